@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment-specific .env file
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'django_extensions',
@@ -56,6 +58,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'core.middleware.JWTAuthenticationMiddleware',
+    'core.middleware.PrincipalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -247,6 +250,60 @@ if ENVIRONMENT == 'production':
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Client uploads: run every upload as a background job, and how jobs run
+# ('thread' = in-process daemon thread, 'command' = manage.py process_client_uploads)
+CLIENT_UPLOAD_BACKGROUND = config('CLIENT_UPLOAD_BACKGROUND', default=False, cast=bool)
+CLIENT_UPLOAD_RUNNER = config('CLIENT_UPLOAD_RUNNER', default='thread')
+# Full-population duplicate scans: 'thread' or 'command' (python manage.py scan_duplicates --queued)
+DUPLICATE_SCAN_RUNNER = config('DUPLICATE_SCAN_RUNNER', default='thread')
+# Caches (core.caching): 'default' is shared by every worker (Redis when REDIS_URL is set, else this
+# process's memory), 'local' is a per-process LRU in front of it
+REDIS_URL = config('REDIS_URL', default='')
+if not REDIS_URL and not DEBUG:
+    # Group invalidation (revoked roles, assignments, logouts) only reaches other workers through Redis
+    raise ImproperlyConfigured('REDIS_URL must be set when DEBUG is False')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'ccd',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ccd-shared',
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ccd-local',
+        'OPTIONS': {'MAX_ENTRIES': config('LOCAL_CACHE_MAX_ENTRIES', default=5000, cast=int)},
+    },
+}
+# Seconds other workers wait for the one worker computing a missing cached value before computing it themselves
+CACHE_LOCK_TIMEOUT = config('CACHE_LOCK_TIMEOUT', default=10, cast=int)
+# Seconds a resolved role/assignment principal stays cached (writes to roles or assignments invalidate it)
+PRINCIPAL_CACHE_TIMEOUT = config('PRINCIPAL_CACHE_TIMEOUT', default=300, cast=int)
+# Seconds a program manager / staff client-visibility id set stays cached (enrollment, restriction and client writes drop it)
+CLIENT_SCOPE_CACHE_TIMEOUT = config('CLIENT_SCOPE_CACHE_TIMEOUT', default=3600, cast=int)
+# Seconds the dashboard counters stay cached per role scope (client/enrollment/program writes drop them)
+DASHBOARD_STATS_CACHE_TIMEOUT = config('DASHBOARD_STATS_CACHE_TIMEOUT', default=300, cast=int)
+# Buffered audit log batches: 'sync' = insert on commit, 'queue' = hand to a background writer thread
+AUDIT_LOG_WRITER = config('AUDIT_LOG_WRITER', default='sync')
+# Range of one audit_logs partition on PostgreSQL ('day', 'week' or 'month'); see manage.py manage_audit_partitions
+AUDIT_LOG_PARTITION_INTERVAL = config('AUDIT_LOG_PARTITION_INTERVAL', default='day')
+# Rows fetched per database round trip by the streaming CSV exports (core.csv_export)
+CSV_EXPORT_CHUNK_SIZE = config('CSV_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Gzip-compress CSV exports for clients that send Accept-Encoding: gzip
+CSV_EXPORT_GZIP = config('CSV_EXPORT_GZIP', default=True, cast=bool)
+# Background exports: 'thread' = run on a daemon thread, 'command' = leave queued for manage.py process_export_jobs
+EXPORT_JOB_RUNNER = config('EXPORT_JOB_RUNNER', default='thread')
+# Identical export requests within this many seconds reuse the finished file
+EXPORT_JOB_FRESHNESS_SECONDS = config('EXPORT_JOB_FRESHNESS_SECONDS', default=600, cast=int)
+# Finished export files are deleted after this many hours, or sooner (least recently used first) above the size budget
+EXPORT_JOB_MAX_AGE_HOURS = config('EXPORT_JOB_MAX_AGE_HOURS', default=24, cast=int)
+EXPORT_JOB_MAX_TOTAL_MB = config('EXPORT_JOB_MAX_TOTAL_MB', default=1024, cast=int)
+
+# Fuzzy program-name matches from client uploads at or above this similarity are learned as aliases
+PROGRAM_ALIAS_MIN_SIMILARITY = config('PROGRAM_ALIAS_MIN_SIMILARITY', default=0.8, cast=float)
+
 # Email configuration with Gmail SMTP
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -0,0 +1,204 @@
+"""
+Date inference for client uploads.
+
+The upload's ``parse_date`` tried pandas, then up to 16 ``strptime`` formats,
+then slash/dash splitting on every date cell (and on every line of a
+multi-line intake cell), and decided US vs European ordering cell by cell.
+``DateColumn`` parses a whole date column at once instead:
+
+1. cells are split into lines and reduced to their distinct values
+2. numbers between 1 and 1,000,000 are Excel serial dates, converted in one
+   vector operation
+3. the dominant format is picked from a sample of the remaining values: the
+   ``DATE_FORMATS`` entry that parses the most of them, earlier entries
+   winning ties (so an all-ambiguous column stays US-ordered, as before)
+4. every value is parsed with ``pd.to_datetime(format=...)``; only the values
+   that format rejects go through the per-cell fallback (``parse_date_text``)
+
+The chosen format, the ordering and how many values each step parsed are
+reported per column (``DateColumn.report``) and stored in the upload log's
+``upload_details['date_formats']``.
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Upload fields holding dates
+DATE_FIELDS = (
+    'dob', 'intake_date', 'discharge_date', 'health_card_exp_date',
+    'service_end_date', 'rejection_date', 'restriction_date',
+)
+
+# Candidate formats, in the order the per-cell parser tried them
+DATE_FORMATS = (
+    '%Y-%m-%d',           # 2024-12-05
+    '%Y-%m-%d %H:%M:%S',  # 2024-12-05 00:00:00 (Excel datetime cells)
+    '%Y/%m/%d',           # 2024/12/05
+    '%m/%d/%Y',           # 12/05/2024 (US format)
+    '%d/%m/%Y',           # 05/12/2024 (European format)
+    '%m-%d-%Y',           # 12-05-2024
+    '%d-%m-%Y',           # 05-12-2024
+    '%Y.%m.%d',           # 2024.12.05
+    '%m.%d.%Y',           # 12.05.2024
+    '%d.%m.%Y',           # 05.12.2024
+    '%B %d, %Y',          # December 5, 2024
+    '%b %d, %Y',          # Dec 5, 2024
+    '%d %B %Y',           # 5 December 2024
+    '%d %b %Y',           # 5 Dec 2024
+    '%Y%m%d',             # 20241205
+    '%m/%d/%y',           # 12/05/24 (2-digit year)
+    '%d/%m/%y',           # 05/12/24 (2-digit year, European)
+)
+
+# Formats with the day before the month
+DAY_FIRST_FORMATS = frozenset(('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d %B %Y', '%d %b %Y', '%d/%m/%y'))
+# Formats with the month before the day, that a day-first format could be mistaken for
+MONTH_FIRST_FORMATS = frozenset(('%m/%d/%Y', '%m-%d-%Y', '%m.%d.%Y', '%m/%d/%y'))
+
+# Excel stores dates as days since 1899-12-30 (its 1900 leap year bug included)
+EXCEL_EPOCH = datetime(1899, 12, 30)
+EXCEL_SERIAL_RANGE = (1, 1000000)
+
+SAMPLE_SIZE = 500
+
+
+def excel_serial_date(value: float) -> date:
+    return (EXCEL_EPOCH + timedelta(days=int(value))).date()
+
+
+def parse_date_text(value: str, day_first: bool = False) -> Optional[date]:
+    """
+    Per-cell parsing of a date string, for the values a column's format does
+    not cover: Excel serials, pandas' own parser (day first when the column
+    is), then each ``DATE_FORMATS`` entry on the value without its time part.
+    """
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        numeric_value = float(value)
+        if EXCEL_SERIAL_RANGE[0] <= numeric_value <= EXCEL_SERIAL_RANGE[1]:
+            return excel_serial_date(numeric_value)
+    except (ValueError, OverflowError):
+        pass
+    try:
+        parsed = pd.to_datetime(value, errors='coerce', dayfirst=day_first)
+        if pd.notna(parsed):
+            return parsed.date()
+    except (ValueError, TypeError, OverflowError):
+        pass
+    # Drop time components: "2024-12-05 14:30:00" / "2024-12-05T14:30:00" -> "2024-12-05"
+    date_part = value.split(' ')[0].split('T')[0]
+    for date_format in DATE_FORMATS:
+        for candidate in (value, date_part):
+            try:
+                return datetime.strptime(candidate, date_format).date()
+            except ValueError:
+                continue
+    return None
+
+
+def infer_date_format(values: pd.Series) -> Optional[str]:
+    """The ``DATE_FORMATS`` entry that parses the most of a sample of ``values`` (None if none parses any)."""
+    sample = values.iloc[:SAMPLE_SIZE]
+    best_format, best_count = None, 0
+    for date_format in DATE_FORMATS:
+        count = int(pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum())
+        if count > best_count:
+            best_format, best_count = date_format, count
+    return best_format
+
+
+def date_ordering(date_format: Optional[str]) -> Optional[str]:
+    if date_format in DAY_FIRST_FORMATS:
+        return 'day_first'
+    if date_format in MONTH_FIRST_FORMATS:
+        return 'month_first'
+    return None
+
+
+class DateColumn:
+    """
+    Parsed dates of one upload column: ``dates`` maps the stripped text of
+    every cell line to its ``date`` (None when it is not a date).
+    """
+
+    def __init__(self, field_name: str, raw: pd.Series, text: pd.Series):
+        self.field_name = field_name
+        self.dates: Dict[str, Optional[date]] = {}
+        self.report = {
+            'format': None,
+            'ordering': None,
+            'values': 0,
+            'excel_serials': 0,
+            'vectorized': 0,
+            'fallback': 0,
+            'unparsed': 0,
+        }
+        if pd.api.types.is_datetime64_any_dtype(raw.dtype):
+            self._parse_datetimes(raw, text)
+        else:
+            self._parse_text(text)
+
+    def __repr__(self):
+        return f"<DateColumn {self.field_name} format={self.report['format']!r}>"
+
+    def get(self, text: str):
+        """``(True, date or None)`` for a known cell line, ``(False, None)`` otherwise."""
+        if not isinstance(text, str):
+            return False, None
+        key = text.strip()
+        if key in self.dates:
+            return True, self.dates[key]
+        return False, None
+
+    def cell_dates(self, text: pd.Series) -> pd.Series:
+        """The date of each single-line cell of the column (None for empty, multi-line or invalid cells)."""
+        return pd.Series([self.dates.get(value) for value in text], index=text.index, dtype=object)
+
+    def _parse_datetimes(self, raw: pd.Series, text: pd.Series):
+        # Excel date columns arrive as datetimes already
+        for value, timestamp in zip(text, raw):
+            if value and value not in self.dates:
+                self.dates[value] = timestamp.date() if pd.notna(timestamp) else None
+        self.report.update(format='datetime', values=len(self.dates), vectorized=len(self.dates))
+
+    def _parse_text(self, text: pd.Series):
+        lines = text.str.split('\n').explode().str.strip()
+        values = pd.Series(pd.unique(lines[lines.notna() & (lines != '')]), dtype=object)
+        self.report['values'] = len(values)
+        if values.empty:
+            return
+
+        numeric = pd.to_numeric(values, errors='coerce')
+        serial = numeric.between(*EXCEL_SERIAL_RANGE)
+        if serial.any():
+            serial_dates = pd.Timestamp(EXCEL_EPOCH) + pd.to_timedelta(numeric[serial].astype(int), unit='D')
+            self.dates.update(zip(values[serial], (value.date() for value in serial_dates)))
+            self.report['excel_serials'] = int(serial.sum())
+
+        remaining = values[~serial]
+        date_format = infer_date_format(remaining) if not remaining.empty else None
+        self.report.update(format=date_format, ordering=date_ordering(date_format))
+        if date_format:
+            parsed = pd.to_datetime(remaining, format=date_format, errors='coerce')
+            matched = parsed.notna()
+            self.dates.update(zip(remaining[matched], (value.date() for value in parsed[matched])))
+            self.report['vectorized'] = int(matched.sum())
+            remaining = remaining[~matched]
+
+        # Outliers: values the column's format does not cover
+        day_first = self.report['ordering'] == 'day_first'
+        for value in remaining:
+            parsed_date = parse_date_text(value, day_first=day_first)
+            self.dates[value] = parsed_date
+            self.report['fallback' if parsed_date else 'unparsed'] += 1
+        if self.report['unparsed']:
+            logger.info(
+                f"Upload column {self.field_name}: {self.report['unparsed']} value(s) are not dates "
+                f"(format {date_format!r})"
+            )
@@ -0,0 +1,332 @@
+"""
+Full-population duplicate scan.
+
+``run_duplicate_scan`` used to fuzzy-compare only the first 2,000 clients by
+name. ``DuplicateScanEngine`` covers every client in scope: all clients go
+into a ``ClientCandidateIndex``, each client is scored against its blocking
+candidates and the clients sharing its last-name initial and date of birth
+(which the sampled scan lifted to 0.9 whatever the names), only those with a
+higher id so every pair is scored once, and flagged pairs are written with
+``bulk_create`` one batch at a time.
+
+Each batch commits together with the scan's checkpoint (``last_client_id``),
+so an interrupted scan resumes from the last committed batch. Each commit
+also moves ``updated_at``: a queued or running scan that has not moved for
+``STALE_SCAN_SECONDS`` lost its runner (worker restart, OOM), no longer
+blocks new scans and can be resumed. Scans run on a daemon thread by default; set ``DUPLICATE_SCAN_RUNNER = 'command'`` to leave
+them queued for ``python manage.py scan_duplicates --queued``.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from core.candidate_index import ClientCandidateIndex
+from core.fuzzy_matching import fuzzy_matcher
+from core.models import Client, ClientDuplicate, DuplicateScanRun
+
+logger = logging.getLogger(__name__)
+
+# Same cut-off the sampled fuzzy stage of run_duplicate_scan used
+DEFAULT_SCAN_THRESHOLD = 0.88
+DEFAULT_SCAN_BATCH_SIZE = 500
+
+# Queued or running scans with no checkpoint for this long lost their runner
+STALE_SCAN_SECONDS = 1800
+
+
+def get_scan_runner():
+    return getattr(settings, 'DUPLICATE_SCAN_RUNNER', 'thread')
+
+
+def get_stale_cutoff():
+    return timezone.now() - timedelta(seconds=STALE_SCAN_SECONDS)
+
+
+def is_stale(scan_run):
+    """Whether a queued or running scan has stopped checkpointing (its runner died)."""
+    return scan_run.status in ('queued', 'processing') and scan_run.updated_at < get_stale_cutoff()
+
+
+def get_active_scan():
+    """The queued or running scan that is still checkpointing, if any."""
+    return (
+        DuplicateScanRun.objects
+        .filter(status__in=['queued', 'processing'], updated_at__gte=get_stale_cutoff())
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def enqueue_duplicate_scan(user=None, threshold=DEFAULT_SCAN_THRESHOLD, batch_size=DEFAULT_SCAN_BATCH_SIZE,
+                           include_archived=False, source=None):
+    """Create a queued scan and start (or queue) it. Returns the active scan if one is already queued or running."""
+    active_scan = get_active_scan()
+    if active_scan:
+        return active_scan
+
+    staff_profile = None
+    if user is not None and user.is_authenticated:
+        staff_profile = getattr(user, 'staff_profile', None)
+
+    scan_run = DuplicateScanRun.objects.create(
+        status='queued',
+        started_by=staff_profile,
+        options={
+            'threshold': threshold,
+            'batch_size': batch_size,
+            'include_archived': include_archived,
+            'source': source,
+            'runner': get_scan_runner(),
+        },
+    )
+    logger.info(f"Queued duplicate scan {scan_run.external_id}")
+
+    if get_scan_runner() == 'thread':
+        start_scan_thread(scan_run.pk)
+    return scan_run
+
+
+def start_scan_thread(scan_run_id, resume=False):
+    thread = threading.Thread(
+        target=run_duplicate_scan_job,
+        args=(scan_run_id,),
+        kwargs={'resume': resume},
+        name=f"duplicate-scan-{scan_run_id}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def can_resume(scan_run):
+    # A queued or running scan already has a runner unless it stopped checkpointing
+    return scan_run.status == 'failed' or is_stale(scan_run)
+
+
+def run_duplicate_scan_job(scan_run_id, resume=False):
+    """Run a scan. Safe to call from a thread or a management command."""
+    close_old_connections()
+    try:
+        scan_run = DuplicateScanRun.objects.get(pk=scan_run_id)
+        return DuplicateScanEngine(scan_run).run(resume=resume)
+    except Exception as e:
+        logger.exception(f"Duplicate scan {scan_run_id} crashed: {e}")
+        scan_run = DuplicateScanRun.objects.filter(pk=scan_run_id).first()
+        if scan_run:
+            scan_run.status = 'failed'
+            scan_run.completed_at = timezone.now()
+            scan_run.error_message = str(e)
+            scan_run.save()
+        return None
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+class DuplicateScanEngine:
+    """Blocking + scoring over every client in the scan's scope."""
+
+    CLIENT_FIELDS = ('id', 'first_name', 'last_name', 'dob', 'created_at')
+
+    def __init__(self, scan_run, matcher=None):
+        self.scan_run = scan_run
+        self.matcher = matcher or fuzzy_matcher
+        options = scan_run.options or {}
+        self.threshold = float(options.get('threshold') or DEFAULT_SCAN_THRESHOLD)
+        self.batch_size = int(options.get('batch_size') or DEFAULT_SCAN_BATCH_SIZE)
+        self.include_archived = bool(options.get('include_archived'))
+        self.source = options.get('source') or None
+
+    def get_queryset(self):
+        clients_qs = Client.objects.all()
+        if not self.include_archived:
+            clients_qs = clients_qs.filter(is_archived=False)
+        if self.source:
+            clients_qs = clients_qs.filter(source=self.source)
+        return (
+            clients_qs
+            .exclude(first_name__isnull=True, last_name__isnull=True)
+            .only(*self.CLIENT_FIELDS)
+            .order_by('id')
+        )
+
+    @staticmethod
+    def dob_group_key(client):
+        return ((client.last_name or '')[:1].lower(), client.dob)
+
+    def group_by_dob(self, clients):
+        """Clients with a DOB by (last-name initial, DOB): same-DOB pairs score 0.9 whatever their names."""
+        groups = {}
+        for client in clients:
+            if client.dob:
+                groups.setdefault(self.dob_group_key(client), []).append(client)
+        return groups
+
+    def score_candidates(self, client, candidates):
+        """(candidate, match_type, score, reason) for candidates at or above the threshold."""
+        client_data = {'first_name': client.first_name or '', 'last_name': client.last_name or ''}
+        # A matching DOB lifts any candidate to 0.9, so only the others can be cut at the threshold
+        same_dob = [candidate for candidate in candidates if client.dob and candidate.dob == client.dob]
+        other = [candidate for candidate in candidates if not (client.dob and candidate.dob == client.dob)]
+        scored = (
+            self.matcher.find_potential_duplicates(client_data, same_dob, similarity_threshold=0.0)
+            + self.matcher.find_potential_duplicates(client_data, other, similarity_threshold=self.threshold)
+        )
+        matches = []
+        for candidate, name_match, score in scored:
+            if client.dob and candidate.dob and client.dob == candidate.dob:
+                score = max(score, 0.9)
+                match_type = 'name_dob_similarity'
+                reason = 'Similar names with matching date of birth'
+            elif name_match == 'nickname':
+                match_type = 'nickname'
+                reason = 'Similar client names (possible nickname)'
+            else:
+                match_type = 'fuzzy_name'
+                reason = 'Similar client names'
+            if score >= self.threshold:
+                matches.append((candidate, match_type, score, reason))
+        return matches
+
+    def build_duplicate(self, client, candidate, match_type, score, reason):
+        # The older record is treated as the primary, like the interactive scan
+        primary, duplicate = client, candidate
+        if client.created_at and candidate.created_at:
+            if candidate.created_at < client.created_at:
+                primary, duplicate = candidate, client
+        elif candidate.id < client.id:
+            primary, duplicate = candidate, client
+
+        return ClientDuplicate(
+            primary_client_id=primary.id,
+            duplicate_client_id=duplicate.id,
+            similarity_score=round(float(score), 3),
+            match_type=match_type,
+            confidence_level=self.matcher.get_duplicate_confidence_level(score),
+            status='pending',
+            detection_source='scan',
+            match_details={
+                'reason': reason,
+                'source': 'full_population_scan',
+                'scan_id': str(self.scan_run.external_id),
+                'primary_name': f"{primary.first_name or ''} {primary.last_name or ''}".strip(),
+                'duplicate_name': f"{duplicate.first_name or ''} {duplicate.last_name or ''}".strip(),
+                'scanned_at': timezone.now().isoformat(),
+            },
+        )
+
+    def run(self, resume=False):
+        scan_run = self.scan_run
+        run_started_at = timezone.now()
+        start_after = scan_run.last_client_id if resume else 0
+        if not resume:
+            scan_run.clients_scanned = 0
+            scan_run.pairs_compared = 0
+            scan_run.duplicates_flagged = 0
+            scan_run.last_client_id = 0
+        scan_run.status = 'processing'
+        scan_run.started_at = scan_run.started_at or run_started_at
+        scan_run.completed_at = None
+        scan_run.error_message = None
+        scan_run.save()
+
+        clients = list(self.get_queryset().iterator(chunk_size=2000))
+        index = ClientCandidateIndex(self.matcher).add_many(clients)
+        existing_pairs = {
+            tuple(sorted(pair))
+            for pair in ClientDuplicate.objects.values_list('primary_client_id', 'duplicate_client_id')
+        }
+        scan_run.clients_total = len(clients)
+        scan_run.save(update_fields=['clients_total', 'updated_at'])
+        logger.info(
+            f"Duplicate scan {scan_run.external_id}: {len(clients)} clients, {len(index)} indexed, "
+            f"starting after client {start_after}"
+        )
+
+        pairs_this_run = 0
+        batch_clients = 0
+        batch_last_id = start_after
+        pending_duplicates = []
+        same_dob_groups = self.group_by_dob(clients)
+
+        for client in clients:
+            if client.id <= start_after:
+                continue
+            found = index.candidates(client.first_name, client.last_name)
+            if client.dob:
+                found += same_dob_groups[self.dob_group_key(client)]
+            # Each pair is scored once, from its lower client id
+            candidates = sorted(
+                {candidate.id: candidate for candidate in found if candidate.id > client.id}.values(),
+                key=lambda candidate: candidate.id,
+            )
+            pairs_this_run += len(candidates)
+            scan_run.pairs_compared += len(candidates)
+            for candidate, match_type, score, reason in self.score_candidates(client, candidates):
+                pair_key = (client.id, candidate.id)
+                if pair_key in existing_pairs:
+                    continue
+                existing_pairs.add(pair_key)
+                pending_duplicates.append(self.build_duplicate(client, candidate, match_type, score, reason))
+
+            batch_clients += 1
+            batch_last_id = client.id
+            if batch_clients >= self.batch_size:
+                self._commit_batch(pending_duplicates, batch_clients, batch_last_id, pairs_this_run, run_started_at)
+                pending_duplicates = []
+                batch_clients = 0
+
+        if batch_clients:
+            self._commit_batch(pending_duplicates, batch_clients, batch_last_id, pairs_this_run, run_started_at)
+
+        scan_run.status = 'success'
+        scan_run.completed_at = timezone.now()
+        scan_run.save()
+        logger.info(
+            f"Duplicate scan {scan_run.external_id} finished: {scan_run.pairs_compared} pairs, "
+            f"{scan_run.duplicates_flagged} flagged, {scan_run.pairs_per_second or 0} pairs/sec"
+        )
+        return build_scan_payload(scan_run)
+
+    def _commit_batch(self, pending_duplicates, batch_clients, batch_last_id, pairs_this_run, run_started_at):
+        """Write a batch of flagged pairs together with the resume checkpoint."""
+        scan_run = self.scan_run
+        elapsed = max((timezone.now() - run_started_at).total_seconds(), 0.001)
+        with transaction.atomic():
+            # Known pairs are filtered before the batch; ignore_conflicts only covers concurrent flags
+            ClientDuplicate.objects.bulk_create(pending_duplicates, ignore_conflicts=True)
+            scan_run.duplicates_flagged += len(pending_duplicates)
+            scan_run.clients_scanned += batch_clients
+            scan_run.last_client_id = batch_last_id
+            scan_run.pairs_per_second = round(pairs_this_run / elapsed, 2)
+            scan_run.save(update_fields=[
+                'duplicates_flagged', 'clients_scanned', 'last_client_id',
+                'pairs_compared', 'pairs_per_second', 'updated_at',
+            ])
+
+
+def build_scan_payload(scan_run):
+    """Serialize a scan's progress for the polling endpoint and the command."""
+    return {
+        'id': str(scan_run.external_id),
+        'status': scan_run.status,
+        'finished': scan_run.status in ('success', 'failed') and scan_run.completed_at is not None,
+        'options': scan_run.options,
+        'clients_total': scan_run.clients_total,
+        'clients_scanned': scan_run.clients_scanned,
+        'percentage': int((scan_run.clients_scanned / scan_run.clients_total) * 100) if scan_run.clients_total else 0,
+        'pairs_compared': scan_run.pairs_compared,
+        'pairs_per_second': scan_run.pairs_per_second,
+        'duplicates_flagged': scan_run.duplicates_flagged,
+        'last_client_id': scan_run.last_client_id,
+        'can_resume': can_resume(scan_run),
+        'stale': is_stale(scan_run),
+        'error_message': scan_run.error_message if scan_run.status == 'failed' else None,
+        'started_at': scan_run.started_at.strftime('%Y-%m-%d %H:%M:%S') if scan_run.started_at else None,
+        'completed_at': scan_run.completed_at.strftime('%Y-%m-%d %H:%M:%S') if scan_run.completed_at else None,
+        'duration_seconds': scan_run.duration_seconds,
+    }
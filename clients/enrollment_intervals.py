@@ -0,0 +1,202 @@
+"""
+Enrollment intervals for client uploads.
+
+For every program on every imported row the upload queried the client's
+enrollments in that program, scanned the whole ``enrollment_cache`` of the
+upload for unsaved ones, and saved each created, merged or archived
+enrollment right away (checking the client's inactive flag after each).
+``EnrollmentIntervals`` keeps the enrollments of the upload's clients instead:
+
+- the enrollments of each chunk's existing clients are loaded with one query
+  (clients the chunk creates have none)
+- they are indexed by (client_id, program_id), sorted by start date, so the
+  merge candidates of a row (open-ended, same start, start within 7 days,
+  overlapping or adjacent) come from a bisect instead of a scan
+- created enrollments and changed ones are written with ``bulk_create`` and
+  ``bulk_update`` when the chunk ends (``flush``), inside its transaction; the
+  upload refreshes inactive flags, visibility sets and dashboard counters
+  after each chunk already
+
+Candidates are returned in the merge priority and order the upload used
+(latest start first within each group), so merges keep the same base.
+"""
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Start dates this close are the same enrollment from another source
+SIMILAR_START_DAYS = 7
+
+# Fields the upload changes on existing enrollments
+UPDATE_FIELDS = (
+    'start_date', 'end_date', 'status', 'notes', 'days_elapsed',
+    'updated_by', 'is_archived', 'archived_at', 'updated_at',
+)
+
+BATCH_SIZE = 500
+
+
+def overlaps_or_adjacent(start1, end1, start2, end2) -> bool:
+    """Whether two date ranges overlap or are adjacent (within 1 day); open-ended ranges never end."""
+    if end1 is None and end2 is None:
+        return True
+    if end1 is None:
+        return start2 >= start1 or end2 >= start1
+    if end2 is None:
+        return start1 >= start2 or end1 >= start2
+    overlap = start1 <= end2 and start2 <= end1
+    adjacent = end1 + timedelta(days=1) == start2 or end2 + timedelta(days=1) == start1
+    return overlap or adjacent
+
+
+class EnrollmentIntervals:
+    """Enrollments of an upload's clients by (client_id, program_id), with pending writes."""
+
+    def __init__(self):
+        # (client_id, program_id) -> non-archived enrollments, sorted by start date
+        self._intervals: Dict[Tuple[int, int], list] = {}
+        # (client_id, program_id) -> every enrollment, archived ones included, in load order
+        self._all: Dict[Tuple[int, int], list] = {}
+        self._loaded_clients = set()
+        self._order = {}
+        self._to_create = []
+        self._to_update = {}
+        self.stats = {'loaded': 0, 'load_queries': 0, 'created': 0, 'updated': 0}
+
+    def __repr__(self):
+        return (
+            f"<EnrollmentIntervals {len(self._loaded_clients)} clients, "
+            f"{len(self._to_create)} to create, {len(self._to_update)} to update>"
+        )
+
+    def load_clients(self, client_ids: Iterable[int]) -> None:
+        """Load the enrollments of the clients not loaded yet, in one query."""
+        from core.models import ClientProgramEnrollment
+
+        client_ids = {client_id for client_id in client_ids if client_id not in self._loaded_clients}
+        if not client_ids:
+            return
+        self._loaded_clients.update(client_ids)
+        enrollments = ClientProgramEnrollment.objects.filter(client_id__in=client_ids).order_by('-start_date', 'pk')
+        self.stats['load_queries'] += 1
+        for enrollment in enrollments:
+            self._index(enrollment)
+            self.stats['loaded'] += 1
+
+    def add_new_clients(self, client_ids: Iterable[int]) -> None:
+        """Clients created by the upload: they have no enrollments to load."""
+        self._loaded_clients.update(client_ids)
+
+    def get(self, client_id: int, program_id: int, start_date):
+        """The enrollment of the client in the program starting on ``start_date`` (archived included), or None."""
+        self.load_clients((client_id,))
+        for enrollment in self._all.get((client_id, program_id), ()):
+            if enrollment.start_date == start_date:
+                return enrollment
+        return None
+
+    def candidates(self, client_id: int, program_id: int, start_date, end_date) -> List:
+        """
+        Non-archived enrollments a new enrollment from ``start_date`` to
+        ``end_date`` merges into, in priority order: open-ended ones (when the
+        new one is open-ended too), the same start date, a start within
+        ``SIMILAR_START_DAYS``, then overlapping or adjacent ones.
+        """
+        self.load_clients((client_id,))
+        intervals = self._intervals.get((client_id, program_id))
+        if not intervals:
+            return []
+        starts = [enrollment.start_date for enrollment in intervals]
+        groups = []
+        if end_date is None:
+            groups.append([enrollment for enrollment in intervals if enrollment.end_date is None])
+        if start_date is not None:
+            groups.append(intervals[bisect_left(starts, start_date):bisect_right(starts, start_date)])
+            groups.append(intervals[
+                bisect_left(starts, start_date - timedelta(days=SIMILAR_START_DAYS)):
+                bisect_right(starts, start_date + timedelta(days=SIMILAR_START_DAYS))
+            ])
+            # A closed range only reaches enrollments starting by the day after it ends
+            last = len(intervals) if end_date is None else bisect_right(starts, max(start_date, end_date) + timedelta(days=1))
+            groups.append([
+                enrollment for enrollment in intervals[:last]
+                if overlaps_or_adjacent(enrollment.start_date, enrollment.end_date, start_date, end_date)
+            ])
+        matches, seen = [], set()
+        for group in groups:
+            for enrollment in sorted(group, key=self._sort_key):
+                if id(enrollment) not in seen:
+                    seen.add(id(enrollment))
+                    matches.append(enrollment)
+        return matches
+
+    def open_ended(self, client_id: int, program_id: int, exclude_start=None):
+        """The latest-starting non-archived open-ended enrollment not starting on ``exclude_start``."""
+        self.load_clients((client_id,))
+        for enrollment in sorted(self._intervals.get((client_id, program_id), ()), key=self._sort_key):
+            if enrollment.end_date is None and enrollment.start_date != exclude_start:
+                return enrollment
+        return None
+
+    def create(self, **fields):
+        """A new enrollment, written when the chunk is flushed."""
+        from core.models import ClientProgramEnrollment
+
+        enrollment = ClientProgramEnrollment(**fields)
+        self._to_create.append(enrollment)
+        self._index(enrollment)
+        return enrollment
+
+    def changed(self, enrollment) -> None:
+        """Record changes to an enrollment (its dates included), written when the chunk is flushed."""
+        intervals = self._intervals.get((enrollment.client_id, enrollment.program_id), [])
+        if any(other is enrollment for other in intervals):
+            intervals.sort(key=lambda other: other.start_date)
+        if enrollment.pk is not None:
+            self._to_update[enrollment.pk] = enrollment
+
+    def archive(self, enrollment, archived_at=None) -> None:
+        """Archive an enrollment merged into another one; it stops being a merge candidate."""
+        enrollment.is_archived = True
+        enrollment.archived_at = archived_at or timezone.now()
+        key = (enrollment.client_id, enrollment.program_id)
+        self._intervals[key] = [other for other in self._intervals.get(key, ()) if other is not enrollment]
+        self.changed(enrollment)
+
+    def flush(self) -> Tuple[int, int]:
+        """Write the pending creates and updates; returns (created, updated)."""
+        from core.models import ClientProgramEnrollment
+
+        created, updated = self._to_create, list(self._to_update.values())
+        self._to_create, self._to_update = [], {}
+        if created:
+            ClientProgramEnrollment.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        if updated:
+            # bulk_update does not apply auto_now
+            now = timezone.now()
+            for enrollment in updated:
+                enrollment.updated_at = now
+            ClientProgramEnrollment.objects.bulk_update(updated, UPDATE_FIELDS, batch_size=BATCH_SIZE)
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        if created or updated:
+            logger.info(f"Wrote {len(created)} new and {len(updated)} changed enrollments")
+        return len(created), len(updated)
+
+    def _index(self, enrollment) -> None:
+        key = (enrollment.client_id, enrollment.program_id)
+        self._order[id(enrollment)] = len(self._order)
+        self._all.setdefault(key, []).append(enrollment)
+        if enrollment.is_archived:
+            return
+        intervals = self._intervals.setdefault(key, [])
+        intervals.insert(bisect_right([other.start_date for other in intervals], enrollment.start_date), enrollment)
+
+    def _sort_key(self, enrollment):
+        # Latest start first, then in load (or creation) order
+        return (-enrollment.start_date.toordinal(), self._order.get(id(enrollment), 0))
@@ -0,0 +1,278 @@
+"""
+Background client upload jobs.
+
+Uploads queued with ``enqueue_client_upload`` are stored under
+``MEDIA_ROOT/client_uploads/`` and processed chunk by chunk by
+``run_client_upload_job``. Every chunk commits on its own and records a
+checkpoint in ``ClientUploadLog.upload_details`` so a failed or interrupted
+upload can be resumed from the last committed chunk. A queued or processing
+upload whose ``updated_at`` has not moved for ``STALE_UPLOAD_SECONDS`` lost
+its runner (worker restart, OOM) and is resumable too.
+
+Jobs run on a daemon thread by default. Set ``CLIENT_UPLOAD_RUNNER = 'command'``
+to leave them queued for ``python manage.py process_client_uploads`` instead.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from core.audit import audit_buffer
+from core.models import ClientUploadLog
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STORAGE_DIR = 'client_uploads'
+
+# Number of per-chunk results kept in upload_details['chunks']
+MAX_CHUNK_RESULTS = 500
+
+# Queued or processing uploads with no checkpoint for this long lost their runner
+STALE_UPLOAD_SECONDS = 1800
+
+
+def get_upload_runner():
+    return getattr(settings, 'CLIENT_UPLOAD_RUNNER', 'thread')
+
+
+def enqueue_client_upload(file, source, user):
+    """Store the uploaded file, create a queued ClientUploadLog and start (or queue) the job."""
+    file_extension = file.name.split('.')[-1].lower()
+    stored_path = default_storage.save(
+        os.path.join(UPLOAD_STORAGE_DIR, f"{uuid.uuid4()}.{file_extension}"), file
+    )
+
+    staff_profile = None
+    if user is not None and user.is_authenticated:
+        staff_profile = getattr(user, 'staff_profile', None)
+
+    upload_log = ClientUploadLog.objects.create(
+        file_name=file.name,
+        file_size=file.size,
+        file_type=file_extension,
+        source=source,
+        started_at=timezone.now(),
+        uploaded_by=staff_profile,
+        status='queued',
+        upload_details={
+            'job': {
+                'stored_path': stored_path,
+                'user_id': user.pk if user is not None and user.is_authenticated else None,
+                'runner': get_upload_runner(),
+                'queued_at': str(timezone.now()),
+            },
+            'progress': {'processed': 0, 'total': 0, 'percentage': 0, 'status': 'queued'},
+        },
+    )
+    logger.info(f"Queued client upload {upload_log.external_id} ({file.name}, {file.size} bytes)")
+
+    if get_upload_runner() == 'thread':
+        start_upload_thread(upload_log.pk)
+    return upload_log
+
+
+def start_upload_thread(upload_log_id, resume=False):
+    thread = threading.Thread(
+        target=run_client_upload_job,
+        args=(upload_log_id,),
+        kwargs={'resume': resume},
+        name=f"client-upload-{upload_log_id}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def is_stale(upload_log):
+    """Whether a queued or processing upload has stopped checkpointing (its runner died)."""
+    if upload_log.status not in ('queued', 'processing') or upload_log.updated_at is None:
+        return False
+    return upload_log.updated_at < timezone.now() - timedelta(seconds=STALE_UPLOAD_SECONDS)
+
+
+def can_resume(upload_log):
+    """A job can resume when its file is still stored and it failed or lost its runner."""
+    job = (upload_log.upload_details or {}).get('job') or {}
+    stored_path = job.get('stored_path')
+    if not stored_path or not default_storage.exists(stored_path):
+        return False
+    # A queued or processing upload already has a runner unless it stopped checkpointing
+    return upload_log.status == 'failed' or is_stale(upload_log)
+
+
+def _get_job_user(job):
+    from core.models import User
+
+    user_id = job.get('user_id')
+    if user_id:
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            logger.warning(f"Upload job user {user_id} no longer exists; running as System")
+    return AnonymousUser()
+
+
+def run_client_upload_job(upload_log_id, resume=False):
+    """Process a stored upload. Safe to call from a thread or a management command."""
+    from .views import process_client_upload
+
+    close_old_connections()
+    try:
+        upload_log = ClientUploadLog.objects.get(pk=upload_log_id)
+        job = (upload_log.upload_details or {}).get('job') or {}
+        stored_path = job.get('stored_path')
+        if not stored_path:
+            logger.error(f"Upload {upload_log.external_id} has no stored file to process")
+            return None
+
+        # Drop the response of a previous (failed) run so pollers wait for this one
+        if 'result' in upload_log.upload_details:
+            upload_log.upload_details.pop('result')
+            upload_log.upload_details.pop('result_status_code', None)
+            upload_log.save(update_fields=['upload_details'])
+
+        job_user = _get_job_user(job)
+        with default_storage.open(stored_path, 'rb') as stored_file, audit_buffer(job_user):
+            stored_file.name = upload_log.file_name
+            response = process_client_upload(
+                stored_file,
+                upload_log.source,
+                job_user,
+                upload_log=upload_log,
+                resume=resume,
+            )
+
+        result = json.loads(response.content)
+        upload_log.refresh_from_db()
+        details = upload_log.upload_details or {}
+        details['result'] = result
+        details['result_status_code'] = response.status_code
+        upload_log.upload_details = details
+        upload_log.save(update_fields=['upload_details'])
+
+        # Keep the file around while the upload can still be resumed
+        if upload_log.status != 'failed':
+            default_storage.delete(stored_path)
+        return result
+    except Exception as e:
+        logger.exception(f"Client upload job {upload_log_id} crashed: {e}")
+        upload_log = ClientUploadLog.objects.filter(pk=upload_log_id).first()
+        if upload_log:
+            details = upload_log.upload_details or {}
+            details['result'] = {'success': False, 'error': str(e)}
+            upload_log.upload_details = details
+            upload_log.status = 'failed'
+            upload_log.completed_at = timezone.now()
+            upload_log.error_message = str(e)
+            upload_log.save()
+        return None
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def read_checkpoint(upload_log):
+    """Return the last committed checkpoint for the upload, or None."""
+    if upload_log is None:
+        return None
+    return (upload_log.upload_details or {}).get('checkpoint')
+
+
+def record_chunk_checkpoint(upload_log, chunk_result, totals, total_rows, rows_this_run, run_started_at):
+    """
+    Persist a committed chunk: per-chunk result, resume checkpoint, running
+    counters and throughput. Called after the chunk's transaction commits.
+    """
+    if upload_log is None:
+        return
+    now = timezone.now()
+    elapsed = max((now - run_started_at).total_seconds(), 0.001)
+    rows_per_second = rows_this_run / elapsed
+    processed = chunk_result['end_row']
+    remaining = max(total_rows - processed, 0)
+
+    details = upload_log.upload_details or {}
+    chunks = details.get('chunks') or []
+    chunks.append(chunk_result)
+    details['chunks'] = chunks[-MAX_CHUNK_RESULTS:]
+    details['checkpoint'] = {
+        'next_row': processed,
+        'chunk_number': chunk_result['chunk'],
+        'records_created': totals['created'],
+        'records_updated': totals['updated'],
+        'records_skipped': totals['skipped'],
+        'duplicates_flagged': totals['duplicates_flagged'],
+        'errors_count': totals['errors'],
+        'committed_at': str(now),
+    }
+    details['progress'] = {
+        'processed': processed,
+        'total': total_rows,
+        'percentage': int((processed / total_rows) * 100) if total_rows else 100,
+        'current_chunk': chunk_result['chunk'],
+        'rows_per_second': round(rows_per_second, 2),
+        'eta_seconds': round(remaining / rows_per_second, 1) if rows_per_second > 0 else None,
+        'status': 'processing',
+    }
+    upload_log.upload_details = details
+    upload_log.total_rows = total_rows
+    upload_log.records_created = totals['created']
+    upload_log.records_updated = totals['updated']
+    upload_log.records_skipped = totals['skipped']
+    upload_log.duplicates_flagged = totals['duplicates_flagged']
+    upload_log.errors_count = totals['errors']
+    upload_log.save(update_fields=[
+        'upload_details', 'total_rows', 'records_created', 'records_updated',
+        'records_skipped', 'duplicates_flagged', 'errors_count', 'updated_at',
+    ])
+
+
+def build_progress_payload(upload_log):
+    """Serialize an upload's live progress for the polling endpoint."""
+    details = upload_log.upload_details or {}
+    progress = details.get('progress') or {}
+    stale = is_stale(upload_log)
+    # Background jobs are finished once their final response has been stored
+    finished = (
+        upload_log.status in ('success', 'partial', 'failed')
+        and upload_log.completed_at is not None
+        and ('result' in details or 'job' not in details)
+    )
+    return {
+        'id': str(upload_log.external_id),
+        'file_name': upload_log.file_name,
+        'source': upload_log.source,
+        'status': upload_log.status,
+        'finished': finished,
+        'total_rows': upload_log.total_rows,
+        'processed_rows': progress.get('processed', 0),
+        'percentage': progress.get('percentage', 0),
+        'rows_per_second': progress.get('rows_per_second'),
+        'eta_seconds': progress.get('eta_seconds'),
+        'current_chunk': progress.get('current_chunk'),
+        'records_created': upload_log.records_created,
+        'records_updated': upload_log.records_updated,
+        'records_skipped': upload_log.records_skipped,
+        'duplicates_flagged': upload_log.duplicates_flagged,
+        'errors_count': upload_log.errors_count,
+        'error_message': (
+            upload_log.error_message if upload_log.status == 'failed'
+            else 'The upload stopped responding. Resume it from the last saved chunk.' if stale
+            else None
+        ),
+        'checkpoint': details.get('checkpoint'),
+        'chunks': details.get('chunks') or [],
+        'can_resume': can_resume(upload_log),
+        'stale': stale,
+        'started_at': upload_log.started_at.strftime('%Y-%m-%d %H:%M:%S') if upload_log.started_at else None,
+        'completed_at': upload_log.completed_at.strftime('%Y-%m-%d %H:%M:%S') if upload_log.completed_at else None,
+        'result': details.get('result') if finished else None,
+    }
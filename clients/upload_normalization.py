@@ -0,0 +1,204 @@
+"""
+Normalization stage for client uploads.
+
+The upload view used to re-resolve the column mapping inside every row and
+walk the DataFrame several times to collect ids, DOBs and names for the batch
+pre-loads. ``UploadFrame`` resolves the mapping once and builds the canonical
+columns with pandas vector operations, so the per-row code only reads from
+plain dicts. Date columns are parsed once per column with an inferred format
+(see clients.date_inference).
+"""
+import logging
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .date_inference import DATE_FIELDS, DateColumn
+
+logger = logging.getLogger(__name__)
+
+# Placeholder DOB written for clients without a date of birth
+PLACEHOLDER_DOB = date(1900, 1, 1)
+
+NULL_TOKENS = ('nan', 'none', 'null')
+
+
+def resolve_field_columns(column_mapping: Dict[str, str], df_columns: Iterable[str]) -> Dict[str, str]:
+    """Return {standard_field: column}, keeping the first column mapped to each field."""
+    field_columns = {}
+    for col in df_columns:
+        field_name = column_mapping.get(col)
+        if field_name and field_name not in field_columns:
+            field_columns[field_name] = col
+    return field_columns
+
+
+def clean_text_series(series: pd.Series) -> pd.Series:
+    """Vectorized ``str(value).strip()``; missing values become ''."""
+    result = pd.Series('', index=series.index, dtype=object)
+    present = series.notna()
+    if present.any():
+        values = series[present]
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            # Keep str(Timestamp) output ("YYYY-MM-DD HH:MM:SS") like the row-wise code
+            text = values.astype(object).map(str)
+        else:
+            text = values.astype(str)
+        result[present] = text.str.strip().astype(object)
+    return result
+
+
+def clean_client_id_series(text: pd.Series) -> pd.Series:
+    """
+    Vectorized counterpart of the upload's client id cleaning: null tokens are
+    dropped and integral decimals such as "2765.0" become "2765".
+    """
+    ids = text.copy()
+    ids[ids.str.lower().isin(NULL_TOKENS)] = ''
+    dotted = ids.str.contains('.', regex=False)
+    if dotted.any():
+        numeric = pd.to_numeric(ids[dotted], errors='coerce')
+        # Non-numeric ids containing '.' were rejected by the row-wise cleaner
+        ids[numeric[numeric.isna()].index] = ''
+        finite = numeric[numeric.notna() & (numeric.abs() != float('inf'))]
+        integral = finite[finite % 1 == 0]
+        if not integral.empty:
+            ids[integral.index] = integral.map(lambda value: str(int(value)))
+    return ids
+
+
+def phone_key_series(text: pd.Series) -> pd.Series:
+    """Strip spaces, dashes, parentheses and plus signs for phone matching."""
+    return text.str.replace(r'[ \-()+]', '', regex=True)
+
+
+def split_lines_series(text: pd.Series) -> pd.Series:
+    """Split multi-line cells (programs, intake dates) into lists of stripped parts."""
+    return text.map(lambda value: [part.strip() for part in value.split('\n') if part.strip()])
+
+
+class UploadFrame:
+    """
+    Canonical, typed view of an uploaded client sheet.
+
+    ``fields`` holds one stripped string column per mapped standard field
+    ('' when the cell is empty). Derived columns used for batch matching are
+    built alongside it:
+
+    - ``client_id_clean``: cleaned client ids
+    - ``email_key``: lower-cased emails
+    - ``phone_key``: phones without formatting characters
+    - ``first_name_key`` / ``last_name_key``: lower-cased names
+    - ``dob_date``: parsed DOBs as ``date`` objects
+    - ``program_name_list`` / ``intake_date_list``: multi-line cells split into lists
+
+    ``date_columns`` holds a ``DateColumn`` per mapped date field, with the
+    parsed date of every cell line.
+    """
+
+    DERIVED_COLUMNS = (
+        'client_id_clean', 'email_key', 'phone_key', 'first_name_key',
+        'last_name_key', 'dob_date', 'program_name_list', 'intake_date_list',
+    )
+
+    def __init__(self, df: pd.DataFrame, column_mapping: Dict[str, str]):
+        self.df = df
+        self.column_mapping = column_mapping
+        self.field_columns = resolve_field_columns(column_mapping, df.columns)
+        self.mapped_fields = frozenset(self.field_columns)
+        self.fields = self._build_fields()
+        self.date_columns = {
+            field_name: DateColumn(field_name, self.df[self.field_columns[field_name]], self.text(field_name))
+            for field_name in DATE_FIELDS if self.has_field(field_name)
+        }
+        self.derived = self._build_derived()
+        self._row_fields = None
+
+    def has_field(self, field_name: str) -> bool:
+        return field_name in self.mapped_fields
+
+    def text(self, field_name: str) -> pd.Series:
+        """Stripped string column for a field; all '' when the field is not mapped."""
+        if field_name in self.fields:
+            return self.fields[field_name]
+        return pd.Series('', index=self.df.index, dtype=object)
+
+    def _build_fields(self) -> pd.DataFrame:
+        columns = {
+            field_name: clean_text_series(self.df[col])
+            for field_name, col in self.field_columns.items()
+        }
+        return pd.DataFrame(columns, index=self.df.index)
+
+    def _build_derived(self) -> pd.DataFrame:
+        derived = {
+            'client_id_clean': clean_client_id_series(self.text('client_id')),
+            'email_key': self.text('email').str.lower(),
+            'phone_key': phone_key_series(self.text('phone')),
+            'first_name_key': self.text('first_name').str.lower(),
+            'last_name_key': self.text('last_name').str.lower(),
+            'program_name_list': split_lines_series(self.text('program_name')),
+            'intake_date_list': split_lines_series(self.text('intake_date')),
+        }
+        if self.has_field('dob'):
+            derived['dob_date'] = self.date_columns['dob'].cell_dates(self.text('dob'))
+        else:
+            derived['dob_date'] = pd.Series([None] * len(self.df.index), index=self.df.index, dtype=object)
+        return pd.DataFrame(derived, index=self.df.index)
+
+    def lookup_date(self, field_name: str, value) -> Tuple[bool, Optional[date]]:
+        """``(True, date or None)`` when ``value`` is a cell line of a parsed date column, else ``(False, None)``."""
+        date_column = self.date_columns.get(field_name)
+        if date_column is None:
+            return False, None
+        return date_column.get(value)
+
+    def date_formats(self) -> Dict[str, Dict]:
+        """Per date column: the inferred format and how its values were parsed (for the upload log)."""
+        return {field_name: date_column.report for field_name, date_column in self.date_columns.items()}
+
+    def unique_values(self, column: str) -> List:
+        """Distinct non-empty values of a field or derived column, in file order."""
+        series = self.derived[column] if column in self.derived else self.text(column)
+        series = series[series.map(bool)]
+        return list(dict.fromkeys(series))
+
+    def dobs(self, exclude_placeholder: bool = True) -> set:
+        dobs = {value for value in self.derived['dob_date'] if value is not None}
+        if exclude_placeholder:
+            dobs.discard(PLACEHOLDER_DOB)
+        return dobs
+
+    def name_dob_keys(self) -> set:
+        """(first_name_lower, last_name_lower, dob) for rows that carry all three."""
+        keys = set()
+        for first, last, dob in zip(
+            self.derived['first_name_key'], self.derived['last_name_key'], self.derived['dob_date']
+        ):
+            if first and last and dob is not None and dob != PLACEHOLDER_DOB:
+                keys.add((first, last, dob))
+        return keys
+
+    def row_fields(self, index) -> Dict:
+        """Ready dict of mapped field values plus derived columns for one row label."""
+        if self._row_fields is None:
+            combined = pd.concat([self.fields, self.derived], axis=1)
+            self._row_fields = dict(zip(self.df.index, combined.to_dict('records')))
+        return self._row_fields[index]
+
+    def iter_rows(self, start: int, end: int) -> Iterator[Tuple[object, Dict, Dict]]:
+        """Yield (index, raw_row, row_fields) for positional rows [start, end)."""
+        chunk = self.df.iloc[start:end]
+        raw_rows = chunk.to_dict('records')
+        for index, raw_row in zip(chunk.index, raw_rows):
+            yield index, raw_row, self.row_fields(index)
+
+    def get_field(self, row_fields: Dict, field_name: str, default: Optional[str] = '') -> Optional[str]:
+        """
+        Same contract as the upload's per-row ``get_field_data``: None when the
+        field is not mapped, ``default`` when the mapped cell is empty.
+        """
+        if field_name not in self.mapped_fields:
+            return None
+        return row_fields.get(field_name) or default
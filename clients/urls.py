@@ -17,6 +17,8 @@ urlpatterns = [
     path('bulk-restore/', views.bulk_restore_clients, name='bulk_restore'),
     path('dedupe/', views.ClientDedupeView.as_view(), name='dedupe'),
     path('dedupe/run-scan/', views.run_duplicate_scan, name='dedupe_run_scan'),
+    path('dedupe/scans/<uuid:scan_id>/progress/', views.get_duplicate_scan_progress, name='dedupe_scan_progress'),
+    path('dedupe/scans/<uuid:scan_id>/resume/', views.resume_duplicate_scan, name='dedupe_scan_resume'),
     path('dedupe/delete-high-confidence/', views.delete_high_confidence_duplicates, name='dedupe_delete_high_confidence'),
     path('dedupe/action/<int:duplicate_id>/<str:action>/', views.mark_duplicate_action, name='duplicate_action'),
     path('dedupe/bulk-action/', views.bulk_duplicate_action, name='bulk_duplicate_action'),
@@ -32,6 +34,8 @@ urlpatterns = [
     path('save-email-subscriptions/', views.save_email_subscriptions, name='save_email_subscriptions'),
     path('remove-email-recipient/<int:recipient_id>/', views.remove_email_recipient, name='remove_email_recipient'),
     path('upload-logs/', views.get_upload_logs, name='upload_logs'),
+    path('upload-logs/<uuid:upload_id>/progress/', views.get_upload_progress, name='upload_progress'),
+    path('upload-logs/<uuid:upload_id>/resume/', views.resume_upload, name='resume_upload'),
     path('<uuid:external_id>/update-profile-picture/', views.update_profile_picture, name='update_profile_picture'),
     path('<uuid:external_id>/remove-profile-picture/', views.remove_profile_picture, name='remove_profile_picture'),
 ]
@@ -8,15 +8,27 @@ from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.utils.decorators import method_decorator
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from django.db.models import Q, Count, Exists, OuterRef, Max
+from django.db.models import Q, Count, Exists, OuterRef, Max, Prefetch
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db import IntegrityError, transaction
-from core.models import Client, Program, Department, Intake, ClientProgramEnrollment, ClientDuplicate, ClientUploadLog, ServiceRestrictionNotificationSubscription
+from core.models import Client, Program, Department, Intake, ClientProgramEnrollment, ClientDuplicate, ClientUploadLog, DuplicateScanRun, ServiceRestrictionNotificationSubscription
 from core.upload_errors import UploadError, UPLOAD_ERROR_CODES, get_error_code_for_exception
 from datetime import datetime, date, timedelta
 from core.views import ProgramManagerAccessMixin, AnalystAccessMixin, jwt_required, can_see_archived
+from core.principal import get_principal
+from core.client_scope import get_program_manager_client_ids, get_staff_client_ids, get_visible_clients, invalidate_client_scopes
+from core.client_search import client_search_filter
+from core.dashboard_stats import invalidate_dashboard_stats
+from core.csv_export import CSVExport, iter_queryset
+from core.export_jobs import export_job_response, wants_background_export
 from core.fuzzy_matching import fuzzy_matcher
+from core.candidate_index import ClientCandidateIndex
+from core.program_index import load_program_index
+from core.similarity import token_similarity
 from .forms import ClientForm
+from .upload_normalization import UploadFrame
+from .enrollment_intervals import EnrollmentIntervals
+from .duplicate_scan import build_scan_payload, enqueue_duplicate_scan
 import pandas as pd
 import json
 import uuid
@@ -134,19 +146,9 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         # Check if user can see archived clients (only SuperAdmin and Admin)
         user_can_see_archived = can_see_archived(self.request.user)
         
-        # Start with base queryset - exclude archived clients for non-admin users
-        # Don't use ProgramManagerAccessMixin's get_queryset because it tries to select_related('program') 
-        # which doesn't exist on Client model
-        if not user_can_see_archived:
-            queryset = Client.objects.filter(is_archived=False).order_by('-created_at')
-        else:
-            # SuperAdmin/Admin can see all clients (archived filter will be applied by status_filter if needed)
-            queryset = Client.objects.all().order_by('-created_at')
-        
-        # Exclude clients that are marked as duplicates (i.e., they are duplicate_client in a pending ClientDuplicate record)
-        queryset = queryset.exclude(
-            duplicate_of__status='pending'
-        )
+        # Clients visible to the user: archived clients only for SuperAdmin/Admin, no clients
+        # pending as duplicates, and the program manager, staff-only and leader scopes
+        queryset = get_visible_clients(self.request.user).order_by('-created_at')
         
         # Apply date range filtering
         start_date, end_date, parsed_start_date, parsed_end_date = get_date_range_filter(self.request)
@@ -156,96 +158,6 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if parsed_end_date:
             queryset = queryset.filter(created_at__date__lte=parsed_end_date)
         
-        # For program managers and staff-only users, we need to filter clients based on their relationships
-        if self.request.user.is_authenticated:
-            try:
-                staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
-                
-                if staff.is_program_manager():
-                    # Get assigned programs
-                    assigned_programs = staff.get_assigned_programs()
-                    
-                    # Create a Q object to combine all the relationship filters
-                    relationship_filters = Q()
-                    
-                    # 1. Clients enrolled in programs they manage
-                    relationship_filters |= Q(
-                        clientprogramenrollment__program__in=assigned_programs
-                    )
-                    
-                    # 2. Clients they have created enrollments for
-                    # (This would require tracking who created enrollments - using created_by field)
-                    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                    relationship_filters |= Q(
-                        clientprogramenrollment__created_by=staff_name
-                    )
-                    
-                    # 3. Clients they have created restrictions for
-                    relationship_filters |= Q(
-                        servicerestriction__created_by=staff_name
-                    )
-                    
-                    # 4. Clients they have updated (using updated_by field)
-                    relationship_filters |= Q(
-                        updated_by=staff_name
-                    )
-                    
-                    # Apply the combined filter
-                    queryset = queryset.filter(relationship_filters).distinct()
-                elif 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
-                    # Staff-only users see clients from both assigned programs AND directly assigned clients
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    
-                    # Create a Q object to combine both types of assignments
-                    relationship_filters = Q()
-                    
-                    # 1. Clients enrolled in their assigned programs
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(
-                            clientprogramenrollment__program_id__in=assigned_program_ids
-                        )
-                    
-                    # 2. Directly assigned clients
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(
-                            id__in=assigned_client_ids
-                        )
-                    
-                    # Apply the combined filter
-                    if relationship_filters:
-                        queryset = queryset.filter(relationship_filters).distinct()
-                    else:
-                        # If no assignments, show no clients
-                        queryset = queryset.none()
-                
-                elif staff.is_leader():
-                    # Leader users see only clients enrolled in programs from their assigned departments
-                    # Leaders cannot see archived clients
-                    from core.models import Department
-                    assigned_departments = Department.objects.filter(
-                        leader_assignments__staff=staff,
-                        leader_assignments__is_active=True,
-                        is_archived=False
-                    ).distinct()
-                    assigned_programs = Program.objects.filter(
-                        department__in=assigned_departments
-                    ).distinct()
-                    queryset = queryset.filter(
-                        clientprogramenrollment__program__in=assigned_programs
-                    ).distinct()
-            except Exception:
-                pass
-        
         search_query = self.request.GET.get('search', '').strip()
         program_filter = self.request.GET.get('program', '').strip()
         age_range = self.request.GET.get('age_range', '').strip()
@@ -273,19 +185,9 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         # when marked as duplicates
         
         if search_query:
-            # Search across multiple fields using Q objects
-            search_filters = Q(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(preferred_name__icontains=search_query) |
-                Q(alias__icontains=search_query) |
-                Q(contact_information__email__icontains=search_query) |
-                Q(contact_information__phone__icontains=search_query) |
-                Q(client_id__icontains=search_query) |
-                Q(uid_external__icontains=search_query) |
-                Q(postal_code__icontains=search_query) |
-                Q(chart_number__icontains=search_query)
-            )
+            # Names, alias, IDs, phones, emails, postal code and chart number
+            # (trigram-indexed search_text on PostgreSQL, see core.client_search)
+            search_filters = client_search_filter(search_query)
             
             # Also search by primary key ID if search_query is numeric (CCD ID)
             try:
@@ -326,7 +228,7 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
                 except (ValueError, TypeError):
                     pass
             
-            queryset = queryset.filter(search_filters).distinct()
+            queryset = queryset.filter(search_filters)
         
         if program_filter:
             # Filter clients enrolled in the selected program
@@ -420,8 +322,7 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if manager_filter and self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 # Only apply manager filter if user is SuperAdmin or Admin
                 if any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -486,8 +387,7 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         
         try:
             staff = self.request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(self.request.user).role_names
             
             # SuperAdmin and Admin see all programs
             if any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -564,8 +464,7 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 # Only show manager filter to SuperAdmin and Admin
                 if any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -601,37 +500,12 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if staff.is_program_manager():
-                    assigned_programs = staff.get_assigned_programs()
-                    relationship_filters = Q()
-                    relationship_filters |= Q(clientprogramenrollment__program__in=assigned_programs)
-                    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                    relationship_filters |= Q(clientprogramenrollment__created_by=staff_name)
-                    relationship_filters |= Q(servicerestriction__created_by=staff_name)
-                    relationship_filters |= Q(updated_by=staff_name)
-                    base_queryset_for_max = base_queryset_for_max.filter(relationship_filters)
+                    base_queryset_for_max = base_queryset_for_max.filter(id__in=get_program_manager_client_ids(self.request.user))
                 elif 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    relationship_filters = Q()
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(clientprogramenrollment__program_id__in=assigned_program_ids)
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(id__in=assigned_client_ids)
-                    if relationship_filters:
-                        base_queryset_for_max = base_queryset_for_max.filter(relationship_filters)
-                    else:
-                        base_queryset_for_max = base_queryset_for_max.none()
+                    base_queryset_for_max = base_queryset_for_max.filter(id__in=get_staff_client_ids(self.request.user))
                 elif staff.is_leader():
                     from core.models import Department
                     assigned_departments = Department.objects.filter(
@@ -718,37 +592,12 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if staff.is_program_manager():
-                    assigned_programs = staff.get_assigned_programs()
-                    relationship_filters = Q()
-                    relationship_filters |= Q(clientprogramenrollment__program__in=assigned_programs)
-                    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                    relationship_filters |= Q(clientprogramenrollment__created_by=staff_name)
-                    relationship_filters |= Q(servicerestriction__created_by=staff_name)
-                    relationship_filters |= Q(updated_by=staff_name)
-                    base_queryset = base_queryset.filter(relationship_filters)
+                    base_queryset = base_queryset.filter(id__in=get_program_manager_client_ids(self.request.user))
                 elif 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    relationship_filters = Q()
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(clientprogramenrollment__program_id__in=assigned_program_ids)
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(id__in=assigned_client_ids)
-                    if relationship_filters:
-                        base_queryset = base_queryset.filter(relationship_filters)
-                    else:
-                        base_queryset = base_queryset.none()
+                    base_queryset = base_queryset.filter(id__in=get_staff_client_ids(self.request.user))
                 elif staff.is_leader():
                     from core.models import Department
                     assigned_departments = Department.objects.filter(
@@ -785,37 +634,12 @@ class ClientListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if staff.is_program_manager():
-                    assigned_programs = staff.get_assigned_programs()
-                    relationship_filters = Q()
-                    relationship_filters |= Q(clientprogramenrollment__program__in=assigned_programs)
-                    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                    relationship_filters |= Q(clientprogramenrollment__created_by=staff_name)
-                    relationship_filters |= Q(servicerestriction__created_by=staff_name)
-                    relationship_filters |= Q(updated_by=staff_name)
-                    duplicate_clients = duplicate_clients.filter(relationship_filters)
+                    duplicate_clients = duplicate_clients.filter(id__in=get_program_manager_client_ids(self.request.user))
                 elif 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    relationship_filters = Q()
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(clientprogramenrollment__program_id__in=assigned_program_ids)
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(id__in=assigned_client_ids)
-                    if relationship_filters:
-                        duplicate_clients = duplicate_clients.filter(relationship_filters)
-                    else:
-                        duplicate_clients = duplicate_clients.none()
+                    duplicate_clients = duplicate_clients.filter(id__in=get_staff_client_ids(self.request.user))
                 elif staff.is_leader():
                     from core.models import Department
                     assigned_departments = Department.objects.filter(
@@ -852,8 +676,7 @@ def toggle_client_status(request, external_id):
     
     try:
         staff = request.user.staff_profile
-        user_roles = staff.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         
         if 'SuperAdmin' not in role_names and 'Admin' not in role_names:
             return JsonResponse({'success': False, 'error': 'Permission denied. Only SuperAdmin and Admin can change client status.'}, status=403)
@@ -899,71 +722,20 @@ class ClientDetailView(AnalystAccessMixin, DetailView):
         if not request.user.is_superuser:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 
                 if staff.is_program_manager():
-                    # Check if this client is in the filtered queryset from ClientListView
-                    from django.db.models import Q
-                    
-                    # Get assigned programs
-                    assigned_programs = staff.get_assigned_programs()
-                    
-                    # Create the same relationship filters as in ClientListView
-                    relationship_filters = Q()
-                    relationship_filters |= Q(clientprogramenrollment__program__in=assigned_programs)
-                    
-                    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                    relationship_filters |= Q(clientprogramenrollment__created_by=staff_name)
-                    relationship_filters |= Q(servicerestriction__created_by=staff_name)
-                    relationship_filters |= Q(updated_by=staff_name)
-                    
-                    # Check if this client matches any of the relationship filters
-                    if not Client.objects.filter(pk=self.object.pk).filter(relationship_filters).exists():
+                    # Same visibility as ClientListView
+                    if self.object.pk not in get_program_manager_client_ids(request.user):
                         from django.shortcuts import redirect
                         from django.urls import reverse
                         return redirect(f"{reverse('core:permission_error')}?type=client_not_related&resource=client&name={self.object.first_name} {self.object.last_name}")
                 
                 elif 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
                     # Staff users can access clients from both assigned programs AND directly assigned clients
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    from django.db.models import Q
-                    
-                    # Create a Q object to combine both types of assignments
-                    relationship_filters = Q()
-                    
-                    # 1. Clients enrolled in their assigned programs
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(
-                            clientprogramenrollment__program_id__in=assigned_program_ids
-                        )
-                    
-                    # 2. Directly assigned clients
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(
-                            id__in=assigned_client_ids
-                        )
-                    
-                    # Check if this client matches any of the relationship filters
-                    if relationship_filters:
-                        # If we have filters, check if this client matches them
-                        if not Client.objects.filter(
-                            pk=self.object.pk
-                        ).filter(relationship_filters).exists():
-                            from django.shortcuts import redirect
-                            from django.urls import reverse
-                            return redirect(f"{reverse('core:permission_error')}?type=client_not_assigned&resource=client&name={self.object.first_name} {self.object.last_name}")
-                    else:
-                        # If no filters (no assignments), deny access
+                    # (no assignments means no access)
+                    if self.object.pk not in get_staff_client_ids(request.user):
                         from django.shortcuts import redirect
                         from django.urls import reverse
                         return redirect(f"{reverse('core:permission_error')}?type=client_not_assigned&resource=client&name={self.object.first_name} {self.object.last_name}")
@@ -1048,8 +820,7 @@ class ClientCreateView(AnalystAccessMixin, CreateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot create clients
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Leader'] for role in role_names):
@@ -1337,8 +1108,7 @@ class ClientUpdateView(AnalystAccessMixin, UpdateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot edit clients
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager', 'Leader'] for role in role_names):
@@ -1608,8 +1378,7 @@ class ClientDeleteView(DeleteView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin and Admin can delete clients
                 # Staff, Managers, and Leaders cannot delete clients
@@ -1741,8 +1510,7 @@ class ClientUploadView(TemplateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot upload clients
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1769,12 +1537,10 @@ def upload_clients(request):
     """
     Handle CSV/Excel file upload and process client data with chunked processing.
     Processes files in chunks to avoid timeouts and enable partial success.
-    """
     
-    # Start timing the upload
-    upload_start_time = timezone.now()
-    upload_log = None
-    CHUNK_SIZE = 1000  # Process 1000 rows per chunk
+    With background=true (or CLIENT_UPLOAD_BACKGROUND enabled) the file is queued
+    for a background job and the response points at the progress endpoint.
+    """
     
     # Check for load test mode - skip database writes if X-Load-Test header is present
     is_load_test = request.headers.get('X-Load-Test', '').lower() == 'true'
@@ -1783,8 +1549,7 @@ def upload_clients(request):
     if request.user.is_authenticated:
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             # Staff role users cannot upload clients
             if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1800,45 +1565,89 @@ def upload_clients(request):
         except Exception:
             pass
     
-    try:
-        if 'file' not in request.FILES:
-            error = UploadError('UPLOAD_001', details={'reason': 'No file in request.FILES'})
-            logger.error(f"Upload failed: {error.message}")
-            return JsonResponse({'success': False, 'error': error.message, 'error_code': error.code}, status=400)
-        
-        # Get the source parameter
-        source = request.POST.get('source', 'SMIS')  # Default to SMIS if not provided
-        logger.info(f"Upload request - source: {source}, file: {request.FILES.get('file', {}).name if 'file' in request.FILES else 'None'}")
-        if source not in ['SMIS', 'EMHware']:
-            error = UploadError('UPLOAD_100', message=f'Invalid source: {source}. Must be SMIS or EMHware.')
-            logger.error(f"Upload failed: {error.message}")
+    if 'file' not in request.FILES:
+        error = UploadError('UPLOAD_001', details={'reason': 'No file in request.FILES'})
+        logger.error(f"Upload failed: {error.message}")
+        return JsonResponse({'success': False, 'error': error.message, 'error_code': error.code}, status=400)
+    
+    # Get the source parameter
+    source = request.POST.get('source', 'SMIS')  # Default to SMIS if not provided
+    logger.info(f"Upload request - source: {source}, file: {request.FILES['file'].name}")
+    if source not in ['SMIS', 'EMHware']:
+        error = UploadError('UPLOAD_100', message=f'Invalid source: {source}. Must be SMIS or EMHware.')
+        logger.error(f"Upload failed: {error.message}")
+        return JsonResponse({'success': False, 'error': error.message, 'error_code': error.code}, status=400)
+    
+    file = request.FILES['file']
+    run_in_background = request.POST.get('background', '').lower() in ['true', '1', 'yes'] or getattr(settings, 'CLIENT_UPLOAD_BACKGROUND', False)
+    if run_in_background and not is_load_test:
+        file_extension = file.name.split('.')[-1].lower()
+        if file_extension not in ['csv', 'xlsx', 'xls']:
+            error = UploadError('UPLOAD_001', details={'file_extension': file_extension})
             return JsonResponse({'success': False, 'error': error.message, 'error_code': error.code}, status=400)
-        
-        file = request.FILES['file']
+        try:
+            from .upload_jobs import enqueue_client_upload
+            upload_log = enqueue_client_upload(file, source, request.user)
+        except Exception as e:
+            logger.error(f"Failed to queue client upload: {e}")
+            error = UploadError(get_error_code_for_exception(e), raw_error=e)
+            return JsonResponse({'success': False, 'error': error.message, 'error_code': error.code}, status=500)
+        return JsonResponse({
+            'success': True,
+            'queued': True,
+            'upload_id': str(upload_log.external_id),
+            'progress_url': reverse('clients:upload_progress', args=[upload_log.external_id]),
+            'message': 'Upload queued. Processing will continue in the background.'
+        }, status=202)
+    
+    return process_client_upload(file, source, request.user, is_load_test=is_load_test)
+
+
+def process_client_upload(file, source, upload_user, upload_log=None, is_load_test=False, resume=False):
+    """
+    Process an uploaded client file in chunks and return the JsonResponse for it.
+    
+    Each chunk commits in its own transaction and records a checkpoint on the
+    ClientUploadLog; with resume=True processing restarts from that checkpoint.
+    Used directly by upload_clients and by the background upload jobs.
+    """
+    from .upload_jobs import read_checkpoint, record_chunk_checkpoint
+    
+    # Start timing the upload
+    upload_start_time = upload_log.started_at if upload_log else timezone.now()
+    CHUNK_SIZE = getattr(settings, 'CLIENT_UPLOAD_CHUNK_SIZE', 1000)  # Rows per chunk (one transaction each)
+    resume_checkpoint = read_checkpoint(upload_log) if resume else None
+    
+    try:
         file_extension = file.name.split('.')[-1].lower()
         
         # Get staff profile for upload log
         staff_profile = None
-        if request.user.is_authenticated:
+        if upload_user.is_authenticated:
             try:
-                staff_profile = request.user.staff_profile
+                staff_profile = upload_user.staff_profile
             except Exception:
                 pass
         
-        # Create upload log entry
+        # Create upload log entry (background jobs already have one)
         # Generate a temporary UUID for audit log in case upload_log creation fails
         temp_upload_id = uuid.uuid4()
         try:
-            upload_log = ClientUploadLog.objects.create(
-                file_name=file.name,
-                file_size=file.size,
-                file_type=file_extension,
-                source=source,
-                started_at=upload_start_time,
-                uploaded_by=staff_profile,
-                status='success',
-                upload_details={}
-            )
+            if upload_log is None:
+                upload_log = ClientUploadLog.objects.create(
+                    file_name=file.name,
+                    file_size=file.size,
+                    file_type=file_extension,
+                    source=source,
+                    started_at=upload_start_time,
+                    uploaded_by=staff_profile,
+                    status='processing',
+                    upload_details={}
+                )
+            else:
+                upload_log.status = 'processing'
+                upload_log.completed_at = None
+                upload_log.save(update_fields=['status', 'completed_at', 'updated_at'])
             temp_upload_id = upload_log.external_id  # Use the actual upload log ID
         except Exception as e:
             logger.warning(f"Failed to create upload log: {e}")
@@ -1850,7 +1659,7 @@ def upload_clients(request):
                     entity_name='ClientUpload',
                     entity_id=temp_upload_id,
                     action='import',
-                    changed_by=request.user if request.user.is_authenticated else None,
+                    changed_by=upload_user if upload_user.is_authenticated else None,
                     diff_data={
                         'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                         'file_size': file.size if hasattr(file, 'size') else 0,
@@ -1893,7 +1702,7 @@ def upload_clients(request):
                     entity_name='ClientUpload',
                     entity_id=entity_id,
                     action='import',
-                    changed_by=request.user if request.user.is_authenticated else None,
+                    changed_by=upload_user if upload_user.is_authenticated else None,
                     diff_data={
                         'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                         'file_size': file.size if hasattr(file, 'size') else 0,
@@ -1979,7 +1788,7 @@ def upload_clients(request):
                                 entity_name='ClientUpload',
                                 entity_id=entity_id,
                                 action='import',
-                                changed_by=request.user if request.user.is_authenticated else None,
+                                changed_by=upload_user if upload_user.is_authenticated else None,
                                 diff_data={
                                     'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                                     'file_size': file.size if hasattr(file, 'size') else 0,
@@ -2034,7 +1843,7 @@ def upload_clients(request):
                     entity_name='ClientUpload',
                     entity_id=entity_id,
                     action='import',
-                    changed_by=request.user if request.user.is_authenticated else None,
+                    changed_by=upload_user if upload_user.is_authenticated else None,
                     diff_data={
                         'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                         'file_size': file.size if hasattr(file, 'size') else 0,
@@ -2086,7 +1895,7 @@ def upload_clients(request):
                     entity_name='ClientUpload',
                     entity_id=entity_id,
                     action='import',
-                    changed_by=request.user if request.user.is_authenticated else None,
+                    changed_by=upload_user if upload_user.is_authenticated else None,
                     diff_data={
                         'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                         'file_size': file.size if hasattr(file, 'size') else 0,
@@ -2135,7 +1944,7 @@ def upload_clients(request):
                     entity_name='ClientUpload',
                     entity_id=entity_id,
                     action='import',
-                    changed_by=request.user if request.user.is_authenticated else None,
+                    changed_by=upload_user if upload_user.is_authenticated else None,
                     diff_data={
                         'file_name': file.name if hasattr(file, 'name') else 'Unknown',
                         'file_size': file.size if hasattr(file, 'size') else 0,
@@ -2210,9 +2019,13 @@ def upload_clients(request):
         # Create field mapping
         column_mapping = create_field_mapping(df.columns)
         
+        # Resolve the mapping once and build the canonical columns used by every later phase
+        upload_frame = UploadFrame(df, column_mapping)
+        csv_fields = set(upload_frame.mapped_fields)
+        
         # Check if we have client_id column (now required for all uploads)
         # Check if any column maps to client_id (not just exact column name)
-        has_client_id = any(column_mapping.get(col) == 'client_id' for col in df.columns)
+        has_client_id = upload_frame.has_field('client_id')
 
         # Helper used in multiple phases to normalize client ids
         def _clean_client_id(value):
@@ -2234,14 +2047,7 @@ def upload_clients(request):
         # Determine if any Client ID + source combinations already exist (single batched lookup)
         has_existing_client_ids = False
         if has_client_id:
-            client_id_candidates = set()
-            for col in df.columns:
-                if column_mapping.get(col) == 'client_id':
-                    client_id_series = df[col]
-                    for value in client_id_series:
-                        cleaned = _clean_client_id(value)
-                        if cleaned:
-                            client_id_candidates.add(cleaned)
+            client_id_candidates = set(upload_frame.unique_values('client_id_clean'))
             if client_id_candidates:
                 has_existing_client_ids = Client.objects.filter(
                     client_id__in=list(client_id_candidates),
@@ -2270,18 +2076,10 @@ def upload_clients(request):
         
         # Enforce required fields for all uploads (client_id is now required for both new and updates)
         # Special handling for combined client field - if present, it can provide client_id, first_name, last_name
-        has_combined_client_field = False
-        for col in df.columns:
-            if column_mapping.get(col) == 'client_combined':
-                has_combined_client_field = True
-                break
+        has_combined_client_field = upload_frame.has_field('client_combined')
         
         for required_field in required_fields:
-            found = False
-            for col in df.columns:
-                if column_mapping.get(col) == required_field:
-                    found = True
-                    break
+            found = upload_frame.has_field(required_field)
             
             # If not found individually, check if combined client field can provide it
             if not found and has_combined_client_field:
@@ -2304,11 +2102,7 @@ def upload_clients(request):
         # Phone and DOB are both optional - no requirement check needed
         
         # Check for intake-related columns using case-insensitive mapping
-        has_intake_data = False
-        for col in df.columns:
-            if column_mapping.get(col) in ['program_name', 'intake_date']:
-                has_intake_data = True
-                break
+        has_intake_data = upload_frame.has_field('program_name') or upload_frame.has_field('intake_date')
         
         # Process the data
         created_count = 0
@@ -2318,36 +2112,10 @@ def upload_clients(request):
         errors = []
         duplicate_details = []  # Track duplicate details for user feedback
         
-        def normalize_name(name):
-            """Normalize name for comparison"""
-            if not name:
-                return ""
-            return " ".join(name.lower().split())
-        
-        def calculate_name_similarity(name1, name2):
-            """Calculate similarity between two names (0-1 scale)"""
-            if not name1 or not name2:
-                return 0
-            
-            name1_norm = normalize_name(name1)
-            name2_norm = normalize_name(name2)
-            
-            if name1_norm == name2_norm:
-                return 1.0
-            
-            # Simple similarity check - if one name contains the other
-            if name1_norm in name2_norm or name2_norm in name1_norm:
-                return 0.8
-            
-            # Check for common words
-            words1 = set(name1_norm.split())
-            words2 = set(name2_norm.split())
-            if words1 and words2:
-                common_words = len(words1.intersection(words2))
-                total_words = len(words1.union(words2))
-                return common_words / total_words if total_words > 0 else 0
-            
-            return 0
+        def calculate_name_similarity(name1, name2, threshold=0.0):
+            """Calculate similarity between two names (0-1 scale); 0 when it cannot reach threshold"""
+            # Word-overlap scorer, memoized across rows and uploads
+            return token_similarity.similarity_at_least(name1, name2, threshold) or 0
         
         def parse_combined_client_field(client_field_value, client_id_field_value=None):
             """
@@ -2513,10 +2281,8 @@ def upload_clients(request):
             column_mapping,
             df_columns,
             departments_cache,
-            program_lookup_by_name,
-            all_programs_list,
-            program_fuzzy_cache,
-            enrollment_cache,
+            program_index,
+            enrollment_intervals,
             intake_cache,
             warnings_list=None,  # Optional list to collect future date warnings
         ):
@@ -2524,18 +2290,15 @@ def upload_clients(request):
             try:
                 # Helper function to get data using field mapping
                 def get_field_data(field_name, default=''):
-                    """Get data from row using field mapping"""
-                    for col in df_columns:
-                        if column_mapping.get(col) == field_name:
-                            value = row[col]
-                            if pd.notna(value) and str(value).strip():
-                                logger.debug(f"Found {field_name} in column '{col}' with value: '{value}'")
-                                return str(value).strip()
+                    """Get data from the normalized row fields"""
+                    value = row.get(field_name)
+                    if value and field_name in upload_frame.mapped_fields:
+                        return value
                     # Only log warning for intake_date if we're actually processing intake data
                     # (i.e., if program_name is present, which means intake processing is expected)
                     if field_name == 'intake_date':
                         # Check if program_name is mapped (indicating intake processing is expected)
-                        has_program = any(column_mapping.get(col) == 'program_name' for col in df_columns)
+                        has_program = upload_frame.has_field('program_name')
                         if has_program:
                             # Try to find similar column names that might be intake_date
                             similar_cols = [col for col in df_columns if 'intake' in col.lower() or 'admission' in col.lower() or 'date' in col.lower()]
@@ -2604,11 +2367,19 @@ def upload_clients(request):
                     return False
                 
                 # Helper function to parse date values safely
-                def parse_date(value, field_name='date', default=None):
+                def parse_date(value, field_name='date', default=None, column=None):
                     """Parse date value from string, handling empty values, multiple formats, Excel serial numbers, and various date formats"""
                     if not value or (isinstance(value, str) and value.strip() == ''):
                         return default
                     
+                    # Date columns were parsed up front with each column's inferred format
+                    known, parsed_date_obj = upload_frame.lookup_date(column or field_name, value)
+                    if known:
+                        if parsed_date_obj is None:
+                            return default
+                        check_future_date_intake(parsed_date_obj, field_name)
+                        return parsed_date_obj
+                    
                     # Handle pandas Timestamp or datetime objects directly
                     if hasattr(value, 'date'):
                         try:
@@ -2780,7 +2551,7 @@ def upload_clients(request):
                     
                     for date_str in date_strings:
                         # Use the robust parse_date function instead of pd.to_datetime
-                        parsed_date = parse_date(date_str)
+                        parsed_date = parse_date(date_str, column='intake_date')
                         if parsed_date:
                             parsed_dates.append(parsed_date)
                         elif default:
@@ -2863,7 +2634,7 @@ def upload_clients(request):
                     return
                 
                 # Handle multiple programs in a single cell (separated by newlines)
-                program_names = [name.strip() for name in str(program_name).split('\n') if name.strip()]
+                program_names = list(row.get('program_name_list') or [])
                 print(f"DEBUG: Split program names: {program_names}")
                 
                 # Handle multiple dates in a single cell (separated by newlines)
@@ -2931,27 +2702,14 @@ def upload_clients(request):
                         logger.warning(f"Skipping enrollment: empty program name for client {client.first_name} {client.last_name}")
                         continue
                     
-                    # First, try exact match (case-insensitive) across all departments from cache
-                    program = program_lookup_by_name.get(normalized_name.lower())
-                    
-                    # If no exact match, try cached fuzzy match before scanning all programs
-                    if not program:
-                        cached_program = program_fuzzy_cache.get(normalized_name)
-                        if cached_program is not None:
-                            program = cached_program
-                        else:
-                            best_match = None
-                            best_score = 0
-                            for p in all_programs_list:
-                                score = calculate_name_similarity(normalized_name, p.name or '')
-                                if score > best_score:
-                                    best_score = score
-                                    best_match = p
-                            # Store even if None to avoid repeated scans
-                            program_fuzzy_cache[normalized_name] = best_match if best_score > 0 else None
-                            if best_match and best_score > 0:
-                                program = best_match
-                                logger.info(f"Fuzzy matched program '{current_program_name}' to existing program '{program.name}' (score: {best_score:.2f})")
+                    # Exact name, then a learned alias, then the best fuzzy match among indexed candidates
+                    resolution = program_index.resolve(normalized_name)
+                    program = resolution.program
+                    if resolution.match_type == 'fuzzy':
+                        logger.info(f"Fuzzy matched program '{current_program_name}' to existing program '{program.name}' (score: {resolution.score:.2f})")
+                    # Close fuzzy matches become aliases for later uploads once this chunk commits
+                    if program:
+                        program_index.confirm(normalized_name, resolution)
                     
                     if not program:
                         logger.warning(
@@ -3046,10 +2804,9 @@ def upload_clients(request):
                     # 2. Same program + overlapping/adjacent dates → merge into one
                     # 3. Different programs → create separate enrollments
                     # 4. Merge strategy: earliest start_date, latest end_date
-                    # 5. This works for cross-source merges because it queries ALL existing enrollments
+                    # 5. This works for cross-source merges because it considers ALL existing enrollments
                     #    for the client, not just from the current upload
                     
-                    from django.db.models import Q
                     from datetime import timedelta
                     from django.utils import timezone
                     
@@ -3057,128 +2814,19 @@ def upload_clients(request):
                     new_start_date = current_intake_date
                     new_end_date = discharge_date
                     
-                    # Get all non-archived enrollments for this client and program
-                    # IMPORTANT: This queries ALL existing enrollments, including those from other sources
-                    # This enables cross-source enrollment merging when clients are merged
-                    # Also check the enrollment_cache for enrollments created in this same upload
-                    all_enrollments = list(ClientProgramEnrollment.objects.filter(
-                        client=client,
-                        program=program,
-                        is_archived=False
-                    ))
-                    
-                    # Add enrollments from cache that haven't been saved yet (same upload batch)
-                    for cache_key, cached_enrollment in enrollment_cache.items():
-                        if (cache_key[0] == client.id and cache_key[1] == program.id and 
-                            not cached_enrollment.is_archived and cached_enrollment not in all_enrollments):
-                            all_enrollments.append(cached_enrollment)
-                    
-                    # Helper function to check if two date ranges overlap or are adjacent
-                    def ranges_overlap_or_adjacent(start1, end1, start2, end2):
-                        """Check if two date ranges overlap or are adjacent (within 1 day)"""
-                        # If either range has no end date, they overlap if starts are compatible
-                        if end1 is None and end2 is None:
-                            return True  # Both open-ended, consider them overlapping
-                        if end1 is None:
-                            # Range 1 is open-ended (start1 to infinity)
-                            # Overlaps if: range 2 starts within range 1, OR range 2 ends after range 1 starts
-                            # Case 1: start2 >= start1 (range 2 starts within open-ended range)
-                            # Case 2: end2 and end2 >= start1 (range 2 extends into open-ended range)
-                            return start2 >= start1 or (end2 and end2 >= start1)
-                        if end2 is None:
-                            # Range 2 is open-ended (start2 to infinity)
-                            # Overlaps if: range 1 starts within range 2, OR range 1 ends after range 2 starts
-                            return start1 >= start2 or (end1 and end1 >= start2)
-                        
-                        # Both have end dates - check for overlap or adjacency
-                        # Overlap: start1 <= end2 AND start2 <= end1
-                        # Adjacent: end1 + 1 day = start2 OR end2 + 1 day = start1
-                        overlap = start1 <= end2 and start2 <= end1
-                        adjacent = (end1 and end1 + timedelta(days=1) == start2) or (end2 and end2 + timedelta(days=1) == start1)
-                        return overlap or adjacent
-                    
-                    # Helper function to check if start dates are similar (within threshold)
-                    def start_dates_similar(start1, start2, threshold_days=7):
-                        """Check if two start dates are similar (within threshold days)"""
-                        if not start1 or not start2:
-                            return False
-                        date_diff = abs((start1 - start2).days)
-                        return date_diff <= threshold_days
-                    
-                    # PRIORITY 0: Check for open-ended enrollments (no end_date) - highest priority
-                    # If both existing and new enrollment have no end_date, they should ALWAYS merge
-                    # regardless of start_date difference (they represent the same ongoing enrollment)
-                    open_ended_enrollments = []
-                    if new_end_date is None:
-                        # New enrollment has no end_date - find all existing open-ended enrollments
-                        for existing in all_enrollments:
-                            if existing.end_date is None:
-                                open_ended_enrollments.append(existing)
-                    
-                    # PRIORITY 1: Check for exact start_date matches
-                    # This handles enrollments with the same start_date in the same program
-                    exact_match_enrollments = [
-                        e for e in all_enrollments 
-                        if e.start_date == new_start_date
-                    ]
-                    
-                    # PRIORITY 2: Check for similar start dates (within 7 days) for same program
-                    # This handles cross-source enrollments with slightly different start dates
-                    similar_start_enrollments = [
-                        e for e in all_enrollments
-                        if start_dates_similar(e.start_date, new_start_date, threshold_days=7)
-                    ]
-                    
-                    # PRIORITY 3: Find all overlapping/adjacent enrollments
-                    overlapping_enrollments = []
-                    for existing in all_enrollments:
-                        if ranges_overlap_or_adjacent(
-                            existing.start_date, existing.end_date,
-                            new_start_date, new_end_date
-                        ):
-                            overlapping_enrollments.append(existing)
-                    
-                    # Combine all potential matches: open-ended > exact > similar > overlapping
-                    # Remove duplicates while preserving priority
-                    all_potential_matches = []
-                    match_ids = set()
-                    
-                    # Add open-ended matches first (highest priority - always merge open-ended enrollments)
-                    if open_ended_enrollments:
+                    # Non-archived enrollments of this client and program to merge into, existing ones (from
+                    # any source) and ones from this upload alike, by priority:
+                    # open-ended (when the new one is too) > exact start > similar start (within 7 days) > overlapping
+                    overlapping_enrollments = enrollment_intervals.candidates(client.id, program.id, new_start_date, new_end_date)
+                    if new_end_date is None and overlapping_enrollments and overlapping_enrollments[0].end_date is None:
                         logger.info(
-                            f"Found {len(open_ended_enrollments)} open-ended enrollment(s) (no end_date) for client {client.first_name} {client.last_name} "
+                            f"Found open-ended enrollment(s) (no end_date) for client {client.first_name} {client.last_name} "
                             f"in program {program.name}. New enrollment also has no end_date - will merge into one."
                         )
-                        for e in open_ended_enrollments:
-                            if e.id not in match_ids:
-                                all_potential_matches.append(e)
-                                match_ids.add(e.id)
-                    
-                    # Add exact matches (high priority)
-                    for e in exact_match_enrollments:
-                        if e.id not in match_ids:
-                            all_potential_matches.append(e)
-                            match_ids.add(e.id)
-                    
-                    # Add similar start matches (medium priority)
-                    for e in similar_start_enrollments:
-                        if e.id not in match_ids:
-                            all_potential_matches.append(e)
-                            match_ids.add(e.id)
-                    
-                    # Add overlapping matches (lowest priority, but still valid)
-                    for e in overlapping_enrollments:
-                        if e.id not in match_ids:
-                            all_potential_matches.append(e)
-                            match_ids.add(e.id)
-                    
-                    # Use combined list for merging
-                    overlapping_enrollments = all_potential_matches
                     
                     existing_enrollment = None
                     enrollment = None
                     created = False
-                    enrollment_was_just_merged = False  # Track if we just merged and saved
                     
                     if overlapping_enrollments:
                         # Merge all overlapping enrollments into one
@@ -3266,160 +2914,25 @@ def upload_clients(request):
                             if notes_parts:
                                 existing_enrollment.notes = ' | '.join(notes_parts)
                         
-                        # Save the merged enrollment immediately so it's visible to subsequent CSV records
-                        existing_enrollment.updated_by = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                        existing_enrollment.save()
-                        
-                        # ISSUE 2 FIX: Update client status after enrollment merge
-                        try:
-                            status_changed = client.update_inactive_status()
-                            if status_changed:
-                                client.save(update_fields=['is_inactive'])
-                                logger.debug(f"Updated client inactive status after enrollment merge for {client.first_name} {client.last_name}")
-                        except Exception as e:
-                            logger.warning(f"Failed to update client status after enrollment merge: {e}")
-                        
-                        # Update cache with the merged enrollment
-                        enrollment_cache_key = (client.id, program.id, earliest_start)
-                        enrollment_cache[enrollment_cache_key] = existing_enrollment
+                        # The merged dates are visible to subsequent CSV records at once; the enrollment is
+                        # written when the chunk ends (client inactive flags are refreshed after each chunk)
+                        existing_enrollment.updated_by = upload_user.get_full_name() or upload_user.username if upload_user.is_authenticated else 'System'
+                        enrollment_intervals.changed(existing_enrollment)
                         
                         # Archive other overlapping enrollments (they're being merged)
                         for other_enrollment in overlapping_enrollments[1:]:
                             if not other_enrollment.is_archived:
-                                other_enrollment.is_archived = True
-                                other_enrollment.archived_at = timezone.now()
-                                other_enrollment.save()
+                                enrollment_intervals.archive(other_enrollment, timezone.now())
                                 logger.info(
                                     f"Archived duplicate enrollment (ID: {other_enrollment.id}, "
                                     f"dates: {other_enrollment.start_date} to {other_enrollment.end_date}) "
                                     f"for client {client.first_name} {client.last_name} "
                                     f"in program {program.name} - merged into enrollment ID: {existing_enrollment.id}"
                                 )
-                                
-                                # ISSUE 2 FIX: Update client status after archiving enrollment
-                                try:
-                                    status_changed = client.update_inactive_status()
-                                    if status_changed:
-                                        client.save(update_fields=['is_inactive'])
-                                        logger.debug(f"Updated client inactive status after archiving enrollment for {client.first_name} {client.last_name}")
-                                except Exception as e:
-                                    logger.warning(f"Failed to update client status after archiving enrollment: {e}")
                         
-                        # Mark that we've already merged and saved
+                        # The merged dates and discharge notes are the update
                         enrollment = existing_enrollment
                         created = False
-                        enrollment_was_just_merged = True  # Flag to skip duplicate save
-                    else:
-                        # No overlapping enrollments found - will create new enrollment below
-                        existing_enrollment = None
-                        enrollment_was_just_merged = False
-                    
-                    if existing_enrollment:
-                        # Update existing enrollment (may have been merged above)
-                        enrollment = existing_enrollment
-                        created = False
-                        
-                        # Cache the enrollment for potential future use in the same upload
-                        enrollment_cache_key = (client.id, program.id, enrollment.start_date)
-                        enrollment_cache[enrollment_cache_key] = enrollment
-                        
-                        # If we merged enrollments above, the dates are already updated and saved
-                        # We just need to ensure end_date is set if discharge_date is provided and it's later
-                        if discharge_date:
-                            # Ensure end_date is the latest (merge logic already handled this, but double-check)
-                            if enrollment.end_date:
-                                enrollment.end_date = max(enrollment.end_date, discharge_date)
-                            else:
-                                enrollment.end_date = discharge_date
-                            
-                            # Ensure end_date >= start_date constraint is satisfied
-                            # Note: If we merged above, this should already be satisfied, but check anyway
-                            if enrollment.end_date and enrollment.end_date < enrollment.start_date:
-                                # If discharge_date is before start_date, we need to adjust
-                                # But preserve historical start_date if it's in the past and we have a valid admission date
-                                today = datetime.now().date()
-                                original_start_date = enrollment.start_date
-                                
-                                # If we have days_elapsed, calculate start_date from discharge_date
-                                if days_elapsed and days_elapsed > 0:
-                                    from datetime import timedelta
-                                    calculated_start_date = discharge_date - timedelta(days=days_elapsed)
-                                    # Only update start_date if the calculated date makes sense
-                                    # Don't overwrite a historical start_date with today's date
-                                    if calculated_start_date < today or original_start_date == today:
-                                        enrollment.start_date = calculated_start_date
-                                        logger.info(
-                                            f"Updated enrollment start_date from {original_start_date} to {calculated_start_date} "
-                                            f"(calculated from discharge_date {discharge_date} - {days_elapsed} days) "
-                                            f"for client {client.first_name} {client.last_name}"
-                                        )
-                                    else:
-                                        logger.warning(
-                                            f"Preserving historical start_date {original_start_date} instead of using calculated date "
-                                            f"{calculated_start_date} for client {client.first_name} {client.last_name}"
-                                        )
-                                else:
-                                    # No days_elapsed, use discharge_date as start_date (same-day enrollment/discharge)
-                                    # But only if the original start_date is today (suggesting it was incorrectly set)
-                                    if original_start_date == today:
-                                        enrollment.start_date = discharge_date
-                                        logger.info(
-                                            f"Updated enrollment start_date from today ({today}) to discharge_date {discharge_date} "
-                                            f"(same-day enrollment/discharge) for client {client.first_name} {client.last_name}"
-                                        )
-                                    else:
-                                        # Preserve historical start_date, but ensure constraint is satisfied
-                                        if discharge_date < original_start_date:
-                                            logger.warning(
-                                                f"Discharge date {discharge_date} is before existing start_date {original_start_date} "
-                                                f"for client {client.first_name} {client.last_name}. Using discharge_date as start_date."
-                                            )
-                                            enrollment.start_date = discharge_date
-                            
-                            # Update status to 'completed' if discharge date is set and no specific status provided
-                            if not program_status:
-                                enrollment.status = 'completed'
-                            else:
-                                enrollment.status = program_status
-                            
-                            # Format discharge note consistently
-                            if reason_discharge:
-                                discharge_note = f'Discharge Date: {discharge_date.strftime("%Y-%m-%d")} | Reason: {reason_discharge}'
-                            else:
-                                discharge_note = f'Discharge Date: {discharge_date.strftime("%Y-%m-%d")}'
-                            
-                            # Append discharge note to existing notes
-                            existing_notes = enrollment.notes or ''
-                            if existing_notes:
-                                enrollment.notes = f'{existing_notes} | {discharge_note}'
-                            else:
-                                enrollment.notes = discharge_note
-                            
-                            if days_elapsed:
-                                enrollment.days_elapsed = days_elapsed
-                            
-                            enrollment.updated_by = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                            # Only save if we didn't just merge (merge already saved above)
-                            if not enrollment_was_just_merged:
-                                enrollment.save()
-                                # ISSUE 2 FIX: Update client status after enrollment update
-                                try:
-                                    status_changed = client.update_inactive_status()
-                                    if status_changed:
-                                        client.save(update_fields=['is_inactive'])
-                                        logger.debug(f"Updated client inactive status after enrollment update for {client.first_name} {client.last_name}")
-                                except Exception as e:
-                                    logger.warning(f"Failed to update client status after enrollment update: {e}")
-                            logger.info(f"Updated enrollment end_date for {client.first_name} {client.last_name} in {program.name} with discharge date {discharge_date}")
-                        else:
-                            # No discharge date, just update other fields
-                            enrollment.status = program_status if program_status else enrollment.status
-                            if days_elapsed:
-                                enrollment.days_elapsed = days_elapsed
-                            enrollment.updated_by = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                            # Only save if we didn't just merge (merge already saved above)
-                            if not enrollment_was_just_merged:
-                                enrollment.save()
                     else:
                         # Create new enrollment - client is not enrolled in this program yet
                         # Build notes with additional information
@@ -3486,103 +2999,64 @@ def upload_clients(request):
                         # Create new enrollment - check for duplicate with same start_date first
                         # IMPORTANT: Before creating, check if there's an existing open-ended enrollment
                         # (no end_date) that we might have missed - if so, merge instead of creating duplicate
+                        existing_open_ended = None
                         if discharge_date is None:
                             # New enrollment has no end_date - check for any existing open-ended enrollments
-                            existing_open_ended = ClientProgramEnrollment.objects.filter(
-                                client=client,
-                                program=program,
-                                end_date__isnull=True,
-                                is_archived=False
-                            ).exclude(
-                                start_date=enrollment_start_date  # Exclude exact start_date match (already handled above)
-                            ).first()
+                            # (excluding an exact start_date match, already handled above)
+                            existing_open_ended = enrollment_intervals.open_ended(client.id, program.id, exclude_start=enrollment_start_date)
                             
-                            if existing_open_ended:
-                                # Found an existing open-ended enrollment - merge into it instead of creating duplicate
+                        if existing_open_ended:
+                            # Found an existing open-ended enrollment - merge into it instead of creating duplicate
+                            logger.info(
+                                f"Found existing open-ended enrollment (ID: {existing_open_ended.id}, start_date: {existing_open_ended.start_date}) "
+                                f"for client {client.first_name} {client.last_name} in program {program.name}. "
+                                f"New enrollment also has no end_date - merging into existing enrollment."
+                            )
+                            # Use earliest start_date
+                            if enrollment_start_date < existing_open_ended.start_date:
+                                existing_open_ended.start_date = enrollment_start_date
                                 logger.info(
-                                    f"Found existing open-ended enrollment (ID: {existing_open_ended.id}, start_date: {existing_open_ended.start_date}) "
-                                    f"for client {client.first_name} {client.last_name} in program {program.name}. "
-                                    f"New enrollment also has no end_date - merging into existing enrollment."
+                                    f"Updated existing enrollment start_date to {enrollment_start_date} "
+                                    f"(earliest date) for client {client.first_name} {client.last_name}"
                                 )
-                                # Use earliest start_date
-                                if enrollment_start_date < existing_open_ended.start_date:
-                                    existing_open_ended.start_date = enrollment_start_date
-                                    existing_open_ended.save()
-                                    logger.info(
-                                        f"Updated existing enrollment start_date to {enrollment_start_date} "
-                                        f"(earliest date) for client {client.first_name} {client.last_name}"
-                                    )
-                                
-                                # Merge notes
-                                new_notes = ' | '.join(notes_parts)
-                                existing_notes = existing_open_ended.notes or ''
-                                if existing_notes:
-                                    if new_notes not in existing_notes:
-                                        existing_open_ended.notes = f'{existing_notes} | {new_notes}'
-                                else:
-                                    existing_open_ended.notes = new_notes
-                                
-                                # Update status if needed
-                                if final_status:
-                                    existing_open_ended.status = final_status
-                                
-                                existing_open_ended.updated_by = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                                existing_open_ended.save()
-                                
-                                # Cache the enrollment
-                                enrollment_cache_key = (client.id, program.id, existing_open_ended.start_date)
-                                enrollment_cache[enrollment_cache_key] = existing_open_ended
-                                
-                                enrollment = existing_open_ended
-                                created = False
-                                
-                                # Update client status
-                                try:
-                                    status_changed = client.update_inactive_status()
-                                    if status_changed:
-                                        client.save(update_fields=['is_inactive'])
-                                        logger.debug(f"Updated client inactive status after merging open-ended enrollment for {client.first_name} {client.last_name}")
-                                except Exception as e:
-                                    logger.warning(f"Failed to update client status after merging open-ended enrollment: {e}")
-                                
-                                logger.info(f"Merged into existing open-ended enrollment for {client.first_name} {client.last_name} in {current_program_name}")
+                            
+                            # Merge notes
+                            new_notes = ' | '.join(notes_parts)
+                            existing_notes = existing_open_ended.notes or ''
+                            if existing_notes:
+                                if new_notes not in existing_notes:
+                                    existing_open_ended.notes = f'{existing_notes} | {new_notes}'
                             else:
-                                # No existing open-ended enrollment - proceed with normal creation
-                                enrollment, created = ClientProgramEnrollment.objects.get_or_create(
+                                existing_open_ended.notes = new_notes
+                            
+                            # Update status if needed
+                            if final_status:
+                                existing_open_ended.status = final_status
+                            
+                            existing_open_ended.updated_by = upload_user.get_full_name() or upload_user.username if upload_user.is_authenticated else 'System'
+                            enrollment_intervals.changed(existing_open_ended)
+                            
+                            enrollment = existing_open_ended
+                            created = False
+                            logger.info(f"Merged into existing open-ended enrollment for {client.first_name} {client.last_name} in {current_program_name}")
+                        else:
+                            # Same client, program and start_date (archived enrollments included) is the same enrollment
+                            enrollment = enrollment_intervals.get(client.id, program.id, enrollment_start_date)
+                            created = enrollment is None
+                            if created:
+                                enrollment = enrollment_intervals.create(
                                     client=client,
                                     program=program,
-                                    start_date=enrollment_start_date,  # Use start_date as part of unique constraint
-                                    defaults={
-                                        'end_date': discharge_date,  # Set discharge_date as end_date (None for open-ended)
-                                        'status': final_status,
-                                        'days_elapsed': days_elapsed,
-                                        'notes': ' | '.join(notes_parts),
-                                        'created_by': request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                                    }
+                                    start_date=enrollment_start_date,
+                                    end_date=discharge_date,  # Set discharge_date as end_date (None for open-ended)
+                                    status=final_status,
+                                    days_elapsed=days_elapsed,
+                                    notes=' | '.join(notes_parts),
+                                    created_by=upload_user.get_full_name() or upload_user.username if upload_user.is_authenticated else 'System',
                                 )
-                                # Cache the enrollment for potential future use in the same upload
-                                enrollment_cache_key = (client.id, program.id, enrollment_start_date)
-                                enrollment_cache[enrollment_cache_key] = enrollment
-                        else:
-                            # New enrollment has end_date - proceed with normal creation
-                            enrollment, created = ClientProgramEnrollment.objects.get_or_create(
-                                client=client,
-                                program=program,
-                                start_date=enrollment_start_date,  # Use start_date as part of unique constraint
-                                defaults={
-                                    'end_date': discharge_date,  # Set discharge_date as end_date
-                                    'status': final_status,
-                                    'days_elapsed': days_elapsed,
-                                    'notes': ' | '.join(notes_parts),
-                                    'created_by': request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                                }
-                            )
-                            # Cache the enrollment for potential future use in the same upload
-                            enrollment_cache_key = (client.id, program.id, enrollment_start_date)
-                            enrollment_cache[enrollment_cache_key] = enrollment
                         
                         if not created:
-                            # Enrollment was found during get_or_create (race condition), update it instead
+                            # An existing enrollment was found, update it instead
                             if discharge_date:
                                 enrollment.end_date = discharge_date
                                 
@@ -3607,27 +3081,11 @@ def upload_clients(request):
                                 else:
                                     enrollment.notes = discharge_note
                             enrollment.status = final_status
-                            enrollment.updated_by = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-                            enrollment.save()
-                            # ISSUE 2 FIX: Update client status after enrollment update
-                            try:
-                                status_changed = client.update_inactive_status()
-                                if status_changed:
-                                    client.save(update_fields=['is_inactive'])
-                                    logger.debug(f"Updated client inactive status after enrollment update for {client.first_name} {client.last_name}")
-                            except Exception as e:
-                                logger.warning(f"Failed to update client status after enrollment update: {e}")
-                            logger.info(f"Updated existing enrollment (found during get_or_create) for {client.first_name} {client.last_name} in {program.name}")
+                            enrollment.updated_by = upload_user.get_full_name() or upload_user.username if upload_user.is_authenticated else 'System'
+                            enrollment_intervals.changed(enrollment)
+                            logger.info(f"Updated existing enrollment (same start_date) for {client.first_name} {client.last_name} in {program.name}")
 
                     if created:
-                        # ISSUE 2 FIX: Update client status after enrollment creation
-                        try:
-                            status_changed = client.update_inactive_status()
-                            if status_changed:
-                                client.save(update_fields=['is_inactive'])
-                                logger.debug(f"Updated client inactive status after enrollment creation for {client.first_name} {client.last_name}")
-                        except Exception as e:
-                            logger.warning(f"Failed to update client status after enrollment creation: {e}")
                         logger.info(f"Created {final_status} enrollment for {client.first_name} {client.last_name} in {current_program_name}")
                         # Skip audit log for bulk imports to improve performance
                         # Audit logs can be created separately if needed for specific tracking
@@ -3645,6 +3103,11 @@ def upload_clients(request):
         if is_load_test:
             # Simulate processing without database writes
             processed_count = len(df)
+            if upload_log:
+                upload_log.completed_at = timezone.now()
+                upload_log.total_rows = processed_count
+                upload_log.status = 'success'
+                upload_log.save()
             
             # Return load test response
             return JsonResponse({
@@ -3667,62 +3130,20 @@ def upload_clients(request):
             })
         
         # ===== BATCH OPTIMIZATION: Pre-load existing data =====
-        # Collect all client_ids, emails, phones from the upload first
-        all_client_ids = []
-        all_emails = []
-        all_phones = []
-        row_data_map = {}  # Store row data by index for later processing
-        
         # Pre-load all departments and programs for intake processing optimization
         logger.info("Pre-loading departments and programs for batch processing")
         departments_cache = {dept.name: dept for dept in Department.objects.filter(is_archived=False)}
-        all_programs_list = list(Program.objects.select_related('department').all())
-        program_lookup_by_name = {}
-        for program in all_programs_list:
-            name_key = (program.name or '').strip().lower()
-            if name_key:
-                program_lookup_by_name[name_key] = program
-        
-        program_fuzzy_cache = {}
-        enrollment_cache = {}
+        program_index = load_program_index()
+        enrollment_intervals = EnrollmentIntervals()
         intake_cache = {}
         
-        logger.info(f"Pre-loaded {len(departments_cache)} departments and {len(all_programs_list)} programs")
+        logger.info(f"Pre-loaded {len(departments_cache)} departments and {len(program_index)} programs")
+        
+        # Collect all client_ids, emails, phones from the normalized upload columns
         logger.info("Starting batch data collection phase")
-        for index, row in df.iterrows():
-            try:
-                # Helper function to get data using field mapping (inline version for collection phase)
-                def get_field_data_inline(field_name, default=''):
-                    for col in df.columns:
-                        if column_mapping.get(col) == field_name:
-                            value = row[col]
-                            if pd.notna(value) and str(value).strip():
-                                return str(value).strip()
-                    return default
-                
-                # Helper function to clean client_id
-                client_id = _clean_client_id(get_field_data_inline('client_id'))
-                email = get_field_data_inline('email', '').strip()
-                phone = get_field_data_inline('phone', '').strip()
-                
-                # Store row data for later processing
-                row_data_map[index] = {
-                    'client_id': client_id,
-                    'email': email,
-                    'phone': phone,
-                    'first_name': get_field_data_inline('first_name', ''),
-                    'last_name': get_field_data_inline('last_name', ''),
-                }
-                
-                if client_id:
-                    all_client_ids.append(client_id)
-                if email:
-                    all_emails.append(email.lower())
-                if phone:
-                    all_phones.append(phone)
-            except Exception as e:
-                logger.warning(f"Error collecting data from row {index + 1}: {str(e)}")
-                continue
+        all_client_ids = upload_frame.unique_values('client_id_clean')
+        all_emails = upload_frame.unique_values('email_key')
+        all_phones = upload_frame.unique_values('phone')
         
         # Batch query existing clients by client_id - check ALL sources (including same source)
         # Logic: If uploading from EMHware, check SMIS AND EMHware. If uploading from SMIS, check EMHware AND SMIS.
@@ -3838,45 +3259,20 @@ def upload_clients(request):
         # Pre-load ALL clients from other sources for SMIS/EMHware name-based duplicate detection
         # This maintains the original business logic while avoiding queries inside transaction
         all_clients_from_other_sources = []
+        other_sources_index = None
         if source in ['SMIS', 'EMHware']:
             all_clients_from_other_sources = list(Client.objects.exclude(source=source).only(
                 'id', 'first_name', 'last_name', 'email', 'phone', 'contact_information', 
                 'dob', 'client_id', 'source'
             ))
+            # Blocking index so each row only scores the clients that could match its name
+            other_sources_index = ClientCandidateIndex(fuzzy_matcher).add_many(all_clients_from_other_sources)
             logger.info(f"Pre-loaded {len(all_clients_from_other_sources)} clients from other sources for name-based duplicate detection")
         
         # Pre-load clients by DOB for name+DOB matching (for all sources)
         # This maintains the original business logic for Priority 5 and 6 duplicate checks
         clients_by_dob = {}
-        all_dobs_in_upload = set()
-        for index, row in df.iterrows():
-            try:
-                # Get DOB from row
-                dob_value = None
-                for col in df.columns:
-                    if column_mapping.get(col) == 'dob':
-                        dob_value = row[col]
-                        break
-                if dob_value:
-                    try:
-                        # Check if value is pandas NaT (Not a Time) before processing
-                        if pd.isna(dob_value):
-                            continue
-                        parsed_dob = pd.to_datetime(dob_value, errors='coerce')
-                        # Check if parsing resulted in NaT
-                        if pd.isna(parsed_dob):
-                            continue
-                        # Convert to date object
-                        parsed_dob_date = parsed_dob.date()
-                        # Additional check: ensure it's a valid date (not NaT date)
-                        if parsed_dob_date and parsed_dob_date != datetime(1900, 1, 1).date():
-                            all_dobs_in_upload.add(parsed_dob_date)
-                    except Exception as e:
-                        # Skip invalid date values
-                        logger.debug(f"Skipping invalid DOB value at row {index}: {e}")
-                        pass
-            except:
-                pass
+        all_dobs_in_upload = upload_frame.dobs()
         
         if all_dobs_in_upload:
             clients_with_matching_dob = Client.objects.filter(dob__in=all_dobs_in_upload).only(
@@ -3891,34 +3287,8 @@ def upload_clients(request):
         # Pre-load clients by name+DOB for discharge updates (name-based lookup)
         # This maintains the original business logic for discharge date updates
         clients_by_name_dob = {}  # Key: (first_name_lower, last_name_lower, dob) -> [clients]
-        all_name_dob_combos = set()
         logger.info("Collecting name+DOB combinations from upload file...")
-        for index, row in df.iterrows():
-            try:
-                # Get name and DOB from row
-                first_name_val = None
-                last_name_val = None
-                dob_value = None
-                for col in df.columns:
-                    field_name = column_mapping.get(col)
-                    if field_name == 'first_name':
-                        first_name_val = row[col]
-                    elif field_name == 'last_name':
-                        last_name_val = row[col]
-                    elif field_name == 'dob':
-                        dob_value = row[col]
-                
-                if first_name_val and last_name_val and dob_value:
-                    try:
-                        first_name_clean = str(first_name_val).strip().lower() if first_name_val else ''
-                        last_name_clean = str(last_name_val).strip().lower() if last_name_val else ''
-                        parsed_dob = pd.to_datetime(dob_value).date()
-                        if first_name_clean and last_name_clean and parsed_dob and parsed_dob != datetime(1900, 1, 1).date():
-                            all_name_dob_combos.add((first_name_clean, last_name_clean, parsed_dob))
-                    except:
-                        pass
-            except:
-                pass
+        all_name_dob_combos = upload_frame.name_dob_keys()
         
         logger.info(f"Collected {len(all_name_dob_combos)} unique name+DOB combinations from upload file")
         
@@ -3963,19 +3333,7 @@ def upload_clients(request):
         
         # Pre-load clients by uid_external for external ID matching
         existing_clients_by_external_id = {}
-        all_external_ids_in_upload = set()
-        for index, row in df.iterrows():
-            try:
-                # Get uid_external from row
-                uid_external_val = None
-                for col in df.columns:
-                    if column_mapping.get(col) == 'uid_external':
-                        uid_external_val = row[col]
-                        break
-                if uid_external_val and str(uid_external_val).strip():
-                    all_external_ids_in_upload.add(str(uid_external_val).strip())
-            except:
-                pass
+        all_external_ids_in_upload = set(upload_frame.unique_values('uid_external'))
         
         if all_external_ids_in_upload:
             clients_with_external_id = Client.objects.filter(uid_external__in=all_external_ids_in_upload).only(
@@ -4134,7 +3492,7 @@ def upload_clients(request):
                 
                 for client in candidates:
                     client_full_name = f"{client.first_name} {client.last_name}".strip()
-                    similarity = calculate_name_similarity(full_name, client_full_name)
+                    similarity = calculate_name_similarity(full_name, client_full_name, 0.9)
                     if similarity >= 0.9:
                         return client, f"name_similarity_{similarity:.2f}"
             
@@ -4174,7 +3532,7 @@ def upload_clients(request):
                 # Check name similarity
                 for candidate in candidates:
                     candidate_full_name = f"{candidate.first_name} {candidate.last_name}".strip()
-                    similarity = calculate_name_similarity(full_name, candidate_full_name)
+                    similarity = calculate_name_similarity(full_name, candidate_full_name, 0.7)
                     if similarity >= 0.7:
                         return candidate, f"dob_name_similarity_{similarity:.2f}"
             
@@ -4185,6 +3543,7 @@ def upload_clients(request):
         total_updated_count = 0
         total_skipped_count = 0
         total_duplicates_flagged = 0
+        total_errors_count = 0
         all_errors = []
         all_warnings = []  # Track all future date warnings
         all_duplicate_details = []
@@ -4192,47 +3551,72 @@ def upload_clients(request):
         # Check file size and warn if very large
         total_rows = len(df)
         if total_rows > 10000:
-            logger.warning(f"Large file detected: {total_rows} rows. Processing in chunks within a single transaction.")
+            logger.warning(f"Large file detected: {total_rows} rows. Processing in {CHUNK_SIZE}-row chunks, each committed separately.")
         
-        logger.info("All pre-loading complete. Starting chunked processing within transaction...")
+        logger.info("All pre-loading complete. Starting chunked processing...")
         
-        # Process file in chunks but within a SINGLE transaction
-        # If ANY chunk fails, ALL database operations will rollback
+        # Process file in chunks; each chunk commits in its own transaction and records a
+        # checkpoint, so a failure only rolls back the current chunk and the upload can resume from it
         chunk_start = 0
         chunk_number = 0
+        if resume_checkpoint:
+            chunk_start = resume_checkpoint.get('next_row', 0)
+            chunk_number = resume_checkpoint.get('chunk_number', 0)
+            total_created_count = resume_checkpoint.get('records_created', 0)
+            total_updated_count = resume_checkpoint.get('records_updated', 0)
+            total_skipped_count = resume_checkpoint.get('records_skipped', 0)
+            total_duplicates_flagged = resume_checkpoint.get('duplicates_flagged', 0)
+            total_errors_count = resume_checkpoint.get('errors_count', 0)
+            logger.info(f"Resuming upload {upload_log.external_id} from row {chunk_start + 1} (after chunk {chunk_number})")
+        run_start_row = chunk_start
+        run_started_at = timezone.now()
+        clients_to_update = []
+        created_clients = []
+        
+        def update_inactive_status_for(processed_client_ids):
+            """Update inactive status for processed clients based on active enrollments"""
+            if not processed_client_ids:
+                return
+            try:
+                logger.info(f"Updating inactive status for {len(processed_client_ids)} processed clients")
+                inactive_count = 0
+                
+                # Get all processed clients with their enrollments prefetched
+                processed_clients = Client.objects.filter(
+                    id__in=processed_client_ids
+                ).prefetch_related('clientprogramenrollment_set')
+                
+                clients_to_update_status = []
+                for client in processed_clients:
+                    status_changed = client.update_inactive_status()
+                    if status_changed:
+                        clients_to_update_status.append(client)
+                        if client.is_inactive:
+                            inactive_count += 1
+                
+                # Bulk update inactive status
+                # Use smaller batch size to avoid PostgreSQL stack depth limit
+                if clients_to_update_status:
+                    Client.objects.bulk_update(
+                        clients_to_update_status,
+                        ['is_inactive'],
+                        batch_size=500
+                    )
+                    logger.info(f"Updated inactive status for {len(clients_to_update_status)} clients ({inactive_count} marked as inactive)")
+            except Exception as e:
+                # Don't fail the upload if inactive status update fails
+                logger.error(f"Error updating inactive status for processed clients: {str(e)}")
         
-        # Wrap ALL chunk processing in a single transaction
-        # This ensures that if any chunk fails, everything rolls back
         try:
-            logger.info("Entering transaction.atomic() block...")
-            with transaction.atomic():
-                logger.info("Inside transaction.atomic() block. Starting chunk processing...")
-                while chunk_start < total_rows:
+            logger.info("Starting chunk processing (one transaction per chunk)...")
+            while chunk_start < total_rows:
+                chunk_started_at = timezone.now()
+                with transaction.atomic():
                     chunk_end = min(chunk_start + CHUNK_SIZE, total_rows)
                     chunk_number += 1
-                    chunk_df = df.iloc[chunk_start:chunk_end]
                     
                     logger.info(f"Processing chunk {chunk_number}: rows {chunk_start + 1} to {chunk_end} of {total_rows}")
                     
-                    # Update progress in upload log (outside transaction for visibility)
-                    # Note: This won't persist if transaction rolls back, but gives user feedback
-                    if upload_log:
-                        try:
-                            progress_percentage = int((chunk_start / total_rows) * 100) if total_rows > 0 else 0
-                            upload_log.upload_details = upload_log.upload_details or {}
-                            upload_log.upload_details['progress'] = {
-                                'processed': chunk_start,
-                                'total': total_rows,
-                                'percentage': progress_percentage,
-                                'current_chunk': chunk_number,
-                                'status': 'processing'
-                            }
-                            # Save outside transaction for progress visibility
-                            # Use save(update_fields=...) to avoid triggering signals
-                            upload_log.save(update_fields=['upload_details'])
-                        except Exception as e:
-                            logger.warning(f"Failed to update progress: {e}")
-                    
                     # Initialize lists for this chunk
                     clients_to_create = []
                     clients_to_update = []
@@ -4251,17 +3635,14 @@ def upload_clients(request):
                     chunk_clients_by_name_dob = {}  # Key: (first_name_lower, last_name_lower, dob) -> client_data dict
                     
                     # Process rows in this chunk
-                    for chunk_row_idx, (index, row) in enumerate(chunk_df.iterrows()):
+                    # Raw cells stay available for the ad-hoc column lookups (combined client, SMIS/EMHware ids);
+                    # mapped fields come from the normalized row dicts
+                    for chunk_row_idx, (index, row, row_fields) in enumerate(upload_frame.iter_rows(chunk_start, chunk_end)):
                         try:
                             # Helper function to get data using field mapping
                             def get_field_data(field_name, default=''):
-                                """Get data from row using field mapping"""
-                                for col in df.columns:
-                                    if column_mapping.get(col) == field_name:
-                                        value = row[col]
-                                        if pd.notna(value) and str(value).strip():
-                                            return str(value).strip()
-                                        return default
+                                """Get data from the normalized row fields"""
+                                return upload_frame.get_field(row_fields, field_name, default)
                             # Helper function to ensure proper defaults for optional fields (convert empty strings to None)
                             def get_field_with_default(field_name, default=None):
                                 """Get field data and ensure empty strings become None for optional fields"""
@@ -4322,6 +3703,14 @@ def upload_clients(request):
                                 if not value or (isinstance(value, str) and value.strip() == ''):
                                     return default
                                 
+                                # Date columns were parsed up front with each column's inferred format
+                                known, parsed_date_obj = upload_frame.lookup_date(field_name, value)
+                                if known:
+                                    if parsed_date_obj is None:
+                                        return default
+                                    check_future_date(parsed_date_obj, field_name, index)
+                                    return parsed_date_obj
+                                
                                 # Handle pandas Timestamp or datetime objects directly
                                 if hasattr(value, 'date'):
                                     try:
@@ -5047,12 +4436,7 @@ def upload_clients(request):
                                         # Prepare update data - collect fields from CSV
                                         filtered_data = {}
                                         
-                                        # Get all fields that are mapped from CSV columns
-                                        csv_fields = set()
-                                        for col in df.columns:
-                                            field_name = column_mapping.get(col)
-                                            if field_name:
-                                                csv_fields.add(field_name)
+                                        # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                         
                                         # Only include fields that exist in the CSV and have non-empty values
                                         for field, value in client_data.items():
@@ -5139,12 +4523,12 @@ def upload_clients(request):
                                             # If program is specified, we'll handle it later in enrollment processing
                                         
                                         # Set updated_by field
-                                        if request.user.is_authenticated:
-                                            first_name = request.user.first_name or ''
-                                            last_name = request.user.last_name or ''
+                                        if upload_user.is_authenticated:
+                                            first_name = upload_user.first_name or ''
+                                            last_name = upload_user.last_name or ''
                                             user_name = f"{first_name} {last_name}".strip()
                                             if not user_name or user_name == ' ':
-                                                user_name = request.user.username or request.user.email or 'System'
+                                                user_name = upload_user.username or upload_user.email or 'System'
                                             client.updated_by = user_name
                                         else:
                                             client.updated_by = 'System'
@@ -5306,12 +4690,7 @@ def upload_clients(request):
                                             # Prepare update data - collect fields from CSV (same logic as same-source match)
                                             filtered_data = {}
                                             
-                                            # Get all fields that are mapped from CSV columns
-                                            csv_fields = set()
-                                            for col in df.columns:
-                                                field_name = column_mapping.get(col)
-                                                if field_name:
-                                                    csv_fields.add(field_name)
+                                            # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                             
                                             # Only include fields that exist in the CSV and have non-empty values
                                             for field, value in client_data.items():
@@ -5398,12 +4777,12 @@ def upload_clients(request):
                                                 # If program is specified, we'll handle it later in enrollment processing
                                             
                                             # Set updated_by field
-                                            if request.user.is_authenticated:
-                                                first_name = request.user.first_name or ''
-                                                last_name = request.user.last_name or ''
+                                            if upload_user.is_authenticated:
+                                                first_name = upload_user.first_name or ''
+                                                last_name = upload_user.last_name or ''
                                                 user_name = f"{first_name} {last_name}".strip()
                                                 if not user_name or user_name == ' ':
-                                                    user_name = request.user.username or request.user.email or 'System'
+                                                    user_name = upload_user.username or upload_user.email or 'System'
                                                 client.updated_by = user_name
                                             else:
                                                 client.updated_by = 'System'
@@ -5468,12 +4847,7 @@ def upload_clients(request):
                                         # For updates, only include fields that are actually present in the CSV
                                         filtered_data = {}
                                         
-                                        # Get all fields that are mapped from CSV columns
-                                        csv_fields = set()
-                                        for col in df.columns:
-                                            field_name = column_mapping.get(col)
-                                            if field_name:
-                                                csv_fields.add(field_name)
+                                        # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                         
                                         # Only include fields that exist in the CSV and have non-empty values
                                         for field, value in client_data.items():
@@ -5579,12 +4953,12 @@ def upload_clients(request):
                                                     filtered_data['reason_discharge'] = reason_discharge_value
                                         
                                         # Set updated_by field
-                                        if request.user.is_authenticated:
-                                            first_name = request.user.first_name or ''
-                                            last_name = request.user.last_name or ''
+                                        if upload_user.is_authenticated:
+                                            first_name = upload_user.first_name or ''
+                                            last_name = upload_user.last_name or ''
                                             user_name = f"{first_name} {last_name}".strip()
                                             if not user_name or user_name == ' ':
-                                                user_name = request.user.username or request.user.email or 'System'
+                                                user_name = upload_user.username or upload_user.email or 'System'
                                             client.updated_by = user_name
                                         else:
                                             client.updated_by = 'System'
@@ -5828,12 +5202,7 @@ def upload_clients(request):
                                             # Prepare update data - collect fields from CSV (same logic as other matches)
                                             filtered_data = {}
                                             
-                                            # Get all fields that are mapped from CSV columns
-                                            csv_fields = set()
-                                            for col in df.columns:
-                                                field_name = column_mapping.get(col)
-                                                if field_name:
-                                                    csv_fields.add(field_name)
+                                            # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                             
                                             # Only include fields that exist in the CSV and have non-empty values
                                             for field, value in client_data.items():
@@ -5904,12 +5273,12 @@ def upload_clients(request):
                                                         setattr(client, field, value)
                                             
                                             # Set updated_by field
-                                            if request.user.is_authenticated:
-                                                first_name = request.user.first_name or ''
-                                                last_name = request.user.last_name or ''
+                                            if upload_user.is_authenticated:
+                                                first_name = upload_user.first_name or ''
+                                                last_name = upload_user.last_name or ''
                                                 user_name = f"{first_name} {last_name}".strip()
                                                 if not user_name or user_name == ' ':
-                                                    user_name = request.user.username or request.user.email or 'System'
+                                                    user_name = upload_user.username or upload_user.email or 'System'
                                                 client.updated_by = user_name
                                             else:
                                                 client.updated_by = 'System'
@@ -6023,12 +5392,7 @@ def upload_clients(request):
                                     # Collect update data - only include fields that are actually present in the CSV
                                     filtered_data = {}
                                     
-                                    # Get all fields that are mapped from CSV columns
-                                    csv_fields = set()
-                                    for col in df.columns:
-                                        field_name = column_mapping.get(col)
-                                        if field_name:
-                                            csv_fields.add(field_name)
+                                    # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                     
                                     # Only include fields that exist in the CSV and have non-empty values
                                     for field, value in client_data.items():
@@ -6174,12 +5538,12 @@ def upload_clients(request):
                                                 setattr(client, field, value)
                                     
                                     # Set updated_by field
-                                    if request.user.is_authenticated:
-                                        first_name = request.user.first_name or ''
-                                        last_name = request.user.last_name or ''
+                                    if upload_user.is_authenticated:
+                                        first_name = upload_user.first_name or ''
+                                        last_name = upload_user.last_name or ''
                                         user_name = f"{first_name} {last_name}".strip()
                                         if not user_name or user_name == ' ':
-                                            user_name = request.user.username or request.user.email or 'System'
+                                            user_name = upload_user.username or upload_user.email or 'System'
                                         client.updated_by = user_name
                                     else:
                                         client.updated_by = 'System'
@@ -6257,7 +5621,8 @@ def upload_clients(request):
                                             # Use fuzzy_matcher to find potential duplicates by name
                                             # Maintains original business logic
                                             potential_duplicates = fuzzy_matcher.find_potential_duplicates(
-                                                client_data, all_clients_from_other_sources, similarity_threshold=0.9
+                                                client_data, all_clients_from_other_sources, similarity_threshold=0.9,
+                                                candidate_index=other_sources_index
                                             )
                                             
                                             if potential_duplicates:
@@ -6393,12 +5758,7 @@ def upload_clients(request):
                                     # Collect update data - only include fields that are actually present in the CSV
                                     filtered_data = {}
                                     
-                                    # Get all fields that are mapped from CSV columns
-                                    csv_fields = set()
-                                    for col in df.columns:
-                                        field_name = column_mapping.get(col)
-                                        if field_name:
-                                            csv_fields.add(field_name)
+                                    # csv_fields: fields mapped from CSV columns (resolved once by upload_frame)
                                     
                                     # Only include fields that exist in the CSV and have non-empty values
                                     for field, value in client_data.items():
@@ -6518,12 +5878,12 @@ def upload_clients(request):
                                                 )
                                     
                                     # Set updated_by field
-                                    if request.user.is_authenticated:
-                                        first_name = request.user.first_name or ''
-                                        last_name = request.user.last_name or ''
+                                    if upload_user.is_authenticated:
+                                        first_name = upload_user.first_name or ''
+                                        last_name = upload_user.last_name or ''
                                         user_name = f"{first_name} {last_name}".strip()
                                         if not user_name or user_name == ' ':
-                                            user_name = request.user.username or request.user.email or 'System'
+                                            user_name = upload_user.username or upload_user.email or 'System'
                                         existing_client.updated_by = user_name
                                     else:
                                         existing_client.updated_by = 'System'
@@ -6592,15 +5952,15 @@ def upload_clients(request):
                                         client_fields[field] = value
                                 
                                 # Set user fields for created_by and updated_by
-                                if request.user.is_authenticated:
+                                if upload_user.is_authenticated:
                                     # Try to get user's full name
-                                    first_name = request.user.first_name or ''
-                                    last_name = request.user.last_name or ''
+                                    first_name = upload_user.first_name or ''
+                                    last_name = upload_user.last_name or ''
                                     user_name = f"{first_name} {last_name}".strip()
                                     
                                     # If no full name, fall back to username or email
                                     if not user_name or user_name == ' ':
-                                        user_name = request.user.username or request.user.email or 'System'
+                                        user_name = upload_user.username or upload_user.email or 'System'
                                     
                                     client_fields['created_by'] = user_name
                                     client_fields['updated_by'] = user_name
@@ -6826,11 +6186,13 @@ def upload_clients(request):
                         
                         # Process intake data for updated clients
                         if has_intake_data:
+                            # Their enrollments, for overlap/merge checks, in one query
+                            enrollment_intervals.load_clients(update_data['client'].id for update_data in clients_to_update)
                             for update_data in clients_to_update:
                                 try:
                                     client = update_data['client']
                                     row_index = update_data['row_index']
-                                    row = df.iloc[row_index]
+                                    row = upload_frame.row_fields(row_index)
                                     process_intake_data(
                                         client,
                                         row,
@@ -6838,10 +6200,8 @@ def upload_clients(request):
                                         column_mapping,
                                         df.columns,
                                         departments_cache,
-                                        program_lookup_by_name,
-                                        all_programs_list,
-                                        program_fuzzy_cache,
-                                        enrollment_cache,
+                                        program_index,
+                                        enrollment_intervals,
                                         intake_cache,
                                         chunk_warnings,  # Pass warnings list
                                     )
@@ -6947,12 +6307,13 @@ def upload_clients(request):
                         # Process intake data for all created clients
                         if has_intake_data and created_clients:
                             logger.info(f"Processing intake data for {len(created_clients)} created clients in chunk {chunk_number}")
+                            enrollment_intervals.add_new_clients(client.id for client in created_clients)
                             for i, client in enumerate(created_clients):
                                 try:
                                     # Get the original row data for this client
                                     client_data = clients_to_create[i]
                                     row_index = client_data['row_index']
-                                    row = df.iloc[row_index]
+                                    row = upload_frame.row_fields(row_index)
                                     
                                     # Pass pre-loaded caches to avoid repeated database queries
                                     process_intake_data(
@@ -6962,10 +6323,8 @@ def upload_clients(request):
                                         column_mapping,
                                         df.columns,
                                         departments_cache,
-                                        program_lookup_by_name,
-                                        all_programs_list,
-                                        program_fuzzy_cache,
-                                        enrollment_cache,
+                                        program_index,
+                                        enrollment_intervals,
                                         intake_cache,
                                         chunk_warnings,  # Pass warnings list
                                     )
@@ -6978,7 +6337,7 @@ def upload_clients(request):
                                         )
                                         for merged_row_index in merged_row_indices:
                                             try:
-                                                merged_row = df.iloc[merged_row_index]
+                                                merged_row = upload_frame.row_fields(merged_row_index)
                                                 process_intake_data(
                                                     client,
                                                     merged_row,
@@ -6986,10 +6345,8 @@ def upload_clients(request):
                                                     column_mapping,
                                                     df.columns,
                                                     departments_cache,
-                                                    program_lookup_by_name,
-                                                    all_programs_list,
-                                                    program_fuzzy_cache,
-                                                    enrollment_cache,
+                                                    program_index,
+                                                    enrollment_intervals,
                                                     intake_cache,
                                                     chunk_warnings,
                                                 )
@@ -7004,7 +6361,7 @@ def upload_clients(request):
                                         )
                                         for merged_row_index in merged_row_indices:
                                             try:
-                                                merged_row = df.iloc[merged_row_index]
+                                                merged_row = upload_frame.row_fields(merged_row_index)
                                                 process_intake_data(
                                                     client,
                                                     merged_row,
@@ -7012,10 +6369,8 @@ def upload_clients(request):
                                                     column_mapping,
                                                     df.columns,
                                                     departments_cache,
-                                                    program_lookup_by_name,
-                                                    all_programs_list,
-                                                    program_fuzzy_cache,
-                                                    enrollment_cache,
+                                                    program_index,
+                                                    enrollment_intervals,
                                                     intake_cache,
                                                     chunk_warnings,
                                                 )
@@ -7028,6 +6383,9 @@ def upload_clients(request):
                                     logger.error(f"Error processing intake data for client {client.first_name} {client.last_name}: {str(e)}")
                                     chunk_errors.append(f"Row {row_index + 2}: Error processing intake data - {str(e)}")
                     
+                    # Write the chunk's new and merged enrollments
+                    enrollment_intervals.flush()
+                    
                     # Aggregate chunk results
                     chunk_duplicates_flagged = len([d for d in chunk_duplicate_details if d['type'] == 'created_with_duplicate'])
                     
@@ -7039,18 +6397,56 @@ def upload_clients(request):
                     all_warnings.extend(chunk_warnings)  # Collect warnings from chunk
                     all_duplicate_details.extend(chunk_duplicate_details)
                     
-                    logger.info(f"Chunk {chunk_number} completed: {chunk_created_count} created, {chunk_updated_count} updated, {len(chunk_errors)} errors")
+                    total_errors_count += len(chunk_errors)
                     
-                    # Move to next chunk
-                    chunk_start = chunk_end
+                    logger.info(f"Chunk {chunk_number} completed: {chunk_created_count} created, {chunk_updated_count} updated, {len(chunk_errors)} errors")
+                
+                # Chunk committed - refresh inactive flags and record the checkpoint
+                update_inactive_status_for(
+                    [update_data['client'].id for update_data in clients_to_update] +
+                    [client.id for client in created_clients]
+                )
+                # Bulk writes skip the signals that maintain the visibility sets and dashboard counters
+                invalidate_client_scopes()
+                invalidate_dashboard_stats()
+                if upload_log:
+                    try:
+                        record_chunk_checkpoint(
+                            upload_log,
+                            {
+                                'chunk': chunk_number,
+                                'start_row': chunk_start,
+                                'end_row': chunk_end,
+                                'created': chunk_created_count,
+                                'updated': chunk_updated_count,
+                                'skipped': chunk_skipped_count,
+                                'duplicates_flagged': chunk_duplicates_flagged,
+                                'errors': len(chunk_errors),
+                                'duration_seconds': round((timezone.now() - chunk_started_at).total_seconds(), 3),
+                            },
+                            {
+                                'created': total_created_count,
+                                'updated': total_updated_count,
+                                'skipped': total_skipped_count,
+                                'duplicates_flagged': total_duplicates_flagged,
+                                'errors': total_errors_count,
+                            },
+                            total_rows,
+                            chunk_end - run_start_row,
+                            run_started_at,
+                        )
+                    except Exception as e:
+                        logger.warning(f"Failed to record checkpoint for chunk {chunk_number}: {e}")
                 
-                # All chunks processed successfully - transaction will commit
-                logger.info(f"All {chunk_number} chunks processed successfully. Transaction will commit.")
+                # Move to next chunk
+                chunk_start = chunk_end
+            
+            logger.info(f"All {chunk_number} chunks processed and committed.")
                             
         except UploadError as e:
             # If UploadError is raised, preserve it and re-raise
             # This ensures the original error message and details are maintained
-            logger.error(f"UploadError in chunk {chunk_number}: {e.message}. ALL database operations will rollback.")
+            logger.error(f"UploadError in chunk {chunk_number}: {e.message}. Chunk {chunk_number} rolled back; earlier chunks stay committed.")
             logger.error(f"Error code: {e.code}, Category: {e.category}")
             if isinstance(e.details, dict):
                 logger.error(f"Error details: Row {e.details.get('row', 'N/A')}, Field: {e.details.get('field', 'N/A')}, Date: {e.details.get('date', 'N/A')}")
@@ -7072,67 +6468,20 @@ def upload_clients(request):
                     'traceback': error_traceback
                 }
             )
-            logger.error(f"Error processing chunk {chunk_number}: {upload_error.message}. ALL database operations will rollback.")
+            logger.error(f"Error processing chunk {chunk_number}: {upload_error.message}. Chunk {chunk_number} rolled back; earlier chunks stay committed.")
             logger.error(f"Exception type: {type(e).__name__}, Exception message: {str(e)}")
             logger.error(f"Full traceback:\n{error_traceback}")
             all_errors.append(f"Chunk {chunk_number} (rows {chunk_start + 1}-{chunk_end}): {upload_error.message}")
             # Re-raise to trigger transaction rollback
             raise upload_error
         
-        # Update inactive status for all processed clients based on active enrollments
-        # This is done after all clients and enrollments have been processed
-        try:
-            all_processed_client_ids = []
-            
-            # Collect IDs from updated clients
-            if clients_to_update:
-                for update_data in clients_to_update:
-                    client = update_data['client']
-                    all_processed_client_ids.append(client.id)
-            
-            # Collect IDs from created clients
-            if created_clients:
-                for client in created_clients:
-                    all_processed_client_ids.append(client.id)
-            
-            # Update inactive status for all processed clients
-            if all_processed_client_ids:
-                logger.info(f"Updating inactive status for {len(all_processed_client_ids)} processed clients")
-                inactive_count = 0
-                
-                # Get all processed clients with their enrollments prefetched
-                processed_clients = Client.objects.filter(
-                    id__in=all_processed_client_ids
-                ).prefetch_related('clientprogramenrollment_set')
-                
-                clients_to_update_status = []
-                for client in processed_clients:
-                    status_changed = client.update_inactive_status()
-                    if status_changed:
-                        clients_to_update_status.append(client)
-                        if client.is_inactive:
-                            inactive_count += 1
-                
-                # Bulk update inactive status
-                # Use smaller batch size to avoid PostgreSQL stack depth limit
-                if clients_to_update_status:
-                    Client.objects.bulk_update(
-                        clients_to_update_status,
-                        ['is_inactive'],
-                        batch_size=500
-                    )
-                    logger.info(f"Updated inactive status for {len(clients_to_update_status)} clients ({inactive_count} marked as inactive)")
-        except Exception as e:
-            # Don't fail the upload if inactive status update fails
-            logger.error(f"Error updating inactive status for processed clients: {str(e)}")
-        
         # Calculate completion time and update upload log
         upload_completed_time = timezone.now()
         
         # Determine status based on aggregated results
-        if len(all_errors) > 0 and (total_created_count == 0 and total_updated_count == 0):
+        if total_errors_count > 0 and (total_created_count == 0 and total_updated_count == 0):
             status = 'failed'
-        elif len(all_errors) > 0:
+        elif total_errors_count > 0:
             status = 'partial'
         else:
             status = 'success'
@@ -7146,7 +6495,7 @@ def upload_clients(request):
                 upload_log.records_updated = total_updated_count
                 upload_log.records_skipped = total_skipped_count
                 upload_log.duplicates_flagged = total_duplicates_flagged
-                upload_log.errors_count = len(all_errors)
+                upload_log.errors_count = total_errors_count
                 upload_log.status = status
                 
                 # Store error details with structure (include tracebacks if available)
@@ -7180,19 +6529,31 @@ def upload_clients(request):
                     if len(all_errors) > 1:
                         error_summary += f"... and {len(all_errors) - 1} more error(s)"
                     upload_log.error_message = error_summary
-                upload_log.upload_details = {
+                # Keep job, checkpoint and per-chunk results written while processing
+                upload_details = upload_log.upload_details or {}
+                run_seconds = (upload_completed_time - run_started_at).total_seconds()
+                upload_details.update({
                     'has_intake_data': has_intake_data,
+                    'date_formats': upload_frame.date_formats(),
+                    'program_resolution': dict(program_index.stats),
+                    'learned_program_aliases': program_index.learned_aliases,
+                    'enrollments': dict(enrollment_intervals.stats),
                     'source': source,
                     'file_extension': file_extension,
                     'chunks_processed': chunk_number,
                     'chunk_size': CHUNK_SIZE,
+                    'resumed_from_row': run_start_row if resume_checkpoint else None,
                     'progress': {
                         'processed': total_rows,
                         'total': total_rows,
                         'percentage': 100,
+                        'current_chunk': chunk_number,
+                        'rows_per_second': round((total_rows - run_start_row) / run_seconds, 2) if run_seconds > 0 else None,
+                        'eta_seconds': 0,
                         'status': 'completed'
                     }
-                }
+                })
+                upload_log.upload_details = upload_details
                 upload_log.save()
                 logger.info(f"Upload log updated: {upload_log.id} - Duration: {upload_log.duration_seconds:.2f}s")
                 
@@ -7203,7 +6564,7 @@ def upload_clients(request):
                         entity_name='ClientUpload',
                         entity_id=upload_log.external_id,
                         action='import',
-                        changed_by=request.user if request.user.is_authenticated else None,
+                        changed_by=upload_user if upload_user.is_authenticated else None,
                         diff_data={
                             'file_name': upload_log.file_name,
                             'file_size': upload_log.file_size,
@@ -7321,7 +6682,7 @@ def upload_clients(request):
                         entity_name='ClientUpload',
                         entity_id=entity_id,
                         action='import',
-                        changed_by=request.user if request.user.is_authenticated else None,
+                        changed_by=upload_user if upload_user.is_authenticated else None,
                         diff_data={
                             'file_name': file_name,
                             'file_size': file_size,
@@ -7363,6 +6724,12 @@ def upload_clients(request):
             'details': e.details
         }
         
+        # Chunks committed before the failure stay saved; report where a resume would pick up
+        checkpoint = read_checkpoint(upload_log)
+        if checkpoint:
+            error_response['checkpoint'] = checkpoint
+            error_response['upload_id'] = str(upload_log.external_id)
+        
         # For future date validation errors, include additional helpful information
         if e.code == 'UPLOAD_030' and isinstance(e.details, dict):
             error_response['row_number'] = e.details.get('row')
@@ -7373,7 +6740,7 @@ def upload_clients(request):
                 f"Row {e.details.get('row', 'N/A')}: Future date detected in {e.details.get('field', 'date field')}. "
                 f"Date: {e.details.get('date', 'N/A')} (Client ID: {e.details.get('client_id', 'N/A')}). "
                 f"Please update the Excel sheet with the correct date and try uploading again. "
-                f"No changes were saved to the database."
+                + (f"The first {checkpoint['next_row']} row(s) were already saved; resume the upload to continue." if checkpoint else "No changes were saved to the database.")
             )
         
         return JsonResponse(error_response, status=status_code)
@@ -7414,7 +6781,7 @@ def upload_clients(request):
                         entity_name='ClientUpload',
                         entity_id=upload_log.external_id,
                         action='import',
-                        changed_by=request.user if request.user.is_authenticated else None,
+                        changed_by=upload_user if upload_user.is_authenticated else None,
                         diff_data={
                             'file_name': upload_log.file_name if hasattr(upload_log, 'file_name') else 'Unknown',
                             'file_size': upload_log.file_size if hasattr(upload_log, 'file_size') else 0,
@@ -7453,8 +6820,7 @@ def get_upload_logs(request):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot view upload logs
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -7523,6 +6889,68 @@ def get_upload_logs(request):
         logger.error(f"Error fetching upload logs: {e}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def _can_manage_uploads(request):
+    """Same rule as the upload itself: Staff, Manager and Leader users need SuperAdmin/Admin"""
+    if not request.user.is_authenticated:
+        return False
+    principal = get_principal(request.user)
+    if not principal.has_staff_profile or principal.is_admin:
+        return True
+    return not principal.has_any_role('Staff', 'Manager', 'Leader')
+
+@require_http_methods(["GET"])
+@login_required
+def get_upload_progress(request, upload_id):
+    """API endpoint to poll a client upload: rows/sec, ETA, checkpoint and per-chunk results"""
+    if not _can_manage_uploads(request):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to view upload logs.'}, status=403)
+    
+    try:
+        upload_log = ClientUploadLog.objects.get(external_id=upload_id)
+    except ClientUploadLog.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Upload not found.'}, status=404)
+    
+    from .upload_jobs import build_progress_payload
+    return JsonResponse({'success': True, 'upload': build_progress_payload(upload_log)})
+
+@require_http_methods(["POST"])
+@login_required
+def resume_upload(request, upload_id):
+    """Resume a background upload from its last committed chunk"""
+    if not _can_manage_uploads(request):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to upload clients. Contact your administrator.'}, status=403)
+    
+    from .upload_jobs import can_resume, get_upload_runner, is_stale, start_upload_thread
+    
+    with transaction.atomic():
+        try:
+            upload_log = ClientUploadLog.objects.select_for_update().get(external_id=upload_id)
+        except ClientUploadLog.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Upload not found.'}, status=404)
+        
+        # A queued or processing upload already has a runner, unless it stopped checkpointing
+        if upload_log.status in ('queued', 'processing') and not is_stale(upload_log):
+            return JsonResponse({'success': False, 'error': 'This upload is already queued or processing.'}, status=409)
+        if not can_resume(upload_log):
+            return JsonResponse({'success': False, 'error': 'This upload cannot be resumed. Please upload the file again.'}, status=400)
+        
+        upload_log.status = 'queued'
+        upload_log.upload_details = upload_log.upload_details or {}
+        upload_log.upload_details.setdefault('job', {})['resume_requested_at'] = str(timezone.now())
+        upload_log.save(update_fields=['status', 'upload_details', 'updated_at'])
+    
+    if get_upload_runner() == 'thread':
+        start_upload_thread(upload_log.pk, resume=True)
+    
+    checkpoint = upload_log.upload_details.get('checkpoint') or {}
+    return JsonResponse({
+        'success': True,
+        'upload_id': str(upload_log.external_id),
+        'resume_from_row': checkpoint.get('next_row', 0),
+        'progress_url': reverse('clients:upload_progress', args=[upload_log.external_id]),
+        'message': 'Upload resumed from the last saved chunk.'
+    }, status=202)
+
 @require_http_methods(["GET"])
 def download_sample(request, file_type):
     """Generate and download sample CSV or Excel file"""
@@ -7811,58 +7239,11 @@ def bulk_delete_clients(request):
                 'error': 'No clients found with provided IDs'
             }, status=404)
         
-        # Soft delete: archive clients instead of actually deleting them
-        from django.utils import timezone
-        from core.models import create_audit_log, ServiceRestriction
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        archived_at = timezone.now()
-        
-        total_enrollments_archived = 0
-        total_restrictions_archived = 0
-        
-        for client in clients_to_delete:
-            # Create audit log entry before archiving
-            try:
-                create_audit_log(
-                    entity_name='Client',
-                    entity_id=client.external_id,
-                    action='archive',
-                    changed_by=request.user,
-                    diff_data={
-                        'first_name': client.first_name,
-                        'last_name': client.last_name,
-                        'client_id': client.client_id or '',
-                        'archived_by': user_name
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Error creating audit log for client archiving: {e}")
-            
-            # Archive all enrollments associated with this client
-            enrollments = ClientProgramEnrollment.objects.filter(client=client, is_archived=False)
-            enrollment_count = enrollments.count()
-            total_enrollments_archived += enrollment_count
-            for enrollment in enrollments:
-                enrollment.is_archived = True
-                enrollment.archived_at = archived_at
-                enrollment.updated_by = user_name
-                enrollment.save()
-            
-            # Archive all restrictions associated with this client
-            restrictions = ServiceRestriction.objects.filter(client=client, is_archived=False)
-            restriction_count = restrictions.count()
-            total_restrictions_archived += restriction_count
-            for restriction in restrictions:
-                restriction.is_archived = True
-                restriction.archived_at = archived_at
-                restriction.updated_by = user_name
-                restriction.save()
-            
-            # Soft delete: set is_archived=True and archived_at timestamp
-            client.is_archived = True
-            client.archived_at = archived_at
-            client.updated_by = user_name
-            client.save()
+        # Soft delete: archive clients, their enrollments and restrictions in a few set-based updates
+        from core.bulk_lifecycle import archive_clients
+        archived = archive_clients(clients_to_delete, request.user)
+        total_enrollments_archived = archived['enrollments']
+        total_restrictions_archived = archived['restrictions']
         
         logger.info(f"Bulk archived {deleted_count} clients: {client_ids}")
         logger.info(f"Archived {total_enrollments_archived} enrollments and {total_restrictions_archived} restrictions")
@@ -7932,33 +7313,8 @@ def bulk_restore_clients(request):
             }, status=404)
         
         # Restore clients: set is_archived=False and clear archived_at
-        from django.utils import timezone
-        from core.models import create_audit_log
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        
-        for client in clients_to_restore:
-            # Create audit log entry for restoration
-            try:
-                create_audit_log(
-                    entity_name='Client',
-                    entity_id=client.external_id,
-                    action='restore',
-                    changed_by=request.user,
-                    diff_data={
-                        'first_name': client.first_name,
-                        'last_name': client.last_name,
-                        'client_id': client.client_id or '',
-                        'restored_by': user_name
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Error creating audit log for client restoration: {e}")
-            
-            # Restore: set is_archived=False and clear archived_at
-            client.is_archived = False
-            client.archived_at = None
-            client.updated_by = user_name
-            client.save()
+        from core.bulk_lifecycle import restore_clients
+        restore_clients(clients_to_restore, request.user)
         
         return JsonResponse({
             'success': True,
@@ -7989,8 +7345,7 @@ class ClientDedupeView(TemplateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot access duplicate detection
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Leader'] for role in role_names):
@@ -8590,8 +7945,7 @@ def run_duplicate_scan(request):
     # Reuse the same permission check as the dedupe view
     try:
         staff = request.user.staff_profile
-        user_roles = staff.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         # Staff role users cannot access duplicate detection
         if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
             return JsonResponse({
@@ -8896,61 +8250,8 @@ def run_duplicate_scan(request):
                 if len(results) >= scan_limit:
                     break
         
-        # 5. Fuzzy name matches (sampled set for performance)
-        # For auto-merge, increase sample size to find more duplicates
-        if len(results) < scan_limit:
-            # Increase sample size for auto-merge mode to find hundreds of duplicates
-            fuzzy_sample_size = 2000 if auto_merge_mode else 400
-            fuzzy_candidates = list(
-                clients_qs
-                .filter(first_name__isnull=False, last_name__isnull=False)
-                .exclude(first_name__exact='')
-                .exclude(last_name__exact='')
-                .order_by('last_name', 'first_name')[:fuzzy_sample_size]
-            )
-            
-            if fuzzy_candidates:
-                buckets = {}
-                for client in fuzzy_candidates:
-                    key = (client.last_name[:1] or '').lower()
-                    buckets.setdefault(key, []).append(client)
-                
-                for bucket_clients in buckets.values():
-                    bucket_clients.sort(key=lambda c: (c.last_name.lower(), c.first_name.lower(), c.id))
-                    bucket_size = len(bucket_clients)
-                    if bucket_size < 2:
-                        continue
-                    
-                    for i in range(bucket_size):
-                        if len(results) >= scan_limit:
-                            break
-                        for j in range(i + 1, bucket_size):
-                            c1 = bucket_clients[i]
-                            c2 = bucket_clients[j]
-                            
-                            similarity = fuzzy_matcher.calculate_similarity(
-                                f"{c1.first_name} {c1.last_name}",
-                                f"{c2.first_name} {c2.last_name}"
-                            )
-                            
-                            if c1.dob and c2.dob and c1.dob == c2.dob:
-                                similarity = max(similarity, 0.9)
-                                match_type = 'name_dob_similarity'
-                                reason = 'Similar names with matching date of birth'
-                            else:
-                                match_type = 'fuzzy_name'
-                                reason = 'Similar client names'
-                            
-                            if similarity < 0.88:
-                                continue
-                            
-                            add_candidate(c1, c2, match_type, reason, similarity)
-                            if len(results) >= scan_limit:
-                                break
-                        if len(results) >= scan_limit:
-                            break
-                    if len(results) >= scan_limit:
-                        break
+        # 5. Fuzzy name matches cover every client in a background scan (clients/duplicate_scan.py),
+        # queued once the exact matches below have been merged or flagged
         
         results.sort(key=lambda item: item['similarity_score'], reverse=True)
         # For auto-merge, process ALL results (not just limited)
@@ -9131,6 +8432,14 @@ def run_duplicate_scan(request):
                 errors.append(f"Error processing duplicate: {str(e)}")
                 logger.error(f"Error processing duplicate record: {e}", exc_info=True)
         
+        fuzzy_scan = None
+        if payload.get('fuzzy_scan', True):
+            scan_run = enqueue_duplicate_scan(
+                user=request.user, include_archived=include_archived, source=source_filter
+            )
+            fuzzy_scan = build_scan_payload(scan_run)
+            fuzzy_scan['progress_url'] = reverse('clients:dedupe_scan_progress', args=[scan_run.external_id])
+        
         # Build response message
         message_parts = []
         if merged_count > 0:
@@ -9139,6 +8448,8 @@ def run_duplicate_scan(request):
             message_parts.append(f'Flagged {flagged_count} duplicate(s) for manual review')
         if skipped_count > 0:
             message_parts.append(f'Skipped {skipped_count} existing record(s)')
+        if fuzzy_scan:
+            message_parts.append('Similar-name scan of all clients is running in the background')
         
         message = 'Scan completed. ' + ', '.join(message_parts) + '.'
         
@@ -9156,6 +8467,7 @@ def run_duplicate_scan(request):
             'auto_merge_mode': auto_merge_mode,
             'include_archived': include_archived,
             'source': source_filter,
+            'fuzzy_scan': fuzzy_scan,
             'message': message
         })
     
@@ -9167,6 +8479,67 @@ def run_duplicate_scan(request):
         }, status=500)
 
 
+def _can_run_duplicate_scans(request):
+    """Staff, Manager and Leader users cannot use duplicate detection unless they are also admins"""
+    principal = get_principal(request.user)
+    # No staff profile: same leniency as run_duplicate_scan
+    if not principal.has_staff_profile or principal.is_admin:
+        return True
+    return not principal.has_any_role('Staff', 'Manager', 'Leader')
+
+
+@require_http_methods(["GET"])
+@login_required
+def get_duplicate_scan_progress(request, scan_id):
+    """API endpoint to poll a full-population duplicate scan: clients scanned, pairs/sec, flagged pairs"""
+    if not _can_run_duplicate_scans(request):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to run duplicate scans.'}, status=403)
+    
+    try:
+        scan_run = DuplicateScanRun.objects.get(external_id=scan_id)
+    except DuplicateScanRun.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Scan not found.'}, status=404)
+    
+    return JsonResponse({'success': True, 'scan': build_scan_payload(scan_run)})
+
+
+@csrf_protect
+@require_http_methods(["POST"])
+@login_required
+def resume_duplicate_scan(request, scan_id):
+    """Resume a failed duplicate scan from its last committed batch"""
+    if not _can_run_duplicate_scans(request):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to run duplicate scans.'}, status=403)
+    
+    from .duplicate_scan import can_resume, get_scan_runner, is_stale, start_scan_thread
+    
+    with transaction.atomic():
+        try:
+            scan_run = DuplicateScanRun.objects.select_for_update().get(external_id=scan_id)
+        except DuplicateScanRun.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Scan not found.'}, status=404)
+        
+        # A queued or running scan already has a runner, unless it stopped checkpointing
+        if scan_run.status in ('queued', 'processing') and not is_stale(scan_run):
+            return JsonResponse({'success': False, 'error': 'This scan is already queued or running.'}, status=409)
+        if not can_resume(scan_run):
+            return JsonResponse({'success': False, 'error': 'This scan has already finished.'}, status=400)
+        
+        scan_run.status = 'queued'
+        scan_run.save(update_fields=['status', 'updated_at'])
+    
+    if get_scan_runner() == 'thread':
+        start_scan_thread(scan_run.pk, resume=True)
+    
+    return JsonResponse({
+        'success': True,
+        'scan_id': str(scan_run.external_id),
+        'resume_after_client': scan_run.last_client_id,
+        'progress_url': reverse('clients:dedupe_scan_progress', args=[scan_run.external_id]),
+        'message': 'Duplicate scan resumed from the last saved batch.'
+    }, status=202)
+
+
 @csrf_protect
 @require_http_methods(["POST"])
 @jwt_required
@@ -9178,8 +8551,7 @@ def delete_high_confidence_duplicates(request):
     # Reuse the same permission rules as the dedupe dashboard
     try:
         staff = request.user.staff_profile
-        user_roles = staff.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         # Staff role users cannot access duplicate detection
         if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
             return JsonResponse({
@@ -10357,181 +9729,93 @@ def merge_clients(request, duplicate_id):
         }, status=500)
 
 
-def export_clients(request):
-    """Export clients to CSV with current filters applied"""
-    try:
-        # Check permissions first
-        if request.user.is_authenticated:
-            try:
-                staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
-                
-                # Manager role users cannot export clients
-                if 'Manager' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
-                    messages.error(request, 'You do not have permission to export clients. Contact your administrator.')
-                    return redirect('clients:list')
-            except Exception:
-                pass
-        
-        # Get the same queryset as the list view
-        queryset = Client.objects.all()
-        
-        # Apply role-based filtering (same as ClientListView)
-        if request.user.is_authenticated:
-            try:
-                staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
-                
-                if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
-                    # Staff-only users see clients from both assigned programs AND directly assigned clients
-                    from staff.models import StaffProgramAssignment, StaffClientAssignment
-                    
-                    # Create a Q object to combine both types of assignments
-                    relationship_filters = Q()
-                    
-                    # 1. Clients enrolled in their assigned programs
-                    assigned_program_ids = StaffProgramAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('program_id', flat=True)
-                    if assigned_program_ids:
-                        relationship_filters |= Q(
-                            clientprogramenrollment__program_id__in=assigned_program_ids
-                        )
-                    
-                    # 2. Directly assigned clients
-                    assigned_client_ids = StaffClientAssignment.objects.filter(
-                        staff=staff,
-                        is_active=True
-                    ).values_list('client_id', flat=True)
-                    if assigned_client_ids:
-                        relationship_filters |= Q(
-                            id__in=assigned_client_ids
-                        )
-                    
-                    # Apply the combined filter
-                    if relationship_filters:
-                        queryset = queryset.filter(relationship_filters).distinct()
-                    else:
-                        # If no assignments, show no clients
-                        queryset = queryset.none()
-            except Exception:
-                pass
-        
-        # Apply the same filters as the list view
-        search_query = request.GET.get('search', '')
-        program_filter = request.GET.get('program', '')
-        department_filter = request.GET.get('department', '')
-        status_filter = request.GET.get('status', '')
-        manager_filter = request.GET.get('manager', '')
-        
-        # Apply search filter
-        if search_query:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(phone__icontains=search_query) |
-                Q(client_id__icontains=search_query)
-            )
-        
-        # Apply program filter
-        if program_filter:
-            queryset = queryset.filter(clientprogramenrollment__program__id=program_filter).distinct()
-        
-        # Apply department filter
-        if department_filter:
-            queryset = queryset.filter(clientprogramenrollment__program__department__id=department_filter).distinct()
-        
-        # Apply status filter
-        if status_filter:
-            if status_filter == 'enrolled':
-                queryset = queryset.filter(clientprogramenrollment__status='active').distinct()
-            elif status_filter == 'not_enrolled':
-                queryset = queryset.exclude(clientprogramenrollment__status='active').distinct()
-        
-        # Apply gender filter
-        gender_filter = request.GET.get('gender', '')
-        if gender_filter:
-            queryset = queryset.filter(gender=gender_filter)
-        
-        # Apply program manager filter
-        if manager_filter:
-            queryset = queryset.filter(
-                clientprogramenrollment__program__manager_assignments__staff_id=manager_filter,
-                clientprogramenrollment__program__manager_assignments__is_active=True
-            ).distinct()
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="clients_export.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header row with all fields from client detail view
-        writer.writerow([
-            'First Name',
-            'Last Name',
-            'Preferred Name',
-            'Alias',
-            'Date of Birth',
-            'Gender',
-            'Sexual Orientation',
-            'Citizenship Status',
-            'Indigenous Status',
-            'Country of Birth',
-            'Languages Spoken',
-            'Ethnicity',
-            'Phone',
-            'Work Phone',
-            'Alternative Phone',
-            'Email',
-            'Permission to Phone',
-            'Permission to Email',
-            'Address Line 2',
-            'Addresses (JSON)',
-            'Contact Information (JSON)',
-            'Primary Diagnosis',
-            'Medical Conditions',
-            'Support Workers (JSON)',
-            'Next of Kin (JSON)',
-            'Emergency Contact (JSON)',
-            'Program Enrollments',
-            'Program Status',
-            'Program Start Dates',
-            'Program End Dates',
-            'Comments',
-            'Profile Picture URL',
-            'Image URL',
-            'External UID',
-            'Updated By',
-            'Created Date',
-            'Updated Date'
-        ])
-        
-        # Write data rows
-        for client in queryset:
+def build_client_export(request):
+    """The client export for the request's filters and the user's role scope"""
+    # Get the same queryset as the list view
+    queryset = Client.objects.all()
+    
+    # Apply role-based filtering (same as ClientListView)
+    if request.user.is_authenticated:
+        try:
+            staff = request.user.staff_profile
+            role_names = get_principal(request.user).role_names
+            
+            if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
+                # Staff-only users see clients from both assigned programs AND directly assigned clients
+                queryset = queryset.filter(id__in=get_staff_client_ids(request.user))
+        except Exception:
+            pass
+    
+    # Apply the same filters as the list view
+    search_query = request.GET.get('search', '')
+    program_filter = request.GET.get('program', '')
+    department_filter = request.GET.get('department', '')
+    status_filter = request.GET.get('status', '')
+    manager_filter = request.GET.get('manager', '')
+    
+    # Apply search filter
+    if search_query:
+        queryset = queryset.filter(
+            Q(first_name__icontains=search_query) |
+            Q(last_name__icontains=search_query) |
+            Q(email__icontains=search_query) |
+            Q(phone__icontains=search_query) |
+            Q(client_id__icontains=search_query)
+        )
+    
+    # Apply program filter
+    if program_filter:
+        queryset = queryset.filter(clientprogramenrollment__program__id=program_filter).distinct()
+    
+    # Apply department filter
+    if department_filter:
+        queryset = queryset.filter(clientprogramenrollment__program__department__id=department_filter).distinct()
+    
+    # Apply status filter
+    if status_filter:
+        if status_filter == 'enrolled':
+            queryset = queryset.filter(clientprogramenrollment__status='active').distinct()
+        elif status_filter == 'not_enrolled':
+            queryset = queryset.exclude(clientprogramenrollment__status='active').distinct()
+    
+    # Apply gender filter
+    gender_filter = request.GET.get('gender', '')
+    if gender_filter:
+        queryset = queryset.filter(gender=gender_filter)
+    
+    # Apply program manager filter
+    if manager_filter:
+        queryset = queryset.filter(
+            clientprogramenrollment__program__manager_assignments__staff_id=manager_filter,
+            clientprogramenrollment__program__manager_assignments__is_active=True
+        ).distinct()
+    
+    # Enrollments and their programs are prefetched per chunk of clients
+    queryset = queryset.prefetch_related(
+        Prefetch('clientprogramenrollment_set', queryset=ClientProgramEnrollment.objects.select_related('program'))
+    )
+    
+    def rows():
+        for client in iter_queryset(queryset):
             # Get contact information from JSON field
             contact_info = client.contact_information or {}
             phone = contact_info.get('phone', '') if contact_info else ''
             email = contact_info.get('email', '') if contact_info else ''
-            
+        
             # Get program enrollment information
-            enrollments = client.clientprogramenrollment_set.all()
+            enrollments = client.clientprogramenrollment_set.all()  # prefetched with their programs
             program_names = []
             program_statuses = []
             start_dates = []
             end_dates = []
-            
+        
             for enrollment in enrollments:
                 program_names.append(enrollment.program.name if enrollment.program else 'Unknown Program')
                 program_statuses.append(enrollment.status)
                 start_dates.append(enrollment.start_date.strftime('%Y-%m-%d') if enrollment.start_date else 'null')
                 end_dates.append(enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else 'null')
-            
-            writer.writerow([
+        
+            yield [
                 client.first_name or 'null',
                 client.last_name or 'null',
                 client.preferred_name or 'null',
@@ -10569,9 +9853,69 @@ def export_clients(request):
                 client.updated_by or 'null',
                 client.created_at.strftime('%Y-%m-%d %H:%M:%S') if client.created_at else 'null',
                 client.updated_at.strftime('%Y-%m-%d %H:%M:%S') if client.updated_at else 'null'
-            ])
+            ]
+    
+    # Header row with all fields from client detail view
+    return CSVExport('clients_export.csv', rows(), header=[
+        'First Name',
+        'Last Name',
+        'Preferred Name',
+        'Alias',
+        'Date of Birth',
+        'Gender',
+        'Sexual Orientation',
+        'Citizenship Status',
+        'Indigenous Status',
+        'Country of Birth',
+        'Languages Spoken',
+        'Ethnicity',
+        'Phone',
+        'Work Phone',
+        'Alternative Phone',
+        'Email',
+        'Permission to Phone',
+        'Permission to Email',
+        'Address Line 2',
+        'Addresses (JSON)',
+        'Contact Information (JSON)',
+        'Primary Diagnosis',
+        'Medical Conditions',
+        'Support Workers (JSON)',
+        'Next of Kin (JSON)',
+        'Emergency Contact (JSON)',
+        'Program Enrollments',
+        'Program Status',
+        'Program Start Dates',
+        'Program End Dates',
+        'Comments',
+        'Profile Picture URL',
+        'Image URL',
+        'External UID',
+        'Updated By',
+        'Created Date',
+        'Updated Date'
+    ])
+
+
+def export_clients(request):
+    """Export clients to CSV with current filters applied"""
+    try:
+        # Check permissions first
+        if request.user.is_authenticated:
+            try:
+                staff = request.user.staff_profile
+                role_names = get_principal(request.user).role_names
+                
+                # Manager role users cannot export clients
+                if 'Manager' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
+                    messages.error(request, 'You do not have permission to export clients. Contact your administrator.')
+                    return redirect('clients:list')
+            except Exception:
+                pass
         
-        return response
+        if wants_background_export(request):
+            return export_job_response(request, 'clients')
+        return build_client_export(request).as_response(request)
         
     except Exception as e:
         print(f"Error in export_clients: {str(e)}")
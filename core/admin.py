@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    Department, Role, Staff, StaffRole, Program, SubProgram, ProgramStaff,
+    Department, Role, Staff, StaffRole, Program, ProgramAlias, SubProgram, ProgramStaff,
     Client, ClientProgramEnrollment, Intake, Discharge, ServiceRestriction,
     AuditLog, EmailRecipient, EmailLog, ServiceRestrictionNotificationSubscription,
     Notification
@@ -46,6 +46,14 @@ class ProgramAdmin(admin.ModelAdmin):
     readonly_fields = ['external_id', 'created_at', 'updated_at']
 
 
+@admin.register(ProgramAlias)
+class ProgramAliasAdmin(admin.ModelAdmin):
+    list_display = ['alias', 'program', 'source', 'use_count', 'last_used_at']
+    search_fields = ['alias', 'program__name']
+    list_filter = ['source']
+    readonly_fields = ['external_id', 'created_at', 'updated_at', 'use_count', 'last_used_at']
+
+
 @admin.register(SubProgram)
 class SubProgramAdmin(admin.ModelAdmin):
     list_display = ['name', 'program', 'is_active', 'created_at']
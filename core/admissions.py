@@ -0,0 +1,153 @@
+"""
+Batch admission of clients into a program.
+
+Bulk enrollment from the program page loaded each selected client, ran
+``Program.can_enroll_client`` for it (restriction, capacity and
+existing-enrollment queries), created the enrollment and its audit entry,
+one client at a time. ``admit_clients`` admits a whole selection with a
+fixed number of queries:
+
+1. the clients, in one ``in_bulk``
+2. their active restrictions, global or for the program, in one query
+3. the program's capacity on the start date (core.capacity)
+4. their enrollments in the program active on the start date, in one query
+
+Clients are then decided in the order given, with the same checks and
+messages as ``can_enroll_client``: a restriction, then a full program, then
+an existing enrollment. Every admitted client takes one of the remaining
+spots, so the program fills up exactly as it did one create at a time. The
+admitted enrollments are written with one ``bulk_create`` and their audit
+entries with one buffered insert. The program row is locked for the
+transaction, so concurrent admissions into it are allocated one after the
+other.
+"""
+import logging
+from typing import Iterable, List
+
+from django.db import transaction
+from django.db.models import Q
+
+from .audit import audit_buffer
+from .capacity import active_on, get_program_capacity
+from .client_scope import invalidate_scope_keys
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import Client, ClientProgramEnrollment, Program, ServiceRestriction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+class AdmissionDecision:
+    """Whether one requested client was admitted; ``client`` is None when the id does not exist."""
+
+    __slots__ = ('client_id', 'client', 'accepted', 'reason', 'enrollment')
+
+    def __init__(self, client_id, client=None, accepted=False, reason='', enrollment=None):
+        self.client_id = client_id
+        self.client = client
+        self.accepted = accepted
+        self.reason = reason
+        self.enrollment = enrollment
+
+    def __repr__(self):
+        return f"<AdmissionDecision client={self.client_id} {'accepted' if self.accepted else 'rejected'}>"
+
+
+def _client_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_blocking_restrictions(program, client_ids, start_date):
+    """``{client_id: restriction}``: the first global restriction, else the first for ``program``, active on ``start_date``."""
+    restrictions = (
+        ServiceRestriction.objects
+        .filter(client_id__in=client_ids, is_archived=False, start_date__lte=start_date)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=start_date))
+        .filter(Q(scope='org') | Q(scope='program', program=program))
+        .order_by('pk')
+    )
+    blocking = {}
+    for restriction in restrictions:
+        current = blocking.get(restriction.client_id)
+        if current is None or (current.scope != 'org' and restriction.scope == 'org'):
+            blocking[restriction.client_id] = restriction
+    return blocking
+
+
+def admit_clients(program, client_ids: Iterable, start_date, user, source='program_detail_page') -> List[AdmissionDecision]:
+    """
+    Enroll the clients (ids, in order) in ``program`` from ``start_date``
+    where ``can_enroll_client`` would allow it; returns one decision per id.
+    """
+    created_by = user.get_full_name() or user.username
+    requested = [(client_id, _client_pk(client_id)) for client_id in client_ids]
+    pks = {pk for _, pk in requested if pk is not None}
+
+    with transaction.atomic():
+        list(Program.objects.select_for_update().filter(pk=program.pk).values_list('pk', flat=True))
+        clients = Client.objects.in_bulk(pks)
+        restrictions = get_blocking_restrictions(program, list(clients), start_date)
+        enrolled = set(
+            ClientProgramEnrollment.objects
+            .filter(program=program, client_id__in=list(clients), is_archived=False)
+            .filter(active_on(start_date))
+            .order_by()
+            .values_list('client_id', flat=True)
+        )
+        capacity = None if program.no_capacity_limit else get_program_capacity(program, start_date)
+        occupied = capacity.current_enrollments if capacity is not None else 0
+
+        decisions = []
+        admitted = []
+        for client_id, pk in requested:
+            client = clients.get(pk)
+            decision = AdmissionDecision(client_id, client)
+            decisions.append(decision)
+            if client is None:
+                decision.reason = 'Client not found.'
+            elif pk in restrictions:
+                decision.reason = program.restriction_message(client, restrictions[pk])
+            elif capacity is not None and capacity.has_limit and occupied >= capacity.capacity:
+                decision.reason = program.capacity_message(start_date, occupied)
+            elif pk in enrolled:
+                decision.reason = program.already_enrolled_message(start_date)
+            else:
+                decision.accepted = True
+                decision.reason = 'Client can be enrolled.'
+                decision.enrollment = ClientProgramEnrollment(
+                    client=client,
+                    program=program,
+                    start_date=start_date,
+                    status='active',
+                    created_by=created_by,
+                    updated_by=created_by,
+                )
+                admitted.append(decision.enrollment)
+                enrolled.add(pk)
+                # Open-ended from the start date: occupies a spot on it
+                occupied += 1
+
+        if admitted:
+            ClientProgramEnrollment.objects.bulk_create(admitted, batch_size=BATCH_SIZE)
+            with audit_buffer(user) as audit:
+                for enrollment in admitted:
+                    audit.add('Enrollment', enrollment.external_id, 'create', {
+                        'client': str(enrollment.client),
+                        'program': str(program),
+                        'start_date': str(enrollment.start_date),
+                        'status': enrollment.status,
+                        'created_by': enrollment.created_by,
+                        'source': source,
+                    })
+            # bulk_create skips the signals that maintain the visibility sets and dashboard counters
+            invalidate_scope_keys(program_ids=[program.pk], staff_names=[created_by])
+            transaction.on_commit(invalidate_dashboard_stats)
+
+    logger.info(
+        f"Admitted {len(admitted)} of {len(decisions)} client(s) into program {program.pk} from {start_date}"
+    )
+    return decisions
@@ -9,6 +9,8 @@ from django.core.exceptions import ValidationError
 from django.db import transaction
 import logging
 from .models import User, Staff, Role, Department
+from .caching import get_cache_stats
+from .identity import get_identity_cache_stats
 from .serializers import UserSerializer, StaffSerializer
 
 # Set up logging
@@ -287,6 +289,12 @@ def logout(request):
         else:
             logger.warning("No refresh token provided in logout request")
         
+        # The access token in the cookie stops authenticating now rather than at its expiry
+        access_token = request.COOKIES.get('access_token')
+        if access_token:
+            from core.identity import revoke_token
+            revoke_token(access_token)
+        
         logger.info("Logout completed successfully")
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
         
@@ -335,6 +343,9 @@ def debug_info(request):
             },
             'roles': roles,
             'departments': departments,
+            # JWT identity cache lookups of this worker process
+            'identity_cache': get_identity_cache_stats(),
+            'cache': get_cache_stats(),
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -0,0 +1,312 @@
+"""
+Buffered audit log writer.
+
+``create_audit_log`` used to look up the actor's staff profile and insert one
+``AuditLog`` row per call, which adds two queries per item to every loop that
+audits (bulk enrollment, bulk archive, maintenance commands). Code that writes
+many entries opens a buffer instead::
+
+    with audit_buffer(request.user) as audit:
+        for enrollment in enrollments:
+            audit.add('Enrollment', enrollment.external_id, 'archive', diff_data)
+
+While a buffer is open on the current thread, ``create_audit_log`` adds to it
+too, so existing call sites are batched without changes. Each actor is
+resolved once per buffer (through the cached principal for users) and the
+entries are written with ``bulk_create`` once the surrounding transaction
+commits - entries of a rolled-back transaction are dropped along with the
+rows they describe, as before.
+
+``AUDIT_LOG_WRITER = 'queue'`` hands flushed batches to a background thread
+instead of inserting them on the request thread. ``get_audit_writer_stats()``
+reports entries written, flushes and flush latency for this process.
+
+Every write also adds to ``AuditLogDailyCount`` (entries per local day,
+entity and action), which the audit log browser sums instead of counting the
+log itself. Retention deletes call ``rebuild_audit_log_counts`` for the days
+they touched.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Entries held by a buffer before a batch is scheduled
+AUDIT_BUFFER_MAX_ENTRIES = 1000
+
+_local = threading.local()
+_UNSET = object()
+
+
+class AuditWriterStats:
+    """Process-wide counters for audit log writes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.entries_written = 0
+            self.entries_failed = 0
+            self.flushes = 0
+            self.total_flush_seconds = 0.0
+            self.max_flush_seconds = 0.0
+            self.last_flush_seconds = 0.0
+
+    def record_flush(self, entries, seconds, failed=False):
+        with self._lock:
+            if failed:
+                self.entries_failed += entries
+            else:
+                self.entries_written += entries
+            self.flushes += 1
+            self.total_flush_seconds += seconds
+            self.last_flush_seconds = seconds
+            self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'entries_written': self.entries_written,
+                'entries_failed': self.entries_failed,
+                'flushes': self.flushes,
+                'last_flush_seconds': round(self.last_flush_seconds, 6),
+                'max_flush_seconds': round(self.max_flush_seconds, 6),
+                'average_flush_seconds': round(self.total_flush_seconds / self.flushes, 6) if self.flushes else 0.0,
+            }
+
+
+stats = AuditWriterStats()
+
+
+def get_audit_writer_stats():
+    return stats.as_dict()
+
+
+def get_audit_writer_mode():
+    return getattr(settings, 'AUDIT_LOG_WRITER', 'sync')
+
+
+def resolve_staff_id(changed_by):
+    """Staff id for a user, a Staff instance or None, the way ``create_audit_log`` has always matched it."""
+    from .models import Staff
+    from .principal import get_principal
+
+    if changed_by is None:
+        return None
+    if isinstance(changed_by, Staff):
+        return changed_by.pk
+    try:
+        return get_principal(changed_by).staff_id
+    except Exception as e:
+        logger.error(f"Error resolving audit actor {changed_by!r}: {e}")
+        return None
+
+
+def record_audit_log_counts(audit_logs):
+    """Add written entries to the per-day/entity/action counters, one upsert per distinct key."""
+    from .models import AuditLogDailyCount
+
+    counts = Counter(
+        (timezone.localdate(audit_log.changed_at), audit_log.entity, audit_log.action) for audit_log in audit_logs
+    )
+    for (day, entity, action), count in counts.items():
+        lookup = {'day': day, 'entity': entity, 'action': action}
+        try:
+            with transaction.atomic():
+                if not AuditLogDailyCount.objects.filter(**lookup).update(count=F('count') + count):
+                    AuditLogDailyCount.objects.create(count=count, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            AuditLogDailyCount.objects.filter(**lookup).update(count=F('count') + count)
+        except Exception as e:
+            logger.error(f"Error updating audit log counts for {day} {entity} {action}: {e}")
+
+
+def rebuild_audit_log_counts(start_day=None, end_day=None):
+    """Recount the counters for local days in ``[start_day, end_day]`` (open ends allowed) from the log."""
+    from .models import AuditLog, AuditLogDailyCount
+
+    counters = AuditLogDailyCount.objects.all()
+    logs = AuditLog.objects.all()
+    if start_day is not None:
+        counters = counters.filter(day__gte=start_day)
+        logs = logs.filter(changed_at__gte=timezone.make_aware(datetime.combine(start_day, datetime.min.time())))
+    if end_day is not None:
+        counters = counters.filter(day__lte=end_day)
+        logs = logs.filter(
+            changed_at__lt=timezone.make_aware(datetime.combine(end_day + timedelta(days=1), datetime.min.time()))
+        )
+
+    rows = (
+        logs.order_by()
+        .annotate(day=TruncDate('changed_at'))
+        .values('day', 'entity', 'action')
+        .annotate(total=Count('id'))
+    )
+    with transaction.atomic():
+        counters.delete()
+        AuditLogDailyCount.objects.bulk_create([
+            AuditLogDailyCount(day=row['day'], entity=row['entity'], action=row['action'], count=row['total'])
+            for row in rows
+        ])
+
+
+def write_audit_logs(audit_logs):
+    """Insert a batch of unsaved AuditLog rows with one ``bulk_create``; failures are logged, not raised."""
+    from .models import AuditLog
+
+    if not audit_logs:
+        return []
+    started = time.monotonic()
+    try:
+        with transaction.atomic():
+            written = AuditLog.objects.bulk_create(audit_logs)
+    except Exception as e:
+        stats.record_flush(len(audit_logs), time.monotonic() - started, failed=True)
+        logger.error(f"Error creating {len(audit_logs)} AuditLog entries: {e}")
+        return []
+    stats.record_flush(len(written), time.monotonic() - started)
+    record_audit_log_counts(written)
+    return written
+
+
+class AuditBuffer:
+    """Audit entries collected for one request or job, written in batches on commit."""
+
+    def __init__(self, changed_by=None, max_entries=AUDIT_BUFFER_MAX_ENTRIES):
+        self.changed_by = changed_by
+        self.max_entries = max_entries
+        self.entries = []
+        self._staff_ids = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _staff_id(self, changed_by):
+        key = (type(changed_by), getattr(changed_by, 'pk', None))
+        if key not in self._staff_ids:
+            self._staff_ids[key] = resolve_staff_id(changed_by)
+        return self._staff_ids[key]
+
+    def add(self, entity_name, entity_id, action, diff_data=None, changed_by=_UNSET):
+        """Queue one entry; ``changed_by`` defaults to the buffer's actor. Returns the unsaved AuditLog."""
+        from .models import AuditLog
+
+        if changed_by is _UNSET:
+            changed_by = self.changed_by
+        audit_log = AuditLog(
+            entity=entity_name,
+            entity_id=entity_id,
+            action=action,
+            changed_by_id=self._staff_id(changed_by),
+            diff_json=diff_data or {},
+        )
+        self.entries.append(audit_log)
+        if len(self.entries) >= self.max_entries:
+            self.flush()
+        return audit_log
+
+    def flush(self):
+        """Schedule the buffered entries to be written once the current transaction commits."""
+        batch, self.entries = self.entries, []
+        if batch:
+            transaction.on_commit(lambda: dispatch_audit_logs(batch))
+
+    def __enter__(self):
+        stack = getattr(_local, 'buffers', None)
+        if stack is None:
+            stack = _local.buffers = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.buffers.pop()
+        self.flush()
+        return False
+
+
+def audit_buffer(changed_by=None, max_entries=AUDIT_BUFFER_MAX_ENTRIES):
+    """Open a buffer that collects ``create_audit_log`` calls on this thread until the block exits."""
+    return AuditBuffer(changed_by, max_entries=max_entries)
+
+
+def get_active_audit_buffer():
+    stack = getattr(_local, 'buffers', None)
+    return stack[-1] if stack else None
+
+
+def create_audit_log(entity_name, entity_id, action, changed_by=None, diff_data=None):
+    """Buffer the entry when a buffer is open, otherwise write it now. Returns the AuditLog or None."""
+    from .models import AuditLog
+
+    buffer = get_active_audit_buffer()
+    if buffer is not None:
+        return buffer.add(entity_name, entity_id, action, diff_data, changed_by=changed_by)
+
+    started = time.monotonic()
+    try:
+        audit_log = AuditLog.objects.create(
+            entity=entity_name,
+            entity_id=entity_id,
+            action=action,
+            changed_by_id=resolve_staff_id(changed_by),
+            diff_json=diff_data or {},
+        )
+    except Exception as e:
+        stats.record_flush(1, time.monotonic() - started, failed=True)
+        logger.error(f"Error creating AuditLog: {e}")
+        return None
+    stats.record_flush(1, time.monotonic() - started)
+    record_audit_log_counts([audit_log])
+    return audit_log
+
+
+# Background writer for AUDIT_LOG_WRITER = 'queue'
+_queue = queue.Queue()
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def _run_worker():
+    while True:
+        batch = _queue.get()
+        try:
+            close_old_connections()
+            write_audit_logs(batch)
+        finally:
+            connections.close_all()
+            _queue.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='audit-log-writer', daemon=True)
+            _worker.start()
+
+
+def dispatch_audit_logs(batch):
+    """Write a committed batch now, or hand it to the background writer in queue mode."""
+    if get_audit_writer_mode() == 'queue':
+        _ensure_worker()
+        _queue.put(batch)
+    else:
+        write_audit_logs(batch)
+
+
+def wait_for_audit_queue():
+    """Block until the background writer has written every queued batch."""
+    _queue.join()
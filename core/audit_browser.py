@@ -0,0 +1,116 @@
+"""
+Audit log browsing: keyset pagination and counter-based statistics.
+
+The audit log list used OFFSET pagination over ``-changed_at`` (deep pages
+read and discard every row before them) and ran four COUNTs over the filtered
+log on each page view. Here pages are cut by a cursor on ``(changed_at, id)``
+- each page is an index range scan from the cursor, however deep - and the
+event totals are sums over ``AuditLogDailyCount``, which the audit writer
+keeps per local day, entity and action (see core.audit).
+
+Cursors are opaque url-safe strings of ``changed_at|id``.
+"""
+import base64
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from django.db.models import Q, Sum
+
+from .models import AuditLogDailyCount
+
+logger = logging.getLogger(__name__)
+
+# Actions shown as separate totals in the audit log header
+COUNTED_ACTIONS = ('create', 'update', 'delete')
+
+
+def encode_cursor(audit_log) -> str:
+    raw = f"{audit_log.changed_at.isoformat()}|{audit_log.pk}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(changed_at, id)`` for a cursor, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        changed_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(changed_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    """One page of audit logs, newest first, with cursors to the neighbouring pages."""
+    object_list: List = field(default_factory=list)
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_page(queryset, per_page, after=None, before=None) -> KeysetPage:
+    """
+    The ``per_page`` entries of ``queryset`` (newest first) that come right
+    after the ``after`` cursor, right before the ``before`` cursor, or first.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key is not None:
+        changed_at, pk = before_key
+        rows = list(
+            queryset.filter(Q(changed_at__gt=changed_at) | Q(changed_at=changed_at, id__gt=pk))
+            .order_by('changed_at', 'id')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after_key is not None:
+            changed_at, pk = after_key
+            queryset = queryset.filter(Q(changed_at__lt=changed_at) | Q(changed_at=changed_at, id__lt=pk))
+        rows = list(queryset.order_by('-changed_at', '-id')[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after_key is not None
+
+    return KeysetPage(
+        object_list=rows,
+        has_next=has_next and bool(rows),
+        has_previous=has_previous and bool(rows),
+        next_cursor=encode_cursor(rows[-1]) if rows else None,
+        previous_cursor=encode_cursor(rows[0]) if rows else None,
+    )
+
+
+def get_audit_log_stats(start_day=None, end_day=None, entity=None):
+    """Total and per-action event counts for local days in ``[start_day, end_day]`` and an optional entity."""
+    counters = AuditLogDailyCount.objects.all()
+    if start_day is not None:
+        counters = counters.filter(day__gte=start_day)
+    if end_day is not None:
+        counters = counters.filter(day__lte=end_day)
+    if entity:
+        counters = counters.filter(entity=entity)
+
+    by_action = dict(counters.order_by().values('action').annotate(total=Sum('count')).values_list('action', 'total'))
+    stats = {'total_events': sum(by_action.values())}
+    for action in COUNTED_ACTIONS:
+        stats[f'{action}_events'] = by_action.get(action, 0)
+    return stats
+
+
+def get_audit_entities():
+    """Entities that have audit log entries, for the filter dropdown."""
+    return sorted(AuditLogDailyCount.objects.filter(count__gt=0).values_list('entity', flat=True).distinct())
@@ -0,0 +1,285 @@
+"""
+Time-partitioned audit log storage (PostgreSQL).
+
+On PostgreSQL ``audit_logs`` is a table partitioned by range on
+``changed_at``, one partition per day by default
+(``AUDIT_LOG_PARTITION_INTERVAL`` = 'day', 'week' or 'month'), named
+``audit_logs_pYYYYMMDD`` after the UTC date the partition starts. A default
+partition catches rows outside every range, so inserts never fail if the
+partitions were not created ahead of time.
+
+Retention removes whole partitions: ``drop_expired_partitions`` drops (or
+detaches, to archive them elsewhere) every partition whose range ends before
+the cutoff, which is instant and leaves no dead rows to vacuum. Rows younger
+than the partition grain, and shorter per-action retention such as the 7 days
+kept for 'delete' entries, are still removed with a plain DELETE - that now
+only touches the newest partitions.
+
+``python manage.py manage_audit_partitions`` creates upcoming partitions and
+drops expired ones; ``cleanup_old_audit_logs`` and the "clear old logs"
+action drop expired partitions before deleting what is left. Queries that
+filter ``changed_at`` with a range (as the audit log list does) only scan the
+matching partitions.
+
+The partition key has to be part of every unique constraint, so on
+PostgreSQL the primary key is ``(id, changed_at)`` and ``external_id`` is
+unique together with ``changed_at``. Other databases keep the plain table and
+every function here is a no-op.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+AUDIT_LOG_TABLE = 'audit_logs'
+DEFAULT_PARTITION = f'{AUDIT_LOG_TABLE}_default'
+PARTITION_INTERVALS = ('day', 'week', 'month')
+
+# Days of partitions created ahead of today
+DEFAULT_PARTITIONS_AHEAD = 7
+
+_BOUND_RE = re.compile(r"FROM \((?P<lower>.+?)\) TO \((?P<upper>.+?)\)")
+
+
+@dataclass
+class AuditLogPartition:
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+    is_default: bool = False
+
+
+def get_partition_interval():
+    interval = getattr(settings, 'AUDIT_LOG_PARTITION_INTERVAL', 'day')
+    if interval not in PARTITION_INTERVALS:
+        raise ValueError(f"AUDIT_LOG_PARTITION_INTERVAL must be one of {PARTITION_INTERVALS}, not {interval!r}")
+    return interval
+
+
+def is_postgresql(connection=None):
+    return (connection or default_connection).vendor == 'postgresql'
+
+
+def is_partitioned(connection=None):
+    connection = connection or default_connection
+    if not is_postgresql(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [AUDIT_LOG_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def partition_start(day: date, interval: str) -> date:
+    """First day of the partition holding ``day``."""
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_partition_start(start: date, interval: str) -> date:
+    if interval == 'week':
+        return start + timedelta(days=7)
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(start: date) -> str:
+    return f"{AUDIT_LOG_TABLE}_p{start:%Y%m%d}"
+
+
+def _utc_bound(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value.upper() == 'MINVALUE' or value.upper() == 'MAXVALUE':
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def list_partitions(connection=None) -> List[AuditLogPartition]:
+    """Partitions of the audit log table with their ``changed_at`` ranges, oldest first."""
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [AUDIT_LOG_TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or '')
+        if match is None:
+            partitions.append(AuditLogPartition(name, None, None, is_default=True))
+            continue
+        partitions.append(AuditLogPartition(name, _parse_bound(match['lower']), _parse_bound(match['upper'])))
+    oldest = datetime.min.replace(tzinfo=dt_timezone.utc)
+    return sorted(partitions, key=lambda partition: (partition.is_default, partition.lower or oldest))
+
+
+def _overlaps(partitions, lower, upper):
+    for partition in partitions:
+        if partition.is_default:
+            continue
+        if (partition.upper is None or lower < partition.upper) and (partition.lower is None or partition.lower < upper):
+            return True
+    return False
+
+
+def create_partition(start: date, end: date, connection=None):
+    connection = connection or default_connection
+    name = partition_name(start)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(AUDIT_LOG_TABLE)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [_utc_bound(start), _utc_bound(end)],
+        )
+    return name
+
+
+def ensure_partitions(ahead_days=DEFAULT_PARTITIONS_AHEAD, from_date=None, dry_run=False, connection=None):
+    """Create the partitions covering ``from_date`` (default today) through ``ahead_days`` later."""
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    interval = get_partition_interval()
+    today = from_date or timezone.now().astimezone(dt_timezone.utc).date()
+    existing = list_partitions(connection)
+
+    created = []
+    start = partition_start(today, interval)
+    while start <= today + timedelta(days=ahead_days):
+        end = next_partition_start(start, interval)
+        if not _overlaps(existing, _utc_bound(start), _utc_bound(end)):
+            if not dry_run:
+                create_partition(start, end, connection)
+            created.append(partition_name(start))
+        start = end
+    if created:
+        logger.info(f"Created audit log partitions: {', '.join(created)}")
+    return created
+
+
+def get_expired_partitions(cutoff: datetime, connection=None) -> List[AuditLogPartition]:
+    """Partitions whose whole range lies before ``cutoff``."""
+    return [
+        partition for partition in list_partitions(connection)
+        if not partition.is_default and partition.upper is not None and partition.upper <= cutoff
+    ]
+
+
+def drop_expired_partitions(cutoff: datetime, detach=False, dry_run=False, connection=None):
+    """
+    Drop (or detach, leaving a standalone table) every partition that ends
+    before ``cutoff``. Returns ``[(partition name, row count)]``.
+    """
+    connection = connection or default_connection
+    quote = connection.ops.quote_name
+    dropped = []
+    for partition in get_expired_partitions(cutoff, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {quote(partition.name)}")
+            rows = cursor.fetchone()[0]
+            if not dry_run:
+                if detach:
+                    cursor.execute(f"ALTER TABLE {quote(AUDIT_LOG_TABLE)} DETACH PARTITION {quote(partition.name)}")
+                else:
+                    cursor.execute(f"DROP TABLE {quote(partition.name)}")
+        dropped.append((partition.name, rows))
+        logger.info(f"{'Detached' if detach else 'Dropped'} audit log partition {partition.name} ({rows} rows)")
+    return dropped
+
+
+def convert_to_partitioned(connection, staff_table='staff'):
+    """
+    Rebuild the plain ``audit_logs`` table as a partitioned one: existing rows
+    go into a single partition ending today, followed by partitions for the
+    days ahead and a default partition.
+    """
+    quote = connection.ops.quote_name
+    table = quote(AUDIT_LOG_TABLE)
+    legacy = quote(f'{AUDIT_LOG_TABLE}_unpartitioned')
+    sequence = f'{AUDIT_LOG_TABLE}_partitioned_id_seq'
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    interval = get_partition_interval()
+    first_start = partition_start(today, interval)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+        cursor.execute(
+            f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (changed_at)"
+        )
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {table}.id")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_id_changed_at_pk PRIMARY KEY (id, changed_at)")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_external_id_changed_at_uniq UNIQUE (external_id, changed_at)")
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_changed_by_id_fk FOREIGN KEY (changed_by_id) "
+            f"REFERENCES {quote(staff_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        for column in ('entity', 'entity_id', 'action', 'changed_by_id', 'changed_at'):
+            cursor.execute(f"CREATE INDEX {quote(f'audit_logs_{column}_idx')} ON {table} ({quote(column)})")
+
+        # Everything already logged lands in one partition that retention drops as a whole
+        cursor.execute(
+            f"CREATE TABLE {quote(partition_name(first_start) + '_before')} PARTITION OF {table} "
+            f"FOR VALUES FROM (MINVALUE) TO (%s)",
+            [_utc_bound(first_start)],
+        )
+        cursor.execute(f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT")
+        start = first_start
+        while start <= today + timedelta(days=DEFAULT_PARTITIONS_AHEAD):
+            end = next_partition_start(start, interval)
+            create_partition(start, end, connection)
+            start = end
+
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {legacy}")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+        cursor.execute(f"DROP TABLE {legacy}")
+
+
+def convert_to_plain(connection, staff_table='staff'):
+    """Undo ``convert_to_partitioned``: copy every partition back into a plain table."""
+    quote = connection.ops.quote_name
+    table = quote(AUDIT_LOG_TABLE)
+    partitioned = quote(f'{AUDIT_LOG_TABLE}_partitioned')
+    sequence = f'{AUDIT_LOG_TABLE}_partitioned_id_seq'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {partitioned}")
+        cursor.execute(f"CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)")
+        cursor.execute(f"ALTER SEQUENCE {quote(sequence)} OWNED BY {table}.id")
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {partitioned}")
+        cursor.execute(f"DROP TABLE {partitioned} CASCADE")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_id_pk PRIMARY KEY (id)")
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_external_id_uniq UNIQUE (external_id)")
+        cursor.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT audit_logs_changed_by_id_fk FOREIGN KEY (changed_by_id) "
+            f"REFERENCES {quote(staff_table)} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        for column in ('entity', 'entity_id', 'action', 'changed_by_id', 'changed_at'):
+            cursor.execute(f"CREATE INDEX {quote(f'audit_logs_{column}_idx')} ON {table} ({quote(column)})")
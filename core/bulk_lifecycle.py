@@ -0,0 +1,286 @@
+"""
+Set-based archive and restore for bulk selections.
+
+The bulk archive/restore endpoints used to walk their selection row by row:
+an audit entry, a ``save()`` and, for clients, departments and programs, a
+COUNT plus a save per dependent enrollment and restriction. The functions here
+archive or restore a whole selection with a few ``UPDATE ... WHERE id IN``
+statements and write the audit entries through one audit buffer
+(core.audit), flushed with a single ``bulk_create`` on commit:
+
+- clients: the clients, their live enrollments and their live restrictions
+- departments: the departments, their live programs and those programs'
+  live enrollments
+- programs: the programs and their live enrollments
+- enrollments and restrictions: just the selected rows
+
+Restoring never brings dependents back, as before. Queryset updates bypass
+the model signals, so every call drops the cached client scopes and dashboard
+counters itself once the transaction commits.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .audit import audit_buffer
+from .client_scope import get_staff_name, invalidate_client_scopes
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import Client, ClientProgramEnrollment, Department, Program, ServiceRestriction
+
+logger = logging.getLogger(__name__)
+
+
+def get_changed_by_name(user):
+    """Name written to updated_by and to the audit entries for bulk changes."""
+    if user is None or not user.is_authenticated:
+        return 'System'
+    return get_staff_name(user)
+
+
+def audit_selection(entity_name, action, user, diff_by_entity_id):
+    """One audit entry per ``{external_id: diff_data}`` item, written in a single insert on commit."""
+    with audit_buffer(user) as audit:
+        for entity_id, diff_data in diff_by_entity_id.items():
+            audit.add(entity_name, entity_id, action, diff_data)
+
+
+def _invalidate_caches_on_commit():
+    transaction.on_commit(invalidate_client_scopes)
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def _archive(queryset, archived_at, updated_by=None):
+    values = {'is_archived': True, 'archived_at': archived_at, 'updated_at': archived_at}
+    if updated_by is not None:
+        values['updated_by'] = updated_by
+    return queryset.update(**values)
+
+
+def _restore(queryset, updated_by=None):
+    values = {'is_archived': False, 'archived_at': None, 'updated_at': timezone.now()}
+    if updated_by is not None:
+        values['updated_by'] = updated_by
+    return queryset.update(**values)
+
+
+def _enrollment_diff(enrollment):
+    return {
+        'client': str(enrollment.client),
+        'program': str(enrollment.program),
+        'start_date': str(enrollment.start_date),
+        'end_date': str(enrollment.end_date) if enrollment.end_date else None,
+        'status': enrollment.status,
+    }
+
+
+def archive_clients(clients, user):
+    """Archive the clients with their live enrollments and restrictions; returns the three counts."""
+    user_name = get_changed_by_name(user)
+    archived_at = timezone.now()
+    clients = list(clients.only('id', 'external_id', 'first_name', 'last_name', 'client_id'))
+    client_ids = [client.pk for client in clients]
+
+    with transaction.atomic():
+        audit_selection('Client', 'archive', user, {
+            client.external_id: {
+                'first_name': client.first_name,
+                'last_name': client.last_name,
+                'client_id': client.client_id or '',
+                'archived_by': user_name,
+            }
+            for client in clients
+        })
+        enrollments_archived = _archive(
+            ClientProgramEnrollment.objects.filter(client_id__in=client_ids, is_archived=False), archived_at, user_name
+        )
+        restrictions_archived = _archive(
+            ServiceRestriction.objects.filter(client_id__in=client_ids, is_archived=False), archived_at, user_name
+        )
+        clients_archived = _archive(Client.objects.filter(id__in=client_ids), archived_at, user_name)
+        _invalidate_caches_on_commit()
+
+    return {
+        'clients': clients_archived,
+        'enrollments': enrollments_archived,
+        'restrictions': restrictions_archived,
+    }
+
+
+def restore_clients(clients, user):
+    """Restore the clients (not their enrollments or restrictions); returns the number restored."""
+    user_name = get_changed_by_name(user)
+    clients = list(clients.only('id', 'external_id', 'first_name', 'last_name', 'client_id'))
+
+    with transaction.atomic():
+        audit_selection('Client', 'restore', user, {
+            client.external_id: {
+                'first_name': client.first_name,
+                'last_name': client.last_name,
+                'client_id': client.client_id or '',
+                'restored_by': user_name,
+            }
+            for client in clients
+        })
+        restored = _restore(Client.objects.filter(id__in=[client.pk for client in clients]), user_name)
+        _invalidate_caches_on_commit()
+    return restored
+
+
+def archive_enrollments(enrollments, user):
+    """Archive the enrollments; returns the number archived."""
+    user_name = get_changed_by_name(user)
+    enrollments = list(enrollments.select_related('client', 'program__department'))
+
+    with transaction.atomic():
+        audit_selection('Enrollment', 'archive', user, {
+            enrollment.external_id: {**_enrollment_diff(enrollment), 'archived_by': user_name}
+            for enrollment in enrollments
+        })
+        archived = _archive(
+            ClientProgramEnrollment.objects.filter(id__in=[enrollment.pk for enrollment in enrollments]),
+            timezone.now(),
+            user_name,
+        )
+        _invalidate_caches_on_commit()
+    return archived
+
+
+def restore_enrollments(enrollments, user):
+    """Restore the enrollments; returns ``"First Last - Program"`` for each restored enrollment."""
+    user_name = get_changed_by_name(user)
+    enrollments = list(enrollments.select_related('client', 'program__department'))
+
+    restored_items = []
+    diff_by_entity_id = {}
+    for enrollment in enrollments:
+        enrollment_name = f"{enrollment.client.first_name} {enrollment.client.last_name} - {enrollment.program.name}"
+        restored_items.append(enrollment_name)
+        diff_by_entity_id[enrollment.external_id] = {
+            **_enrollment_diff(enrollment),
+            'restored_by': user_name,
+            'restored_item': enrollment_name,
+        }
+
+    with transaction.atomic():
+        audit_selection('Enrollment', 'restore', user, diff_by_entity_id)
+        _restore(ClientProgramEnrollment.objects.filter(id__in=[enrollment.pk for enrollment in enrollments]), user_name)
+        _invalidate_caches_on_commit()
+    return restored_items
+
+
+def archive_restrictions(restrictions, user):
+    """Archive the restrictions; returns the number archived."""
+    with transaction.atomic():
+        archived = _archive(restrictions.order_by(), timezone.now(), get_changed_by_name(user))
+        _invalidate_caches_on_commit()
+    return archived
+
+
+def restore_restrictions(restrictions, user):
+    """Restore the restrictions; returns the number restored."""
+    user_name = get_changed_by_name(user)
+    restrictions = list(restrictions.select_related('client'))
+
+    with transaction.atomic():
+        audit_selection('Restriction', 'restore', user, {
+            restriction.external_id: {'client': str(restriction.client), 'restored_by': user_name}
+            for restriction in restrictions
+        })
+        restored = _restore(
+            ServiceRestriction.objects.filter(id__in=[restriction.pk for restriction in restrictions]), user_name
+        )
+        _invalidate_caches_on_commit()
+    return restored
+
+
+def archive_departments(departments, user):
+    """Archive the departments with their live programs and those programs' live enrollments."""
+    user_name = get_changed_by_name(user)
+    archived_at = timezone.now()
+    departments = list(departments.select_related('owner__user'))
+    department_ids = [department.pk for department in departments]
+
+    with transaction.atomic():
+        audit_selection('Department', 'delete', user, {
+            department.external_id: {
+                'name': department.name,
+                'owner': str(department.owner) if department.owner else None,
+                'deleted_by': user_name,
+            }
+            for department in departments
+        })
+        archived = _archive(Department.objects.filter(id__in=department_ids), archived_at)
+        _archive(Program.objects.filter(department_id__in=department_ids, is_archived=False), archived_at, user_name)
+        _archive(
+            ClientProgramEnrollment.objects.filter(program__department_id__in=department_ids, is_archived=False),
+            archived_at,
+            user_name,
+        )
+        _invalidate_caches_on_commit()
+    return archived
+
+
+def restore_departments(departments, user):
+    """Restore the departments (not their programs); returns the number restored."""
+    user_name = get_changed_by_name(user)
+    departments = list(departments.only('id', 'external_id', 'name'))
+
+    with transaction.atomic():
+        audit_selection('Department', 'restore', user, {
+            department.external_id: {'name': department.name, 'restored_by': user_name}
+            for department in departments
+        })
+        restored = _restore(Department.objects.filter(id__in=[department.pk for department in departments]))
+        _invalidate_caches_on_commit()
+    return restored
+
+
+def archive_programs(programs, user, source='bulk_delete'):
+    """Archive the programs with their live enrollments; returns the number of programs archived."""
+    user_name = get_changed_by_name(user)
+    archived_at = timezone.now()
+    programs = list(programs.select_related('department'))
+    program_ids = [program.pk for program in programs]
+
+    with transaction.atomic():
+        audit_selection('Program', 'delete', user, {
+            program.external_id: {
+                'name': program.name,
+                'department': str(program.department),
+                'location': program.location or '',
+                'capacity_current': program.capacity_current,
+                'capacity_effective_date': (
+                    str(program.capacity_effective_date) if program.capacity_effective_date else None
+                ),
+                'deleted_by': user_name,
+                'source': source,
+            }
+            for program in programs
+        })
+        archived = _archive(Program.objects.filter(id__in=program_ids), archived_at, user_name)
+        _archive(
+            ClientProgramEnrollment.objects.filter(program_id__in=program_ids, is_archived=False), archived_at, user_name
+        )
+        _invalidate_caches_on_commit()
+    return archived
+
+
+def restore_programs(programs, user, source='bulk_restore'):
+    """Restore the programs (not their enrollments); returns the number restored."""
+    user_name = get_changed_by_name(user)
+    programs = list(programs.select_related('department'))
+
+    with transaction.atomic():
+        audit_selection('Program', 'restore', user, {
+            program.external_id: {
+                'name': program.name,
+                'department': str(program.department),
+                'restored_by': user_name,
+                'source': source,
+            }
+            for program in programs
+        })
+        restored = _restore(Program.objects.filter(id__in=[program.pk for program in programs]), user_name)
+        _invalidate_caches_on_commit()
+    return restored
@@ -0,0 +1,307 @@
+"""
+Two-tier cache for computed values.
+
+The principal, client-scope and dashboard caches used Django's default cache,
+and with no ``CACHES`` setting that was a separate local-memory cache in every
+gunicorn worker: a role change or a new enrollment only invalidated the
+worker that handled the write. ``CACHES`` now has two aliases:
+
+- ``default``: the shared tier, Redis when ``REDIS_URL`` is set (a
+  local-memory stand-in otherwise, e.g. in tests and development; settings
+  refuse to start without ``REDIS_URL`` when ``DEBUG`` is off)
+- ``local``: a per-process, size-bounded local-memory LRU
+
+A ``CacheNamespace`` prefixes its keys with its name and the current version
+of each invalidation group it belongs to. Bumping a group
+(``invalidate_group('dashboard')``) moves every namespace in it to new keys
+in both tiers at once, because versions are always read from the shared tier
+(one ``get_many`` per lookup). Values are looked up in the local tier first,
+then the shared tier, and copied into the local tier on a shared hit.
+Namespaces that also delete single keys (client-scope) skip the local tier,
+since other workers could not see the delete.
+
+``get_or_set`` protects expensive computations from stampedes: the first
+worker to miss takes a short lock in the shared tier and computes, the
+others wait for its value (up to ``CACHE_LOCK_TIMEOUT`` seconds) instead of
+computing it too.
+
+Hits per tier, misses, lock waits and lookup/compute time are counted per
+namespace in each process; see ``get_cache_stats()``.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_ALIAS = 'default'
+LOCAL_CACHE_ALIAS = 'local'
+
+# Backends that keep a separate copy in every process, so writes never reach the other workers
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+DEFAULT_CACHE_LOCK_TIMEOUT = 10
+LOCK_POLL_SECONDS = 0.05
+
+_MISSING = object()
+
+_stats = defaultdict(lambda: defaultdict(float))
+_stats_lock = threading.Lock()
+
+
+def shared_cache():
+    return caches[SHARED_CACHE_ALIAS]
+
+
+def shared_cache_is_process_local():
+    """Whether the shared tier is really a per-process cache (no ``REDIS_URL``, e.g. in development)."""
+    backend = settings.CACHES.get(SHARED_CACHE_ALIAS, {}).get('BACKEND', '')
+    return backend in PROCESS_LOCAL_BACKENDS
+
+
+def local_cache():
+    """The per-process tier, or ``None`` when no ``local`` alias is configured."""
+    if LOCAL_CACHE_ALIAS not in settings.CACHES:
+        return None
+    return caches[LOCAL_CACHE_ALIAS]
+
+
+def _record(namespace, **counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[namespace][name] += value
+
+
+def get_cache_stats():
+    """Per-namespace counters of this process, with hit rate and average latencies in milliseconds."""
+    with _stats_lock:
+        snapshot = {namespace: dict(counts) for namespace, counts in _stats.items()}
+    report = {}
+    for namespace, counts in sorted(snapshot.items()):
+        local_hits = int(counts.get('local_hits', 0))
+        shared_hits = int(counts.get('shared_hits', 0))
+        misses = int(counts.get('misses', 0))
+        lookups = local_hits + shared_hits + misses
+        report[namespace] = {
+            'local_hits': local_hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'lock_waits': int(counts.get('lock_waits', 0)),
+            'hit_rate': round((local_hits + shared_hits) / lookups, 4) if lookups else None,
+            'avg_lookup_ms': round(counts.get('lookup_seconds', 0) * 1000 / lookups, 3) if lookups else None,
+            'avg_compute_ms': round(counts.get('compute_seconds', 0) * 1000 / misses, 3) if misses else None,
+        }
+    return report
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def group_version_key(group):
+    return f"cache_group:{group}:version"
+
+
+def _initial_version():
+    # Milliseconds since the epoch: a version key lost to a flush or eviction restarts above every
+    # version used before it, so no stale entry (e.g. in a worker's local tier) becomes current again
+    return time.time_ns() // 1_000_000
+
+
+def get_group_versions(groups):
+    """Current version of each group, from the shared tier."""
+    groups = tuple(groups)
+    if not groups:
+        return {}
+    cache = shared_cache()
+    keys = {group_version_key(group): group for group in groups}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, group in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key) or _initial_version()
+        versions[group] = version
+    return versions
+
+
+def get_group_version(group):
+    return get_group_versions([group])[group]
+
+
+def invalidate_group(*groups):
+    """Move every namespace in the groups to new keys (in every process and both tiers)."""
+    cache = shared_cache()
+    for group in groups:
+        key = group_version_key(group)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def invalidate_group_on_commit(*groups):
+    """Invalidate once the current transaction commits, so no request re-caches the old rows."""
+    transaction.on_commit(lambda: invalidate_group(*groups))
+
+
+def get_lock_timeout():
+    return getattr(settings, 'CACHE_LOCK_TIMEOUT', DEFAULT_CACHE_LOCK_TIMEOUT)
+
+
+class CacheNamespace:
+    """
+    Keys under ``name``, invalidated with ``groups``. The timeout comes from
+    the ``timeout_setting`` setting when it is set, else ``timeout``.
+
+    ``get``/``set`` and friends each read the current group versions; code
+    that reads, computes and writes back uses ``current()`` so the value is
+    stored under the versions it was computed from, and an invalidation in
+    between leaves it unreachable instead of current.
+    """
+
+    def __init__(self, name, groups=(), timeout=300, timeout_setting=None, use_local=True):
+        self.name = name
+        self.groups = tuple(groups)
+        self.default_timeout = timeout
+        self.timeout_setting = timeout_setting
+        self.use_local = use_local
+
+    def __repr__(self):
+        return f"<CacheNamespace {self.name} groups={list(self.groups)}>"
+
+    @property
+    def timeout(self):
+        if self.timeout_setting:
+            return getattr(settings, self.timeout_setting, self.default_timeout)
+        return self.default_timeout
+
+    def current(self):
+        """The namespace at the current group versions."""
+        versions = get_group_versions(self.groups)
+        version_part = ''.join(f":{group}={versions[group]}" for group in self.groups)
+        return VersionedCache(self, f"{self.name}{version_part}")
+
+    def get_many(self, keys):
+        return self.current().get_many(keys)
+
+    def get(self, key, default=None):
+        return self.current().get(key, default)
+
+    def set_many(self, mapping, timeout=None):
+        self.current().set_many(mapping, timeout)
+
+    def set(self, key, value, timeout=None):
+        self.current().set(key, value, timeout)
+
+    def delete_many(self, keys):
+        self.current().delete_many(keys)
+
+    def delete(self, key):
+        self.current().delete(key)
+
+    def get_or_set(self, key, compute, timeout=None):
+        return self.current().get_or_set(key, compute, timeout)
+
+
+class VersionedCache:
+    """A ``CacheNamespace`` pinned to one set of group versions."""
+
+    def __init__(self, namespace, prefix):
+        self.namespace = namespace
+        self.prefix = prefix
+        self.local = local_cache() if namespace.use_local else None
+
+    def make_key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys):
+        """``{key: value}`` for the keys found in either tier."""
+        started = time.monotonic()
+        full_keys = {self.make_key(key): key for key in keys}
+        found = {}
+        if self.local is not None:
+            found.update(self.local.get_many(list(full_keys)))
+        local_hits = len(found)
+        missing = [full_key for full_key in full_keys if full_key not in found]
+        shared_found = shared_cache().get_many(missing) if missing else {}
+        if self.local is not None and shared_found:
+            self.local.set_many(shared_found, self.namespace.timeout)
+        found.update(shared_found)
+        _record(
+            self.namespace.name,
+            local_hits=local_hits,
+            shared_hits=len(shared_found),
+            misses=len(full_keys) - len(found),
+            lookup_seconds=time.monotonic() - started,
+        )
+        return {full_keys[full_key]: value for full_key, value in found.items()}
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping, timeout=None):
+        timeout = self.namespace.timeout if timeout is None else timeout
+        values = {self.make_key(key): value for key, value in mapping.items()}
+        shared_cache().set_many(values, timeout)
+        if self.local is not None:
+            self.local.set_many(values, timeout)
+
+    def set(self, key, value, timeout=None):
+        self.set_many({key: value}, timeout)
+
+    def delete_many(self, keys):
+        """Drop keys from the shared tier (and this process's local tier)."""
+        full_keys = [self.make_key(key) for key in keys]
+        shared_cache().delete_many(full_keys)
+        if self.local is not None:
+            self.local.delete_many(full_keys)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def get_or_set(self, key, compute, timeout=None):
+        """The cached value of ``key``, or ``compute()`` cached by the one worker that computes it."""
+        found = self.get_many([key])
+        if key in found:
+            return found[key]
+
+        full_key = self.make_key(key)
+        lock_key = f"lock:{full_key}"
+        lock_timeout = get_lock_timeout()
+        shared = shared_cache()
+        if not shared.add(lock_key, 1, lock_timeout):
+            # Another worker is computing it: wait for its value
+            _record(self.namespace.name, lock_waits=1)
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_SECONDS)
+                value = shared.get(full_key, _MISSING)
+                if value is not _MISSING:
+                    if self.local is not None:
+                        self.local.set(full_key, value, self.namespace.timeout if timeout is None else timeout)
+                    return value
+            logger.warning("Timed out waiting for %s; computing it here", full_key)
+            return self._compute_and_set(key, compute, timeout)
+
+        try:
+            return self._compute_and_set(key, compute, timeout)
+        finally:
+            shared.delete(lock_key)
+
+    def _compute_and_set(self, key, compute, timeout):
+        started = time.monotonic()
+        value = compute()
+        _record(self.namespace.name, compute_seconds=time.monotonic() - started)
+        self.set(key, value, timeout)
+        return value
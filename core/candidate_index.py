@@ -0,0 +1,211 @@
+"""
+In-process blocking index for fuzzy client matching.
+
+Comparing an incoming name against every existing client runs the expensive
+similarity (SequenceMatcher plus nickname lookups) once per client. The
+``ClientCandidateIndex`` keeps cheap blocking keys for each indexed client so a
+lookup only returns the handful of clients that could plausibly score above a
+duplicate threshold:
+
+- phonetic key: Soundex code of every name token, order independent
+- sorted-token key: the normalized name tokens, sorted
+- nickname group: canonical names from the matcher's compiled nickname index
+- character n-grams: clients sharing enough trigrams (Dice coefficient)
+- DOB-year bucket: optional filter on top of the keys above
+
+Clients can be added, updated and removed one at a time as they change.
+"""
+import logging
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'),
+    **dict.fromkeys('cgjkqsxz', '2'),
+    **dict.fromkeys('dt', '3'),
+    'l': '4',
+    **dict.fromkeys('mn', '5'),
+    'r': '6',
+}
+
+
+def soundex(token: str) -> str:
+    """American Soundex code of a single name token ('' for tokens without letters)."""
+    letters = [ch for ch in token.lower() if 'a' <= ch <= 'z']
+    if not letters:
+        return ''
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for ch in letters[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # 'h' and 'w' do not separate letters with the same code
+        if ch not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def char_ngrams(text: str, size: int = 3) -> Set[str]:
+    """Character n-grams of a normalized name, padded so short names still produce grams."""
+    if not text:
+        return set()
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+class ClientCandidateIndex:
+    """
+    Blocking-key index over clients, keyed by primary key.
+
+    ``candidates()`` returns the indexed clients sharing a phonetic, sorted-token
+    or nickname key with the queried name, or enough character n-grams. The
+    expensive similarity is then only computed for that small set.
+    """
+
+    def __init__(self, matcher=None, ngram_size: int = 3, min_ngram_similarity: float = 0.4):
+        if matcher is None:
+            from .fuzzy_matching import fuzzy_matcher as matcher
+        self.matcher = matcher
+        self.ngram_size = ngram_size
+        self.min_ngram_similarity = min_ngram_similarity
+
+        self._clients: Dict[Any, Any] = {}
+        self._entry_keys: Dict[Any, Dict[str, Any]] = {}
+        self._phonetic: Dict[str, Set[Any]] = defaultdict(set)
+        self._sorted_tokens: Dict[str, Set[Any]] = defaultdict(set)
+        self._nickname_groups: Dict[str, Set[Any]] = defaultdict(set)
+        self._ngrams: Dict[str, Set[Any]] = defaultdict(set)
+        self._dob_years: Dict[Optional[int], Set[Any]] = defaultdict(set)
+        self._order: Dict[Any, int] = {}
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, client_or_id) -> bool:
+        return self._client_key(client_or_id) in self._clients
+
+    @staticmethod
+    def _client_key(client_or_id):
+        return getattr(client_or_id, 'pk', client_or_id)
+
+    def _name_keys(self, first_name: Optional[str], last_name: Optional[str]) -> Dict[str, Any]:
+        full_name = self.matcher.normalize_name(f"{first_name or ''} {last_name or ''}")
+        tokens = full_name.split()
+        phonetic = ' '.join(sorted(code for code in (soundex(token) for token in tokens) if code))
+        return {
+            'full_name': full_name,
+            'phonetic': phonetic,
+            'sorted_tokens': ' '.join(sorted(tokens)),
+            'nickname_groups': self.matcher.nickname_index.canonical_names(full_name),
+            'ngrams': char_ngrams(full_name, self.ngram_size),
+        }
+
+    def add(self, client) -> None:
+        """Index a client (re-indexing it if it is already present)."""
+        key = self._client_key(client)
+        if key in self._clients:
+            self.remove(key)
+
+        keys = self._name_keys(client.first_name, client.last_name)
+        if not keys['full_name']:
+            return
+        dob = getattr(client, 'dob', None)
+        keys['dob_year'] = dob.year if dob else None
+
+        self._clients[key] = client
+        self._entry_keys[key] = keys
+        self._order[key] = self._next_order
+        self._next_order += 1
+        if keys['phonetic']:
+            self._phonetic[keys['phonetic']].add(key)
+        self._sorted_tokens[keys['sorted_tokens']].add(key)
+        for group in keys['nickname_groups']:
+            self._nickname_groups[group].add(key)
+        for gram in keys['ngrams']:
+            self._ngrams[gram].add(key)
+        self._dob_years[keys['dob_year']].add(key)
+
+    def add_many(self, clients: Iterable[Any]) -> 'ClientCandidateIndex':
+        for client in clients:
+            self.add(client)
+        return self
+
+    # Re-indexing drops the old keys first, so updating is the same as adding
+    update = add
+
+    def remove(self, client_or_id) -> None:
+        key = self._client_key(client_or_id)
+        keys = self._entry_keys.pop(key, None)
+        self._clients.pop(key, None)
+        self._order.pop(key, None)
+        if keys is None:
+            return
+        self._discard(self._phonetic, keys['phonetic'], key)
+        self._discard(self._sorted_tokens, keys['sorted_tokens'], key)
+        for group in keys['nickname_groups']:
+            self._discard(self._nickname_groups, group, key)
+        for gram in keys['ngrams']:
+            self._discard(self._ngrams, gram, key)
+        self._discard(self._dob_years, keys['dob_year'], key)
+
+    @staticmethod
+    def _discard(postings, posting_key, key) -> None:
+        bucket = postings.get(posting_key)
+        if bucket is None:
+            return
+        bucket.discard(key)
+        if not bucket:
+            del postings[posting_key]
+
+    def candidate_ids(self, first_name: Optional[str], last_name: Optional[str],
+                      dob=None, dob_year_window: Optional[int] = None) -> Set[Any]:
+        """
+        Primary keys of indexed clients that share a blocking key with the name.
+
+        When ``dob`` and ``dob_year_window`` are given, candidates whose DOB year
+        is further away are dropped; clients without a DOB are always kept.
+        """
+        keys = self._name_keys(first_name, last_name)
+        if not keys['full_name']:
+            return set()
+
+        found: Set[Any] = set()
+        if keys['phonetic']:
+            found |= self._phonetic.get(keys['phonetic'], set())
+        found |= self._sorted_tokens.get(keys['sorted_tokens'], set())
+        for group in keys['nickname_groups']:
+            found |= self._nickname_groups.get(group, set())
+
+        query_grams = keys['ngrams']
+        if query_grams:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._ngrams.get(gram, ()))
+            query_size = len(query_grams)
+            for key, overlap in shared.items():
+                if key in found:
+                    continue
+                dice = 2.0 * overlap / (query_size + len(self._entry_keys[key]['ngrams']))
+                if dice >= self.min_ngram_similarity:
+                    found.add(key)
+
+        if dob is not None and dob_year_window is not None and found:
+            allowed = set(self._dob_years.get(None, set()))
+            for year in range(dob.year - dob_year_window, dob.year + dob_year_window + 1):
+                allowed |= self._dob_years.get(year, set())
+            found &= allowed
+        return found
+
+    def candidates(self, first_name: Optional[str], last_name: Optional[str],
+                   dob=None, dob_year_window: Optional[int] = None) -> List[Any]:
+        """Indexed client objects that could match the name, in insertion order."""
+        found = self.candidate_ids(first_name, last_name, dob=dob, dob_year_window=dob_year_window)
+        return [self._clients[key] for key in sorted(found, key=self._order.__getitem__)]
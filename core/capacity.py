@@ -0,0 +1,143 @@
+"""
+Program capacity and occupancy.
+
+``Program.get_current_enrollments_count``, ``get_available_capacity``,
+``is_at_capacity`` and ``get_capacity_percentage`` each run their own COUNT,
+so listing N programs with their capacity cost 3-4 queries per program.
+``get_program_capacities`` counts the enrollments of every requested program
+as of a date in one grouped query and returns ``{program_id: ProgramCapacity}``
+with the same rules as the model methods:
+
+- occupied: non-archived enrollments with ``start_date <= date`` that have
+  no end date or end after the date
+- total (current and future): non-archived enrollments that have no end date
+  or end after today
+- programs with ``no_capacity_limit`` or a capacity of 0 or less have no limit
+"""
+import logging
+from typing import Dict, Iterable
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CAPACITY_FILTERS = ('at_capacity', 'available', 'no_limit')
+
+
+class ProgramCapacity:
+    """Occupancy of one program as of a date."""
+
+    __slots__ = ('program_id', 'capacity', 'no_capacity_limit', 'as_of_date', 'current_enrollments', 'total_enrollments')
+
+    def __init__(self, program, as_of_date, current_enrollments=0, total_enrollments=0):
+        self.program_id = program.pk
+        self.capacity = program.capacity_current
+        self.no_capacity_limit = program.no_capacity_limit
+        self.as_of_date = as_of_date
+        self.current_enrollments = current_enrollments
+        self.total_enrollments = total_enrollments
+
+    def __repr__(self):
+        return f"<ProgramCapacity program={self.program_id} {self.current_enrollments}/{self.capacity} on {self.as_of_date}>"
+
+    @property
+    def has_limit(self):
+        return not self.no_capacity_limit and self.capacity > 0
+
+    @property
+    def available_capacity(self):
+        """Open spots, or None when the program has no limit (Program.get_available_capacity)"""
+        if not self.has_limit:
+            return None
+        return max(0, self.capacity - self.current_enrollments)
+
+    @property
+    def is_at_capacity(self):
+        if not self.has_limit:
+            return False
+        return self.current_enrollments >= self.capacity
+
+    @property
+    def capacity_percentage(self):
+        """Utilization capped at 100, 0 without a limit (Program.get_capacity_percentage)"""
+        if not self.has_limit:
+            return 0
+        return min(100, (self.current_enrollments / self.capacity) * 100)
+
+    @property
+    def vacant(self):
+        """Capacity minus occupied, negative when over capacity (reports)"""
+        return self.capacity - self.current_enrollments
+
+    @property
+    def utilization(self):
+        """Uncapped utilization percentage rounded to one decimal (reports)"""
+        return round((self.current_enrollments / self.capacity * 100) if self.capacity > 0 else 0, 1)
+
+
+def active_on(as_of_date):
+    """Q for enrollments active on ``as_of_date``."""
+    return Q(start_date__lte=as_of_date) & (Q(end_date__isnull=True) | Q(end_date__gt=as_of_date))
+
+
+def get_enrollment_counts(program_ids, as_of_date=None):
+    """``{program_id: (occupied on as_of_date, current and future)}`` in one grouped query."""
+    from .models import ClientProgramEnrollment
+
+    today = timezone.now().date()
+    if as_of_date is None:
+        as_of_date = today
+    rows = (
+        ClientProgramEnrollment.objects
+        .filter(program_id__in=program_ids, is_archived=False)
+        .order_by()
+        .values('program_id')
+        .annotate(
+            occupied=Count('id', filter=active_on(as_of_date)),
+            total=Count('id', filter=Q(end_date__isnull=True) | Q(end_date__gt=today)),
+        )
+        .values_list('program_id', 'occupied', 'total')
+    )
+    return {program_id: (occupied, total) for program_id, occupied, total in rows}
+
+
+def get_program_capacities(programs: Iterable, as_of_date=None) -> Dict[int, ProgramCapacity]:
+    """Capacity of every program (model instances or a queryset) as of ``as_of_date`` (default today)."""
+    if as_of_date is None:
+        as_of_date = timezone.now().date()
+    programs = list(programs)
+    if not programs:
+        return {}
+    counts = get_enrollment_counts([program.pk for program in programs], as_of_date)
+    return {
+        program.pk: ProgramCapacity(program, as_of_date, *counts.get(program.pk, (0, 0)))
+        for program in programs
+    }
+
+
+def get_program_capacity(program, as_of_date=None) -> ProgramCapacity:
+    return get_program_capacities([program], as_of_date)[program.pk]
+
+
+def filter_programs_by_capacity(queryset, capacity_filter: str, as_of_date=None):
+    """
+    Narrow a program queryset by capacity ('at_capacity', 'available' or
+    'no_limit') and keep it a queryset, so search and sorting still apply.
+    """
+    if capacity_filter == 'no_limit':
+        return queryset.filter(Q(no_capacity_limit=True) | Q(capacity_current__lte=0))
+    if capacity_filter not in CAPACITY_FILTERS:
+        return queryset
+
+    capacities = get_program_capacities(
+        queryset.order_by().only('id', 'capacity_current', 'no_capacity_limit'), as_of_date
+    )
+    if capacity_filter == 'at_capacity':
+        matching_ids = [program_id for program_id, capacity in capacities.items() if capacity.is_at_capacity]
+    else:
+        matching_ids = [
+            program_id for program_id, capacity in capacities.items()
+            if not capacity.is_at_capacity and (capacity.available_capacity is None or capacity.available_capacity > 0)
+        ]
+    return queryset.filter(id__in=matching_ids)
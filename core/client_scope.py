@@ -0,0 +1,173 @@
+"""
+Materialized client visibility for program managers and staff-only users.
+
+The list, detail, export and dashboard views used to scope these roles with
+an OR over four joins (enrollments in assigned programs, enrollments and
+restrictions created by the staff member, clients last updated by them)
+followed by ``.distinct()``. The same visibility is kept here as cached id
+sets, so the views filter with a plain ``id IN (...)``:
+
+- program set: ids of clients with an enrollment in the program
+- name set: ids of clients whose enrollment or restriction was created by,
+  or who were last updated by, a given staff name
+
+A program manager sees the program sets of their assigned programs plus their
+name set; a staff-only user sees the program sets of their staff program
+assignments plus their directly assigned clients (from the principal).
+
+Sets are maintained per key: saving or deleting an enrollment, restriction or
+client drops only the program and name sets it touches (see core.signals).
+Bulk writes that bypass signals call ``invalidate_client_scopes()``, which
+bumps the ``client-scope`` invalidation group (core.caching). Because single
+sets are deleted, they live in the shared cache tier only.
+"""
+import hashlib
+import logging
+
+from django.db import transaction
+
+from .caching import CacheNamespace, invalidate_group
+from .principal import get_principal
+
+logger = logging.getLogger(__name__)
+
+CLIENT_SCOPE_GROUP = 'client-scope'
+DEFAULT_CLIENT_SCOPE_CACHE_TIMEOUT = 3600
+
+client_scope_cache = CacheNamespace(
+    'client-scope', groups=(CLIENT_SCOPE_GROUP,), use_local=False,
+    timeout=DEFAULT_CLIENT_SCOPE_CACHE_TIMEOUT, timeout_setting='CLIENT_SCOPE_CACHE_TIMEOUT',
+)
+
+STAFF_ONLY_EXCLUDED_ROLES = ('SuperAdmin', 'Manager', 'Leader')
+
+
+def get_staff_name(user):
+    """Name written to created_by/updated_by for this user, as the scope filters have always matched it."""
+    return f"{user.first_name} {user.last_name}".strip() or user.username
+
+
+def invalidate_client_scopes():
+    """Drop every cached visibility set by moving to a new version."""
+    invalidate_group(CLIENT_SCOPE_GROUP)
+
+
+def _program_key(program_id):
+    return f"program:{program_id}"
+
+
+def _name_key(staff_name):
+    digest = hashlib.md5(staff_name.encode('utf-8')).hexdigest()
+    return f"name:{digest}"
+
+
+def invalidate_scope_keys(program_ids=(), staff_names=()):
+    """Drop the program and name sets touched by a write, once the transaction commits."""
+    program_ids = {program_id for program_id in program_ids if program_id}
+    staff_names = {staff_name for staff_name in staff_names if staff_name}
+    if not program_ids and not staff_names:
+        return
+
+    def drop_keys():
+        client_scope_cache.delete_many(
+            [_program_key(program_id) for program_id in program_ids]
+            + [_name_key(staff_name) for staff_name in staff_names]
+        )
+
+    transaction.on_commit(drop_keys)
+
+
+def get_program_client_ids(program_ids):
+    """Ids of clients enrolled (in any status) in any of the programs."""
+    from core.models import ClientProgramEnrollment
+
+    program_ids = set(program_ids)
+    if not program_ids:
+        return set()
+    scope_cache = client_scope_cache.current()
+    keys = {_program_key(program_id): program_id for program_id in program_ids}
+    cached = scope_cache.get_many(list(keys))
+
+    client_ids = set()
+    for client_id_set in cached.values():
+        client_ids.update(client_id_set)
+
+    missing = {program_id for key, program_id in keys.items() if key not in cached}
+    if missing:
+        by_program = {program_id: set() for program_id in missing}
+        rows = ClientProgramEnrollment.objects.filter(program_id__in=missing).values_list('program_id', 'client_id')
+        for program_id, client_id in rows.iterator(chunk_size=5000):
+            by_program[program_id].add(client_id)
+        scope_cache.set_many({_program_key(program_id): ids for program_id, ids in by_program.items()})
+        for ids in by_program.values():
+            client_ids.update(ids)
+    return client_ids
+
+
+def get_name_client_ids(staff_name):
+    """Ids of clients with an enrollment or restriction created by, or last updated by, ``staff_name``."""
+    from core.models import Client, ClientProgramEnrollment, ServiceRestriction
+
+    if not staff_name:
+        return set()
+    scope_cache = client_scope_cache.current()
+    key = _name_key(staff_name)
+    client_ids = scope_cache.get(key)
+    if client_ids is None:
+        client_ids = set(
+            ClientProgramEnrollment.objects.filter(created_by=staff_name).values_list('client_id', flat=True)
+        )
+        client_ids.update(
+            ServiceRestriction.objects.filter(created_by=staff_name).values_list('client_id', flat=True)
+        )
+        client_ids.update(Client.objects.filter(updated_by=staff_name).values_list('id', flat=True))
+        scope_cache.set(key, client_ids)
+    return set(client_ids)
+
+
+def get_program_manager_client_ids(user):
+    """Client ids visible to a program manager."""
+    principal = get_principal(user)
+    client_ids = get_program_client_ids(principal.assigned_program_ids)
+    client_ids.update(get_name_client_ids(get_staff_name(user)))
+    return client_ids
+
+
+def get_staff_client_ids(user):
+    """Client ids visible to a staff-only user: assigned programs plus directly assigned clients."""
+    principal = get_principal(user)
+    client_ids = get_program_client_ids(principal.staff_program_ids)
+    client_ids.update(principal.staff_client_ids)
+    return client_ids
+
+
+def is_staff_only(principal):
+    """The staff-only check the client views use (Staff without SuperAdmin, Manager or Leader)."""
+    return principal.has_role('Staff') and not principal.has_any_role(*STAFF_ONLY_EXCLUDED_ROLES)
+
+
+def get_visible_clients(user):
+    """
+    Clients the client list shows ``user`` before any search or filter:
+    archived clients only for admins, no clients pending as duplicates, and
+    the program manager, staff-only and leader scopes.
+    """
+    from .models import Client, ClientProgramEnrollment
+
+    if not user or not user.is_authenticated:
+        return Client.objects.none()
+    principal = get_principal(user)
+    queryset = Client.objects.all() if principal.is_admin else Client.objects.filter(is_archived=False)
+    queryset = queryset.exclude(duplicate_of__status='pending')
+
+    if principal.is_program_manager:
+        return queryset.filter(id__in=get_program_manager_client_ids(user))
+    if is_staff_only(principal):
+        return queryset.filter(id__in=get_staff_client_ids(user))
+    if principal.is_leader:
+        # Clients enrolled in programs of the leader's departments
+        return queryset.filter(id__in=ClientProgramEnrollment.objects.filter(
+            program__department_id__in=principal.leader_department_ids,
+            program__department__is_archived=False,
+        ).values('client_id'))
+    return queryset
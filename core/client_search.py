@@ -0,0 +1,133 @@
+"""
+Client search.
+
+The client typeahead (``core.views.search_clients``) used to run two
+``icontains``/``istartswith`` queries over the names and join them in
+Python, and the client list searched with an OR of ten ``icontains``
+filters, so both scanned the whole clients table on every keystroke.
+
+On PostgreSQL every client row carries ``search_text``: the lowercased
+names, preferred name, alias, client ID, phones, emails, external ID, postal
+code and chart number, kept up to date by a ``BEFORE INSERT OR UPDATE``
+trigger (so bulk creates and ``update()`` calls are covered too) and indexed
+with a ``pg_trgm`` GIN index. Substring matches (``LIKE '%term%'``) and
+fuzzy word matches (``term <% search_text``) are both answered from that
+index, and ``rank_client_matches`` ranks them in one LIMITed query: name prefix
+matches first, then substring matches, then by trigram word similarity.
+
+Other databases (SQLite in tests) leave ``search_text`` empty and fall back
+to ``icontains`` over the same fields.
+"""
+import logging
+
+from django.db import connections
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When
+
+logger = logging.getLogger(__name__)
+
+CLIENT_TABLE = 'clients'
+SEARCH_INDEX_NAME = 'clients_search_text_trgm'
+SEARCH_TRIGGER_NAME = 'clients_search_text_update'
+DEFAULT_SEARCH_LIMIT = 50
+
+# Client fields (and contact_information keys) matched by a search
+SEARCH_FIELDS = (
+    'first_name', 'last_name', 'preferred_name', 'alias', 'client_id', 'phone', 'email',
+    'contact_information__email', 'contact_information__phone', 'uid_external', 'postal_code', 'chart_number',
+)
+
+# search_text of the row being written, as the trigger and the backfill compute it
+SEARCH_TEXT_SQL = """lower(concat_ws(' ',
+    {row}first_name, {row}last_name, {row}preferred_name, {row}alias, {row}client_id, {row}phone, {row}email,
+    {row}contact_information ->> 'email', {row}contact_information ->> 'phone',
+    {row}uid_external, {row}postal_code, {row}chart_number
+))"""
+
+
+def is_postgresql(connection):
+    return connection.vendor == 'postgresql'
+
+
+def install_search_index(connection):
+    """Create the pg_trgm extension, the search_text trigger and its GIN index, and fill search_text."""
+    if not is_postgresql(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {SEARCH_TRIGGER_NAME}() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_text := {SEARCH_TEXT_SQL.format(row='NEW.')};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TRIGGER_NAME} ON {CLIENT_TABLE}")
+        cursor.execute(
+            f"CREATE TRIGGER {SEARCH_TRIGGER_NAME} BEFORE INSERT OR UPDATE ON {CLIENT_TABLE} "
+            f"FOR EACH ROW EXECUTE FUNCTION {SEARCH_TRIGGER_NAME}()"
+        )
+        cursor.execute(f"UPDATE {CLIENT_TABLE} SET search_text = {SEARCH_TEXT_SQL.format(row='')}")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON {CLIENT_TABLE} "
+            f"USING gin (search_text gin_trgm_ops)"
+        )
+
+
+def uninstall_search_index(connection):
+    if not is_postgresql(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}")
+        cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TRIGGER_NAME} ON {CLIENT_TABLE}")
+        cursor.execute(f"DROP FUNCTION IF EXISTS {SEARCH_TRIGGER_NAME}()")
+
+
+def normalize_search_term(term):
+    return ' '.join((term or '').split()).lower()
+
+
+def client_search_filter(term, using='default'):
+    """``Q`` matching clients whose search fields contain ``term`` (case-insensitive)."""
+    term = normalize_search_term(term)
+    if is_postgresql(connections[using]):
+        return Q(search_text__contains=term)
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': term})
+    return condition
+
+
+def rank_client_matches(queryset, term, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Clients of ``queryset`` matching ``term``, best first, in one query:
+    first or last name starting with the term, then (on PostgreSQL) by
+    trigram word similarity, substring matches before fuzzy ones.
+    """
+    term = normalize_search_term(term)
+    name_prefix = Case(
+        When(Q(first_name__istartswith=term) | Q(last_name__istartswith=term), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    if is_postgresql(connections[queryset.db]):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        queryset = queryset.filter(
+            Q(search_text__contains=term) | Q(search_text__trigram_word_similar=term)
+        ).annotate(
+            search_prefix=name_prefix,
+            search_substring=Case(
+                When(search_text__contains=term, then=Value(1)), default=Value(0), output_field=IntegerField(),
+            ),
+            search_rank=TrigramWordSimilarity(term, 'search_text'),
+        )
+    else:
+        queryset = queryset.filter(client_search_filter(term, using=queryset.db)).annotate(
+            search_prefix=name_prefix,
+            search_substring=Value(1, output_field=IntegerField()),
+            search_rank=Value(0.0, output_field=FloatField()),
+        )
+    return queryset.order_by(
+        '-search_prefix', '-search_substring', '-search_rank', 'last_name', 'first_name', 'pk'
+    )[:limit]
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from core.models import Staff, Role
+from core.principal import get_principal
 
 User = get_user_model()
 
@@ -7,9 +8,10 @@ def user_permissions(request):
     """Add user permissions and roles to template context"""
     if request.user.is_authenticated:
         try:
-            staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            principal = get_principal(request.user)
+            if not principal.has_staff_profile:
+                raise Staff.DoesNotExist
+            role_names = principal.role_names
             
             # Check if user has only "User" role or no roles - if so, no permissions
             if role_names == ['User'] or not role_names:
@@ -0,0 +1,134 @@
+"""
+Cached dashboard statistics.
+
+The dashboard used to recompute its counters (active clients, active
+programs, staff, active restrictions) and the capacity of the first five
+programs with a separate COUNT per number and three per program, on every
+load and for every role. ``get_dashboard_stats`` computes them with a handful
+of aggregate queries and caches the result per scope:
+
+- ``global`` / ``analyst``: shared by every admin-type or analyst user
+- ``manager:<staff id>``, ``leader:<staff id>``, ``staff:<staff id>``
+
+Entries live in the ``dashboard`` cache namespace (core.caching), which is
+in both the ``dashboard`` and the principal invalidation groups (assignment
+changes move a user to a new key); keys also carry today's date (counts are
+"as of today"). Writes to clients, enrollments, programs, restrictions and
+staff drop every cached entry through ``invalidate_dashboard_stats`` (see
+core.signals); ``DASHBOARD_STATS_CACHE_TIMEOUT`` bounds how long an entry
+lives otherwise. A dashboard that expires under load is recomputed by one
+worker while the others wait for its result.
+"""
+import logging
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import CacheNamespace, invalidate_group
+from .capacity import get_program_capacities
+from .models import Program, ServiceRestriction, Staff
+from .principal import PRINCIPAL_GROUP, get_principal
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_GROUP = 'dashboard'
+DEFAULT_DASHBOARD_STATS_CACHE_TIMEOUT = 300
+
+# Programs shown in the dashboard's program status panel
+PROGRAM_STATUS_LIMIT = 5
+
+
+dashboard_cache = CacheNamespace(
+    'dashboard',
+    groups=(DASHBOARD_GROUP, PRINCIPAL_GROUP),
+    timeout=DEFAULT_DASHBOARD_STATS_CACHE_TIMEOUT,
+    timeout_setting='DASHBOARD_STATS_CACHE_TIMEOUT',
+)
+
+
+def invalidate_dashboard_stats():
+    """Drop every cached dashboard entry by moving to a new version."""
+    invalidate_group(DASHBOARD_GROUP)
+
+
+def get_dashboard_scope(user, is_program_manager=False, is_leader=False, is_staff_only=False, is_analyst=False):
+    """Cache scope for the role branch the dashboard view picked."""
+    principal = get_principal(user)
+    if is_program_manager:
+        return f'manager:{principal.staff_id}'
+    if is_leader:
+        return f'leader:{principal.staff_id}'
+    if is_staff_only:
+        return f'staff:{principal.staff_id}'
+    if is_analyst:
+        return 'analyst'
+    return 'global'
+
+
+def get_program_status(programs, as_of_date):
+    """Capacity rows for the program status panel, with one grouped enrollment count for all programs."""
+    programs = list(programs.select_related('department')[:PROGRAM_STATUS_LIMIT])
+    capacities = get_program_capacities(programs, as_of_date)
+
+    program_status = []
+    for program in programs:
+        capacity = capacities[program.pk]
+        program_status.append({
+            'name': program.name,
+            'department': {'name': program.department.name},
+            'capacity_current': program.capacity_current,
+            'current_enrollments': capacity.current_enrollments,
+            'available_capacity': capacity.available_capacity,
+            'capacity_percentage': round(capacity.capacity_percentage, 1),
+            'is_at_capacity': capacity.is_at_capacity,
+        })
+    return program_status
+
+
+def compute_dashboard_stats(request, programs, assigned_programs=None, is_program_manager=False, is_leader=False,
+                            is_staff_only=False, is_analyst=False, can_see_archived_items=False):
+    """Counters and program status for one dashboard scope, straight from the database."""
+    from .views import get_active_clients_count
+
+    today = timezone.now().date()
+    total_clients = get_active_clients_count(
+        request,
+        assigned_programs=assigned_programs,
+        is_program_manager=is_program_manager,
+        is_leader=is_leader,
+        is_staff_only=is_staff_only,
+        is_analyst=is_analyst,
+    )
+
+    # Managers and leaders count their assigned programs; everyone else counts all programs
+    scoped_programs = (is_program_manager or is_leader) and assigned_programs
+    active_programs_queryset = assigned_programs if scoped_programs else Program.objects.all()
+    active_programs_queryset = active_programs_queryset.filter(status='active')
+    if not can_see_archived_items:
+        active_programs_queryset = active_programs_queryset.filter(is_archived=False)
+
+    # Roles without a dashboard scope never count archived restrictions
+    has_scope = scoped_programs or is_staff_only or is_analyst
+    active_restrictions_queryset = ServiceRestriction.objects.filter(
+        start_date__lte=today
+    ).filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=today)
+    )
+    if not can_see_archived_items or not has_scope:
+        active_restrictions_queryset = active_restrictions_queryset.filter(is_archived=False)
+
+    return {
+        'total_clients': total_clients,
+        'active_programs': active_programs_queryset.count(),
+        'total_staff': Staff.objects.count(),
+        'active_restrictions': active_restrictions_queryset.count(),
+        'program_status': get_program_status(programs, today),
+    }
+
+
+def get_dashboard_stats(request, scope, programs, can_see_archived_items=False, **scope_flags):
+    """Cached ``compute_dashboard_stats`` for the scope."""
+    key = f"{timezone.now().date().isoformat()}:{scope}:{'archived' if can_see_archived_items else 'live'}"
+    return dashboard_cache.get_or_set(key, lambda: compute_dashboard_stats(
+        request, programs, can_see_archived_items=can_see_archived_items, **scope_flags
+    ))
@@ -0,0 +1,371 @@
+"""
+Background export jobs with reusable artifacts.
+
+The large exports (clients, client demographics, organizational summary,
+program performance) were computed on every click, even when several
+analysts asked for the same filters minutes apart. Adding ``background=true``
+to an export URL queues an ``ExportJob`` instead of streaming the file: the job
+writes the CSV (or XLSX with ``format=xlsx``) to default storage under
+``exports/`` and the page polls ``core:export_job_progress`` until it can
+download the artifact.
+
+Jobs are keyed by export type, format, normalized filters and the requester's
+role scope (roles and assignments from the principal, which is everything the
+exports filter rows by). A request matching a queued or running job, or a job
+finished within ``EXPORT_JOB_FRESHNESS_SECONDS``, gets that job back instead
+of a new one. Finished artifacts are evicted after ``EXPORT_JOB_MAX_AGE_HOURS``
+and, least recently used first, once they take more than
+``EXPORT_JOB_MAX_TOTAL_MB`` together.
+
+Jobs run on a daemon thread by default. Set ``EXPORT_JOB_RUNNER = 'command'``
+to leave them queued for ``python manage.py process_export_jobs``.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ExportJob
+from .principal import get_principal
+
+logger = logging.getLogger(__name__)
+
+EXPORT_STORAGE_DIR = 'exports'
+
+# Export types that can run in the background: a function taking a request, or
+# a view class with get_export(); either returns a core.csv_export.CSVExport
+EXPORT_TYPES = {
+    'clients': 'clients.views.build_client_export',
+    'client_demographics': 'reports.views.ClientDemographicsExportView',
+    'organizational_summary': 'reports.views.OrganizationalSummaryExportView',
+    'program_performance': 'reports.views.ProgramPerformanceExportView',
+}
+
+# Query parameters that control the job rather than the rows
+CONTROL_PARAMETERS = ('background', 'format', 'page')
+
+# Queued or running jobs older than this are not handed to new requests
+STALE_JOB_SECONDS = 3600
+
+
+def get_export_runner():
+    return getattr(settings, 'EXPORT_JOB_RUNNER', 'thread')
+
+
+def normalize_filters(query):
+    """Non-empty query parameters (other than job controls) as ``{key: [values]}``, keys sorted."""
+    filters = {}
+    for key in sorted(query.keys()):
+        if key in CONTROL_PARAMETERS:
+            continue
+        values = [value.strip() for value in query.getlist(key) if value.strip()]
+        if values:
+            filters[key] = values
+    return filters
+
+
+def get_export_scope(user):
+    """Roles and assignments the exports limit rows by; users with equal scopes see the same rows."""
+    principal = get_principal(user)
+    return {
+        'roles': sorted(principal.role_names),
+        'assigned_program_ids': sorted(principal.assigned_program_ids),
+        'leader_department_ids': sorted(principal.leader_department_ids),
+        'staff_program_ids': sorted(principal.staff_program_ids),
+        'staff_client_ids': sorted(principal.staff_client_ids),
+    }
+
+
+def build_cache_key(export_type, file_format, filters, scope):
+    payload = json.dumps([export_type, file_format, filters, scope], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def find_reusable_job(cache_key, now=None):
+    """A queued/running job or a fresh finished artifact for ``cache_key``, newest first."""
+    now = now or timezone.now()
+    freshness = getattr(settings, 'EXPORT_JOB_FRESHNESS_SECONDS', 600)
+    return (
+        ExportJob.objects.filter(cache_key=cache_key)
+        .filter(
+            Q(status__in=['queued', 'processing'], created_at__gte=now - timedelta(seconds=STALE_JOB_SECONDS))
+            | Q(status='success', completed_at__gte=now - timedelta(seconds=freshness))
+        )
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def enqueue_export_job(export_type, request, file_format='csv'):
+    """Reuse a matching job or create a queued one and start (or queue) it. Returns ``(job, reused)``."""
+    if export_type not in EXPORT_TYPES:
+        raise ValueError(f"Unknown export type: {export_type}")
+    if file_format not in ('csv', 'xlsx'):
+        file_format = 'csv'
+
+    filters = normalize_filters(request.GET)
+    scope = get_export_scope(request.user)
+    cache_key = build_cache_key(export_type, file_format, filters, scope)
+
+    job = find_reusable_job(cache_key)
+    if job is not None:
+        logger.info(f"Reusing {export_type} export {job.external_id} ({job.status})")
+        return job, True
+
+    user = request.user
+    job = ExportJob.objects.create(
+        export_type=export_type,
+        file_format=file_format,
+        filters=filters,
+        scope=scope,
+        cache_key=cache_key,
+        requested_by=getattr(user, 'staff_profile', None) if user.is_authenticated else None,
+        options={
+            'user_id': user.pk if user.is_authenticated else None,
+            'runner': get_export_runner(),
+        },
+    )
+    logger.info(f"Queued {export_type} export {job.external_id}")
+
+    if get_export_runner() == 'thread':
+        start_export_thread(job.pk)
+    return job, False
+
+
+def start_export_thread(job_id):
+    thread = threading.Thread(
+        target=run_export_job,
+        args=(job_id,),
+        name=f"export-job-{job_id}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def build_export_request(user, filters):
+    """A GET request carrying the job's filters and user, for the export builders."""
+    request = HttpRequest()
+    request.method = 'GET'
+    query = QueryDict(mutable=True)
+    for key, values in filters.items():
+        query.setlist(key, values)
+    request.GET = query
+    request.user = user
+    return request
+
+
+def build_export(export_type, request):
+    builder = import_string(EXPORT_TYPES[export_type])
+    if isinstance(builder, type):
+        view = builder()
+        view.setup(request)
+        return view.get_export()
+    return builder(request)
+
+
+def _get_job_user(job):
+    from .models import User
+
+    user_id = (job.options or {}).get('user_id')
+    if user_id:
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            logger.warning(f"Export job user {user_id} no longer exists; running as anonymous")
+    return AnonymousUser()
+
+
+def write_csv_file(export, file):
+    """Write the export's header and rows to a text file; returns the number of rows."""
+    writer = csv.writer(file)
+    if export.header:
+        writer.writerow(export.header)
+    row_count = 0
+    for row in export.rows:
+        writer.writerow(row)
+        row_count += 1
+    return row_count
+
+
+def write_xlsx_file(export, path):
+    """Write the export to an XLSX workbook row by row; returns the number of rows."""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def clean(value):
+        return ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Export')
+    if export.header:
+        sheet.append([clean(value) for value in export.header])
+    row_count = 0
+    for row in export.rows:
+        sheet.append([clean(value) for value in row])
+        row_count += 1
+    workbook.save(path)
+    return row_count
+
+
+def write_export_artifact(job, export):
+    """Write the export to a temporary file, then store it; returns ``(storage path, file name, rows, bytes)``."""
+    base_name = os.path.splitext(export.filename)[0]
+    file_name = f"{base_name}.{job.file_format}"
+    fd, temp_path = tempfile.mkstemp(suffix=f'.{job.file_format}')
+    os.close(fd)
+    try:
+        if job.file_format == 'xlsx':
+            row_count = write_xlsx_file(export, temp_path)
+        else:
+            with open(temp_path, 'w', newline='', encoding='utf-8') as file:
+                row_count = write_csv_file(export, file)
+        with open(temp_path, 'rb') as file:
+            stored_path = default_storage.save(
+                os.path.join(EXPORT_STORAGE_DIR, f"{job.external_id}.{job.file_format}"), File(file)
+            )
+        return stored_path, file_name, row_count, default_storage.size(stored_path)
+    finally:
+        os.remove(temp_path)
+
+
+def run_export_job(job_id):
+    """Build and store an export. Safe to call from a thread or a management command."""
+    close_old_connections()
+    try:
+        job = ExportJob.objects.get(pk=job_id)
+        job.status = 'processing'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+
+        started = time.monotonic()
+        request = build_export_request(_get_job_user(job), job.filters)
+        export = build_export(job.export_type, request)
+        job.file_path, job.file_name, job.row_count, job.file_size = write_export_artifact(job, export)
+
+        job.status = 'success'
+        job.completed_at = timezone.now()
+        job.duration_seconds = round(time.monotonic() - started, 3)
+        job.save()
+        logger.info(
+            f"{job.export_type} export {job.external_id}: {job.row_count} rows, "
+            f"{job.file_size} bytes in {job.duration_seconds}s"
+        )
+
+        evict_export_artifacts()
+        return job
+    except Exception as e:
+        logger.exception(f"Export job {job_id} crashed: {e}")
+        job = ExportJob.objects.filter(pk=job_id).first()
+        if job:
+            job.status = 'failed'
+            job.completed_at = timezone.now()
+            job.error_message = str(e)
+            job.save()
+        return None
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def expire_export_job(job):
+    """Delete a job's artifact and mark it expired."""
+    if job.file_path:
+        try:
+            default_storage.delete(job.file_path)
+        except Exception as e:
+            logger.error(f"Error deleting export artifact {job.file_path}: {e}")
+    ExportJob.objects.filter(pk=job.pk).update(status='expired', file_path=None, updated_at=timezone.now())
+
+
+def evict_export_artifacts(now=None):
+    """
+    Expire artifacts older than ``EXPORT_JOB_MAX_AGE_HOURS``, then the least
+    recently used ones until the rest fit in ``EXPORT_JOB_MAX_TOTAL_MB``.
+    Returns the number of artifacts expired.
+    """
+    now = now or timezone.now()
+    max_age = timedelta(hours=getattr(settings, 'EXPORT_JOB_MAX_AGE_HOURS', 24))
+    max_total_bytes = getattr(settings, 'EXPORT_JOB_MAX_TOTAL_MB', 1024) * 1024 * 1024
+
+    finished = ExportJob.objects.filter(status='success')
+    expired = list(finished.filter(completed_at__lt=now - max_age))
+
+    total_bytes = 0
+    kept = (
+        finished.filter(completed_at__gte=now - max_age)
+        .annotate(last_used_at=Coalesce('last_accessed_at', 'completed_at'))
+        .order_by('-last_used_at', '-pk')
+        .only('pk', 'file_path', 'file_size')
+    )
+    for job in kept:
+        total_bytes += job.file_size
+        if total_bytes > max_total_bytes:
+            expired.append(job)
+
+    for job in expired:
+        expire_export_job(job)
+    if expired:
+        logger.info(f"Expired {len(expired)} export artifacts")
+    return len(expired)
+
+
+def record_export_download(job):
+    ExportJob.objects.filter(pk=job.pk).update(download_count=F('download_count') + 1, last_accessed_at=timezone.now())
+
+
+def can_access_export_job(job, user):
+    """Artifacts are shared between users whose exports would contain the same rows."""
+    return user.is_authenticated and job.scope == get_export_scope(user)
+
+
+def build_export_job_payload(job):
+    """Serialize an export job for the polling endpoint."""
+    finished = job.status in ('success', 'failed', 'expired')
+    return {
+        'id': str(job.external_id),
+        'export_type': job.export_type,
+        'format': job.file_format,
+        'status': job.status,
+        'finished': finished,
+        'file_name': job.file_name,
+        'file_size': job.file_size,
+        'row_count': job.row_count,
+        'error_message': job.error_message if job.status == 'failed' else None,
+        'download_url': reverse('core:export_job_download', args=[job.external_id]) if job.status == 'success' else None,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'completed_at': job.completed_at.strftime('%Y-%m-%d %H:%M:%S') if job.completed_at else None,
+    }
+
+
+def wants_background_export(request):
+    return request.GET.get('background', '').lower() in ('1', 'true')
+
+
+def export_job_response(request, export_type):
+    """Queue (or reuse) a background export for the request and describe it for the polling page."""
+    job, reused = enqueue_export_job(export_type, request, file_format=request.GET.get('format', 'csv'))
+    return JsonResponse({
+        'success': True,
+        'queued': True,
+        'reused': reused,
+        'job': build_export_job_payload(job),
+        'progress_url': reverse('core:export_job_progress', args=[job.external_id]),
+    })
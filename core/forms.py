@@ -103,9 +103,10 @@ class EnrollmentForm(forms.ModelForm):
         if not can_enroll:
             if "capacity" in message.lower():
                 
-                current_enrollments = program.get_current_enrollments_count(start_date)
-                available_capacity = program.get_available_capacity(start_date)
-                capacity_percentage = program.get_capacity_percentage(start_date)
+                capacity = program.get_capacity(start_date)
+                current_enrollments = capacity.current_enrollments
+                available_capacity = capacity.available_capacity
+                capacity_percentage = capacity.capacity_percentage
                 
                 raise ValidationError(
                     f"📊 PROGRAM AT FULL CAPACITY\n\n"
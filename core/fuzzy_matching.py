@@ -1,127 +1,189 @@
 import json
 import os
-from difflib import SequenceMatcher
-from typing import List, Tuple, Optional, Dict, Any
+import threading
+import time
+from typing import List, Tuple, Optional, Dict, Any, Set
 from django.conf import settings
 
+from .similarity import SimilarityKernel, normalize_name
+
+
+DEFAULT_NICKNAME_MAPPINGS = {
+    "Rohit Singh": ["Rohit", "RS", "Singh", "R. Singh"],
+    "Hemo Globin": ["HG", "Hemo", "Hobo", "Globin"],
+    "John Smith": ["JS", "Johnny", "John", "Smith", "Jon"],
+    "Maria Garcia": ["MG", "Maria", "Garcia", "Mari"],
+    "Sarah Williams": ["SW", "Sarah", "Williams", "Sally"],
+    "Michael Brown": ["MB", "Mike", "Mikey", "Michael", "Brown"],
+    "Lisa Davis": ["LD", "Lisa", "Liz", "Liza", "Davis"],
+    "James Wilson": ["JW", "Jim", "Jimmy", "James", "Wilson"],
+    "Jennifer Martinez": ["JM", "Jen", "Jenny", "Martinez"],
+    "Robert Anderson": ["RA", "Rob", "Bobby", "Robert", "Anderson", "Robbie"]
+}
+
+
+class NicknameIndex:
+    """
+    Nickname mappings compiled into hash lookups.
+    
+    Each mapping entry is a group, numbered in file order. Normalized full names
+    and nicknames map to the groups they appear in, so a check is a couple of
+    dict lookups and small set intersections instead of a walk over every entry.
+    """
+    
+    def __init__(self, mappings: Dict[str, List[str]]):
+        self.groups: List[str] = []
+        self.full_name_groups: Dict[str, Set[int]] = {}
+        self.nickname_groups: Dict[str, Set[int]] = {}
+        for full_name, nicknames in (mappings or {}).items():
+            group = len(self.groups)
+            full_name_norm = normalize_name(full_name)
+            self.groups.append(full_name_norm)
+            self.full_name_groups.setdefault(full_name_norm, set()).add(group)
+            for nickname in nicknames or []:
+                self.nickname_groups.setdefault(normalize_name(nickname), set()).add(group)
+    
+    def __len__(self) -> int:
+        return len(self.groups)
+    
+    def match(self, name1_norm: str, name2_norm: str) -> float:
+        """
+        Confidence of a nickname match between two normalized names (0.0 if none).
+        
+        Same result as walking the mappings in order: the first group that links
+        the names decides, 0.9 for full name <-> nickname, 0.85 for two nicknames.
+        """
+        full1 = self.full_name_groups.get(name1_norm, set())
+        full2 = self.full_name_groups.get(name2_norm, set())
+        nick1 = self.nickname_groups.get(name1_norm, set())
+        nick2 = self.nickname_groups.get(name2_norm, set())
+        
+        full_to_nick = (full1 & nick2) | (full2 & nick1)
+        both_nicks = nick1 & nick2
+        if not full_to_nick and not both_nicks:
+            return 0.0
+        first_group = min(full_to_nick | both_nicks)
+        return 0.9 if first_group in full_to_nick else 0.85
+    
+    def canonical_names(self, name_norm: str) -> Set[str]:
+        """Normalized full names of every group the name belongs to."""
+        groups = self.full_name_groups.get(name_norm, set()) | self.nickname_groups.get(name_norm, set())
+        return {self.groups[group] for group in groups}
+
 
 class FuzzyMatcher:
     """Fuzzy matching utility for client names with nickname support"""
     
+    # Seconds between checks of the nickname file for changes
+    NICKNAME_RELOAD_INTERVAL = 5
+    
     def __init__(self):
-        self.nickname_mappings = self._load_nickname_mappings()
+        self.nickname_file = getattr(settings, 'NICKNAME_MAPPINGS_FILE', None)
+        self.nickname_reload_interval = getattr(settings, 'NICKNAME_RELOAD_INTERVAL', self.NICKNAME_RELOAD_INTERVAL)
+        self.nickname_stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+        self._nickname_lock = threading.Lock()
+        self._nickname_mtime = None
+        self._last_reload_check = time.monotonic()
+        self._set_nickname_mappings(self._load_nickname_mappings())
+        # SequenceMatcher ratio or word overlap, memoized per pair
+        self.similarity_kernel = SimilarityKernel('sequence')
+    
+    def _nickname_file_mtime(self) -> Optional[float]:
+        if not self.nickname_file:
+            return None
+        try:
+            return os.path.getmtime(self.nickname_file)
+        except OSError:
+            return None
     
     def _load_nickname_mappings(self) -> Dict[str, List[str]]:
         """Load nickname mappings from JSON file or use default mappings"""
         # Try to load from a JSON file first
-        nickname_file = getattr(settings, 'NICKNAME_MAPPINGS_FILE', None)
-        if nickname_file and os.path.exists(nickname_file):
+        self._nickname_mtime = self._nickname_file_mtime()
+        if self._nickname_mtime is not None:
             try:
-                with open(nickname_file, 'r', encoding='utf-8') as f:
+                with open(self.nickname_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except (json.JSONDecodeError, IOError):
                 pass
         
         # Default nickname mappings
-        return {
-            "Rohit Singh": ["Rohit", "RS", "Singh", "R. Singh"],
-            "Hemo Globin": ["HG", "Hemo", "Hobo", "Globin"],
-            "John Smith": ["JS", "Johnny", "John", "Smith", "Jon"],
-            "Maria Garcia": ["MG", "Maria", "Garcia", "Mari"],
-            "Sarah Williams": ["SW", "Sarah", "Williams", "Sally"],
-            "Michael Brown": ["MB", "Mike", "Mikey", "Michael", "Brown"],
-            "Lisa Davis": ["LD", "Lisa", "Liz", "Liza", "Davis"],
-            "James Wilson": ["JW", "Jim", "Jimmy", "James", "Wilson"],
-            "Jennifer Martinez": ["JM", "Jen", "Jenny", "Martinez"],
-            "Robert Anderson": ["RA", "Rob", "Bobby", "Robert", "Anderson", "Robbie"]
-        }
+        return dict(DEFAULT_NICKNAME_MAPPINGS)
+    
+    def _set_nickname_mappings(self, mappings: Dict[str, List[str]]) -> None:
+        self.nickname_mappings = mappings
+        self.nickname_index = NicknameIndex(mappings)
+    
+    def refresh_nickname_mappings(self, force: bool = False) -> bool:
+        """Recompile the nickname index if the JSON file changed. Returns True when it reloaded."""
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.nickname_reload_interval:
+            return False
+        with self._nickname_lock:
+            self._last_reload_check = now
+            if not force and self._nickname_file_mtime() == self._nickname_mtime:
+                return False
+            self._set_nickname_mappings(self._load_nickname_mappings())
+            self.nickname_stats['reloads'] += 1
+            return True
+    
+    def get_nickname_stats(self) -> Dict[str, int]:
+        stats = dict(self.nickname_stats)
+        stats['groups'] = len(self.nickname_index)
+        return stats
     
     def normalize_name(self, name: str) -> str:
         """Normalize name for comparison"""
-        if not name:
-            return ""
-        return " ".join(name.lower().strip().split())
+        return normalize_name(name)
     
     def calculate_similarity(self, name1: str, name2: str) -> float:
         """Calculate similarity between two names (0-1 scale)"""
-        if not name1 or not name2:
-            return 0.0
-        
-        name1_norm = self.normalize_name(name1)
-        name2_norm = self.normalize_name(name2)
-        
-        if name1_norm == name2_norm:
-            return 1.0
-        
-        # Check if one name contains the other
-        if name1_norm in name2_norm or name2_norm in name1_norm:
-            return 0.8
-        
-        # Use SequenceMatcher for more accurate similarity
-        similarity = SequenceMatcher(None, name1_norm, name2_norm).ratio()
-        
-        # Check for common words
-        words1 = set(name1_norm.split())
-        words2 = set(name2_norm.split())
-        if words1 and words2:
-            common_words = len(words1.intersection(words2))
-            total_words = len(words1.union(words2))
-            word_similarity = common_words / total_words if total_words > 0 else 0
-            # Take the higher of the two similarities
-            similarity = max(similarity, word_similarity)
-        
-        return similarity
+        return self.similarity_kernel.similarity(name1, name2)
     
     def check_nickname_match(self, name1: str, name2: str) -> Tuple[bool, float]:
         """Check if two names match through nickname mappings"""
-        name1_norm = self.normalize_name(name1)
-        name2_norm = self.normalize_name(name2)
-        
-        # Check direct nickname mappings
-        for full_name, nicknames in self.nickname_mappings.items():
-            full_name_norm = self.normalize_name(full_name)
-            
-            # Check if name1 matches full name and name2 matches a nickname
-            if name1_norm == full_name_norm:
-                for nickname in nicknames:
-                    if self.normalize_name(nickname) == name2_norm:
-                        return True, 0.9  # High confidence for nickname match
-            
-            # Check if name2 matches full name and name1 matches a nickname
-            if name2_norm == full_name_norm:
-                for nickname in nicknames:
-                    if self.normalize_name(nickname) == name1_norm:
-                        return True, 0.9  # High confidence for nickname match
-            
-            # Check if both names are nicknames of the same full name
-            name1_is_nickname = any(self.normalize_name(nickname) == name1_norm for nickname in nicknames)
-            name2_is_nickname = any(self.normalize_name(nickname) == name2_norm for nickname in nicknames)
-            
-            if name1_is_nickname and name2_is_nickname:
-                return True, 0.85  # High confidence for both being nicknames
-        
+        self.refresh_nickname_mappings()
+        confidence = self.nickname_index.match(self.normalize_name(name1), self.normalize_name(name2))
+        if confidence:
+            self.nickname_stats['hits'] += 1
+            return True, confidence
+        self.nickname_stats['misses'] += 1
         return False, 0.0
     
     def find_potential_duplicates(self, client_data: Dict[str, Any], existing_clients: List[Any], 
-                                similarity_threshold: float = 0.7) -> List[Tuple[Any, str, float]]:
-        """Find potential duplicate clients based on name similarity and nickname matching"""
+                                similarity_threshold: float = 0.7,
+                                candidate_index: Optional[Any] = None) -> List[Tuple[Any, str, float]]:
+        """
+        Find potential duplicate clients based on name similarity and nickname matching.
+        
+        When a ``ClientCandidateIndex`` built over ``existing_clients`` is passed, only
+        its candidates for the name are scored instead of every existing client.
+        """
         potential_duplicates = []
         client_name = f"{client_data.get('first_name', '')} {client_data.get('last_name', '')}".strip()
         
         if not client_name:
             return potential_duplicates
         
+        if candidate_index is not None:
+            existing_clients = candidate_index.candidates(
+                client_data.get('first_name'), client_data.get('last_name')
+            )
+        
+        query_profile = self.similarity_kernel.profile(client_name)
         for existing_client in existing_clients:
             existing_name = f"{existing_client.first_name} {existing_client.last_name}".strip()
             
-            # Calculate basic similarity
-            similarity = self.calculate_similarity(client_name, existing_name)
-            
             # Check for nickname match
             is_nickname_match, nickname_confidence = self.check_nickname_match(client_name, existing_name)
             
+            # The similarity only matters if it can reach both the threshold and the nickname score
+            similarity = self.similarity_kernel.similarity_at_least(
+                query_profile, existing_name, max(similarity_threshold, nickname_confidence)
+            )
+            
             # Use the higher confidence score
-            final_similarity = max(similarity, nickname_confidence)
+            final_similarity = max(similarity or 0.0, nickname_confidence)
             
             if final_similarity >= similarity_threshold:
                 match_type = "nickname" if is_nickname_match else "similarity"
@@ -0,0 +1,166 @@
+"""
+Cached JWT identities.
+
+``JWTAuthenticationMiddleware`` used to decode the ``access_token`` cookie
+and load the user with ``User.objects.get`` on every request, after which the
+views loaded the staff profile and role set again. ``resolve_token_user``
+keeps the resolved user, with its staff profile and principal (core.principal)
+attached, in the cache under the token's ``jti`` for the rest of the token's
+lifetime, so a request with a known token costs one ``get_many`` and no
+queries.
+
+A cached identity is only used while it is current:
+
+- role, staff or assignment changes move the principal version
+  (core.signals), which every cached identity records
+- saving or deleting a user (deactivation included) moves that user's
+  identity version
+- logging out revokes the token's ``jti`` until the token expires, so the
+  cookie can no longer authenticate
+
+Revocations and version moves only reach the other workers through a shared
+cache. When the default cache is per-process (no ``REDIS_URL``), identities
+are not cached and every request loads the user again, as before.
+
+Lookups are counted per process; ``get_identity_cache_stats()`` reports the
+hits, misses and revoked tokens seen so far.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken, UntypedToken
+
+from .caching import shared_cache_is_process_local
+from .principal import PRINCIPAL_VERSION_KEY, get_principal, get_principal_version
+
+logger = logging.getLogger(__name__)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _identity_key(jti):
+    return f"identity:jti:{jti}"
+
+
+def _revoked_key(jti):
+    return f"identity:revoked:{jti}"
+
+
+def _user_version_key(user_id):
+    return f"identity:user:{user_id}:version"
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def get_identity_cache_stats():
+    """Identity cache lookups in this process: hits, misses, revoked tokens and the hit rate."""
+    with _stats_lock:
+        hits, misses, revoked = _stats['hit'], _stats['miss'], _stats['revoked']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'revoked': revoked,
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_identity_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def identity_cache_enabled():
+    """Identities are cached only when logouts and deactivations reach every worker."""
+    return not shared_cache_is_process_local()
+
+
+def _seconds_left(token):
+    return max(int(token['exp'] - time.time()), 1)
+
+
+def invalidate_user_identities(user_id):
+    """Drop the cached identities of every token of a user (saved, deactivated or deleted)."""
+    key = _user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def revoke_token(raw_token):
+    """Stop an access token from authenticating for the rest of its lifetime (logout)."""
+    try:
+        token = UntypedToken(raw_token)
+    except (InvalidToken, TokenError):
+        return
+    jti = token.get('jti')
+    if not jti:
+        return
+    cache.set(_revoked_key(jti), True, _seconds_left(token))
+    cache.delete(_identity_key(jti))
+
+
+def resolve_token_user(raw_token):
+    """
+    The active user an access token authenticates, with its staff profile
+    and principal loaded, or ``None`` for an invalid, expired, revoked or
+    inactive token.
+    """
+    try:
+        token = AccessToken(raw_token)
+        user_id = token['user_id']
+    except (InvalidToken, TokenError, KeyError):
+        return None
+    jti = token.get('jti')
+    if not jti or not identity_cache_enabled():
+        return _load_user(user_id)
+
+    identity_key = _identity_key(jti)
+    revoked_key = _revoked_key(jti)
+    user_version_key = _user_version_key(user_id)
+    cached = cache.get_many([identity_key, revoked_key, user_version_key, PRINCIPAL_VERSION_KEY])
+    if cached.get(revoked_key):
+        _record('revoked')
+        return None
+
+    principal_version = cached.get(PRINCIPAL_VERSION_KEY) or get_principal_version()
+    user_version = cached.get(user_version_key, 1)
+    identity = cached.get(identity_key)
+    if (identity is not None and identity['principal_version'] == principal_version
+            and identity['user_version'] == user_version):
+        _record('hit')
+        return identity['user']
+
+    _record('miss')
+    user = _load_user(user_id)
+    if user is None:
+        return None
+    # Resolve the principal now so it is cached along with the user
+    get_principal(user)
+    cache.set(identity_key, {
+        'user': user,
+        'principal_version': principal_version,
+        'user_version': user_version,
+    }, _seconds_left(token))
+    return user
+
+
+def _load_user(user_id):
+    User = get_user_model()
+    try:
+        user = User.objects.select_related('staff_profile').get(id=user_id)
+    except User.DoesNotExist:
+        return None
+    if not user.is_active:
+        return None
+    return user
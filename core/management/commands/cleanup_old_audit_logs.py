@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
+from core.audit import rebuild_audit_log_counts
+from core.audit_partitions import drop_expired_partitions, ensure_partitions, is_partitioned
 from core.models import AuditLog
 import logging
 
@@ -41,6 +43,15 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        try:
+            self.remove_old_logs(**options)
+        finally:
+            if not options['dry_run']:
+                # Recount the daily counters for the days the cleanup touched
+                shortest_days = min(options['days'], options['delete_days']) if options['cleanup_deletes'] else options['days']
+                rebuild_audit_log_counts(end_day=timezone.localdate(timezone.now() - timedelta(days=shortest_days)))
+
+    def remove_old_logs(self, **options):
         days_to_keep = options['days']
         cleanup_deletes = options['cleanup_deletes']
         delete_days = options['delete_days']
@@ -49,6 +60,24 @@ class Command(BaseCommand):
         
         total_deleted = 0
         
+        # Partitioned storage (PostgreSQL): keep partitions ahead of today and drop the ones
+        # past every retention period, instead of deleting their rows
+        if is_partitioned():
+            if not dry_run:
+                ensure_partitions()
+            longest_days = max(days_to_keep, delete_days) if cleanup_deletes else days_to_keep
+            dropped = drop_expired_partitions(timezone.now() - timedelta(days=longest_days), dry_run=dry_run)
+            if dropped:
+                dropped_rows = sum(rows for _, rows in dropped)
+                if not dry_run:
+                    total_deleted += dropped_rows
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'\n{"DRY RUN: Would drop" if dry_run else "✅ Dropped"} {len(dropped)} expired partition(s) '
+                        f'holding {dropped_rows} audit log(s) older than {longest_days} days.'
+                    )
+                )
+        
         # If cleanup_deletes is specified, clean up delete records first
         if cleanup_deletes:
             delete_cutoff_date = timezone.now() - timedelta(days=delete_days)
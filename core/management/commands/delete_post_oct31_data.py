@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 from datetime import datetime, date
+from core.audit import audit_buffer
 from core.models import (
     Program, ClientProgramEnrollment, ServiceRestriction, SubProgram,
     ProgramStaff, ProgramManagerAssignment, create_audit_log
@@ -126,7 +127,8 @@ class Command(BaseCommand):
             return
         
         try:
-            with transaction.atomic():
+            # Audit entries are buffered and written in batches when the transaction commits
+            with transaction.atomic(), audit_buffer():
                 deleted_counts = {
                     'programs': 0,
                     'enrollments': 0,
@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.audit import rebuild_audit_log_counts
+from core.audit_partitions import (
+    DEFAULT_PARTITIONS_AHEAD, drop_expired_partitions, ensure_partitions, is_partitioned, list_partitions,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming audit log partitions and drop (or detach) partitions older than the retention period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=DEFAULT_PARTITIONS_AHEAD,
+            help=f'Days of partitions to create ahead of today (default: {DEFAULT_PARTITIONS_AHEAD})',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=15,
+            help='Drop partitions that only hold audit logs older than this many days (default: 15)',
+        )
+        parser.add_argument(
+            '--detach',
+            action='store_true',
+            help='Detach expired partitions (keeping them as standalone tables) instead of dropping them',
+        )
+        parser.add_argument(
+            '--no-drop',
+            action='store_true',
+            help='Only create partitions',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the partitions and exit',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be created and dropped without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('The audit_logs table is not partitioned (PostgreSQL only, see migration 0087).')
+
+        if options['list']:
+            for partition in list_partitions():
+                if partition.is_default:
+                    self.stdout.write(f'{partition.name}: default')
+                else:
+                    self.stdout.write(f'{partition.name}: {partition.lower or "MINVALUE"} -> {partition.upper}')
+            return
+
+        dry_run = options['dry_run']
+        prefix = 'DRY RUN: would ' if dry_run else ''
+
+        created = ensure_partitions(ahead_days=options['ahead'], dry_run=dry_run)
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'{prefix}create {len(created)} partition(s): {", ".join(created)}'))
+        else:
+            self.stdout.write(f'Partitions already exist for the next {options["ahead"]} day(s).')
+
+        if options['no_drop']:
+            return
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        dropped = drop_expired_partitions(cutoff, detach=options['detach'], dry_run=dry_run)
+        if not dropped:
+            self.stdout.write(f'No partitions older than {options["days"]} days.')
+            return
+
+        action = 'detach' if options['detach'] else 'drop'
+        for name, rows in dropped:
+            self.stdout.write(self.style.WARNING(f'{prefix}{action} {name} ({rows} audit log(s))'))
+        total = sum(rows for _, rows in dropped)
+        if not dry_run:
+            rebuild_audit_log_counts(end_day=timezone.localdate(cutoff))
+            logger.info(f"{'Detached' if options['detach'] else 'Dropped'} {len(dropped)} audit log partition(s) holding {total} row(s)")
+        self.stdout.write(self.style.SUCCESS(f'\n📊 {prefix}{action} {len(dropped)} partition(s), {total} audit log(s)'))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import ClientUploadLog
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Process queued background client uploads, or resume a failed upload from its last committed chunk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resume',
+            metavar='UPLOAD_ID',
+            help='External ID of an upload to resume from its last checkpoint',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Maximum number of queued uploads to process (default: all)',
+        )
+
+    def handle(self, *args, **options):
+        from clients.upload_jobs import can_resume, run_client_upload_job
+
+        if options['resume']:
+            try:
+                upload_log = ClientUploadLog.objects.get(external_id=options['resume'])
+            except (ClientUploadLog.DoesNotExist, ValueError):
+                raise CommandError(f"Upload {options['resume']} not found")
+            if not can_resume(upload_log):
+                raise CommandError(f'Upload {upload_log.external_id} cannot be resumed (status: {upload_log.status})')
+
+            self.stdout.write(f'Resuming upload {upload_log.external_id} ({upload_log.file_name})...')
+            result = run_client_upload_job(upload_log.pk, resume=True)
+            self._report(upload_log, result)
+            return
+
+        queued = ClientUploadLog.objects.filter(status='queued').order_by('started_at')
+        if options['limit']:
+            queued = queued[:options['limit']]
+        queued = list(queued)
+
+        if not queued:
+            self.stdout.write('No queued uploads.')
+            return
+
+        for upload_log in queued:
+            # A queued upload with a checkpoint was requested for resume
+            resume = bool((upload_log.upload_details or {}).get('checkpoint'))
+            self.stdout.write(f'Processing upload {upload_log.external_id} ({upload_log.file_name})...')
+            result = run_client_upload_job(upload_log.pk, resume=resume)
+            self._report(upload_log, result)
+
+    def _report(self, upload_log, result):
+        upload_log.refresh_from_db()
+        if upload_log.status == 'failed':
+            self.stdout.write(self.style.ERROR(
+                f'  Failed: {upload_log.error_message or (result or {}).get("error", "unknown error")}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'  {upload_log.status}: {upload_log.records_created} created, '
+                f'{upload_log.records_updated} updated, {upload_log.errors_count} errors'
+            ))
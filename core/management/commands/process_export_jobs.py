@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from core.models import ExportJob
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background exports and expire old or over-budget export files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Maximum number of queued exports to run (default: all)',
+        )
+        parser.add_argument(
+            '--cleanup-only',
+            action='store_true',
+            help='Only expire export files past their age or size limits',
+        )
+
+    def handle(self, *args, **options):
+        from core.export_jobs import evict_export_artifacts, run_export_job
+
+        if not options['cleanup_only']:
+            queued = ExportJob.objects.filter(status='queued').order_by('created_at')
+            if options['limit']:
+                queued = queued[:options['limit']]
+            queued = list(queued)
+
+            if not queued:
+                self.stdout.write('No queued exports.')
+            for job in queued:
+                self.stdout.write(f'Running {job.export_type} export {job.external_id}...')
+                run_export_job(job.pk)
+                job.refresh_from_db()
+                if job.status == 'failed':
+                    self.stdout.write(self.style.ERROR(f'  Failed: {job.error_message}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'  {job.row_count} rows, {job.file_size} bytes in {job.duration_seconds}s'
+                    ))
+
+        expired = evict_export_artifacts()
+        self.stdout.write(f'Expired {expired} export files.')
@@ -0,0 +1,103 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import DuplicateScanRun
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Scan every client for likely duplicates and flag them for review, or resume an interrupted scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resume',
+            metavar='SCAN_ID',
+            help="External ID of a scan to resume from its last committed batch, or 'latest'",
+        )
+        parser.add_argument(
+            '--queued',
+            action='store_true',
+            help='Run scans queued from the dedupe page instead of starting a new one',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=None,
+            help='Minimum similarity for a pair to be flagged (default: 0.88)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Clients scanned per committed batch (default: 500)',
+        )
+        parser.add_argument(
+            '--include-archived',
+            action='store_true',
+            help='Include archived clients in the scan',
+        )
+        parser.add_argument(
+            '--source',
+            type=str,
+            help='Only scan clients from this source (e.g. SMIS, EMHware)',
+        )
+
+    def handle(self, *args, **options):
+        from clients.duplicate_scan import (
+            DEFAULT_SCAN_BATCH_SIZE, DEFAULT_SCAN_THRESHOLD, can_resume, run_duplicate_scan_job,
+        )
+
+        if options['resume']:
+            scans = DuplicateScanRun.objects.all()
+            try:
+                if options['resume'] == 'latest':
+                    scan_run = scans.filter(status__in=['failed', 'queued', 'processing']).order_by('-created_at').first()
+                    if scan_run is None:
+                        raise DuplicateScanRun.DoesNotExist
+                else:
+                    scan_run = scans.get(external_id=options['resume'])
+            except (DuplicateScanRun.DoesNotExist, ValueError):
+                raise CommandError(f"Scan {options['resume']} not found")
+            if not can_resume(scan_run):
+                raise CommandError(f'Scan {scan_run.external_id} cannot be resumed (status: {scan_run.status})')
+
+            self.stdout.write(f'Resuming scan {scan_run.external_id} after client {scan_run.last_client_id}...')
+            self._run(scan_run, run_duplicate_scan_job, resume=True)
+            return
+
+        if options['queued']:
+            queued = list(DuplicateScanRun.objects.filter(status='queued').order_by('created_at'))
+            if not queued:
+                self.stdout.write('No queued scans.')
+                return
+            for scan_run in queued:
+                self.stdout.write(f'Running scan {scan_run.external_id}...')
+                self._run(scan_run, run_duplicate_scan_job, resume=scan_run.last_client_id > 0)
+            return
+
+        scan_run = DuplicateScanRun.objects.create(
+            status='queued',
+            options={
+                'threshold': options['threshold'] or DEFAULT_SCAN_THRESHOLD,
+                'batch_size': options['batch_size'] or DEFAULT_SCAN_BATCH_SIZE,
+                'include_archived': options['include_archived'],
+                'source': options['source'],
+                'runner': 'command',
+            },
+        )
+        self.stdout.write(f'Starting scan {scan_run.external_id}...')
+        self._run(scan_run, run_duplicate_scan_job, resume=False)
+
+    def _run(self, scan_run, run_duplicate_scan_job, resume):
+        run_duplicate_scan_job(scan_run.pk, resume=resume)
+        scan_run.refresh_from_db()
+        if scan_run.status == 'failed':
+            self.stdout.write(self.style.ERROR(
+                f'  Failed after client {scan_run.last_client_id}: {scan_run.error_message}. '
+                f'Resume with --resume {scan_run.external_id}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'  {scan_run.clients_scanned} clients, {scan_run.pairs_compared} pairs compared '
+                f'({scan_run.pairs_per_second or 0} pairs/sec), {scan_run.duplicates_flagged} duplicates flagged'
+            ))
@@ -51,3 +51,7 @@ class Command(BaseCommand):
             
             self.stdout.write(f"  '{test_name1}' vs '{test_name2}': {final_similarity:.2f} "
                             f"({'nickname' if test_nickname_match else 'similarity'})")
+        
+        stats = fuzzy_matcher.get_nickname_stats()
+        self.stdout.write(f"\nNickname index: {stats['groups']} groups, {stats['hits']} hits, "
+                          f"{stats['misses']} misses, {stats['reloads']} reloads")
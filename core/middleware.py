@@ -1,14 +1,11 @@
-from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import AccessToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-
-User = get_user_model()
+from django.utils.functional import SimpleLazyObject
 
 
 class JWTAuthenticationMiddleware:
     """
     Middleware to handle JWT authentication for web requests.
     This middleware checks for JWT tokens in cookies and sets the user accordingly.
+    The user, staff profile and principal are cached per token (see core.identity).
     """
     
     def __init__(self, get_response):
@@ -18,13 +15,26 @@ class JWTAuthenticationMiddleware:
         # Check for JWT token in cookies
         token = request.COOKIES.get('access_token')
         if token and not request.user.is_authenticated:
-            try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                request.user = User.objects.get(id=user_id)
-            except (InvalidToken, TokenError, User.DoesNotExist):
-                # Token is invalid, leave user as anonymous
-                pass
+            from core.identity import resolve_token_user
+            user = resolve_token_user(token)
+            # Invalid, expired, revoked or inactive tokens leave the user anonymous
+            if user is not None:
+                request.user = user
 
         response = self.get_response(request)
         return response
+
+
+class PrincipalMiddleware:
+    """
+    Attach the user's resolved roles and assignments as ``request.principal``.
+    Resolved lazily, once per request, from the versioned principal cache.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from core.principal import get_principal
+        request.principal = SimpleLazyObject(lambda: get_principal(request.user))
+        return self.get_response(request)
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0085_client_upload_log_job_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateScanRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.UUIDField(db_index=True, default=uuid.uuid4, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('success', 'Success'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('options', models.JSONField(default=dict, help_text='Options the scan was started with')),
+                ('clients_total', models.IntegerField(default=0, help_text='Clients covered by the scan')),
+                ('clients_scanned', models.IntegerField(default=0)),
+                ('pairs_compared', models.BigIntegerField(default=0, help_text='Candidate pairs scored')),
+                ('duplicates_flagged', models.IntegerField(default=0)),
+                ('last_client_id', models.BigIntegerField(default=0, help_text='Highest client id fully scanned')),
+                ('pairs_per_second', models.FloatField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicate_scans', to='core.staff')),
+            ],
+            options={
+                'db_table': 'duplicate_scan_runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='duplicate_s_status_ecdd36_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:18
+
+from django.db import migrations
+
+
+def partition_audit_logs(apps, schema_editor):
+    """Rebuild audit_logs as a table partitioned on changed_at (PostgreSQL only)"""
+    from core.audit_partitions import convert_to_partitioned, is_partitioned
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or is_partitioned(connection):
+        return
+    Staff = apps.get_model('core', 'Staff')
+    convert_to_partitioned(connection, staff_table=Staff._meta.db_table)
+
+
+def unpartition_audit_logs(apps, schema_editor):
+    """Copy the partitions back into a plain audit_logs table"""
+    from core.audit_partitions import convert_to_plain, is_partitioned
+
+    connection = schema_editor.connection
+    if not is_partitioned(connection):
+        return
+    Staff = apps.get_model('core', 'Staff')
+    convert_to_plain(connection, staff_table=Staff._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0086_duplicate_scan_run'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_audit_logs, unpartition_audit_logs),
+    ]
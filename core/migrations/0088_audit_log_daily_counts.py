@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:26
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import uuid
+
+
+def count_existing_audit_logs(apps, schema_editor):
+    """Fill the daily counters from the audit logs already stored"""
+    AuditLog = apps.get_model('core', 'AuditLog')
+    AuditLogDailyCount = apps.get_model('core', 'AuditLogDailyCount')
+    
+    rows = (
+        AuditLog.objects.order_by()
+        .annotate(day=TruncDate('changed_at'))
+        .values('day', 'entity', 'action')
+        .annotate(total=Count('id'))
+    )
+    AuditLogDailyCount.objects.bulk_create(
+        [
+            AuditLogDailyCount(day=row['day'], entity=row['entity'], action=row['action'], count=row['total'])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0087_partition_audit_logs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.UUIDField(db_index=True, default=uuid.uuid4, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField(db_index=True)),
+                ('entity', models.CharField(max_length=100)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('archive', 'Archive'), ('restore', 'Restore'), ('import', 'Import'), ('login', 'Login'), ('logout', 'Logout')], max_length=20)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'audit_log_daily_counts',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='auditlogdailycount',
+            constraint=models.UniqueConstraint(fields=('day', 'entity', 'action'), name='unique_audit_log_daily_count'),
+        ),
+        migrations.RunPython(count_existing_audit_logs, migrations.RunPython.noop),
+    ]
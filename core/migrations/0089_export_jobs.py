@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0088_audit_log_daily_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.UUIDField(db_index=True, default=uuid.uuid4, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('export_type', models.CharField(db_index=True, help_text='Registered export (see core.export_jobs)', max_length=50)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=10)),
+                ('filters', models.JSONField(default=dict)),
+                ('scope', models.JSONField(default=dict)),
+                ('cache_key', models.CharField(db_index=True, max_length=64)),
+                ('options', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('success', 'Success'), ('failed', 'Failed'), ('expired', 'Expired')], db_index=True, default='queued', max_length=20)),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('file_path', models.CharField(blank=True, max_length=500, null=True)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('row_count', models.IntegerField(default=0)),
+                ('download_count', models.IntegerField(default=0)),
+                ('last_accessed_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to='core.staff')),
+            ],
+            options={
+                'db_table': 'export_jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['cache_key', 'status', 'completed_at'], name='export_jobs_cache_k_2a1145_idx')],
+            },
+        ),
+    ]
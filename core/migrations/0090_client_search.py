@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+def install_client_search(apps, schema_editor):
+    """pg_trgm index and search_text trigger on clients (PostgreSQL only)"""
+    from core.client_search import install_search_index
+
+    install_search_index(schema_editor.connection)
+
+
+def uninstall_client_search(apps, schema_editor):
+    from core.client_search import uninstall_search_index
+
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0089_export_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Lowercased search fields for trigram search, kept up to date by a database trigger (see core.client_search)'),
+        ),
+        migrations.RunPython(install_client_search, uninstall_client_search),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0090_client_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.UUIDField(db_index=True, default=uuid.uuid4, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('alias', models.CharField(help_text='Normalized name: lowercase, single spaces', max_length=255, unique=True)),
+                ('source', models.CharField(choices=[('upload', 'Learned from a client upload'), ('manual', 'Added manually')], default='manual', max_length=20)),
+                ('use_count', models.PositiveIntegerField(default=0, help_text='Uploads that resolved a name through this alias')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='core.program')),
+            ],
+            options={
+                'db_table': 'program_aliases',
+                'ordering': ['alias'],
+            },
+        ),
+    ]
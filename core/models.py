@@ -4,6 +4,8 @@ from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.base_user import BaseUserManager
 from django.utils import timezone
 
+from .similarity import normalize_name
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -324,8 +326,18 @@ class Program(BaseModel):
             current_enrollments = self.get_current_enrollments_count()
         return min(100, (current_enrollments / self.capacity_current) * 100)
     
-    def can_enroll_client(self, client, start_date=None, exclude_instance=None):
-        """Check if a client can be enrolled in this program"""
+    def get_capacity(self, as_of_date=None):
+        """Occupancy, availability and utilization as of a date, from a single count (see core.capacity)"""
+        from .capacity import get_program_capacity
+        return get_program_capacity(self, as_of_date)
+    
+    def can_enroll_client(self, client, start_date=None, exclude_instance=None, capacity=None):
+        """
+        Check if a client can be enrolled in this program.
+        
+        ``capacity`` is this program's ProgramCapacity for ``start_date`` when the
+        caller already computed it for many programs (core.capacity.get_program_capacities).
+        """
         if start_date is None:
             start_date = timezone.now().date()
         
@@ -335,9 +347,11 @@ class Program(BaseModel):
             return restriction_check
         
         # Check if program is at capacity for the specific date
-        if not self.no_capacity_limit and self.is_at_capacity(start_date):
-            enrollments_on_date = self.get_enrollments_count_for_date(start_date)
-            return False, f"Program '{self.name}' is at full capacity on {start_date.strftime('%B %d, %Y')} ({enrollments_on_date}/{self.capacity_current} clients)."
+        if not self.no_capacity_limit:
+            if capacity is None:
+                capacity = self.get_capacity(start_date)
+            if capacity.is_at_capacity:
+                return False, self.capacity_message(start_date, capacity.current_enrollments)
         
         # Check if client is already enrolled in this program on the specific date
         existing_enrollments = ClientProgramEnrollment.objects.filter(
@@ -354,7 +368,7 @@ class Program(BaseModel):
             existing_enrollments = existing_enrollments.exclude(pk=exclude_instance.pk)
         
         if existing_enrollments.exists():
-            return False, f"Client is already enrolled in '{self.name}' program on {start_date.strftime('%B %d, %Y')}."
+            return False, self.already_enrolled_message(start_date)
         
         return True, "Client can be enrolled."
     
@@ -374,36 +388,73 @@ class Program(BaseModel):
         # Check for global restrictions (scope='org') - these block ALL programs
         global_restrictions = active_restrictions.filter(scope='org')
         if global_restrictions.exists():
-            restriction = global_restrictions.first()
-            end_date_text = restriction.end_date.strftime('%B %d, %Y') if restriction.end_date else 'indefinite'
-            
-            return False, (
-                f"⚠️ ENROLLMENT BLOCKED - ACTIVE GLOBAL SERVICE RESTRICTION\n\n"
-                f"Client: {client.first_name} {client.last_name}\n"
-                f"Restriction Type: {restriction.get_restriction_type_display()}\n"
-                f"Scope: ALL PROGRAMS (Global Restriction)\n"
-                f"Period: {restriction.start_date.strftime('%B %d, %Y')} to {end_date_text}\n"
-                f"Reason: {restriction.notes or 'No reason provided'}\n\n"
-                f"ACTION REQUIRED: This client cannot be enrolled in ANY program due to a global restriction. Please remove or modify the restriction before enrolling this client."
-            )
+            return False, self.restriction_message(client, global_restrictions.first())
         
         # Check for program-specific restrictions (scope='program') - these only block the specific program
         program_restrictions = active_restrictions.filter(scope='program', program=self)
         if program_restrictions.exists():
-            restriction = program_restrictions.first()
-            end_date_text = restriction.end_date.strftime('%B %d, %Y') if restriction.end_date else 'indefinite'
-            
-            return False, (
-                f"⚠️ ENROLLMENT BLOCKED - ACTIVE PROGRAM-SPECIFIC SERVICE RESTRICTION\n\n"
+            return False, self.restriction_message(client, program_restrictions.first())
+        
+        return True, "No restrictions found."
+    
+    def restriction_message(self, client, restriction):
+        """Why ``restriction`` (global or for this program) blocks enrolling ``client``"""
+        end_date_text = restriction.end_date.strftime('%B %d, %Y') if restriction.end_date else 'indefinite'
+        if restriction.scope == 'org':
+            return (
+                f"⚠️ ENROLLMENT BLOCKED - ACTIVE GLOBAL SERVICE RESTRICTION\n\n"
                 f"Client: {client.first_name} {client.last_name}\n"
                 f"Restriction Type: {restriction.get_restriction_type_display()}\n"
-                f"Scope: '{self.name}' program only\n"
+                f"Scope: ALL PROGRAMS (Global Restriction)\n"
                 f"Period: {restriction.start_date.strftime('%B %d, %Y')} to {end_date_text}\n"
                 f"Reason: {restriction.notes or 'No reason provided'}\n\n"
-                f"ACTION REQUIRED: This client cannot be enrolled in the '{self.name}' program due to a program-specific restriction. The client can still be enrolled in other programs."
+                f"ACTION REQUIRED: This client cannot be enrolled in ANY program due to a global restriction. Please remove or modify the restriction before enrolling this client."
             )
-        
-        return True, "No restrictions found."
+        return (
+            f"⚠️ ENROLLMENT BLOCKED - ACTIVE PROGRAM-SPECIFIC SERVICE RESTRICTION\n\n"
+            f"Client: {client.first_name} {client.last_name}\n"
+            f"Restriction Type: {restriction.get_restriction_type_display()}\n"
+            f"Scope: '{self.name}' program only\n"
+            f"Period: {restriction.start_date.strftime('%B %d, %Y')} to {end_date_text}\n"
+            f"Reason: {restriction.notes or 'No reason provided'}\n\n"
+            f"ACTION REQUIRED: This client cannot be enrolled in the '{self.name}' program due to a program-specific restriction. The client can still be enrolled in other programs."
+        )
+    
+    def capacity_message(self, start_date, current_enrollments):
+        """Why a full program rejects an enrollment starting on ``start_date``"""
+        return f"Program '{self.name}' is at full capacity on {start_date.strftime('%B %d, %Y')} ({current_enrollments}/{self.capacity_current} clients)."
+    
+    def already_enrolled_message(self, start_date):
+        return f"Client is already enrolled in '{self.name}' program on {start_date.strftime('%B %d, %Y')}."
+
+
+class ProgramAlias(BaseModel):
+    """
+    Another name a program is known by in imported files. Names resolved to
+    a program by fuzzy matching during a client upload are learned here, so
+    later uploads resolve them directly (see core.program_index).
+    """
+    SOURCE_CHOICES = [
+        ('upload', 'Learned from a client upload'),
+        ('manual', 'Added manually'),
+    ]
+    
+    alias = models.CharField(max_length=255, unique=True, help_text="Normalized name: lowercase, single spaces")
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='aliases')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='manual')
+    use_count = models.PositiveIntegerField(default=0, help_text="Uploads that resolved a name through this alias")
+    last_used_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'program_aliases'
+        ordering = ['alias']
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.program.name}"
+    
+    def save(self, *args, **kwargs):
+        self.alias = normalize_name(self.alias)
+        super().save(*args, **kwargs)
 
 
 class SubProgram(BaseModel):
@@ -519,6 +570,7 @@ class Client(BaseModel):
     is_archived = models.BooleanField(default=False, db_index=True, help_text="Whether this client is archived")
     archived_at = models.DateTimeField(null=True, blank=True, db_index=True, help_text="Timestamp when this client was archived")
     is_inactive = models.BooleanField(default=False, db_index=True, help_text="Whether this client is inactive (has zero active enrollments)")
+    search_text = models.TextField(default='', blank=True, editable=False, help_text="Lowercased search fields for trigram search, kept up to date by a database trigger (see core.client_search)")
     
     # Legacy fields (keeping for backward compatibility)
     image = models.URLField(max_length=500, null=True, blank=True)
@@ -1104,6 +1156,7 @@ class ServiceRestriction(BaseModel):
 
 
 class AuditLog(BaseModel):
+    # On PostgreSQL audit_logs is partitioned by changed_at (core.audit_partitions, migration 0087)
     ACTION_CHOICES = [
         ('create', 'Create'),
         ('update', 'Update'),
@@ -1129,41 +1182,27 @@ class AuditLog(BaseModel):
         return f"{self.entity} {self.action} - {self.changed_at}"
 
 
-def create_audit_log(entity_name, entity_id, action, changed_by=None, diff_data=None):
-    """Create an audit log entry"""
-    from django.contrib.auth import get_user_model
-    User = get_user_model()
-    
-    
-    # Get the staff profile if changed_by is a User
-    staff_profile = None
-    if changed_by and hasattr(changed_by, 'staff_profile'):
-        staff_profile = changed_by.staff_profile
-    elif changed_by and isinstance(changed_by, Staff):
-        staff_profile = changed_by
-    elif changed_by:
-        # Try to find staff profile by user
-        try:
-            staff_profile = Staff.objects.filter(user=changed_by).first()
-        except Exception as e:
-            pass
+class AuditLogDailyCount(BaseModel):
+    """Number of audit log entries per local day, entity and action (kept by core.audit as entries are written)"""
+    day = models.DateField(db_index=True)
+    entity = models.CharField(max_length=100)
+    action = models.CharField(max_length=20, choices=AuditLog.ACTION_CHOICES)
+    count = models.PositiveBigIntegerField(default=0)
     
+    class Meta:
+        db_table = 'audit_log_daily_counts'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'entity', 'action'], name='unique_audit_log_daily_count'),
+        ]
     
-    # Create the audit log entry
-    try:
-        audit_log = AuditLog.objects.create(
-            entity=entity_name,
-            entity_id=entity_id,
-            action=action,
-            changed_by=staff_profile,
-            diff_json=diff_data or {}
-        )
-        return audit_log
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error creating AuditLog: {e}")
-        return None
+    def __str__(self):
+        return f"{self.day} {self.entity} {self.action}: {self.count}"
+
+
+def create_audit_log(entity_name, entity_id, action, changed_by=None, diff_data=None):
+    """Create an audit log entry (buffered while a core.audit.audit_buffer is open)"""
+    from .audit import create_audit_log as write_audit_log
+    return write_audit_log(entity_name, entity_id, action, changed_by=changed_by, diff_data=diff_data)
 
 
 
@@ -1576,6 +1615,8 @@ class ClientUploadLog(BaseModel):
     """Track client upload operations for performance monitoring and debugging"""
     
     STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
         ('success', 'Success'),
         ('failed', 'Failed'),
         ('partial', 'Partial Success'),
@@ -1608,7 +1649,7 @@ class ClientUploadLog(BaseModel):
     # User information
     uploaded_by = models.ForeignKey('core.Staff', on_delete=models.SET_NULL, null=True, blank=True, db_index=True, related_name='client_uploads')
     
-    # Additional metadata
+    # Additional metadata (also holds the background job, resume checkpoint and per-chunk results)
     upload_details = models.JSONField(default=dict, help_text="Additional upload metadata")
     
     class Meta:
@@ -1634,4 +1675,110 @@ class ClientUploadLog(BaseModel):
         # Auto-calculate duration on save
         if self.completed_at:
             self.duration_seconds = self.calculate_duration()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class DuplicateScanRun(BaseModel):
+    """Track full-population duplicate scans, their throughput and resume checkpoint"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    # Scan options (threshold, include_archived, source, batch_size)
+    options = models.JSONField(default=dict, help_text="Options the scan was started with")
+    
+    # Progress and results
+    clients_total = models.IntegerField(default=0, help_text="Clients covered by the scan")
+    clients_scanned = models.IntegerField(default=0)
+    pairs_compared = models.BigIntegerField(default=0, help_text="Candidate pairs scored")
+    duplicates_flagged = models.IntegerField(default=0)
+    # Resume checkpoint: every client up to this id has been compared and its pairs written
+    last_client_id = models.BigIntegerField(default=0, help_text="Highest client id fully scanned")
+    pairs_per_second = models.FloatField(null=True, blank=True)
+    
+    # Timing information
+    started_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    
+    error_message = models.TextField(null=True, blank=True)
+    started_by = models.ForeignKey('core.Staff', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicate_scans')
+    
+    class Meta:
+        db_table = 'duplicate_scan_runs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Duplicate scan {self.external_id} - {self.status} ({self.clients_scanned}/{self.clients_total} clients)"
+    
+    def save(self, *args, **kwargs):
+        if self.started_at and self.completed_at:
+            self.duration_seconds = (self.completed_at - self.started_at).total_seconds()
+        super().save(*args, **kwargs)
+
+
+class ExportJob(BaseModel):
+    """Track background exports and the cached artifacts identical requests reuse"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+    
+    export_type = models.CharField(max_length=50, db_index=True, help_text="Registered export (see core.export_jobs)")
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    # Normalized request filters and the role scope the rows were limited to
+    filters = models.JSONField(default=dict)
+    scope = models.JSONField(default=dict)
+    # Hash of export type, format, filters and scope; identical requests share an artifact
+    cache_key = models.CharField(max_length=64, db_index=True)
+    # Who the job runs as and how (user_id, runner)
+    options = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    
+    # Artifact in default storage
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    file_path = models.CharField(max_length=500, null=True, blank=True)
+    file_size = models.BigIntegerField(default=0)
+    row_count = models.IntegerField(default=0)
+    download_count = models.IntegerField(default=0)
+    last_accessed_at = models.DateTimeField(null=True, blank=True)
+    
+    # Timing information
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    
+    error_message = models.TextField(null=True, blank=True)
+    requested_by = models.ForeignKey('core.Staff', on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    
+    class Meta:
+        db_table = 'export_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['cache_key', 'status', 'completed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.export_type} export {self.external_id} - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        # Runners time the export itself; fall back to the wall-clock span for jobs finished elsewhere
+        if self.started_at and self.completed_at and self.duration_seconds is None:
+            self.duration_seconds = (self.completed_at - self.started_at).total_seconds()
+        super().save(*args, **kwargs)
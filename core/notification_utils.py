@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
+from .principal import get_principal
 
 from .models import (
     Notification,
@@ -227,7 +228,7 @@ def notify_superadmin_for_approval(restriction, action='created', user=None):
             if user and hasattr(user, 'staff_profile'):
                 try:
                     user_staff = user.staff_profile
-                    user_staff_roles = [r.role.name for r in user_staff.staffrole_set.select_related('role').all()]
+                    user_staff_roles = get_principal(user).role_names
                     if 'Manager' in user_staff_roles:
                         user_role = 'Manager'
                     elif 'Leader' in user_staff_roles:
@@ -0,0 +1,171 @@
+"""
+Resolved role/permission principal for the current user.
+
+Views used to query ``staff.staffrole_set.select_related('role')`` and rebuild
+the role list several times per request. ``get_principal(user)`` resolves the
+staff profile, role names and assignment ids once, memoizes the result on the
+user object for the rest of the request, and keeps it in the cache across
+requests.
+
+Cached principals belong to the ``principal`` invalidation group
+(core.caching): any write to roles, staff role links or the
+manager/leader/staff assignment tables bumps the group (see core.signals), so
+every principal is rebuilt on its next use, in every worker.
+"""
+import logging
+
+from django.db import transaction
+
+from .caching import CacheNamespace, get_group_version, group_version_key, invalidate_group
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_GROUP = 'principal'
+PRINCIPAL_VERSION_KEY = group_version_key(PRINCIPAL_GROUP)
+DEFAULT_PRINCIPAL_CACHE_TIMEOUT = 300
+
+principal_cache = CacheNamespace(
+    'principal', groups=(PRINCIPAL_GROUP,),
+    timeout=DEFAULT_PRINCIPAL_CACHE_TIMEOUT, timeout_setting='PRINCIPAL_CACHE_TIMEOUT',
+)
+
+ADMIN_ROLES = ('SuperAdmin', 'Admin')
+
+
+class Principal:
+    """Roles and assignments of one user. Plain data, safe to cache."""
+
+    FIELDS = (
+        'user_id', 'staff_id', 'role_names', 'assigned_program_ids', 'assigned_service_ids',
+        'leader_department_ids', 'staff_program_ids', 'staff_client_ids',
+    )
+
+    def __init__(self, user_id=None, staff_id=None, role_names=(), assigned_program_ids=(),
+                 assigned_service_ids=(), leader_department_ids=(), staff_program_ids=(), staff_client_ids=()):
+        self.user_id = user_id
+        self.staff_id = staff_id
+        self.role_names = list(role_names)
+        # Active ProgramManagerAssignment / ProgramServiceManagerAssignment ids
+        self.assigned_program_ids = frozenset(assigned_program_ids)
+        self.assigned_service_ids = frozenset(assigned_service_ids)
+        # Active DepartmentLeaderAssignment department ids
+        self.leader_department_ids = frozenset(leader_department_ids)
+        # Active StaffProgramAssignment / StaffClientAssignment ids
+        self.staff_program_ids = frozenset(staff_program_ids)
+        self.staff_client_ids = frozenset(staff_client_ids)
+
+    def __repr__(self):
+        return f"<Principal user={self.user_id} staff={self.staff_id} roles={self.role_names}>"
+
+    @property
+    def has_staff_profile(self):
+        return self.staff_id is not None
+
+    def has_role(self, role_name):
+        return role_name in self.role_names
+
+    def has_any_role(self, *role_names):
+        return any(role in self.role_names for role in role_names)
+
+    @property
+    def is_admin(self):
+        """SuperAdmin or Admin role (what can_see_archived checks)"""
+        return self.has_any_role(*ADMIN_ROLES)
+
+    @property
+    def is_program_manager(self):
+        return self.has_role('Manager')
+
+    @property
+    def is_leader(self):
+        return self.has_role('Leader')
+
+    @property
+    def is_analyst(self):
+        return self.has_role('Analyst')
+
+    @property
+    def is_staff_only(self):
+        return self.has_role('Staff') and not self.has_any_role('SuperAdmin', 'Admin', 'Manager', 'Leader', 'Analyst')
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+ANONYMOUS_PRINCIPAL = Principal()
+
+
+def build_principal(user):
+    """Resolve a principal from the database."""
+    from core.models import (
+        DepartmentLeaderAssignment, ProgramManagerAssignment, ProgramServiceManagerAssignment, Staff, StaffRole,
+    )
+    from staff.models import StaffClientAssignment, StaffProgramAssignment
+
+    try:
+        staff = user.staff_profile
+    except Staff.DoesNotExist:
+        return Principal(user_id=user.pk)
+
+    role_names = [
+        staff_role.role.name
+        for staff_role in StaffRole.objects.filter(staff_id=staff.pk).select_related('role')
+    ]
+    return Principal(
+        user_id=user.pk,
+        staff_id=staff.pk,
+        role_names=role_names,
+        assigned_program_ids=ProgramManagerAssignment.objects.filter(
+            staff_id=staff.pk, is_active=True
+        ).values_list('program_id', flat=True),
+        assigned_service_ids=ProgramServiceManagerAssignment.objects.filter(
+            staff_id=staff.pk, is_active=True
+        ).values_list('program_service_id', flat=True),
+        leader_department_ids=DepartmentLeaderAssignment.objects.filter(
+            staff_id=staff.pk, is_active=True
+        ).values_list('department_id', flat=True),
+        staff_program_ids=StaffProgramAssignment.objects.filter(
+            staff_id=staff.pk, is_active=True
+        ).values_list('program_id', flat=True),
+        staff_client_ids=StaffClientAssignment.objects.filter(
+            staff_id=staff.pk, is_active=True
+        ).values_list('client_id', flat=True),
+    )
+
+
+def get_principal_version():
+    return get_group_version(PRINCIPAL_GROUP)
+
+
+def invalidate_principals():
+    """Drop every cached principal by moving to a new version."""
+    invalidate_group(PRINCIPAL_GROUP)
+
+
+def invalidate_principals_on_commit():
+    """Invalidate once the current transaction commits, so no request re-caches the old rows."""
+    transaction.on_commit(invalidate_principals)
+
+
+def get_principal(user_or_request):
+    """
+    Principal for a user (or a request's user): memoized on the user object for
+    the request, cached across requests under the current principal version.
+    """
+    user = getattr(user_or_request, 'user', user_or_request)
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return ANONYMOUS_PRINCIPAL
+
+    principal = getattr(user, '_principal', None)
+    if principal is not None:
+        return principal
+
+    principal = Principal.from_dict(
+        principal_cache.get_or_set(f"user:{user.pk}", lambda: build_principal(user).to_dict())
+    )
+    user._principal = principal
+    return principal
@@ -0,0 +1,300 @@
+"""
+Program name resolution.
+
+A client upload matched each program name from the file against the exact
+names first, then scored it against every program with the token similarity
+of the upload (word overlap, or 0.8 when one name contains the other), and
+only remembered the result for the rest of that upload. ``ProgramNameIndex``
+resolves names in this order:
+
+1. exact name (lowercase, single spaces)
+2. learned alias (``ProgramAlias``): names an earlier upload resolved
+3. fuzzy: the same token similarity, scored only against candidates from a
+   token index (programs sharing a word) and a character trigram index
+   (programs whose name may contain, or be contained in, the name). Any
+   program scoring above 0 shares a word or a substring, so the candidates
+   always include the old full scan's best match, and ties still go to the
+   first program in list order.
+
+Fuzzy resolutions scoring at least ``PROGRAM_ALIAS_MIN_SIMILARITY`` (0.8: one
+name contains the other, or most words are shared) are learned as aliases once
+the enrollment that used them commits (``confirm``), so the next upload
+resolves them in step 2. Weaker matches (a single shared word such as
+"program") are still used for that upload but not learned, since an alias
+would outrank a better-matching program added later. Learned aliases are
+listed in ``learned_aliases`` for the upload's details.
+
+The trigram index also ranks typo-tolerant matches for program search
+(``search``), using the Dice coefficient of the trigram sets. The
+program search uses the shared index from ``get_program_index()``, which is
+rebuilt when a program or alias changes (the ``program-names`` cache group,
+see core.signals). Uploads load their own index (``load_program_index()``)
+with one query instead of looking names up row by row.
+"""
+import logging
+import threading
+from collections import Counter, defaultdict, namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import get_group_version, invalidate_group_on_commit
+from .similarity import normalize_name, token_similarity
+
+logger = logging.getLogger(__name__)
+
+PROGRAM_NAMES_GROUP = 'program-names'
+
+NGRAM_SIZE = 3
+# Trigram Dice coefficient a search match needs
+DEFAULT_SEARCH_SIMILARITY = 0.5
+# Similarity a fuzzy resolution needs to be learned as an alias
+DEFAULT_ALIAS_MIN_SIMILARITY = 0.8
+
+ProgramResolution = namedtuple('ProgramResolution', ['program', 'match_type', 'score'])
+
+_shared_index = {}
+_shared_index_lock = threading.Lock()
+
+
+def get_alias_min_similarity() -> float:
+    return getattr(settings, 'PROGRAM_ALIAS_MIN_SIMILARITY', DEFAULT_ALIAS_MIN_SIMILARITY)
+
+
+def name_ngrams(text: str, size: int = NGRAM_SIZE) -> frozenset:
+    """Character n-grams of a normalized name (no padding, so substrings share all of theirs)."""
+    if len(text) < size:
+        return frozenset()
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+class ProgramNameIndex:
+    """Programs by exact name, learned alias, word and character trigram."""
+
+    def __init__(self, programs: Iterable = (), aliases: Optional[Dict[str, int]] = None):
+        self.programs = []
+        self._positions = {}
+        self._by_name = {}
+        self._by_department_name = {}
+        self._aliases = {}
+        self._tokens = defaultdict(set)
+        self._grams = defaultdict(set)
+        self._gram_counts = []
+        # Names too short to have trigrams are always candidates
+        self._short = set()
+        self._resolved = {}
+        self._confirmed = set()
+        # Aliases saved by confirm() once their transaction committed
+        self.learned_aliases = []
+        self.stats = Counter()
+        for program in programs:
+            self.add(program)
+        for alias, program_id in (aliases or {}).items():
+            self.add_alias(alias, program_id)
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    def __repr__(self):
+        return f"<ProgramNameIndex {len(self.programs)} programs, {len(self._aliases)} aliases>"
+
+    def add(self, program) -> None:
+        """Index a program (a new one, e.g. created by a program upload, included)."""
+        position = len(self.programs)
+        self.programs.append(program)
+        self._positions[program.pk] = position
+        text = normalize_name(program.name)
+        if not text:
+            self._gram_counts.append(0)
+            return
+        # Later programs with the same name win, as in the upload's name lookup
+        self._by_name[text] = program
+        self._by_department_name[(program.department_id, text)] = program
+        for token in text.split():
+            self._tokens[token].add(position)
+        grams = name_ngrams(text)
+        self._gram_counts.append(len(grams))
+        if grams:
+            for gram in grams:
+                self._grams[gram].add(position)
+        else:
+            self._short.add(position)
+        self._resolved.clear()
+
+    def add_alias(self, alias: str, program_id: int) -> None:
+        alias = normalize_name(alias)
+        if alias and program_id in self._positions:
+            self._aliases[alias] = program_id
+            self._resolved.pop(alias, None)
+
+    def get_exact(self, name: str, department_id=None):
+        """The program with this name (in the department, when given), or None."""
+        text = normalize_name(name)
+        if department_id is not None:
+            return self._by_department_name.get((department_id, text))
+        return self._by_name.get(text)
+
+    def get_alias(self, name: str):
+        program_id = self._aliases.get(normalize_name(name))
+        if program_id is None:
+            return None
+        return self.programs[self._positions[program_id]]
+
+    def candidate_positions(self, text: str) -> List[int]:
+        """Positions, in list order, of the programs that can score above 0 against ``text``."""
+        positions = set(self._short)
+        for token in text.split():
+            positions.update(self._tokens.get(token, ()))
+        grams = name_ngrams(text)
+        if not grams:
+            # Too short to index: every longer name may contain it
+            return list(range(len(self.programs)))
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        for position, count in shared.items():
+            # All of one name's trigrams appear in the other: one may contain the other
+            if count == len(grams) or count == self._gram_counts[position]:
+                positions.add(position)
+        return sorted(positions)
+
+    def best_match(self, name: str) -> Tuple[Optional[object], float]:
+        """(program, score) with the highest token similarity above 0, first in list order on ties."""
+        text = normalize_name(name)
+        best_program, best_score = None, 0
+        positions = self.candidate_positions(text)
+        self.stats['candidates_scored'] += len(positions)
+        for position in positions:
+            program = self.programs[position]
+            score = token_similarity.similarity(text, program.name or '')
+            if score > best_score:
+                best_program, best_score = program, score
+        return best_program, best_score
+
+    def resolve(self, name: str) -> ProgramResolution:
+        """The program a name from an imported file refers to; ``program`` is None when nothing matches."""
+        text = normalize_name(name)
+        resolution = self._resolved.get(text)
+        if resolution is not None:
+            return resolution
+        program = self._by_name.get(text)
+        if program is not None:
+            resolution = ProgramResolution(program, 'exact', 1.0)
+        elif text in self._aliases:
+            resolution = ProgramResolution(self.get_alias(text), 'alias', 1.0)
+        else:
+            program, score = self.best_match(text)
+            resolution = ProgramResolution(program, 'fuzzy' if program is not None else None, score)
+        self.stats[resolution.match_type or 'unresolved'] += 1
+        self._resolved[text] = resolution
+        return resolution
+
+    def search(self, term: str, limit: int = 20, min_similarity: float = DEFAULT_SEARCH_SIMILARITY) -> List[Tuple[object, float]]:
+        """
+        (program, score) for names close to ``term`` despite typos, best first:
+        aliases score 1.0, other names the trigram Dice coefficient.
+        """
+        text = normalize_name(term)
+        grams = name_ngrams(text)
+        scores = {}
+        alias_program = self.get_alias(text)
+        if alias_program is not None:
+            scores[self._positions[alias_program.pk]] = 1.0
+        if grams:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._grams.get(gram, ()))
+            for position, count in shared.items():
+                score = 2.0 * count / (len(grams) + self._gram_counts[position])
+                if score >= min_similarity and score > scores.get(position, 0):
+                    scores[position] = score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self.programs[position], round(score, 4)) for position, score in ranked]
+
+    def confirm(self, name: str, resolution: ProgramResolution, source: str = 'upload') -> None:
+        """
+        Record that an import used a resolution, once the current transaction
+        commits: fuzzy resolutions at or above the alias similarity become
+        aliases, alias uses are counted. Each name is recorded once per index.
+        """
+        text = normalize_name(name)
+        if resolution.match_type not in ('fuzzy', 'alias') or text in self._confirmed:
+            return
+        self._confirmed.add(text)
+        program = resolution.program
+        if resolution.match_type == 'alias':
+            transaction.on_commit(lambda: mark_alias_used(text))
+            return
+        if resolution.score < get_alias_min_similarity():
+            self.stats['fuzzy_not_learned'] += 1
+            return
+        self.add_alias(text, program.pk)
+
+        def learn():
+            if save_alias(text, program.pk, source):
+                self.learned_aliases.append({
+                    'alias': text,
+                    'program_id': program.pk,
+                    'program_name': program.name,
+                    'score': round(resolution.score, 4),
+                })
+
+        transaction.on_commit(learn)
+
+
+def load_aliases() -> Dict[str, int]:
+    from .models import ProgramAlias
+
+    return dict(ProgramAlias.objects.values_list('alias', 'program_id'))
+
+
+def load_program_index(programs=None) -> ProgramNameIndex:
+    """An index over ``programs`` (default: every program, with its department) and every alias."""
+    from .models import Program
+
+    if programs is None:
+        programs = Program.objects.select_related('department').order_by('pk')
+    return ProgramNameIndex(programs, load_aliases())
+
+
+def get_program_index() -> ProgramNameIndex:
+    """This process's index over every program, rebuilt after programs or aliases change."""
+    from .models import Program
+
+    version = get_group_version(PROGRAM_NAMES_GROUP)
+    cached = _shared_index.get('index')
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _shared_index_lock:
+        cached = _shared_index.get('index')
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = load_program_index(Program.objects.only('id', 'name', 'department_id').order_by('pk'))
+        _shared_index['index'] = (version, index)
+        return index
+
+
+def invalidate_program_index() -> None:
+    invalidate_group_on_commit(PROGRAM_NAMES_GROUP)
+
+
+def save_alias(alias: str, program_id: int, source: str = 'upload') -> bool:
+    """Save (or count a use of) an alias; True when it is new."""
+    from .models import ProgramAlias
+
+    _, created = ProgramAlias.objects.get_or_create(
+        alias=alias, defaults={'program_id': program_id, 'source': source},
+    )
+    if created:
+        logger.info(f"Learned program alias '{alias}' -> program {program_id}")
+    mark_alias_used(alias)
+    return created
+
+
+def mark_alias_used(alias: str) -> None:
+    from .models import ProgramAlias
+
+    ProgramAlias.objects.filter(alias=alias).update(use_count=F('use_count') + 1, last_used_at=timezone.now())
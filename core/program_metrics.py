@@ -0,0 +1,201 @@
+"""
+Program performance metrics.
+
+The program performance report and its export counted the total, active and
+completed enrollments of each program with three COUNT queries per program
+(~900 queries for 300 programs). ``get_program_metrics`` computes them for
+every program in one ``GROUP BY program_id`` query with conditional
+aggregates:
+
+- total: every enrollment (archived ones only for users who can see them)
+- active: ``start_date <= today`` with no end date or an end after today
+- completed: an end date before today
+- completion rate: completed / total, as a percentage rounded to one decimal
+
+With ``trends=True`` the same query also returns month-by-month series for
+each program: admissions (enrollments starting in the month), discharges
+(enrollments ending in the month, up to today) and the average length of stay
+in days of those discharges. Each month is one more set of conditional
+aggregates in the same pass, so a trend costs no extra queries. The window
+is the report's date range (the last 12 months by default), capped at the
+``MAX_TREND_MONTHS`` most recent months and at today.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .capacity import active_on
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TREND_MONTHS = 12
+MAX_TREND_MONTHS = 36
+
+# Lowest completion rate of each performance status, best first
+PERFORMANCE_STATUSES = (
+    (80, 'Excellent'),
+    (60, 'Good'),
+    (40, 'Fair'),
+    (0, 'Needs Improvement'),
+)
+
+
+class ProgramMetrics:
+    """Enrollment metrics of one program, with its monthly trend when requested."""
+
+    __slots__ = ('program', 'total_enrollments', 'active_enrollments', 'completed_enrollments', 'trend')
+
+    def __init__(self, program, total_enrollments=0, active_enrollments=0, completed_enrollments=0, trend=None):
+        self.program = program
+        self.total_enrollments = total_enrollments
+        self.active_enrollments = active_enrollments
+        self.completed_enrollments = completed_enrollments
+        self.trend = trend or []
+
+    def __repr__(self):
+        return (
+            f"<ProgramMetrics program={self.program.pk} {self.completed_enrollments}/"
+            f"{self.total_enrollments} completed>"
+        )
+
+    @property
+    def completion_rate(self):
+        if not self.total_enrollments:
+            return 0
+        return round(self.completed_enrollments / self.total_enrollments * 100, 1)
+
+    @property
+    def performance_status(self):
+        for lowest_rate, status in PERFORMANCE_STATUSES:
+            if self.completion_rate >= lowest_rate:
+                return status
+        return PERFORMANCE_STATUSES[-1][1]
+
+    @property
+    def trend_admissions(self):
+        return sum(point['admissions'] for point in self.trend)
+
+    @property
+    def trend_discharges(self):
+        return sum(point['discharges'] for point in self.trend)
+
+    @property
+    def trend_peak(self):
+        """Highest monthly admission or discharge count, to scale trend charts."""
+        return max([point['admissions'] for point in self.trend] + [point['discharges'] for point in self.trend] + [0])
+
+    @property
+    def trend_average_length_of_stay(self):
+        """Average length of stay in days over the whole trend, or None without discharges."""
+        discharges = self.trend_discharges
+        if not discharges:
+            return None
+        return round(sum(point['length_of_stay_days'] for point in self.trend) / discharges, 1)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def get_trend_months(start_date=None, end_date=None, today=None, months=DEFAULT_TREND_MONTHS):
+    """
+    First days of the months from ``start_date`` through ``end_date`` (default: the
+    ``months`` months up to ``today``), keeping the last ``MAX_TREND_MONTHS``.
+    """
+    today = today or timezone.now().date()
+    end_date = min(end_date or today, today)
+    if start_date is None:
+        start_date = month_start(end_date)
+        for _ in range(max(months, 1) - 1):
+            start_date = month_start(start_date - timedelta(days=1))
+    if start_date > end_date:
+        return []
+    trend_months = []
+    month = month_start(start_date)
+    while month <= end_date:
+        trend_months.append(month)
+        month = next_month(month)
+    return trend_months[-MAX_TREND_MONTHS:]
+
+
+def _month_aggregates(index, month, window_start, window_end):
+    """Admissions, discharges and total stay of one month, within [window_start, window_end]."""
+    start = max(month, window_start)
+    end = min(next_month(month), window_end + timedelta(days=1))
+    admitted = Q(start_date__gte=start, start_date__lt=end)
+    discharged = Q(end_date__gte=start, end_date__lt=end)
+    return {
+        f'admissions_{index}': Count('id', filter=admitted),
+        f'discharges_{index}': Count('id', filter=discharged),
+        f'stay_{index}': Sum(
+            ExpressionWrapper(F('end_date') - F('start_date'), output_field=DurationField()),
+            filter=discharged,
+        ),
+    }
+
+
+def _days(duration):
+    if duration is None:
+        return 0
+    if isinstance(duration, timedelta):
+        return duration.total_seconds() / 86400
+    # Backends without a native interval return microseconds
+    return duration / 86400_000_000
+
+
+def get_program_metrics(programs, include_archived=False, today=None, trends=False, trend_start=None, trend_end=None):
+    """
+    ``ProgramMetrics`` of every program (model instances or a queryset), in
+    order, from one grouped query; ``trends`` adds the monthly series for
+    ``trend_start`` through ``trend_end``.
+    """
+    today = today or timezone.now().date()
+    programs = list(programs)
+    if not programs:
+        return []
+    from .models import ClientProgramEnrollment
+
+    aggregates = {
+        'total': Count('id'),
+        'active': Count('id', filter=active_on(today)),
+        'completed': Count('id', filter=Q(end_date__isnull=False, end_date__lt=today)),
+    }
+    trend_months = get_trend_months(trend_start, trend_end, today=today) if trends else []
+    if trend_months:
+        window_start = max(trend_start or trend_months[0], trend_months[0])
+        window_end = min(trend_end or today, today)
+        for index, month in enumerate(trend_months):
+            aggregates.update(_month_aggregates(index, month, window_start, window_end))
+
+    enrollments = ClientProgramEnrollment.objects.filter(program_id__in=[program.pk for program in programs])
+    if not include_archived:
+        enrollments = enrollments.filter(is_archived=False)
+    rows = {
+        row['program_id']: row
+        for row in enrollments.order_by().values('program_id').annotate(**aggregates)
+    }
+
+    metrics = []
+    for program in programs:
+        row = rows.get(program.pk, {})
+        trend = []
+        for index, month in enumerate(trend_months):
+            discharges = row.get(f'discharges_{index}', 0)
+            stay_days = _days(row.get(f'stay_{index}'))
+            trend.append({
+                'month': month,
+                'admissions': row.get(f'admissions_{index}', 0),
+                'discharges': discharges,
+                'length_of_stay_days': stay_days,
+                'average_length_of_stay': round(stay_days / discharges, 1) if discharges else None,
+            })
+        metrics.append(ProgramMetrics(
+            program, row.get('total', 0), row.get('active', 0), row.get('completed', 0), trend,
+        ))
+    return metrics
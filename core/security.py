@@ -74,9 +74,8 @@ class SecurityManager:
             return []
         
         try:
-            staff = user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            return [staff_role.role.name for staff_role in user_roles]
+            from .principal import get_principal
+            return get_principal(user).role_names
         except Exception:
             return []
     
@@ -0,0 +1,164 @@
+"""
+Cache invalidation signals.
+
+Roles, staff role links and the manager/leader/staff assignment tables feed
+the cached principals in core.principal. Any write to them moves the principal
+cache to a new version once the transaction commits.
+
+Enrollments, restrictions and clients feed the visibility sets in
+core.client_scope. A write drops only the program and staff-name sets it
+touches, before and after the change; the values before it are the ones the
+instance was loaded with (``post_init``), so saves in upload and merge loops
+cost no extra query.
+
+Clients, enrollments, programs, restrictions and staff feed the cached
+dashboard counters in core.dashboard_stats; any write to them drops every
+cached dashboard entry once the transaction commits.
+
+Programs and program aliases feed the program name index in
+core.program_index; any write to them rebuilds it once the transaction
+commits.
+
+Saving or deleting a user drops the cached JWT identities of that user
+(core.identity) once the transaction commits, and logging out revokes the
+access token in the request's cookie.
+
+Queryset ``.update()`` and bulk calls bypass these signals; callers that
+deactivate assignments that way call ``invalidate_principals_on_commit()``
+themselves, and bulk client writes call ``invalidate_client_scopes()`` and
+``invalidate_dashboard_stats()``.
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+from core.client_scope import invalidate_scope_keys
+from core.dashboard_stats import invalidate_dashboard_stats
+from core.identity import invalidate_user_identities, revoke_token
+from core.principal import invalidate_principals_on_commit
+from core.program_index import invalidate_program_index
+
+PRINCIPAL_SOURCES = (
+    'core.Role',
+    'core.Staff',
+    'core.StaffRole',
+    'core.ProgramManagerAssignment',
+    'core.ProgramServiceManagerAssignment',
+    'core.DepartmentLeaderAssignment',
+    'staff.StaffProgramAssignment',
+    'staff.StaffClientAssignment',
+)
+
+
+def principal_source_changed(sender, **kwargs):
+    invalidate_principals_on_commit()
+
+
+for source in PRINCIPAL_SOURCES:
+    post_save.connect(principal_source_changed, sender=source, dispatch_uid=f'principal-save-{source}')
+    post_delete.connect(principal_source_changed, sender=source, dispatch_uid=f'principal-delete-{source}')
+
+
+# Fields that place a client in a visibility set: (program id fields, staff name fields)
+CLIENT_SCOPE_SOURCES = {
+    'core.ClientProgramEnrollment': (('program_id',), ('created_by',)),
+    'core.ServiceRestriction': ((), ('created_by',)),
+    'core.Client': ((), ('updated_by',)),
+}
+
+
+def _scope_values(instance, fields):
+    program_fields, name_fields = fields
+    return (
+        [getattr(instance, field) for field in program_fields],
+        [getattr(instance, field) for field in name_fields],
+    )
+
+
+def remember_scope_values(sender, instance, **kwargs):
+    """Keep the loaded program/name values so moving a client out of a set drops it too."""
+    fields = CLIENT_SCOPE_SOURCES[sender._meta.label]
+    # Deferred fields would cost a query each here; load_deferred_scope_values reads them on save
+    if all(field in instance.__dict__ for field in (*fields[0], *fields[1])):
+        instance._scope_previous = _scope_values(instance, fields)
+
+
+def load_deferred_scope_values(sender, instance, raw=False, **kwargs):
+    """Read the stored values of instances loaded without them (``only()``/``defer()``)."""
+    if raw or instance.pk is None or hasattr(instance, '_scope_previous'):
+        return
+    program_fields, name_fields = CLIENT_SCOPE_SOURCES[sender._meta.label]
+    previous = sender.objects.filter(pk=instance.pk).values(*program_fields, *name_fields).first()
+    if previous:
+        instance._scope_previous = (
+            [previous[field] for field in program_fields],
+            [previous[field] for field in name_fields],
+        )
+
+
+def client_scope_source_changed(sender, instance, **kwargs):
+    fields = CLIENT_SCOPE_SOURCES[sender._meta.label]
+    program_ids, staff_names = _scope_values(instance, fields)
+    previous_program_ids, previous_staff_names = getattr(instance, '_scope_previous', ((), ()))
+    invalidate_scope_keys(
+        program_ids=[*program_ids, *previous_program_ids],
+        staff_names=[*staff_names, *previous_staff_names],
+    )
+    # The saved values are the stored ones for the instance's next save
+    instance._scope_previous = (program_ids, staff_names)
+
+
+for source in CLIENT_SCOPE_SOURCES:
+    post_init.connect(remember_scope_values, sender=source, dispatch_uid=f'client-scope-init-{source}')
+    pre_save.connect(load_deferred_scope_values, sender=source, dispatch_uid=f'client-scope-pre-save-{source}')
+    post_save.connect(client_scope_source_changed, sender=source, dispatch_uid=f'client-scope-save-{source}')
+    post_delete.connect(client_scope_source_changed, sender=source, dispatch_uid=f'client-scope-delete-{source}')
+
+
+DASHBOARD_SOURCES = (
+    'core.Client',
+    'core.ClientProgramEnrollment',
+    'core.Program',
+    'core.ServiceRestriction',
+    'core.Staff',
+)
+
+
+def dashboard_source_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+for source in DASHBOARD_SOURCES:
+    post_save.connect(dashboard_source_changed, sender=source, dispatch_uid=f'dashboard-save-{source}')
+    post_delete.connect(dashboard_source_changed, sender=source, dispatch_uid=f'dashboard-delete-{source}')
+
+
+PROGRAM_NAME_SOURCES = (
+    'core.Program',
+    'core.ProgramAlias',
+)
+
+
+def program_name_source_changed(sender, **kwargs):
+    invalidate_program_index()
+
+
+for source in PROGRAM_NAME_SOURCES:
+    post_save.connect(program_name_source_changed, sender=source, dispatch_uid=f'program-names-save-{source}')
+    post_delete.connect(program_name_source_changed, sender=source, dispatch_uid=f'program-names-delete-{source}')
+
+
+def user_changed(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user_identities(user_id))
+
+
+def user_logged_out_revoke_token(sender, request=None, **kwargs):
+    token = request.COOKIES.get('access_token') if request is not None else None
+    if token:
+        revoke_token(token)
+
+
+post_save.connect(user_changed, sender='core.User', dispatch_uid='identity-save-user')
+post_delete.connect(user_changed, sender='core.User', dispatch_uid='identity-delete-user')
+user_logged_out.connect(user_logged_out_revoke_token, dispatch_uid='identity-logout')
@@ -0,0 +1,189 @@
+"""
+Batched, memoized name similarity.
+
+Duplicate checks score one incoming name against many existing names, and the
+same names come up again and again within an upload. ``SimilarityKernel``
+keeps a normalized profile (text, token set, character counts) per name,
+memoizes pair scores in a bounded LRU, and skips pairs whose length or
+character upper bound cannot reach the caller's threshold.
+
+Two scorers are provided, each returning exactly what the function it
+replaces returned:
+
+- ``'sequence'``: ``FuzzyMatcher.calculate_similarity`` (SequenceMatcher ratio
+  or word overlap, whichever is higher)
+- ``'token'``: the upload view's ``calculate_name_similarity`` (word overlap only)
+"""
+import threading
+from collections import Counter, OrderedDict
+from difflib import SequenceMatcher
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_PAIR_CACHE_SIZE = 100000
+DEFAULT_PROFILE_CACHE_SIZE = 50000
+
+
+def normalize_name(name: str) -> str:
+    """Normalize name for comparison"""
+    if not name:
+        return ""
+    return " ".join(name.lower().strip().split())
+
+
+class NameProfile:
+    """Normalized form of a name with the pieces every comparison needs."""
+
+    __slots__ = ('text', 'tokens', 'chars')
+
+    def __init__(self, name: str):
+        self.text = normalize_name(name)
+        self.tokens = frozenset(self.text.split())
+        self.chars = None
+
+    def char_counts(self) -> Counter:
+        if self.chars is None:
+            self.chars = Counter(self.text)
+        return self.chars
+
+
+class _LRU:
+    """Small thread-safe LRU mapping."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _word_overlap(profile1: NameProfile, profile2: NameProfile) -> float:
+    common_words = len(profile1.tokens & profile2.tokens)
+    total_words = len(profile1.tokens | profile2.tokens)
+    return common_words / total_words if total_words > 0 else 0
+
+
+class SimilarityKernel:
+    """Score one query name against many candidate names."""
+
+    METHODS = ('sequence', 'token')
+
+    def __init__(self, method: str = 'sequence', cache_size: int = DEFAULT_PAIR_CACHE_SIZE,
+                 profile_cache_size: int = DEFAULT_PROFILE_CACHE_SIZE):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown similarity method '{method}'")
+        self.method = method
+        self._pair_cache = _LRU(cache_size)
+        self._profiles = _LRU(profile_cache_size)
+        self.stats = {'hits': 0, 'misses': 0, 'skipped': 0}
+
+    def profile(self, name) -> NameProfile:
+        """Cached profile for a raw name (profiles are passed through)."""
+        if isinstance(name, NameProfile):
+            return name
+        name = name or ''
+        profile = self._profiles.get(name)
+        if profile is None:
+            profile = NameProfile(name)
+            self._profiles.put(name, profile)
+        return profile
+
+    def _upper_bound(self, profile1: NameProfile, profile2: NameProfile) -> float:
+        """Cheap bound on the score of a pair that is neither equal nor contained."""
+        len1, len2 = len(profile1.text), len(profile2.text)
+        tokens1, tokens2 = len(profile1.tokens), len(profile2.tokens)
+        word_bound = min(tokens1, tokens2) / max(tokens1, tokens2) if tokens1 and tokens2 else 0
+        if self.method == 'token':
+            return word_bound
+        # SequenceMatcher.real_quick_ratio, then quick_ratio from cached character counts
+        sequence_bound = 2.0 * min(len1, len2) / (len1 + len2)
+        if sequence_bound > word_bound:
+            shared = sum((profile1.char_counts() & profile2.char_counts()).values())
+            sequence_bound = 2.0 * shared / (len1 + len2)
+        return max(sequence_bound, word_bound)
+
+    def _score(self, profile1: NameProfile, profile2: NameProfile) -> float:
+        if self.method == 'token':
+            if profile1.tokens and profile2.tokens:
+                return _word_overlap(profile1, profile2)
+            return 0
+        similarity = SequenceMatcher(None, profile1.text, profile2.text).ratio()
+        if profile1.tokens and profile2.tokens:
+            similarity = max(similarity, _word_overlap(profile1, profile2))
+        return similarity
+
+    def similarity_at_least(self, name1, name2, threshold: float = 0.0) -> Optional[float]:
+        """
+        Exact score of the pair, or None when it scores below ``threshold``.
+        """
+        score = self._fast_score(name1, name2)
+        if score is None:
+            profile1 = self.profile(name1)
+            profile2 = self.profile(name2)
+            key = (profile1.text, profile2.text)
+            score = self._pair_cache.get(key)
+            if score is not None:
+                self.stats['hits'] += 1
+            elif threshold > 0 and self._upper_bound(profile1, profile2) < threshold:
+                self.stats['skipped'] += 1
+                return None
+            else:
+                self.stats['misses'] += 1
+                score = self._score(profile1, profile2)
+                self._pair_cache.put(key, score)
+        return score if score >= threshold else None
+
+    def _fast_score(self, name1, name2) -> Optional[float]:
+        """Scores that need no comparison work: empty, equal and contained names."""
+        if not name1 or not name2:
+            return 0 if self.method == 'token' else 0.0
+        text1, text2 = self.profile(name1).text, self.profile(name2).text
+        if text1 == text2:
+            return 1.0
+        # Check if one name contains the other
+        if text1 in text2 or text2 in text1:
+            return 0.8
+        return None
+
+    def similarity(self, name1, name2) -> float:
+        return self.similarity_at_least(name1, name2)
+
+    def score_many(self, query, candidates: Iterable, threshold: float = 0.0) -> List[Tuple[int, float]]:
+        """(position, score) for every candidate name scoring at least ``threshold`` against the query."""
+        if not query:
+            return []
+        query_profile = self.profile(query)
+        matches = []
+        for position, candidate in enumerate(candidates):
+            score = self.similarity_at_least(query_profile, candidate, threshold)
+            if score is not None:
+                matches.append((position, score))
+        return matches
+
+    def clear(self) -> None:
+        self._pair_cache.clear()
+        self._profiles.clear()
+
+
+# Shared kernels
+sequence_similarity = SimilarityKernel('sequence')
+token_similarity = SimilarityKernel('token')
@@ -31,3 +31,23 @@ def query_string_with_page(context, page_number):
     query_string = params.urlencode()
     return f'?{query_string}' if query_string else f'?page={page_number}'
 
+
+@register.simple_tag(takes_context=True)
+def query_string_with_cursor(context, direction, cursor):
+    """
+    Generate a query string preserving all GET parameters except the keyset
+    cursors ('after'/'before'), and set ``direction`` to ``cursor``.
+    
+    Usage: {% query_string_with_cursor 'after' page_obj.next_cursor %}
+    """
+    request = context.get('request')
+    params = QueryDict(mutable=True)
+    if request:
+        params.update(request.GET)
+    
+    for key in ('after', 'before', 'page'):
+        if key in params:
+            del params[key]
+    
+    params[direction] = cursor
+    return f'?{params.urlencode()}'
@@ -24,7 +24,10 @@ urlpatterns = [
     path('enrollments/export/', views.EnrollmentCSVExportView.as_view(), name='enrollments_export'),
     path('restrictions/', views.RestrictionListView.as_view(), name='restrictions'),
     path('restrictions/export/', views.RestrictionCSVExportView.as_view(), name='restrictions_export'),
+    path('exports/<uuid:job_id>/', views.export_job_progress, name='export_job_progress'),
+    path('exports/<uuid:job_id>/download/', views.download_export_job, name='export_job_download'),
     path('audit-log/', views.AuditLogListView.as_view(), name='audit_log'),
+    path('audit-log/api/', views.AuditLogAPIView.as_view(), name='audit_log_api'),
     path('audit-log/restore/<int:log_id>/', views.AuditLogRestoreView.as_view(), name='audit_log_restore'),
     path('audit-log/clear-old/', views.clear_old_audit_logs, name='audit_log_clear_old'),
     path('test-messages/', views.test_messages, name='test_messages'),
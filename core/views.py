@@ -1,12 +1,12 @@
 from django.shortcuts import render, redirect
 from django.db.models import Count, Q, Case, When, Value, CharField, F, Exists, OuterRef
 from django.db import models
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse
+from django.core.files.storage import default_storage
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from functools import wraps
 import json
-import csv
 import uuid
 import logging
 from django.contrib import messages
@@ -27,11 +27,21 @@ from .models import (
     Department,
     ServiceRestriction,
     AuditLog,
+    ExportJob,
     Notification,
 )
 from .forms import EnrollmentForm
 from .forms import UserProfileForm, StaffProfileForm, PasswordChangeForm, ServiceRestrictionForm
 from .notification_utils import create_service_restriction_notification
+from .principal import get_principal
+from .client_scope import get_program_manager_client_ids, get_staff_client_ids, get_visible_clients
+from .client_search import rank_client_matches
+from .program_index import get_program_index
+from .dashboard_stats import get_dashboard_scope, get_dashboard_stats
+from .audit import rebuild_audit_log_counts
+from .audit_browser import get_audit_entities, get_audit_log_stats, keyset_page
+from .csv_export import iter_queryset, stream_csv
+from .export_jobs import build_export_job_payload, can_access_export_job, record_export_download
 
 
 User = get_user_model()
@@ -48,8 +58,7 @@ def can_see_archived(user):
     
     try:
         staff = user.staff_profile
-        user_roles = staff.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(user).role_names
         return any(role in ['SuperAdmin', 'Admin'] for role in role_names)
     except Exception:
         return False
@@ -76,38 +85,14 @@ def get_active_clients_count(request, assigned_programs=None, is_program_manager
     if request.user.is_authenticated:
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             if is_program_manager and assigned_programs:
                 # Program managers see clients enrolled in their assigned programs
-                relationship_filters = Q()
-                relationship_filters |= Q(clientprogramenrollment__program__in=assigned_programs)
-                staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
-                relationship_filters |= Q(clientprogramenrollment__created_by=staff_name)
-                relationship_filters |= Q(servicerestriction__created_by=staff_name)
-                relationship_filters |= Q(updated_by=staff_name)
-                base_queryset = base_queryset.filter(relationship_filters)
+                base_queryset = base_queryset.filter(id__in=get_program_manager_client_ids(request.user))
             elif is_staff_only:
                 # Staff-only users see clients assigned to them or enrolled in their assigned programs
-                from staff.models import StaffProgramAssignment, StaffClientAssignment
-                relationship_filters = Q()
-                assigned_program_ids = StaffProgramAssignment.objects.filter(
-                    staff=staff,
-                    is_active=True
-                ).values_list('program_id', flat=True)
-                if assigned_program_ids:
-                    relationship_filters |= Q(clientprogramenrollment__program_id__in=assigned_program_ids)
-                assigned_client_ids = StaffClientAssignment.objects.filter(
-                    staff=staff,
-                    is_active=True
-                ).values_list('client_id', flat=True)
-                if assigned_client_ids:
-                    relationship_filters |= Q(id__in=assigned_client_ids)
-                if relationship_filters:
-                    base_queryset = base_queryset.filter(relationship_filters)
-                else:
-                    base_queryset = base_queryset.none()
+                base_queryset = base_queryset.filter(id__in=get_staff_client_ids(request.user))
             elif is_leader and assigned_programs:
                 # Leaders see clients enrolled in programs in their assigned departments
                 base_queryset = base_queryset.filter(
@@ -155,8 +140,7 @@ class AnalystAccessMixin:
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Block Analyst users from accessing individual pages
                 if 'Analyst' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader', 'Staff'] for role in role_names):
@@ -212,8 +196,7 @@ class ProgramManagerAccessMixin:
         
         try:
             staff = self.request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(self.request.user).role_names
             
             # Manager can see all data - no filtering for managers
             if staff.is_program_manager():
@@ -331,8 +314,7 @@ def dashboard(request):
     # Check if user has proper permissions to access dashboard
     try:
         staff_profile = request.user.staff_profile
-        user_roles = staff_profile.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         
         # Check if user has any meaningful permissions
         has_permissions = any(role in ['SuperAdmin', 'Admin', 'Staff', 'Manager', 'Leader', 'Analyst'] for role in role_names)
@@ -357,8 +339,7 @@ def dashboard(request):
     
     try:
         staff_profile = request.user.staff_profile
-        user_roles = staff_profile.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         
         if staff_profile.is_program_manager():
             is_program_manager = True
@@ -400,37 +381,10 @@ def dashboard(request):
     except Exception:
         pass
     
-    # Get basic statistics - filter for program managers and staff-only users
-    today = timezone.now().date()
+    # Recent activity lists - filter for program managers and leaders
     user_can_see_archived_items = can_see_archived(request.user)
     
-    # Calculate active clients count using the same logic as clients list view
-    total_clients = get_active_clients_count(
-        request,
-        assigned_programs=assigned_programs,
-        is_program_manager=is_program_manager,
-        is_leader=is_leader,
-        is_staff_only=is_staff_only,
-        is_analyst=is_analyst
-    )
-    
-    if is_program_manager and assigned_programs:
-        active_programs_queryset = assigned_programs.filter(status='active')
-        if not user_can_see_archived_items:
-            active_programs_queryset = active_programs_queryset.filter(is_archived=False)
-        active_programs = active_programs_queryset.count()
-        total_staff = Staff.objects.count()  # Staff count is same for all
-        
-        # Get active restrictions count - Managers see ALL restrictions
-        active_restrictions_queryset = ServiceRestriction.objects.filter(
-            start_date__lte=today
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=today)
-        )
-        if not user_can_see_archived_items:
-            active_restrictions_queryset = active_restrictions_queryset.filter(is_archived=False)
-        active_restrictions = active_restrictions_queryset.count()
-        
+    if (is_program_manager or is_leader) and assigned_programs:
         # Get recent clients (last 5) from assigned programs
         recent_clients_queryset = Client.objects.filter(
             clientprogramenrollment__program__in=assigned_programs
@@ -438,150 +392,25 @@ def dashboard(request):
         if not user_can_see_archived_items:
             recent_clients_queryset = recent_clients_queryset.filter(is_archived=False)
         recent_clients = recent_clients_queryset.distinct().order_by('-created_at')[:5]
-        
-        # Get recent restrictions (last 5) - Managers see ALL restrictions
-        recent_restrictions_queryset = ServiceRestriction.objects.all()
-        if not user_can_see_archived_items:
-            recent_restrictions_queryset = recent_restrictions_queryset.filter(is_archived=False)
-        recent_restrictions = recent_restrictions_queryset.select_related('client', 'program').order_by('-created_at')[:5]
-        
-        # Get restricted clients (Agency-wide restrictions) - Managers see ALL agency-wide restrictions
-        restricted_clients_queryset = ServiceRestriction.objects.filter(scope='org')
-        if not user_can_see_archived_items:
-            restricted_clients_queryset = restricted_clients_queryset.filter(is_archived=False)
-        restricted_clients = restricted_clients_queryset.select_related('client', 'program').order_by('-created_at')[:10]
-    elif is_leader and assigned_programs:
-        active_programs_queryset = assigned_programs.filter(status='active')
-        if not user_can_see_archived_items:
-            active_programs_queryset = active_programs_queryset.filter(is_archived=False)
-        active_programs = active_programs_queryset.count()
-        total_staff = Staff.objects.count()  # Staff count is same for all
-        
-        # Get active restrictions count - Leaders see ALL restrictions
-        active_restrictions_queryset = ServiceRestriction.objects.filter(
-            start_date__lte=today
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=today)
-        )
-        if not user_can_see_archived_items:
-            active_restrictions_queryset = active_restrictions_queryset.filter(is_archived=False)
-        active_restrictions = active_restrictions_queryset.count()
-        
-        # Get recent clients (last 5) from assigned programs
-        recent_clients_queryset = Client.objects.filter(
-            clientprogramenrollment__program__in=assigned_programs
-        )
-        if not user_can_see_archived_items:
-            recent_clients_queryset = recent_clients_queryset.filter(is_archived=False)
-        recent_clients = recent_clients_queryset.distinct().order_by('-created_at')[:5]
-        
-        # Get recent restrictions (last 5) - Leaders see ALL restrictions
-        recent_restrictions_queryset = ServiceRestriction.objects.all()
-        if not user_can_see_archived_items:
-            recent_restrictions_queryset = recent_restrictions_queryset.filter(is_archived=False)
-        recent_restrictions = recent_restrictions_queryset.select_related('client', 'program').order_by('-created_at')[:5]
-        
-        # Get restricted clients (Agency-wide restrictions) - Leaders see ALL agency-wide restrictions
-        restricted_clients_queryset = ServiceRestriction.objects.filter(scope='org')
-        if not user_can_see_archived_items:
-            restricted_clients_queryset = restricted_clients_queryset.filter(is_archived=False)
-        restricted_clients = restricted_clients_queryset.select_related('client', 'program').order_by('-created_at')[:10]
-    elif is_staff_only:
-        active_programs_queryset = Program.objects.filter(status='active')
-        if not user_can_see_archived_items:
-            active_programs_queryset = active_programs_queryset.filter(is_archived=False)
-        active_programs = active_programs_queryset.count()
-        total_staff = Staff.objects.count()
-        
-        # Get active restrictions count - Staff users see ALL restrictions
-        active_restrictions_queryset = ServiceRestriction.objects.filter(
-            start_date__lte=today
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=today)
-        )
-        if not user_can_see_archived_items:
-            active_restrictions_queryset = active_restrictions_queryset.filter(is_archived=False)
-        active_restrictions = active_restrictions_queryset.count()
-        
-        # Get recent clients (last 5) - Staff users see ALL clients
+    elif is_staff_only or is_analyst:
+        # Get recent clients (last 5) - Staff users and Analysts see ALL clients
         recent_clients_queryset = Client.objects.all()
         if not user_can_see_archived_items:
             recent_clients_queryset = recent_clients_queryset.filter(is_archived=False)
         recent_clients = recent_clients_queryset.order_by('-created_at')[:5]
-        
-        # Get recent restrictions (last 5) - Staff users see ALL restrictions
-        recent_restrictions_queryset = ServiceRestriction.objects.all()
-        if not user_can_see_archived_items:
-            recent_restrictions_queryset = recent_restrictions_queryset.filter(is_archived=False)
-        recent_restrictions = recent_restrictions_queryset.select_related('client', 'program').order_by('-created_at')[:5]
-        
-        # Get restricted clients (Agency-wide restrictions) - Staff users see ALL agency-wide restrictions
-        restricted_clients_queryset = ServiceRestriction.objects.filter(scope='org')
-        if not user_can_see_archived_items:
-            restricted_clients_queryset = restricted_clients_queryset.filter(is_archived=False)
-        restricted_clients = restricted_clients_queryset.select_related('client', 'program').order_by('-created_at')[:10]
-    elif is_analyst:
-        active_programs_queryset = Program.objects.filter(status='active')
-        if not user_can_see_archived_items:
-            active_programs_queryset = active_programs_queryset.filter(is_archived=False)
-        active_programs = active_programs_queryset.count()
-        total_staff = Staff.objects.count()
-        
-        # Get active restrictions count - Analysts see ALL restrictions
-        active_restrictions_queryset = ServiceRestriction.objects.filter(
-            start_date__lte=today
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=today)
-        )
-        if not user_can_see_archived_items:
-            active_restrictions_queryset = active_restrictions_queryset.filter(is_archived=False)
-        active_restrictions = active_restrictions_queryset.count()
-        
-        # Get recent clients (last 5) - Analysts see ALL clients
-        recent_clients_queryset = Client.objects.all()
-        if not user_can_see_archived_items:
-            recent_clients_queryset = recent_clients_queryset.filter(is_archived=False)
-        recent_clients = recent_clients_queryset.order_by('-created_at')[:5]
-        
-        # Get recent restrictions (last 5) - Analysts see ALL restrictions
-        recent_restrictions_queryset = ServiceRestriction.objects.all()
-        if not user_can_see_archived_items:
-            recent_restrictions_queryset = recent_restrictions_queryset.filter(is_archived=False)
-        recent_restrictions = recent_restrictions_queryset.select_related('client', 'program').order_by('-created_at')[:5]
-        
-        # Get restricted clients (Agency-wide restrictions) - Analysts see ALL agency-wide restrictions
-        restricted_clients_queryset = ServiceRestriction.objects.filter(scope='org')
-        if not user_can_see_archived_items:
-            restricted_clients_queryset = restricted_clients_queryset.filter(is_archived=False)
-        restricted_clients = restricted_clients_queryset.select_related('client', 'program').order_by('-created_at')[:10]
     else:
-        active_programs_queryset = Program.objects.filter(status='active')
-        if not user_can_see_archived_items:
-            active_programs_queryset = active_programs_queryset.filter(is_archived=False)
-        active_programs = active_programs_queryset.count()
-        total_staff = Staff.objects.count()
-        
-        # Get active restrictions count
-        active_restrictions = ServiceRestriction.objects.filter(
-            is_archived=False,
-            start_date__lte=today
-        ).filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=today)
-        ).count()
-        
         # Get recent clients (last 5)
         recent_clients = Client.objects.order_by('-created_at')[:5]
-        
-        # Get recent restrictions (last 5)
-        recent_restrictions = ServiceRestriction.objects.filter(
-            is_archived=False
-        ).select_related('client', 'program').order_by('-created_at')[:5]
-        
-        # Get restricted clients (Agency-wide restrictions)
-        restricted_clients = ServiceRestriction.objects.filter(
-            is_archived=False,
-            scope='org'
-        ).select_related('client', 'program').order_by('-created_at')[:10]
+    
+    # Recent and agency-wide restrictions - every role sees ALL restrictions
+    recent_restrictions_queryset = ServiceRestriction.objects.all()
+    restricted_clients_queryset = ServiceRestriction.objects.filter(scope='org')
+    has_dashboard_scope = ((is_program_manager or is_leader) and assigned_programs) or is_staff_only or is_analyst
+    if not user_can_see_archived_items or not has_dashboard_scope:
+        recent_restrictions_queryset = recent_restrictions_queryset.filter(is_archived=False)
+        restricted_clients_queryset = restricted_clients_queryset.filter(is_archived=False)
+    recent_restrictions = recent_restrictions_queryset.select_related('client', 'program').order_by('-created_at')[:5]
+    restricted_clients = restricted_clients_queryset.select_related('client', 'program').order_by('-created_at')[:10]
     
     # Get program status with enrollment counts and capacity information
     # Filter programs based on user role
@@ -602,26 +431,26 @@ def dashboard(request):
     else:
         programs = Program.objects.none()
     
-    program_status = []
-    
-    # Limit to first 5 programs
-    programs_limited = programs[:5]
-    
-    for program in programs_limited:
-        current_enrollments = program.get_current_enrollments_count()
-        available_capacity = program.get_available_capacity()
-        capacity_percentage = program.get_capacity_percentage()
-        is_at_capacity = program.is_at_capacity()
-        
-        program_status.append({
-            'name': program.name,
-            'department': program.department,
-            'capacity_current': program.capacity_current,
-            'current_enrollments': current_enrollments,
-            'available_capacity': available_capacity,
-            'capacity_percentage': round(capacity_percentage, 1),
-            'is_at_capacity': is_at_capacity
-        })
+    # Counters and program capacity, cached per role scope (core.dashboard_stats)
+    scope_flags = {
+        'assigned_programs': assigned_programs,
+        'is_program_manager': is_program_manager,
+        'is_leader': is_leader,
+        'is_staff_only': is_staff_only,
+        'is_analyst': is_analyst,
+    }
+    stats = get_dashboard_stats(
+        request,
+        get_dashboard_scope(request.user, is_program_manager, is_leader, is_staff_only, is_analyst),
+        programs,
+        can_see_archived_items=user_can_see_archived_items,
+        **scope_flags
+    )
+    total_clients = stats['total_clients']
+    active_programs = stats['active_programs']
+    total_staff = stats['total_staff']
+    active_restrictions = stats['active_restrictions']
+    program_status = stats['program_status']
     
     context = {
         'total_clients': total_clients,
@@ -648,8 +477,7 @@ def departments(request):
     if request.user.is_authenticated:
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             # Block Analyst users from accessing departments page
             if 'Analyst' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader', 'Staff'] for role in role_names):
@@ -796,8 +624,7 @@ def enrollments(request):
     if request.user.is_authenticated:
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             # Block Analyst users from accessing enrollments page
             if 'Analyst' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader', 'Staff'] for role in role_names):
@@ -876,8 +703,7 @@ class RestrictionListView(AnalystAccessMixin, ProgramManagerAccessMixin, ListVie
         
         try:
             staff = self.request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(self.request.user).role_names
             
             # SuperAdmin and Admin see all programs
             if any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1195,8 +1021,7 @@ class AuditLogListView(ListView):
         if not request.user.is_superuser:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
                     messages.error(request, 'You do not have permission to view audit logs.')
@@ -1215,55 +1040,57 @@ class AuditLogListView(ListView):
         except (ValueError, TypeError):
             return self.paginate_by
     
+    def get_date_filters(self):
+        """(start date, end date) from the request, None where missing or invalid"""
+        parsed_dates = []
+        for param in ('start_date', 'end_date'):
+            value = self.request.GET.get(param, '').strip()
+            try:
+                parsed_dates.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+            except ValueError:
+                parsed_dates.append(None)
+        return parsed_dates
+    
     def get_queryset(self):
         """Get audit logs with filtering by date range and entity"""
         queryset = AuditLog.objects.select_related('changed_by')
         
-        # Apply date range filtering
-        start_date = self.request.GET.get('start_date', '').strip()
-        end_date = self.request.GET.get('end_date', '').strip()
-        
+        # Apply date range filtering as changed_at ranges, so partitioned storage only scans the matching partitions
+        start_date, end_date = self.get_date_filters()
         if start_date:
-            try:
-                parsed_start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                # Convert to datetime for comparison with changed_at (DateTimeField)
-                start_datetime = timezone.make_aware(datetime.combine(parsed_start_date, datetime.min.time()))
-                queryset = queryset.filter(changed_at__gte=start_datetime)
-            except ValueError:
-                pass
-        
+            start_datetime = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+            queryset = queryset.filter(changed_at__gte=start_datetime)
         if end_date:
-            try:
-                parsed_end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                # Convert to datetime for comparison with changed_at (DateTimeField)
-                end_datetime = timezone.make_aware(datetime.combine(parsed_end_date, datetime.max.time()))
-                queryset = queryset.filter(changed_at__lte=end_datetime)
-            except ValueError:
-                pass
+            end_datetime = timezone.make_aware(datetime.combine(end_date, datetime.max.time()))
+            queryset = queryset.filter(changed_at__lte=end_datetime)
         
         # Apply entity filter
         entity_filter = self.request.GET.get('entity', '').strip()
         if entity_filter:
             queryset = queryset.filter(entity=entity_filter)
         
-        return queryset.order_by('-changed_at')
+        return queryset.order_by('-changed_at', '-id')
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination on (changed_at, id): ?after=<cursor> for older entries, ?before=<cursor> for newer"""
+        page = keyset_page(
+            queryset,
+            page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_next or page.has_previous
     
     def get_context_data(self, **kwargs):
         """Add statistics to context"""
         context = super().get_context_data(**kwargs)
         
-        # Get filtered queryset for statistics
-        filtered_queryset = self.get_queryset()
-        all_audit_logs = AuditLog.objects.all()
-        
-        # Statistics for filtered results
-        context['total_events'] = filtered_queryset.count()
-        context['create_events'] = filtered_queryset.filter(action='create').count()
-        context['update_events'] = filtered_queryset.filter(action='update').count()
-        context['delete_events'] = filtered_queryset.filter(action='delete').count()
+        # Statistics for filtered results, summed from the daily counters
+        start_date, end_date = self.get_date_filters()
+        context.update(get_audit_log_stats(start_date, end_date, self.request.GET.get('entity', '').strip()))
         
         # Get all unique entities for filter dropdown
-        context['all_entities'] = sorted(all_audit_logs.values_list('entity', flat=True).distinct())
+        context['all_entities'] = get_audit_entities()
         
         # Add filter values to context
         context['start_date'] = self.request.GET.get('start_date', '')
@@ -1271,11 +1098,36 @@ class AuditLogListView(ListView):
         context['current_entity'] = self.request.GET.get('entity', '')
         
         # Add per_page to context for the template
-        context['per_page'] = str(self.get_paginate_by(self.get_queryset()))
+        context['per_page'] = str(self.get_paginate_by(None))
         
         return context
 
 
+class AuditLogAPIView(AuditLogListView):
+    """Audit log entries as JSON with the same filters, keyset cursors and statistics as the list"""
+    
+    def render_to_response(self, context, **response_kwargs):
+        page = context['page_obj']
+        return JsonResponse({
+            'results': [
+                {
+                    'id': log.id,
+                    'external_id': str(log.external_id),
+                    'entity': log.entity,
+                    'entity_id': str(log.entity_id),
+                    'action': log.action,
+                    'changed_by': str(log.changed_by) if log.changed_by else None,
+                    'changed_at': log.changed_at.isoformat(),
+                    'diff_json': log.diff_json,
+                }
+                for log in page
+            ],
+            'next_cursor': page.next_cursor if page.has_next else None,
+            'previous_cursor': page.previous_cursor if page.has_previous else None,
+            'stats': {key: context[key] for key in ('total_events', 'create_events', 'update_events', 'delete_events')},
+        })
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @jwt_required
@@ -1292,8 +1144,7 @@ def clear_old_audit_logs(request):
     if not request.user.is_superuser:
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
                 return JsonResponse({
@@ -1324,8 +1175,11 @@ def clear_old_audit_logs(request):
                 'message': 'No audit log entries older than 7 days found.'
             })
         
-        # Delete the entries
+        # Drop whole expired partitions (partitioned PostgreSQL storage), then delete what is left
+        from .audit_partitions import drop_expired_partitions
+        drop_expired_partitions(cutoff_date)
         old_logs.delete()
+        rebuild_audit_log_counts(end_day=timezone.localdate(cutoff_date))
         
         # Create audit log for this action
         from .models import create_audit_log
@@ -1368,8 +1222,7 @@ class AuditLogRestoreView(View):
         if not request.user.is_superuser:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
                     return JsonResponse({'success': False, 'error': 'You do not have permission to restore records.'}, status=403)
@@ -1806,8 +1659,7 @@ class DepartmentCreateView(AnalystAccessMixin, CreateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Manager role users cannot create departments
                 if 'Manager' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -2027,8 +1879,7 @@ class EnrollmentListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramMan
         
         try:
             staff = self.request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(self.request.user).role_names
             
             # SuperAdmin and Admin see all programs
             if any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -2170,8 +2021,7 @@ class EnrollmentListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramMan
             else:
                 try:
                     staff = self.request.user.staff_profile
-                    user_roles = staff.staffrole_set.select_related('role').all()
-                    role_names = [staff_role.role.name for staff_role in user_roles]
+                    role_names = get_principal(self.request.user).role_names
                     # SuperAdmin, Admin, and Analyst should see all counts
                     if any(role in ['SuperAdmin', 'Admin', 'Analyst'] for role in role_names):
                         has_full_access = True
@@ -2306,8 +2156,7 @@ class EnrollmentDetailView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
         
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             # Check if user is Analyst - they can see all enrollments
             if 'Analyst' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader', 'Staff'] for role in role_names):
@@ -2359,8 +2208,7 @@ class EnrollmentCreateView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot create enrollments
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Leader'] for role in role_names):
@@ -2503,8 +2351,7 @@ class EnrollmentUpdateView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot edit enrollments
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
@@ -2611,8 +2458,7 @@ class EnrollmentDeleteView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot archive enrollments
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
@@ -2708,10 +2554,11 @@ def check_program_capacity(request):
             }, status=404)
         
         # Get capacity information for the specific date
-        enrollments_on_date = program.get_enrollments_count_for_date(start_date)
-        available_capacity = program.get_available_capacity(start_date)
-        is_at_capacity = program.is_at_capacity(start_date)
-        capacity_percentage = program.get_capacity_percentage(start_date)
+        capacity = program.get_capacity(start_date)
+        enrollments_on_date = capacity.current_enrollments
+        available_capacity = capacity.available_capacity
+        is_at_capacity = capacity.is_at_capacity
+        capacity_percentage = capacity.capacity_percentage
         
         return JsonResponse({
             'success': True,
@@ -2739,32 +2586,18 @@ def check_program_capacity(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def search_clients(request):
-    """Search clients by name via AJAX with priority ordering"""
+    """Search the clients visible to the user via AJAX, best matches first (see core.client_search)"""
     try:
         query = request.GET.get('q', '').strip()
+        # Same scope as the client list
+        clients = get_visible_clients(request.user)
         
         if not query:
-            # If no query, return all clients (limit to 20 for performance)
-            clients = Client.objects.all()[:20]
+            # If no query, return the most recent clients (limit to 20 for performance)
+            clients = clients.order_by('-created_at')[:20]
         else:
-            # First get clients that start with the query (highest priority)
-            starts_with_clients = Client.objects.filter(
-                Q(first_name__istartswith=query) |
-                Q(last_name__istartswith=query)
-            )
-            
-            # Then get clients that contain the query anywhere (lower priority)
-            contains_clients = Client.objects.filter(
-                Q(first_name__icontains=query) |
-                Q(last_name__icontains=query)
-            ).exclude(
-                Q(first_name__istartswith=query) |
-                Q(last_name__istartswith=query)
-            )
-            
-            # Combine and limit results
-            clients = list(starts_with_clients) + list(contains_clients)
-            clients = clients[:50]  # Limit to 50 results for performance
+            # Name prefix matches, then substring and fuzzy matches, in one LIMITed query
+            clients = rank_client_matches(clients, query)
         
         # Format results for the frontend
         results = []
@@ -2889,8 +2722,7 @@ def approve_restriction(request, external_id):
         
         try:
             staff = request.user.staff_profile
-            user_roles = staff.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
                 messages.error(request, 'You do not have permission to approve restrictions. Only SuperAdmin and Admin can approve.')
@@ -2951,8 +2783,7 @@ class RestrictionDetailView(AnalystAccessMixin, ProgramManagerAccessMixin, Detai
         if not request.user.is_superuser:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 if staff.is_program_manager():
                     # Managers can view ALL restrictions (no access restriction for viewing)
@@ -2985,8 +2816,7 @@ class RestrictionDetailView(AnalystAccessMixin, ProgramManagerAccessMixin, Detai
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 can_approve = any(role in ['SuperAdmin', 'Admin'] for role in role_names)
             except Exception:
                 pass
@@ -2996,8 +2826,7 @@ class RestrictionDetailView(AnalystAccessMixin, ProgramManagerAccessMixin, Detai
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if staff.is_program_manager():
                     # Managers can edit restrictions for their assigned clients
@@ -3033,8 +2862,7 @@ class RestrictionDetailView(AnalystAccessMixin, ProgramManagerAccessMixin, Detai
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 can_approve = any(role in ['SuperAdmin', 'Admin'] for role in role_names)
             except Exception:
                 pass
@@ -3055,8 +2883,7 @@ class RestrictionCreateView(AnalystAccessMixin, ProgramManagerAccessMixin, Creat
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot create restrictions
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
@@ -3129,7 +2956,7 @@ class RestrictionCreateView(AnalystAccessMixin, ProgramManagerAccessMixin, Creat
             user_roles = []
             try:
                 staff = self.request.user.staff_profile
-                user_roles = [staff_role.role.name for staff_role in staff.staffrole_set.select_related('role').all()]
+                user_roles = get_principal(self.request.user).role_names
             except Exception:
                 pass
             
@@ -3233,8 +3060,7 @@ class RestrictionUpdateView(AnalystAccessMixin, ProgramManagerAccessMixin, Updat
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot edit restrictions (unless they have Admin, SuperAdmin, Manager, or Leader roles)
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager', 'Leader'] for role in role_names):
@@ -3251,8 +3077,7 @@ class RestrictionUpdateView(AnalystAccessMixin, ProgramManagerAccessMixin, Updat
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 # Admin and SuperAdmin can access all programs
                 if 'Admin' in role_names or self.request.user.is_superuser:
@@ -3294,7 +3119,7 @@ class RestrictionUpdateView(AnalystAccessMixin, ProgramManagerAccessMixin, Updat
         user_roles = []
         try:
             staff = self.request.user.staff_profile
-            user_roles = [staff_role.role.name for staff_role in staff.staffrole_set.select_related('role').all()]
+            user_roles = get_principal(self.request.user).role_names
         except Exception:
             pass
         
@@ -3428,8 +3253,7 @@ class RestrictionDeleteView(AnalystAccessMixin, ProgramManagerAccessMixin, Delet
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot archive restrictions
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Manager', 'Leader'] for role in role_names):
@@ -3535,14 +3359,8 @@ def bulk_delete_restrictions(request):
             }, status=404)
         
         # Archive the restrictions instead of deleting
-        from django.utils import timezone
-        updated_by = f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
-        archived_at = timezone.now()
-        for restriction in restrictions_to_archive:
-            restriction.is_archived = True
-            restriction.archived_at = archived_at
-            restriction.updated_by = updated_by
-            restriction.save()
+        from .bulk_lifecycle import archive_restrictions
+        archive_restrictions(restrictions_to_archive, request.user)
         
         return JsonResponse({
             'success': True,
@@ -3593,38 +3411,9 @@ def bulk_delete_departments(request):
                 'error': 'No departments found with the provided IDs'
             }, status=404)
         
-        # Actually delete the departments
-        from .models import create_audit_log
-        from django.utils import timezone
-        now_ts = timezone.now()
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        for department in departments_to_delete:
-            # Create audit log entry before deletion
-            create_audit_log(
-                entity_name='Department',
-                entity_id=department.external_id,
-                action='delete',
-                changed_by=request.user,
-                diff_data={
-                    'name': department.name,
-                    'owner': department.owner,
-                    'deleted_by': request.user.get_full_name() or request.user.username
-                }
-            )
-            
-            # Soft delete: set is_archived=True and archived_at timestamp
-            department.is_archived = True
-            department.archived_at = now_ts
-            department.save()
-
-            # Cascade archive programs and enrollments for this department
-            programs = Program.objects.filter(department=department)
-            programs.filter(is_archived=False).update(is_archived=True, archived_at=now_ts, updated_by=user_name)
-            ClientProgramEnrollment.objects.filter(program__department=department, is_archived=False).update(
-                is_archived=True,
-                archived_at=now_ts,
-                updated_by=user_name
-            )
+        # Soft delete: archive the departments with their programs and enrollments
+        from .bulk_lifecycle import archive_departments
+        archive_departments(departments_to_delete, request.user)
         
         return JsonResponse({
             'success': True,
@@ -3679,32 +3468,8 @@ def bulk_delete_enrollments(request):
             }, status=404)
         
         # Soft delete: archive enrollments instead of actually deleting them
-        from .models import create_audit_log
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        
-        for enrollment in enrollments_to_delete:
-            # Create audit log entry before archiving
-            create_audit_log(
-                entity_name='Enrollment',
-                entity_id=enrollment.external_id,
-                action='archive',
-                changed_by=request.user,
-                diff_data={
-                    'client': str(enrollment.client),
-                    'program': str(enrollment.program),
-                    'start_date': str(enrollment.start_date),
-                    'end_date': str(enrollment.end_date) if enrollment.end_date else None,
-                    'status': enrollment.status,
-                    'archived_by': user_name
-                }
-            )
-            
-            # Soft delete: set is_archived=True and archived_at timestamp
-            from django.utils import timezone
-            enrollment.is_archived = True
-            enrollment.archived_at = timezone.now()
-            enrollment.updated_by = user_name
-            enrollment.save()
+        from .bulk_lifecycle import archive_enrollments
+        archive_enrollments(enrollments_to_delete, request.user)
         
         return JsonResponse({
             'success': True,
@@ -3760,36 +3525,8 @@ def bulk_restore_enrollments(request):
             }, status=404)
         
         # Restore enrollments: set is_archived=False
-        from .models import create_audit_log
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        
-        restored_items = []
-        for enrollment in enrollments_to_restore:
-            enrollment_name = f"{enrollment.client.first_name} {enrollment.client.last_name} - {enrollment.program.name}"
-            restored_items.append(enrollment_name)
-            
-            # Create audit log entry for restoration
-            create_audit_log(
-                entity_name='Enrollment',
-                entity_id=enrollment.external_id,
-                action='restore',
-                changed_by=request.user,
-                diff_data={
-                    'client': str(enrollment.client),
-                    'program': str(enrollment.program),
-                    'start_date': str(enrollment.start_date),
-                    'end_date': str(enrollment.end_date) if enrollment.end_date else None,
-                    'status': enrollment.status,
-                    'restored_by': user_name,
-                    'restored_item': enrollment_name
-                }
-            )
-            
-            # Restore: set is_archived=False and clear archived_at
-            enrollment.is_archived = False
-            enrollment.archived_at = None
-            enrollment.updated_by = user_name
-            enrollment.save()
+        from .bulk_lifecycle import restore_enrollments
+        restored_items = restore_enrollments(enrollments_to_restore, request.user)
         
         # Create a clear success message
         if restored_count == 1:
@@ -3853,26 +3590,8 @@ def bulk_restore_departments(request):
             }, status=404)
         
         # Restore departments: set is_archived=False and clear archived_at
-        from .models import create_audit_log
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        
-        for department in departments_to_restore:
-            # Create audit log entry for restoration
-            create_audit_log(
-                entity_name='Department',
-                entity_id=department.external_id,
-                action='restore',
-                changed_by=request.user,
-                diff_data={
-                    'name': department.name,
-                    'restored_by': user_name
-                }
-            )
-            
-            # Restore: set is_archived=False and clear archived_at
-            department.is_archived = False
-            department.archived_at = None
-            department.save()
+        from .bulk_lifecycle import restore_departments
+        restore_departments(departments_to_restore, request.user)
         
         return JsonResponse({
             'success': True,
@@ -3927,27 +3646,8 @@ def bulk_restore_restrictions(request):
             }, status=404)
         
         # Restore restrictions: set is_archived=False and clear archived_at
-        from .models import create_audit_log
-        user_name = request.user.get_full_name() or request.user.username if request.user.is_authenticated else 'System'
-        
-        for restriction in restrictions_to_restore:
-            # Create audit log entry for restoration
-            create_audit_log(
-                entity_name='Restriction',
-                entity_id=restriction.external_id,
-                action='restore',
-                changed_by=request.user,
-                diff_data={
-                    'client': str(restriction.client),
-                    'restored_by': user_name
-                }
-            )
-            
-            # Restore: set is_archived=False and clear archived_at
-            restriction.is_archived = False
-            restriction.archived_at = None
-            restriction.updated_by = user_name
-            restriction.save()
+        from .bulk_lifecycle import restore_restrictions
+        restore_restrictions(restrictions_to_restore, request.user)
         
         return JsonResponse({
             'success': True,
@@ -4228,6 +3928,17 @@ def search_programs(request):
         # Combine and limit results
         programs = list(starts_with_programs) + list(contains_programs)
         programs = programs[:20]  # Limit to 20 results
+
+        # Top up with names close to the search term (typos, learned aliases)
+        if len(programs) < 20:
+            seen_ids = {program.id for program in programs}
+            similar_ids = [
+                program.id for program, _ in get_program_index().search(search_term)
+                if program.id not in seen_ids
+            ]
+            if similar_ids:
+                similar_programs = queryset.filter(id__in=similar_ids).select_related('department').in_bulk()
+                programs += [similar_programs[pk] for pk in similar_ids if pk in similar_programs][:20 - len(programs)]
         
         programs_data = []
         for program in programs:
@@ -4307,15 +4018,41 @@ class EnrollmentCSVExportView(StaffAccessControlMixin, AnalystAccessMixin, Progr
         return queryset.order_by('-created_at')
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="enrollments_export.csv"'
+        enrollments = self.get_queryset().select_related('client', 'program__department')
         
-        # Create CSV writer
-        writer = csv.writer(response)
-        
-        # Write header row
-        writer.writerow([
+        def rows():
+            from django.utils import timezone
+            today = timezone.now().date()
+            
+            for enrollment in iter_queryset(enrollments):
+                # Calculate status based on current date
+                if today < enrollment.start_date:
+                    status = "Pending"
+                elif enrollment.end_date:
+                    if today > enrollment.end_date:
+                        status = "Completed"
+                    else:
+                        status = "Active"
+                else:
+                    status = "Active"
+                
+                yield [
+                    f"{enrollment.client.first_name} {enrollment.client.last_name}",
+                    enrollment.client.client_id,
+                    enrollment.program.name,
+                    enrollment.program.department.name,
+                    enrollment.start_date.strftime('%Y-%m-%d') if enrollment.start_date else '',
+                    enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else '',
+                    status,
+                    enrollment.notes or '',
+                    enrollment.created_by or '',
+                    enrollment.created_at.strftime('%Y-%m-%d %H:%M:%S') if enrollment.created_at else '',
+                    enrollment.updated_by or '',
+                    enrollment.updated_at.strftime('%Y-%m-%d %H:%M:%S') if enrollment.updated_at else '',
+                    'Yes' if enrollment.is_archived else 'No'
+                ]
+        
+        return stream_csv(request, 'enrollments_export.csv', rows(), header=[
             'Client Name',
             'Client ID',
             'Program Name',
@@ -4330,43 +4067,6 @@ class EnrollmentCSVExportView(StaffAccessControlMixin, AnalystAccessMixin, Progr
             'Updated At',
             'Is Archived'
         ])
-        
-        # Get filtered enrollments
-        enrollments = self.get_queryset()
-        
-        # Write data rows
-        from django.utils import timezone
-        today = timezone.now().date()
-        
-        for enrollment in enrollments:
-            # Calculate status based on current date
-            if today < enrollment.start_date:
-                status = "Pending"
-            elif enrollment.end_date:
-                if today > enrollment.end_date:
-                    status = "Completed"
-                else:
-                    status = "Active"
-            else:
-                status = "Active"
-            
-            writer.writerow([
-                f"{enrollment.client.first_name} {enrollment.client.last_name}",
-                enrollment.client.client_id,
-                enrollment.program.name,
-                enrollment.program.department.name,
-                enrollment.start_date.strftime('%Y-%m-%d') if enrollment.start_date else '',
-                enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else '',
-                status,
-                enrollment.notes or '',
-                enrollment.created_by or '',
-                enrollment.created_at.strftime('%Y-%m-%d %H:%M:%S') if enrollment.created_at else '',
-                enrollment.updated_by or '',
-                enrollment.updated_at.strftime('%Y-%m-%d %H:%M:%S') if enrollment.updated_at else '',
-                'Yes' if enrollment.is_archived else 'No'
-            ])
-        
-        return response
 
 
 @method_decorator(jwt_required, name='dispatch')
@@ -4421,15 +4121,38 @@ class RestrictionCSVExportView(AnalystAccessMixin, ProgramManagerAccessMixin, Li
         return queryset.order_by('-created_at')
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="restrictions_export.csv"'
+        restrictions = self.get_queryset().select_related('client', 'program')
         
-        # Create CSV writer
-        writer = csv.writer(response)
-        
-        # Write header row
-        writer.writerow([
+        def rows():
+            today = timezone.now().date()
+            
+            for restriction in iter_queryset(restrictions):
+                # Determine status
+                status = 'Active'
+                if restriction.end_date and restriction.end_date < today:
+                    status = 'Expired'
+                elif restriction.is_indefinite:
+                    status = 'Indefinite'
+                
+                yield [
+                    f"{restriction.client.first_name} {restriction.client.last_name}",
+                    restriction.client.client_id,
+                    restriction.get_restriction_type_display(),
+                    restriction.get_scope_display(),
+                    restriction.program.name if restriction.program else 'All Programs',
+                    restriction.get_duration_display() if not restriction.is_indefinite else 'Indefinite',
+                    restriction.start_date.strftime('%Y-%m-%d') if restriction.start_date else '',
+                    restriction.end_date.strftime('%Y-%m-%d') if restriction.end_date else '',
+                    'Yes' if restriction.is_indefinite else 'No',
+                    status,
+                    restriction.notes or '',
+                    restriction.created_by or '',
+                    restriction.created_at.strftime('%Y-%m-%d %H:%M:%S') if restriction.created_at else '',
+                    restriction.updated_by or '',
+                    restriction.updated_at.strftime('%Y-%m-%d %H:%M:%S') if restriction.updated_at else ''
+                ]
+        
+        return stream_csv(request, 'restrictions_export.csv', rows(), header=[
             'Client Name',
             'Client ID',
             'Restriction Type',
@@ -4446,38 +4169,37 @@ class RestrictionCSVExportView(AnalystAccessMixin, ProgramManagerAccessMixin, Li
             'Updated By',
             'Updated At'
         ])
-        
-        # Get filtered restrictions
-        restrictions = self.get_queryset()
-        
-        # Write data rows
-        for restriction in restrictions:
-            # Determine status
-            status = 'Active'
-            if restriction.end_date and restriction.end_date < timezone.now().date():
-                status = 'Expired'
-            elif restriction.is_indefinite:
-                status = 'Indefinite'
-            
-            writer.writerow([
-                f"{restriction.client.first_name} {restriction.client.last_name}",
-                restriction.client.client_id,
-                restriction.get_restriction_type_display(),
-                restriction.get_scope_display(),
-                restriction.program.name if restriction.program else 'All Programs',
-                restriction.get_duration_display() if not restriction.is_indefinite else 'Indefinite',
-                restriction.start_date.strftime('%Y-%m-%d') if restriction.start_date else '',
-                restriction.end_date.strftime('%Y-%m-%d') if restriction.end_date else '',
-                'Yes' if restriction.is_indefinite else 'No',
-                status,
-                restriction.notes or '',
-                restriction.created_by or '',
-                restriction.created_at.strftime('%Y-%m-%d %H:%M:%S') if restriction.created_at else '',
-                restriction.updated_by or '',
-                restriction.updated_at.strftime('%Y-%m-%d %H:%M:%S') if restriction.updated_at else ''
-            ])
-        
-        return response
+
+
+@require_http_methods(["GET"])
+@login_required
+def export_job_progress(request, job_id):
+    """API endpoint to poll a background export until its file can be downloaded"""
+    try:
+        job = ExportJob.objects.get(external_id=job_id)
+    except ExportJob.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Export not found.'}, status=404)
+    if not can_access_export_job(job, request.user):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to view this export.'}, status=403)
+    
+    return JsonResponse({'success': True, 'job': build_export_job_payload(job)})
+
+
+@require_http_methods(["GET"])
+@login_required
+def download_export_job(request, job_id):
+    """Download the file of a finished background export"""
+    try:
+        job = ExportJob.objects.get(external_id=job_id)
+    except ExportJob.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Export not found.'}, status=404)
+    if not can_access_export_job(job, request.user):
+        return JsonResponse({'success': False, 'error': 'You do not have permission to download this export.'}, status=403)
+    if job.status != 'success' or not job.file_path or not default_storage.exists(job.file_path):
+        return JsonResponse({'success': False, 'error': 'This export is not available. Please export again.'}, status=410)
+    
+    record_export_download(job)
+    return FileResponse(default_storage.open(job.file_path, 'rb'), as_attachment=True, filename=job.file_name)
 
 
 def help_page(request):
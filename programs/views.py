@@ -4,9 +4,13 @@ from django.shortcuts import redirect
 from django.utils import timezone
 from django.db import models
 from django.db.models import Q, Exists, OuterRef
-from django.http import HttpResponse
 from core.models import Program, Department, ClientProgramEnrollment, ProgramManagerAssignment, Staff
 from core.views import jwt_required, ProgramManagerAccessMixin, AnalystAccessMixin, StaffAccessControlMixin, can_see_archived
+from core.principal import get_principal
+from core.capacity import filter_programs_by_capacity, get_program_capacities
+from core.admissions import admit_clients
+from core.program_index import load_program_index
+from core.csv_export import iter_queryset, stream_csv
 from core.message_utils import success_message, error_message, warning_message, info_message, create_success, update_success, delete_success, validation_error, permission_error, not_found_error
 from django.utils.decorators import method_decorator
 import csv
@@ -20,6 +24,9 @@ from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 import json
 
+# Trigram similarity above which a new program's name is reported as close to an existing one
+SIMILAR_PROGRAM_NAME = 0.8
+
 @method_decorator(jwt_required, name='dispatch')
 class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManagerAccessMixin, ListView):
     model = Program
@@ -56,8 +63,7 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
                     # Staff-only users see ONLY programs where their assigned clients are enrolled
@@ -92,7 +98,6 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        # Apply program filter before capacity filter (which may convert to list)
         if program_filter:
             try:
                 program_id = int(program_filter)
@@ -101,21 +106,9 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
                 pass
         
         if capacity_filter:
-            if capacity_filter == 'at_capacity':
-                # Filter programs that are at or over capacity
-                queryset = [p for p in queryset if p.is_at_capacity()]
-            elif capacity_filter == 'available':
-                # Filter programs with available capacity (including programs with no capacity limit)
-                queryset = [
-                    p for p in queryset
-                    if not p.is_at_capacity() and (p.get_available_capacity() is None or p.get_available_capacity() > 0)
-                ]
-            elif capacity_filter == 'no_limit':
-                # Filter programs with no capacity limit
-                if hasattr(queryset, 'filter'):
-                    queryset = queryset.filter(Q(no_capacity_limit=True) | Q(capacity_current__lte=0))
-                else:
-                    queryset = [p for p in queryset if getattr(p, 'no_capacity_limit', False) or p.capacity_current <= 0]
+            # at_capacity / available (including programs with no capacity limit) / no_limit,
+            # from one grouped enrollment count; the result stays a queryset
+            queryset = filter_programs_by_capacity(queryset, capacity_filter)
         
         if search_query:
             from django.db.models import Q
@@ -129,15 +122,11 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
         # Sorting (case-insensitive by relevant text fields)
         from django.db.models.functions import Lower, Coalesce
         from django.db.models import Value
-        try:
-            queryset = queryset.annotate(
-                name_ci=Lower(Coalesce('name', Value(''))),
-                department_name_ci=Lower(Coalesce(models.F('department__name'), Value(''))),
-                location_ci=Lower(Coalesce('location', Value(''))),
-            )
-        except Exception:
-            # If queryset was converted to a list due to capacity filtering, skip annotations
-            pass
+        queryset = queryset.annotate(
+            name_ci=Lower(Coalesce('name', Value(''))),
+            department_name_ci=Lower(Coalesce(models.F('department__name'), Value(''))),
+            location_ci=Lower(Coalesce('location', Value(''))),
+        )
         sort_key = self.request.GET.get('sort', 'name_asc')
         sort_mapping = {
             'name_asc': ['name_ci'],
@@ -154,26 +143,23 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
             'location_desc': ['-location_ci', 'name_ci'],
         }
         order_by_fields = sort_mapping.get(sort_key, ['name_ci'])
-        try:
-            return queryset.order_by(*order_by_fields)
-        except Exception:
-            # In case queryset was converted to list by capacity filter above
-            return queryset
+        return queryset.order_by(*order_by_fields)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         programs = context['programs']
         time_filter = self.request.GET.get('time_filter', '')
         
-        # Create program data with capacity information
+        # Create program data with capacity information (one grouped count for the page)
+        capacities = get_program_capacities(programs)
         programs_with_capacity = []
         for program in programs:
+            capacity = capacities[program.pk]
             # Use total enrollments (including future) for display
-            total_enrollments = program.get_total_enrollments_count()
-            current_enrollments = program.get_current_enrollments_count()
-            capacity_percentage = program.get_capacity_percentage()
-            available_capacity = program.get_available_capacity()
-            is_at_capacity = program.is_at_capacity()
+            total_enrollments = capacity.total_enrollments
+            capacity_percentage = capacity.capacity_percentage
+            available_capacity = capacity.available_capacity
+            is_at_capacity = capacity.is_at_capacity
             if program.no_capacity_limit or program.capacity_current <= 0:
                 display_bar_percentage = 100 if total_enrollments > 0 else 0
             else:
@@ -190,14 +176,8 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
             })
         
         # Get the total count of filtered programs (not just current page)
-        queryset = self.get_queryset()
-        from django.db.models.query import QuerySet
-        if isinstance(queryset, QuerySet):
-            # It's a QuerySet
-            total_filtered_count = queryset.count()
-        else:
-            # It's a list (from capacity filtering)
-            total_filtered_count = len(queryset)
+        paginator = context.get('paginator')
+        total_filtered_count = paginator.count if paginator else self.get_queryset().count()
         
         # Calculate status card counts (assigned/unassigned/total)
         # Use base queryset with permission filters but without search/filter params
@@ -217,8 +197,7 @@ class ProgramListView(StaffAccessControlMixin, AnalystAccessMixin, ProgramManage
         elif not self.request.user.is_superuser:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 # Manager: sees only their assigned programs
                 if staff.is_program_manager():
@@ -496,25 +475,17 @@ class ProgramDetailView(StaffAccessControlMixin, AnalystAccessMixin, ProgramMana
         if available_staff is None:
             available_staff = Staff.objects.none()
         
-        # Get capacity information with defensive programming
+        # Get capacity information with defensive programming (one count for all four numbers)
         try:
-            current_enrollments_count = program.get_current_enrollments_count()
+            capacity = program.get_capacity()
+            current_enrollments_count = capacity.current_enrollments
+            capacity_percentage = capacity.capacity_percentage
+            available_capacity = capacity.available_capacity
+            is_at_capacity = capacity.is_at_capacity
         except Exception:
             current_enrollments_count = 0
-            
-        try:
-            capacity_percentage = program.get_capacity_percentage()
-        except Exception:
             capacity_percentage = 0.0
-            
-        try:
-            available_capacity = program.get_available_capacity()
-        except Exception:
             available_capacity = 0
-            
-        try:
-            is_at_capacity = program.is_at_capacity()
-        except Exception:
             is_at_capacity = False
         
         # Get enrollment history (last 30 days)
@@ -640,8 +611,7 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Manager role users cannot upload programs
                 if 'Manager' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -705,6 +675,11 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
             updated_count = 0
             skipped = 0
             errors = []
+            similar_names = []
+
+            # Existing programs by name and department (rows creating a program add it too)
+            program_index = load_program_index()
+            departments = {}
 
             # Helper: status mapping
             def map_status(value: str):
@@ -742,17 +717,20 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
                         capacity_current = 0
 
                     # Department (create if not exists)
-                    if dept_name:
-                        department, _ = Department.objects.get_or_create(name=dept_name.strip())
-                    else:
-                        department, _ = Department.objects.get_or_create(name='NA')
+                    dept_key = dept_name.strip() if dept_name else 'NA'
+                    department = departments.get(dept_key)
+                    if department is None:
+                        department, _ = Department.objects.get_or_create(name=dept_key)
+                        departments[dept_key] = department
 
                     # Find existing program by case-insensitive name AND department (must match both)
-                    # This ensures we don't create duplicates or match programs from wrong departments
-                    program = Program.objects.filter(
-                        name__iexact=name,
-                        department=department
-                    ).first()
+                    # This ensures we don't create duplicates or match programs from wrong departments.
+                    # A learned alias of a program in the same department counts as its name.
+                    program = program_index.get_exact(name, department.id)
+                    if program is None:
+                        alias_program = program_index.get_alias(name)
+                        if alias_program is not None and alias_program.department_id == department.id:
+                            program = alias_program
 
                     if program:
                         # Update existing program (only update non-empty fields)
@@ -774,7 +752,11 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
                         created_by = 'System'
                         if request.user.is_authenticated:
                             created_by = request.user.get_full_name() or request.user.username or request.user.email or 'System'
-                        Program.objects.create(
+                        # Flag likely misspellings of existing programs
+                        similar = program_index.search(name, limit=1, min_similarity=SIMILAR_PROGRAM_NAME)
+                        if similar:
+                            similar_names.append(f"'{name}' (similar to '{similar[0][0].name}')")
+                        new_program = Program.objects.create(
                             name=name,
                             department=department,
                             location=location or 'TBD',
@@ -784,6 +766,7 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
                             created_by=created_by,
                             updated_by=created_by,
                         )
+                        program_index.add(new_program)
                         created_count += 1
                 except Exception as e:
                     errors.append(f"Row {idx}: {str(e)}")
@@ -794,6 +777,12 @@ class ProgramCSVUploadView(StaffAccessControlMixin, AnalystAccessMixin, ProgramM
                 messages.warning(request, msg + f" Errors: {len(errors)}")
             else:
                 messages.success(request, msg)
+            if similar_names:
+                messages.warning(
+                    request,
+                    f"Created programs with names close to existing ones, please check: {', '.join(similar_names[:5])}"
+                    + (f" and {len(similar_names) - 5} more" if len(similar_names) > 5 else ''),
+                )
 
             return redirect('programs:list')
         except Exception as e:
@@ -810,8 +799,7 @@ class ProgramBulkEnrollView(ProgramManagerAccessMixin, View):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot enroll clients
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
@@ -824,11 +812,10 @@ class ProgramBulkEnrollView(ProgramManagerAccessMixin, View):
         return super().dispatch(request, *args, **kwargs)
     
     def post(self, request, external_id):
-        from core.models import Program, ClientProgramEnrollment
+        from core.models import Program
         from django.contrib import messages
         from django.shortcuts import redirect
         from django.utils import timezone
-        from django.db import transaction
         
         try:
             program = Program.objects.get(external_id=external_id, is_archived=False)
@@ -844,57 +831,16 @@ class ProgramBulkEnrollView(ProgramManagerAccessMixin, View):
                 from datetime import datetime
                 start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
             
-            enrolled_count = 0
+            # Restrictions, capacity and existing enrollments are checked for the whole selection at once;
+            # admitted clients are enrolled in one insert, in the order selected
+            decisions = admit_clients(program, client_ids, start_date, request.user)
+            enrolled_count = sum(1 for decision in decisions if decision.accepted)
             errors = []
-            
-            with transaction.atomic():
-                for client_id in client_ids:
-                    try:
-                        from core.models import Client
-                        client = Client.objects.get(id=client_id)
-                        
-                        # Check if client can be enrolled
-                        can_enroll, message = program.can_enroll_client(client, start_date)
-                        
-                        if can_enroll:
-                            # Create enrollment
-                            enrollment = ClientProgramEnrollment.objects.create(
-                                client=client,
-                                program=program,
-                                start_date=start_date,
-                                status='active',
-                                created_by=request.user.get_full_name() or request.user.username,
-                                updated_by=request.user.get_full_name() or request.user.username
-                            )
-                            
-                            # Create audit log entry for enrollment creation
-                            try:
-                                from core.models import create_audit_log
-                                create_audit_log(
-                                    entity_name='Enrollment',
-                                    entity_id=enrollment.external_id,
-                                    action='create',
-                                    changed_by=request.user,
-                                    diff_data={
-                                        'client': str(enrollment.client),
-                                        'program': str(enrollment.program),
-                                        'start_date': str(enrollment.start_date),
-                                        'status': enrollment.status,
-                                        'created_by': enrollment.created_by,
-                                        'source': 'program_detail_page'
-                                    }
-                                )
-                            except Exception as e:
-                                print(f"Error creating audit log for enrollment: {e}")
-                            
-                            enrolled_count += 1
-                        else:
-                            errors.append(f"{client.first_name} {client.last_name}: {message}")
-                            
-                    except Client.DoesNotExist:
-                        errors.append(f"Client with ID {client_id} not found.")
-                    except Exception as e:
-                        errors.append(f"Error enrolling client {client_id}: {str(e)}")
+            for decision in decisions:
+                if decision.client is None:
+                    errors.append(f"Client with ID {decision.client_id} not found.")
+                elif not decision.accepted:
+                    errors.append(f"{decision.client.first_name} {decision.client.last_name}: {decision.reason}")
             
             # Show success/error messages
             if enrolled_count > 0:
@@ -921,8 +867,7 @@ class ProgramBulkAssignManagersView(ProgramManagerAccessMixin, View):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin users can assign managers
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1007,8 +952,7 @@ class ProgramCreateView(ProgramManagerAccessMixin, CreateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot create programs
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1133,8 +1077,7 @@ class ProgramUpdateView(ProgramManagerAccessMixin, UpdateView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Staff role users cannot edit programs
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
@@ -1186,8 +1129,7 @@ class ProgramUpdateView(ProgramManagerAccessMixin, UpdateView):
         if not self.request.user.is_superuser:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 # Only SuperAdmin and Admin can change departments
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1287,8 +1229,7 @@ class ProgramDeleteView(ProgramManagerAccessMixin, DeleteView):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin and Admin can delete programs
                 # Managers and Leaders cannot delete programs
@@ -1391,8 +1332,7 @@ class ProgramCSVExportView(ProgramManagerAccessMixin, ListView):
         if self.request.user.is_authenticated:
             try:
                 staff = self.request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 if 'Staff' in role_names and not any(role in ['SuperAdmin', 'Admin', 'Manager'] for role in role_names):
                     # Staff-only users see ONLY programs where their assigned clients are enrolled
@@ -1426,13 +1366,9 @@ class ProgramCSVExportView(ProgramManagerAccessMixin, ListView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        if capacity_filter:
-            if capacity_filter == "at_capacity":
-                # Filter programs that are at or over capacity
-                queryset = [p for p in queryset if p.is_at_capacity()]
-            elif capacity_filter == "available":
-                # Filter programs that have available capacity
-                queryset = [p for p in queryset if not p.is_at_capacity()]
+        if capacity_filter in ("at_capacity", "available"):
+            # Programs at or over capacity / with available capacity
+            queryset = filter_programs_by_capacity(queryset, capacity_filter)
         
         if search_query:
             queryset = queryset.filter(
@@ -1445,15 +1381,52 @@ class ProgramCSVExportView(ProgramManagerAccessMixin, ListView):
         return queryset.order_by("-created_at")
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=\"programs_export.csv\""
+        # Enrollments (with clients) and managers are prefetched per chunk of programs
+        current_enrollments_queryset = ClientProgramEnrollment.objects.select_related("client")
+        # Exclude archived enrollments for non-admin users
+        if not can_see_archived(self.request.user):
+            current_enrollments_queryset = current_enrollments_queryset.filter(is_archived=False)
+        programs = self.get_queryset().select_related("department").prefetch_related(
+            models.Prefetch("clientprogramenrollment_set", queryset=current_enrollments_queryset, to_attr="export_enrollments"),
+            models.Prefetch("manager_assignments", queryset=ProgramManagerAssignment.objects.select_related("staff"), to_attr="export_managers"),
+        )
         
-        # Create CSV writer
-        writer = csv.writer(response)
+        def rows():
+            for program in iter_queryset(programs):
+                current_enrollments = program.export_enrollments
+                
+                # Calculate capacity percentage
+                capacity_percentage = 0
+                if program.capacity_current > 0:
+                    capacity_percentage = min(100, (len(current_enrollments) / program.capacity_current) * 100)
+                
+                # Create comma-separated lists
+                client_names = ", ".join([
+                    f"{enrollment.client.first_name} {enrollment.client.last_name}"
+                    for enrollment in current_enrollments
+                ])
+                
+                manager_names = ", ".join([
+                    f"{assignment.staff.first_name} {assignment.staff.last_name}"
+                    for assignment in program.export_managers
+                ])
+                
+                yield [
+                    program.name,
+                    program.department.name,
+                    program.location or "",
+                    program.get_status_display(),
+                    program.capacity_current if program.capacity_current > 0 else "No limit",
+                    len(current_enrollments),
+                    f"{capacity_percentage:.1f}%",
+                    program.description or "",
+                    program.created_at.strftime("%Y-%m-%d %H:%M:%S") if program.created_at else "",
+                    program.updated_at.strftime("%Y-%m-%d %H:%M:%S") if program.updated_at else "",
+                    client_names,
+                    manager_names
+                ]
         
-        # Write header row
-        writer.writerow([
+        return stream_csv(request, "programs_export.csv", rows(), header=[
             "Program Name",
             "Department",
             "Location",
@@ -1467,59 +1440,6 @@ class ProgramCSVExportView(ProgramManagerAccessMixin, ListView):
             "Current Enrollments (Client Names)",
             "Program Staff (Manager Names)"
         ])
-        
-        # Get filtered programs
-        programs = self.get_queryset()
-        
-        # Write data rows
-        for program in programs:
-            # Get current enrollments
-            current_enrollments_queryset = ClientProgramEnrollment.objects.filter(
-                program=program
-            )
-            # Exclude archived enrollments for non-admin users
-            if not can_see_archived(self.request.user):
-                current_enrollments_queryset = current_enrollments_queryset.filter(is_archived=False)
-            current_enrollments = current_enrollments_queryset.select_related("client")
-            
-            # Get program staff/managers
-            program_managers = ProgramManagerAssignment.objects.filter(
-                program=program
-            ).select_related("staff")
-            
-            # Calculate capacity percentage
-            capacity_percentage = 0
-            if program.capacity_current > 0:
-                current_count = current_enrollments.count()
-                capacity_percentage = min(100, (current_count / program.capacity_current) * 100)
-            
-            # Create comma-separated lists
-            client_names = ", ".join([
-                f"{enrollment.client.first_name} {enrollment.client.last_name}"
-                for enrollment in current_enrollments
-            ])
-            
-            manager_names = ", ".join([
-                f"{assignment.staff.first_name} {assignment.staff.last_name}"
-                for assignment in program_managers
-            ])
-            
-            writer.writerow([
-                program.name,
-                program.department.name,
-                program.location or "",
-                program.get_status_display(),
-                program.capacity_current if program.capacity_current > 0 else "No limit",
-                current_enrollments.count(),
-                f"{capacity_percentage:.1f}%",
-                program.description or "",
-                program.created_at.strftime("%Y-%m-%d %H:%M:%S") if program.created_at else "",
-                program.updated_at.strftime("%Y-%m-%d %H:%M:%S") if program.updated_at else "",
-                client_names,
-                manager_names
-            ])
-        
-        return response
 
 @method_decorator(jwt_required, name='dispatch')
 class ProgramBulkChangeDepartmentView(ProgramManagerAccessMixin, View):
@@ -1530,8 +1450,7 @@ class ProgramBulkChangeDepartmentView(ProgramManagerAccessMixin, View):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin and Admin can change departments
                 # Managers and Leaders cannot change departments
@@ -1633,8 +1552,7 @@ class ProgramBulkDeleteView(ProgramManagerAccessMixin, View):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin and Admin users can bulk delete programs
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1653,9 +1571,8 @@ class ProgramBulkDeleteView(ProgramManagerAccessMixin, View):
         return super().dispatch(request, *args, **kwargs)
     
     def post(self, request):
-        from core.models import Program, ClientProgramEnrollment, ProgramManagerAssignment
+        from core.models import Program
         from django.http import JsonResponse
-        from django.db import transaction
         import json
         
         try:
@@ -1681,49 +1598,14 @@ class ProgramBulkDeleteView(ProgramManagerAccessMixin, View):
                     'error': 'No valid programs found to delete.'
                 })
             
-            deleted_count = 0
+            # Archive the programs and their enrollments in a few set-based updates
+            from core.bulk_lifecycle import archive_programs
             errors = []
-            
-            with transaction.atomic():
-                for program in programs_to_delete:
-                    try:
-                        # Create audit log entry before deletion
-                        try:
-                            from core.models import create_audit_log
-                            create_audit_log(
-                                entity_name='Program',
-                                entity_id=program.external_id,
-                                action='delete',
-                                changed_by=request.user,
-                                diff_data={
-                                    'name': program.name,
-                                    'department': str(program.department),
-                                    'location': program.location or '',
-                                    'capacity_current': program.capacity_current,
-                                    'capacity_effective_date': str(program.capacity_effective_date) if program.capacity_effective_date else None,
-                                    'deleted_by': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-                                    'source': 'bulk_delete'
-                                }
-                            )
-                        except Exception as e:
-                            print(f"Error creating audit log for program deletion: {e}")
-                        
-                        # Soft delete: archive program instead of actually deleting
-                        # Note: We don't delete related enrollments/assignments - they remain but the program is archived
-                        program.is_archived = True
-                        program.archived_at = timezone.now()
-                        program.updated_by = f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
-                        program.save()
-                        # Archive enrollments associated with this program
-                        ClientProgramEnrollment.objects.filter(program=program, is_archived=False).update(
-                            is_archived=True,
-                            archived_at=timezone.now(),
-                            updated_by=program.updated_by
-                        )
-                        deleted_count += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Error deleting {program.name}: {str(e)}")
+            try:
+                deleted_count = archive_programs(programs_to_delete, request.user, source='bulk_delete')
+            except Exception as e:
+                deleted_count = 0
+                errors.append(f"Error deleting programs: {str(e)}")
             
             if deleted_count > 0:
                 return JsonResponse({
@@ -1759,8 +1641,7 @@ class ProgramBulkRestoreView(ProgramManagerAccessMixin, View):
         if request.user.is_authenticated:
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Only SuperAdmin and Admin users can bulk restore programs
                 if not any(role in ['SuperAdmin', 'Admin'] for role in role_names):
@@ -1799,39 +1680,13 @@ class ProgramBulkRestoreView(ProgramManagerAccessMixin, View):
                     'error': 'No archived programs found with the provided IDs.'
                 })
             
-            restored_count = 0
+            from core.bulk_lifecycle import restore_programs
             errors = []
-            
-            with transaction.atomic():
-                for program in programs_to_restore:
-                    try:
-                        # Create audit log entry for restoration
-                        try:
-                            from core.models import create_audit_log
-                            create_audit_log(
-                                entity_name='Program',
-                                entity_id=program.external_id,
-                                action='restore',
-                                changed_by=request.user,
-                                diff_data={
-                                    'name': program.name,
-                                    'department': str(program.department),
-                                    'restored_by': f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username,
-                                    'source': 'bulk_restore'
-                                }
-                            )
-                        except Exception as e:
-                            print(f"Error creating audit log for program restoration: {e}")
-                        
-                        # Restore: set is_archived=False and clear archived_at
-                        program.is_archived = False
-                        program.archived_at = None
-                        program.updated_by = f"{request.user.first_name} {request.user.last_name}".strip() or request.user.username
-                        program.save()
-                        restored_count += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Error restoring {program.name}: {str(e)}")
+            try:
+                restored_count = restore_programs(programs_to_restore, request.user, source='bulk_restore')
+            except Exception as e:
+                restored_count = 0
+                errors.append(f"Error restoring programs: {str(e)}")
             
             if restored_count > 0:
                 return JsonResponse({
@@ -1872,8 +1727,7 @@ def toggle_program_status(request, external_id):
     
     try:
         staff = request.user.staff_profile
-        user_roles = staff.staffrole_set.select_related('role').all()
-        role_names = [staff_role.role.name for staff_role in user_roles]
+        role_names = get_principal(request.user).role_names
         
         if 'SuperAdmin' not in role_names and 'Admin' not in role_names:
             return JsonResponse({'success': False, 'error': 'Permission denied. Only SuperAdmin and Admin can change program status.'}, status=403)
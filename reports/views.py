@@ -3,11 +3,16 @@ from django.views.generic import ListView, TemplateView
 from django.http import HttpResponse
 from django.utils import timezone
 from django.db import models
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, Prefetch
 from datetime import datetime, date
-import csv
 from core.models import Client, Program, ClientProgramEnrollment, Staff, Department
 from core.views import can_see_archived
+from core.principal import get_principal
+from core.capacity import get_program_capacities
+from core.demographics import get_client_demographics
+from core.program_metrics import get_program_metrics
+from core.csv_export import CSVExport, iter_queryset, stream_csv
+from core.export_jobs import export_job_response, wants_background_export
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied
 class ReportsAccessMixin(LoginRequiredMixin):
@@ -19,10 +24,7 @@ class ReportsAccessMixin(LoginRequiredMixin):
 
         try:
             staff_profile = request.user.staff_profile
-            role_names = [
-                staff_role.role.name
-                for staff_role in staff_profile.staffrole_set.select_related('role').all()
-            ]
+            role_names = get_principal(request.user).role_names
 
             # Block staff-only users (no elevated roles) from reports
             if 'Staff' in role_names and not any(
@@ -44,10 +46,7 @@ class ReportsExportAccessMixin(LoginRequiredMixin):
 
         try:
             staff_profile = request.user.staff_profile
-            role_names = [
-                staff_role.role.name
-                for staff_role in staff_profile.staffrole_set.select_related('role').all()
-            ]
+            role_names = get_principal(request.user).role_names
 
             # Block Manager and staff-only users from exporting reports
             # Only SuperAdmin, Admin, Leader, and Analyst can export
@@ -118,8 +117,7 @@ def get_program_manager_filtering(request):
     if request.user.is_authenticated:
         try:
             staff_profile = request.user.staff_profile
-            user_roles = staff_profile.staffrole_set.select_related('role').all()
-            role_names = [staff_role.role.name for staff_role in user_roles]
+            role_names = get_principal(request.user).role_names
             
             if staff_profile.is_program_manager():
                 is_program_manager = True
@@ -161,6 +159,67 @@ def get_program_manager_filtering(request):
     
     return is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients
 
+def build_capacity_rows(programs, as_of_date):
+    """Capacity/occupied/vacant/utilization rows for the capacity reports, from one grouped enrollment count"""
+    programs = list(programs.select_related('department'))
+    capacities = get_program_capacities(programs, as_of_date)
+    return [
+        {
+            'program': program,
+            'capacity': capacities[program.pk].capacity,
+            'occupied': capacities[program.pk].current_enrollments,
+            'vacant': capacities[program.pk].vacant,
+            'utilization': capacities[program.pk].utilization,
+        }
+        for program in programs
+    ]
+
+def get_demographics_clients(request, client_status, is_program_manager, is_leader, is_staff_only,
+                             assigned_programs, assigned_clients):
+    """Clients in scope of the demographics report and its export: role, status, program, department and date filters"""
+    start_date, end_date, parsed_start_date, parsed_end_date = get_date_range_filter(request)
+    program_filter = request.GET.get('program', '').strip()
+    department_filter = request.GET.get('department', '').strip()
+    
+    # Filter clients based on user role
+    if (is_program_manager or is_leader) and assigned_programs:
+        clients = Client.objects.filter(
+            clientprogramenrollment__program__in=assigned_programs
+        ).distinct()
+    elif is_staff_only and assigned_clients:
+        clients = assigned_clients
+    else:
+        clients = Client.objects.all()
+    
+    # Apply client status filter
+    clients = apply_client_status_filter(clients, client_status)
+    
+    # Apply program filter if specified
+    if program_filter:
+        try:
+            program = Program.objects.get(id=program_filter)
+            clients = clients.filter(clientprogramenrollment__program=program).distinct()
+        except (Program.DoesNotExist, ValueError):
+            pass
+    
+    # Apply department filter if specified
+    if department_filter:
+        try:
+            department = Department.objects.get(id=department_filter, is_archived=False)
+            clients = clients.filter(clientprogramenrollment__program__department=department).distinct()
+        except (Department.DoesNotExist, ValueError):
+            pass
+    
+    # Apply date range filtering if specified
+    if parsed_start_date and parsed_end_date:
+        # Filter clients created within the date range
+        clients = clients.filter(created_at__date__range=[parsed_start_date, parsed_end_date])
+    elif parsed_start_date:
+        clients = clients.filter(created_at__date__gte=parsed_start_date)
+    elif parsed_end_date:
+        clients = clients.filter(created_at__date__lte=parsed_end_date)
+    return clients
+
 class ReportListView(ReportsAccessMixin, ListView):
     template_name = 'reports/report_list.html'
     context_object_name = 'reports'
@@ -639,29 +698,9 @@ class VacancyTrackerView(ReportsAccessMixin, TemplateView):
         if department_id:
             programs = programs.filter(department_id=department_id)
         
-        program_data = []
-        for program in programs:
-            # Get active enrollments as of the specified date (excluding archived enrollments)
-            active_enrollments = ClientProgramEnrollment.objects.filter(
-                program=program,
-                is_archived=False,  # Exclude archived enrollments from capacity calculations
-                start_date__lte=as_of_date
-            ).filter(
-                models.Q(end_date__isnull=True) | models.Q(end_date__gt=as_of_date)
-            ).count()
-            
-            # Use capacity_current for now (can be enhanced to use capacity_effective_date)
-            capacity = program.capacity_current
-            occupied = active_enrollments
-            vacant = capacity - occupied
-            
-            program_data.append({
-                'program': program,
-                'capacity': capacity,
-                'occupied': occupied,
-                'vacant': vacant,
-                'utilization': round((occupied / capacity * 100) if capacity > 0 else 0, 1)
-            })
+        # Active enrollments as of the specified date for every program in one grouped query
+        # (capacity_current for now; can be enhanced to use capacity_effective_date)
+        program_data = build_capacity_rows(programs, as_of_date)
         
         context['program_data'] = program_data
         context['as_of_date'] = as_of_date
@@ -708,14 +747,21 @@ class ReportExportView(ReportsExportAccessMixin, TemplateView):
         if department_id:
             programs = programs.filter(department_id=department_id)
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="vacancy_tracker_{as_of_date.strftime("%Y%m%d")}.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        writer.writerow([
+        def rows():
+            for row in build_capacity_rows(programs, as_of_date):
+                program = row['program']
+                yield [
+                    program.name,
+                    program.department.name if program.department else '',
+                    program.location,
+                    row['capacity'],
+                    row['occupied'],
+                    row['vacant'],
+                    f"{row['utilization']}%",
+                    as_of_date.strftime('%Y-%m-%d')
+                ]
+        
+        return stream_csv(request, f'vacancy_tracker_{as_of_date.strftime("%Y%m%d")}.csv', rows(), header=[
             'Program Name',
             'Department',
             'Location',
@@ -725,46 +771,14 @@ class ReportExportView(ReportsExportAccessMixin, TemplateView):
             'Utilization %',
             'As Of Date'
         ])
-        
-        # Write data rows
-        for program in programs:
-            # Exclude archived enrollments from capacity calculations
-            active_enrollments = ClientProgramEnrollment.objects.filter(
-                program=program,
-                is_archived=False,  # Exclude archived enrollments from capacity calculations
-                start_date__lte=as_of_date
-            ).filter(
-                models.Q(end_date__isnull=True) | models.Q(end_date__gt=as_of_date)
-            ).count()
-            
-            capacity = program.capacity_current
-            occupied = active_enrollments
-            vacant = capacity - occupied
-            utilization = round((occupied / capacity * 100) if capacity > 0 else 0, 1)
-            
-            writer.writerow([
-                program.name,
-                program.department.name if program.department else '',
-                program.location,
-                capacity,
-                occupied,
-                vacant,
-                f"{utilization}%",
-                as_of_date.strftime('%Y-%m-%d')
-            ])
-        
-        return response
     
     def export_organizational_summary(self, request):
         # Placeholder for organizational summary export
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="organizational_summary.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['Report', 'Value'])
-        writer.writerow(['Total Clients', Client.objects.count()])
-        writer.writerow(['Total Programs', Program.objects.count()])
-        writer.writerow(['Active Enrollments', ClientProgramEnrollment.objects.filter(end_date__isnull=True).count()])
-        return response
+        return stream_csv(request, 'organizational_summary.csv', [
+            ['Total Clients', Client.objects.count()],
+            ['Total Programs', Program.objects.count()],
+            ['Active Enrollments', ClientProgramEnrollment.objects.filter(end_date__isnull=True).count()],
+        ], header=['Report', 'Value'])
 
 
 # Additional Report Views
@@ -788,139 +802,12 @@ class ClientDemographicsView(ReportsAccessMixin, TemplateView):
         # Get program manager and staff-only filtering
         is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(self.request)
         
-        # Filter clients based on user role
-        if (is_program_manager or is_leader) and assigned_programs:
-            clients = Client.objects.filter(
-                clientprogramenrollment__program__in=assigned_programs
-            ).distinct()
-        elif is_staff_only and assigned_clients:
-            clients = assigned_clients
-        else:
-            clients = Client.objects.all()
-        
-        # Apply client status filter
-        clients = apply_client_status_filter(clients, client_status)
-        
-        # Apply program filter if specified
-        if program_filter:
-            try:
-                program = Program.objects.get(id=program_filter)
-                clients = clients.filter(clientprogramenrollment__program=program).distinct()
-            except (Program.DoesNotExist, ValueError):
-                pass
-        
-        # Apply department filter if specified
-        if department_filter:
-            try:
-                department = Department.objects.get(id=department_filter, is_archived=False)
-                clients = clients.filter(clientprogramenrollment__program__department=department).distinct()
-            except (Department.DoesNotExist, ValueError):
-                pass
-        
-        # Apply date range filtering if specified
-        if parsed_start_date or parsed_end_date:
-            if parsed_start_date and parsed_end_date:
-                # Filter clients created within the date range
-                clients = clients.filter(created_at__date__range=[parsed_start_date, parsed_end_date])
-            elif parsed_start_date:
-                clients = clients.filter(created_at__date__gte=parsed_start_date)
-            elif parsed_end_date:
-                clients = clients.filter(created_at__date__lte=parsed_end_date)
-        
-        # Age distribution
-        age_groups = {
-            '0-17': 0,
-            '18-25': 0,
-            '26-35': 0,
-            '36-45': 0,
-            '46-55': 0,
-            '56-65': 0,
-            '65+': 0
-        }
-        
-        for client in clients:
-            age = client.dob
-            if age:
-                from datetime import date
-                today = date.today()
-                age_years = today.year - age.year - ((today.month, today.day) < (age.month, age.day))
-                
-                if age_years <= 17:
-                    age_groups['0-17'] += 1
-                elif age_years <= 25:
-                    age_groups['18-25'] += 1
-                elif age_years <= 35:
-                    age_groups['26-35'] += 1
-                elif age_years <= 45:
-                    age_groups['36-45'] += 1
-                elif age_years <= 55:
-                    age_groups['46-55'] += 1
-                elif age_years <= 65:
-                    age_groups['56-65'] += 1
-                else:
-                    age_groups['65+'] += 1
-        
-        # Gender distribution
-        gender_counts = {}
-        for client in clients:
-            gender = client.gender or 'Unknown'
-            gender_counts[gender] = gender_counts.get(gender, 0) + 1
-        
-        # Sort gender counts by count (descending) for better display
-        gender_counts = dict(sorted(gender_counts.items(), key=lambda x: x[1], reverse=True))
-        
-        # Calculate demographic breakdowns
-        healthcare_coverage_counts = {}
-        citizenship_status_counts = {}
-        country_of_birth_counts = {}
-        sexual_orientation_counts = {}
-        indigenous_status_counts = {}
-        ethnicity_counts = {}
-        
-        for client in clients:
-            # Healthcare Coverage
-            if hasattr(client, 'healthcare_coverage') and client.healthcare_coverage:
-                hc = client.healthcare_coverage
-            elif client.health_card_number:
-                hc = 'Yes (Has Health Card)'
-            else:
-                hc = 'No/Unknown'
-            healthcare_coverage_counts[hc] = healthcare_coverage_counts.get(hc, 0) + 1
-            
-            # Citizenship Status
-            cs = client.citizenship_status or 'Unknown'
-            citizenship_status_counts[cs] = citizenship_status_counts.get(cs, 0) + 1
-            
-            # Country of Birth
-            cob = client.country_of_birth or 'Unknown'
-            country_of_birth_counts[cob] = country_of_birth_counts.get(cob, 0) + 1
-            
-            # Sexual Orientation
-            so = client.sexual_orientation or 'Unknown'
-            sexual_orientation_counts[so] = sexual_orientation_counts.get(so, 0) + 1
-            
-            # Indigenous Status
-            ind = client.indigenous_status or 'Unknown'
-            indigenous_status_counts[ind] = indigenous_status_counts.get(ind, 0) + 1
-            
-            # Ethnicity (can be a list)
-            if client.ethnicity:
-                if isinstance(client.ethnicity, list):
-                    for eth in client.ethnicity:
-                        if eth:
-                            ethnicity_counts[eth] = ethnicity_counts.get(eth, 0) + 1
-                else:
-                    ethnicity_counts[str(client.ethnicity)] = ethnicity_counts.get(str(client.ethnicity), 0) + 1
-            else:
-                ethnicity_counts['Unknown'] = ethnicity_counts.get('Unknown', 0) + 1
+        clients = get_demographics_clients(
+            self.request, client_status, is_program_manager, is_leader, is_staff_only, assigned_programs, assigned_clients
+        )
         
-        # Sort all demographic counts by count (descending)
-        healthcare_coverage_counts = dict(sorted(healthcare_coverage_counts.items(), key=lambda x: x[1], reverse=True))
-        citizenship_status_counts = dict(sorted(citizenship_status_counts.items(), key=lambda x: x[1], reverse=True))
-        country_of_birth_counts = dict(sorted(country_of_birth_counts.items(), key=lambda x: x[1], reverse=True))
-        sexual_orientation_counts = dict(sorted(sexual_orientation_counts.items(), key=lambda x: x[1], reverse=True))
-        indigenous_status_counts = dict(sorted(indigenous_status_counts.items(), key=lambda x: x[1], reverse=True))
-        ethnicity_counts = dict(sorted(ethnicity_counts.items(), key=lambda x: x[1], reverse=True))
+        # Every breakdown comes from two grouped queries, shared with the CSV export
+        demographics = get_client_demographics(clients)
         
         # Get all programs and departments for filter dropdowns
         if (is_program_manager or is_leader) and assigned_programs:
@@ -933,15 +820,7 @@ class ClientDemographicsView(ReportsAccessMixin, TemplateView):
             available_departments = Department.objects.filter(is_archived=False).order_by('name')
         
         context.update({
-            'total_clients': clients.count(),
-            'age_groups': age_groups,
-            'gender_counts': gender_counts,
-            'healthcare_coverage_counts': healthcare_coverage_counts,
-            'citizenship_status_counts': citizenship_status_counts,
-            'country_of_birth_counts': country_of_birth_counts,
-            'sexual_orientation_counts': sexual_orientation_counts,
-            'indigenous_status_counts': indigenous_status_counts,
-            'ethnicity_counts': ethnicity_counts,
+            **demographics,
             'is_program_manager': is_program_manager,
             'start_date': start_date,
             'end_date': end_date,
@@ -1218,15 +1097,37 @@ class ClientEnrollmentHistoryExportView(ReportsExportAccessMixin, ListView):
         return queryset.order_by('-start_date')
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=\"client_enrollment_history_export.csv\""
-        
-        # Create CSV writer
-        writer = csv.writer(response)
+        # Get enrollment data
+        enrollments = self.get_queryset()
         
-        # Write header row
-        writer.writerow([
+        def rows():
+            today = timezone.now().date()
+            for enrollment in iter_queryset(enrollments):
+                # Calculate duration in days and determine status based on current date
+                if today < enrollment.start_date:
+                    duration = 0  # Not started yet
+                    status = "Pending"
+                elif enrollment.end_date:
+                    duration = (enrollment.end_date - enrollment.start_date).days
+                    if today > enrollment.end_date:
+                        status = "Completed"
+                    else:
+                        status = "Active"
+                else:
+                    duration = (today - enrollment.start_date).days
+                    status = "Active"
+                
+                yield [
+                    f"{enrollment.client.first_name} {enrollment.client.last_name}",
+                    enrollment.program.name,
+                    enrollment.program.department.name if enrollment.program.department else '',
+                    enrollment.start_date.strftime('%Y-%m-%d'),
+                    enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else '',
+                    status,
+                    duration
+                ]
+        
+        return stream_csv(request, "client_enrollment_history_export.csv", rows(), header=[
             "Client Name",
             "Program Name",
             "Department",
@@ -1235,38 +1136,6 @@ class ClientEnrollmentHistoryExportView(ReportsExportAccessMixin, ListView):
             "Status",
             "Duration (Days)"
         ])
-        
-        # Get enrollment data
-        enrollments = self.get_queryset()
-        
-        # Write data rows
-        for enrollment in enrollments:
-            # Calculate duration in days and determine status based on current date
-            today = timezone.now().date()
-            if today < enrollment.start_date:
-                duration = 0  # Not started yet
-                status = "Pending"
-            elif enrollment.end_date:
-                duration = (enrollment.end_date - enrollment.start_date).days
-                if today > enrollment.end_date:
-                    status = "Completed"
-                else:
-                    status = "Active"
-            else:
-                duration = (today - enrollment.start_date).days
-                status = "Active"
-            
-            writer.writerow([
-                f"{enrollment.client.first_name} {enrollment.client.last_name}",
-                enrollment.program.name,
-                enrollment.program.department.name if enrollment.program.department else '',
-                enrollment.start_date.strftime('%Y-%m-%d'),
-                enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else '',
-                status,
-                duration
-            ])
-        
-        return response
 
 
 class ClientOutcomesView(ReportsAccessMixin, TemplateView):
@@ -1399,28 +1268,8 @@ class ProgramCapacityView(ReportsAccessMixin, ListView):
         else:
             programs = Program.objects.all()
         
-        program_data = []
-        today = timezone.now().date()
-        
-        for program in programs:
-            # Get active enrollments using proper date-based logic (excluding archived enrollments)
-            active_enrollments = ClientProgramEnrollment.objects.filter(
-                program=program,
-                is_archived=False,  # Exclude archived enrollments from capacity calculations
-                start_date__lte=today
-            ).filter(
-                models.Q(end_date__isnull=True) | models.Q(end_date__gt=today)
-            ).count()
-            
-            utilization = (active_enrollments / program.capacity_current * 100) if program.capacity_current > 0 else 0
-            
-            program_data.append({
-                'program': program,
-                'capacity': program.capacity_current,
-                'occupied': active_enrollments,
-                'vacant': program.capacity_current - active_enrollments,
-                'utilization': round(utilization, 1)
-            })
+        # Active enrollments as of today for every program in one grouped query
+        program_data = build_capacity_rows(programs, timezone.now().date())
         
         # Sort program_data based on sort_by and sort_order
         reverse_order = (sort_order == 'desc')
@@ -1461,41 +1310,41 @@ class ProgramCapacityExportView(ReportsExportAccessMixin, ListView):
         else:
             programs = Program.objects.all()
         
-        program_data = []
-        today = timezone.now().date()
-        
-        for program in programs:
-            # Get active enrollments using proper date-based logic (excluding archived enrollments)
-            active_enrollments = ClientProgramEnrollment.objects.filter(
-                program=program,
-                is_archived=False,  # Exclude archived enrollments from capacity calculations
-                start_date__lte=today
-            ).filter(
-                models.Q(end_date__isnull=True) | models.Q(end_date__gt=today)
-            ).count()
-            
-            utilization = (active_enrollments / program.capacity_current * 100) if program.capacity_current > 0 else 0
-            
-            program_data.append({
-                'program': program,
-                'capacity': program.capacity_current,
-                'occupied': active_enrollments,
-                'vacant': program.capacity_current - active_enrollments,
-                'utilization': round(utilization, 1)
-            })
+        # Active enrollments as of today for every program in one grouped query
+        program_data = build_capacity_rows(programs, timezone.now().date())
         
         return program_data
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=\"program_capacity_export.csv\""
-        
-        # Create CSV writer
-        writer = csv.writer(response)
+        # Get program data
+        program_data = self.get_queryset()
         
-        # Write header row
-        writer.writerow([
+        def rows():
+            for data in program_data:
+                # Determine status based on utilization
+                if data['utilization'] > 100:
+                    status = "Over Capacity"
+                elif data['utilization'] >= 100:
+                    status = "At Capacity"
+                elif data['utilization'] >= 80:
+                    status = "Near Capacity"
+                elif data['utilization'] >= 60:
+                    status = "Good Utilization"
+                else:
+                    status = "Available Capacity"
+                
+                yield [
+                    data['program'].name,
+                    data['program'].department.name if data['program'].department else '',
+                    data['program'].location,
+                    data['capacity'],
+                    data['occupied'],
+                    data['vacant'],
+                    f"{data['utilization']}%",
+                    status
+                ]
+        
+        return stream_csv(request, "program_capacity_export.csv", rows(), header=[
             "Program Name",
             "Department",
             "Location",
@@ -1505,36 +1354,31 @@ class ProgramCapacityExportView(ReportsExportAccessMixin, ListView):
             "Utilization %",
             "Status"
         ])
-        
-        # Get program data
-        program_data = self.get_queryset()
-        
-        # Write data rows
-        for data in program_data:
-            # Determine status based on utilization
-            if data['utilization'] > 100:
-                status = "Over Capacity"
-            elif data['utilization'] >= 100:
-                status = "At Capacity"
-            elif data['utilization'] >= 80:
-                status = "Near Capacity"
-            elif data['utilization'] >= 60:
-                status = "Good Utilization"
-            else:
-                status = "Available Capacity"
-            
-            writer.writerow([
-                data['program'].name,
-                data['program'].department.name if data['program'].department else '',
-                data['program'].location,
-                data['capacity'],
-                data['occupied'],
-                data['vacant'],
-                f"{data['utilization']}%",
-                status
-            ])
-        
-        return response
+
+
+def get_performance_metrics(request):
+    """Program performance metrics of the programs in the user's scope, with trends over the report's date range."""
+    is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(request)
+
+    # Filter programs based on user role
+    if is_analyst:
+        # Analysts see all programs
+        programs = Program.objects.all()
+    elif (is_program_manager or is_leader) and assigned_programs:
+        programs = assigned_programs
+    elif is_staff_only:
+        programs = assigned_programs if assigned_programs else Program.objects.none()
+    else:
+        programs = Program.objects.all()
+
+    start_date, end_date, parsed_start_date, parsed_end_date = get_date_range_filter(request)
+    return get_program_metrics(
+        programs.select_related('department'),
+        include_archived=can_see_archived(request.user),
+        trends=True,
+        trend_start=parsed_start_date,
+        trend_end=parsed_end_date,
+    )
 
 
 class ProgramPerformanceView(ReportsAccessMixin, ListView):
@@ -1557,56 +1401,7 @@ class ProgramPerformanceView(ReportsAccessMixin, ListView):
         return per_page
     
     def get_queryset(self):
-        # Get program manager and staff-only filtering
-        is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(self.request)
-        
-        # Filter programs based on user role
-        if is_analyst:
-            # Analysts see all programs
-            programs = Program.objects.all()
-        elif (is_program_manager or is_leader) and assigned_programs:
-            programs = assigned_programs
-        elif is_staff_only:
-            programs = assigned_programs if assigned_programs else Program.objects.none()
-        else:
-            programs = Program.objects.all()
-        
-        program_metrics = []
-        today = timezone.now().date()
-        
-        for program in programs:
-            # Get all enrollments for this program
-            all_enrollments = ClientProgramEnrollment.objects.filter(program=program)
-            # Exclude archived enrollments for non-admin users
-            if not can_see_archived(self.request.user):
-                all_enrollments = all_enrollments.filter(is_archived=False)
-            
-            # Optimized: Use database queries instead of Python loop
-            # Calculate active enrollments: start_date <= today AND (end_date is NULL OR end_date > today)
-            active_count = all_enrollments.filter(
-                start_date__lte=today
-            ).filter(
-                Q(end_date__isnull=True) | Q(end_date__gt=today)
-            ).count()
-            
-            # Calculate completed enrollments: end_date is not NULL AND end_date < today
-            completed_count = all_enrollments.filter(
-                end_date__isnull=False,
-                end_date__lt=today
-            ).count()
-            
-            total_enrollments = all_enrollments.count()
-            completion_rate = (completed_count / total_enrollments * 100) if total_enrollments > 0 else 0
-            
-            program_metrics.append({
-                'program': program,
-                'total_enrollments': total_enrollments,
-                'active_enrollments': active_count,
-                'completed_enrollments': completed_count,
-                'completion_rate': round(completion_rate, 1)
-            })
-        
-        return program_metrics
+        return get_performance_metrics(self.request)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1615,12 +1410,15 @@ class ProgramPerformanceView(ReportsAccessMixin, ListView):
         start_date, end_date, parsed_start_date, parsed_end_date = get_date_range_filter(self.request)
         
         # Add the current per_page value to context for the pagination component
-        context['per_page'] = str(self.get_paginate_by(self.get_queryset()))
+        context['per_page'] = str(self.get_paginate_by(self.object_list))
         
         # Add date range parameters to context
         context['start_date'] = start_date
         context['end_date'] = end_date
         
+        # Months of the trend columns (the same for every program)
+        context['trend_months'] = [point['month'] for point in self.object_list[0].trend] if self.object_list else []
+        
         return context
 
 
@@ -1630,67 +1428,44 @@ class ProgramPerformanceExportView(ReportsExportAccessMixin, ListView):
     template_name = 'reports/program_performance.html'
     
     def get_queryset(self):
-        # Get program manager and staff-only filtering
-        is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(self.request)
-        
-        # Filter programs based on user role
-        if is_analyst:
-            # Analysts see all programs
-            programs = Program.objects.all()
-        elif (is_program_manager or is_leader) and assigned_programs:
-            programs = assigned_programs
-        elif is_staff_only:
-            programs = assigned_programs if assigned_programs else Program.objects.none()
-        else:
-            programs = Program.objects.all()
-        
-        program_metrics = []
-        today = timezone.now().date()
-        
-        for program in programs:
-            # Get all enrollments for this program
-            all_enrollments = ClientProgramEnrollment.objects.filter(program=program)
-            # Exclude archived enrollments for non-admin users
-            if not can_see_archived(self.request.user):
-                all_enrollments = all_enrollments.filter(is_archived=False)
-            
-            # Optimized: Use database queries instead of Python loop
-            # Calculate active enrollments: start_date <= today AND (end_date is NULL OR end_date > today)
-            active_count = all_enrollments.filter(
-                start_date__lte=today
-            ).filter(
-                Q(end_date__isnull=True) | Q(end_date__gt=today)
-            ).count()
-            
-            # Calculate completed enrollments: end_date is not NULL AND end_date < today
-            completed_count = all_enrollments.filter(
-                end_date__isnull=False,
-                end_date__lt=today
-            ).count()
-            
-            total_enrollments = all_enrollments.count()
-            completion_rate = (completed_count / total_enrollments * 100) if total_enrollments > 0 else 0
-            
-            program_metrics.append({
-                'program': program,
-                'total_enrollments': total_enrollments,
-                'active_enrollments': active_count,
-                'completed_enrollments': completed_count,
-                'completion_rate': round(completion_rate, 1)
-            })
-        
-        return program_metrics
+        return get_performance_metrics(self.request)
     
     def get(self, request, *args, **kwargs):
-        # Create CSV response
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=\"program_performance_export.csv\""
-        
-        # Create CSV writer
-        writer = csv.writer(response)
+        if wants_background_export(request):
+            return export_job_response(request, 'program_performance')
+        return self.get_export().as_response(request)
+    
+    def get_export(self):
+        # Get program data
+        program_metrics = self.get_queryset()
         
-        # Write header row
-        writer.writerow([
+        trend_months = [point['month'] for point in program_metrics[0].trend] if program_metrics else []
+        
+        def rows():
+            for metric in program_metrics:
+                row = [
+                    metric.program.name,
+                    metric.program.department.name if metric.program.department else '',
+                    metric.program.location,
+                    metric.total_enrollments,
+                    metric.active_enrollments,
+                    metric.completed_enrollments,
+                    f"{metric.completion_rate}%",
+                    metric.performance_status,
+                    metric.trend_admissions,
+                    metric.trend_discharges,
+                    metric.trend_average_length_of_stay if metric.trend_average_length_of_stay is not None else '',
+                ]
+                # Monthly admissions, discharges and average length of stay
+                for point in metric.trend:
+                    row.extend([
+                        point['admissions'],
+                        point['discharges'],
+                        point['average_length_of_stay'] if point['average_length_of_stay'] is not None else '',
+                    ])
+                yield row
+        
+        header = [
             "Program Name",
             "Department",
             "Location",
@@ -1698,36 +1473,19 @@ class ProgramPerformanceExportView(ReportsExportAccessMixin, ListView):
             "Active Enrollments",
             "Completed Enrollments",
             "Completion Rate %",
-            "Performance Status"
-        ])
-        
-        # Get program data
-        program_metrics = self.get_queryset()
-        
-        # Write data rows
-        for metric in program_metrics:
-            # Determine performance status
-            if metric['completion_rate'] >= 80:
-                performance_status = "Excellent"
-            elif metric['completion_rate'] >= 60:
-                performance_status = "Good"
-            elif metric['completion_rate'] >= 40:
-                performance_status = "Fair"
-            else:
-                performance_status = "Needs Improvement"
-            
-            writer.writerow([
-                metric['program'].name,
-                metric['program'].department.name if metric['program'].department else '',
-                metric['program'].location,
-                metric['total_enrollments'],
-                metric['active_enrollments'],
-                metric['completed_enrollments'],
-                f"{metric['completion_rate']}%",
-                performance_status
+            "Performance Status",
+            "Admissions",
+            "Discharges",
+            "Avg Length of Stay (days)",
+        ]
+        for month in trend_months:
+            label = month.strftime('%Y-%m')
+            header.extend([
+                f"Admissions {label}",
+                f"Discharges {label}",
+                f"Avg Length of Stay {label} (days)",
             ])
-        
-        return response
+        return CSVExport("program_performance_export.csv", rows(), header=header)
 
 
 class DepartmentSummaryView(ReportsAccessMixin, TemplateView):
@@ -1788,183 +1546,113 @@ class DepartmentSummaryView(ReportsAccessMixin, TemplateView):
 
 
 # Export Views for the three specific reports
+# (section title, value column, demographics key) of the distribution sections in the demographics export
+DEMOGRAPHICS_EXPORT_SECTIONS = (
+    ('AGE DISTRIBUTION', 'Age Group', 'age_groups'),
+    ('GENDER DISTRIBUTION', 'Gender', 'gender_counts'),
+    ('LANGUAGE DISTRIBUTION', 'Language', 'language_counts'),
+    ('CITY DISTRIBUTION', 'City', 'city_counts'),
+    ('HEALTHCARE COVERAGE', 'Healthcare Coverage', 'healthcare_coverage_counts'),
+    ('CITIZENSHIP STATUS', 'Citizenship Status', 'citizenship_status_counts'),
+    ('COUNTRY OF BIRTH', 'Country of Birth', 'country_of_birth_counts'),
+    ('SEXUAL ORIENTATION', 'Sexual Orientation', 'sexual_orientation_counts'),
+    ('INDIGENOUS STATUS', 'Indigenous Status', 'indigenous_status_counts'),
+    ('ETHNICITY', 'Ethnicity', 'ethnicity_counts'),
+)
+
+
 class ClientDemographicsExportView(ReportsExportAccessMixin, TemplateView):
     """Export client demographics report to CSV"""
     
     def get(self, request, *args, **kwargs):
-        # Get date range filter parameters
-        start_date, end_date, parsed_start_date, parsed_end_date = get_date_range_filter(request)
-        
-        # Get program and department filter parameters
-        program_filter = request.GET.get('program', '').strip()
-        department_filter = request.GET.get('department', '').strip()
-        
+        if wants_background_export(request):
+            return export_job_response(request, 'client_demographics')
+        return self.get_export().as_response(request)
+    
+    def get_export(self):
+        request = self.request
         # Get client status filter
         client_status = get_client_status_filter(request)
         
         # Get the same data as the main view
         is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(request)
         
-        # Filter clients based on user role
-        if (is_program_manager or is_leader) and assigned_programs:
-            clients = Client.objects.filter(
-                clientprogramenrollment__program__in=assigned_programs
-            ).distinct()
-        elif is_staff_only and assigned_clients:
-            clients = assigned_clients
-        else:
-            clients = Client.objects.all()
-        
-        # Apply client status filter
-        clients = apply_client_status_filter(clients, client_status)
-        
-        # Apply program filter if specified
-        if program_filter:
-            try:
-                program = Program.objects.get(id=program_filter)
-                clients = clients.filter(clientprogramenrollment__program=program).distinct()
-            except (Program.DoesNotExist, ValueError):
-                pass
-        
-        # Apply department filter if specified
-        if department_filter:
-            try:
-                department = Department.objects.get(id=department_filter, is_archived=False)
-                clients = clients.filter(clientprogramenrollment__program__department=department).distinct()
-            except (Department.DoesNotExist, ValueError):
-                pass
-        
-        # Apply date range filtering if specified
-        if parsed_start_date or parsed_end_date:
-            if parsed_start_date and parsed_end_date:
-                # Filter clients created within the date range
-                clients = clients.filter(created_at__date__range=[parsed_start_date, parsed_end_date])
-            elif parsed_start_date:
-                clients = clients.filter(created_at__date__gte=parsed_start_date)
-            elif parsed_end_date:
-                clients = clients.filter(created_at__date__lte=parsed_end_date)
+        clients = get_demographics_clients(
+            request, client_status, is_program_manager, is_leader, is_staff_only, assigned_programs, assigned_clients
+        )
+        demographics = get_client_demographics(clients)
+        total_clients = demographics['total_clients']
         
-        # Age distribution
-        age_groups = {
-            '0-17': 0,
-            '18-25': 0,
-            '26-35': 0,
-            '36-45': 0,
-            '46-55': 0,
-            '56-65': 0,
-            '65+': 0
-        }
+        # Program names are prefetched per chunk of clients
+        clients = clients.prefetch_related(
+            Prefetch('clientprogramenrollment_set', queryset=ClientProgramEnrollment.objects.select_related('program'))
+        )
         
-        for client in clients:
-            age = client.dob
-            if age:
-                from datetime import date
-                today = date.today()
-                age_years = today.year - age.year - ((today.month, today.day) < (age.month, age.day))
+        def rows():
+            yield ['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')]
+            yield ['Total Clients', total_clients]
+            yield []
+            
+            # Distribution sections, in the order of the report page
+            for title, label, key in DEMOGRAPHICS_EXPORT_SECTIONS:
+                yield [title]
+                yield [label, 'Count', 'Percentage']
+                for value, count in demographics[key].items():
+                    percentage = (count / total_clients * 100) if total_clients > 0 else 0
+                    yield [value, count, f"{percentage:.1f}%"]
+                yield []
+            
+            # Detailed Client Information
+            yield ['DETAILED CLIENT INFORMATION']
+            yield ['Client ID', 'First Name', 'Last Name', 'Preferred Name', 'Date of Birth', 'Age', 'Gender',
+                   'Healthcare Coverage', 'Citizenship Status', 'Country of Birth', 'Sexual Orientation',
+                   'Indigenous Status', 'Ethnicity', 'Programs']
+            
+            for client in iter_queryset(clients):
+                # Calculate age
+                age = "N/A"
+                if client.dob:
+                    from datetime import date
+                    today = date.today()
+                    age = today.year - client.dob.year - ((today.month, today.day) < (client.dob.month, client.dob.day))
                 
-                if age_years <= 17:
-                    age_groups['0-17'] += 1
-                elif age_years <= 25:
-                    age_groups['18-25'] += 1
-                elif age_years <= 35:
-                    age_groups['26-35'] += 1
-                elif age_years <= 45:
-                    age_groups['36-45'] += 1
-                elif age_years <= 55:
-                    age_groups['46-55'] += 1
-                elif age_years <= 65:
-                    age_groups['56-65'] += 1
-                else:
-                    age_groups['65+'] += 1
-        
-        # Gender distribution
-        gender_counts = {}
-        for client in clients:
-            gender = client.gender or 'Unknown'
-            gender_counts[gender] = gender_counts.get(gender, 0) + 1
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="client_demographics_report.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        writer.writerow(['Client Demographics Report'])
-        writer.writerow(['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow(['Total Clients', clients.count()])
-        writer.writerow([])
-        
-        # Age Distribution Section
-        writer.writerow(['AGE DISTRIBUTION'])
-        writer.writerow(['Age Group', 'Count', 'Percentage'])
-        total_clients = clients.count()
-        for age_group, count in age_groups.items():
-            percentage = (count / total_clients * 100) if total_clients > 0 else 0
-            writer.writerow([age_group, count, f"{percentage:.1f}%"])
-        
-        writer.writerow([])
-        
-        # Gender Distribution Section
-        writer.writerow(['GENDER DISTRIBUTION'])
-        writer.writerow(['Gender', 'Count', 'Percentage'])
-        for gender, count in gender_counts.items():
-            percentage = (count / total_clients * 100) if total_clients > 0 else 0
-            writer.writerow([gender, count, f"{percentage:.1f}%"])
-        
-        writer.writerow([])
-        
-        # Detailed Client Information
-        writer.writerow(['DETAILED CLIENT INFORMATION'])
-        writer.writerow(['Client ID', 'First Name', 'Last Name', 'Preferred Name', 'Date of Birth', 'Age', 'Gender', 
-                        'Healthcare Coverage', 'Citizenship Status', 'Country of Birth', 'Sexual Orientation', 
-                        'Indigenous Status', 'Ethnicity', 'Programs'])
-        
-        for client in clients:
-            # Calculate age
-            age = "N/A"
-            if client.dob:
-                from datetime import date
-                today = date.today()
-                age = today.year - client.dob.year - ((today.month, today.day) < (client.dob.month, client.dob.day))
-            
-            # Get programs for this client
-            client_programs = ClientProgramEnrollment.objects.filter(client=client).values_list('program__name', flat=True)
-            programs_str = ', '.join(client_programs) if client_programs else 'None'
-            
-            # Get healthcare coverage - check if field exists, otherwise derive from health_card_number
-            healthcare_coverage = ''
-            if hasattr(client, 'healthcare_coverage') and client.healthcare_coverage:
-                healthcare_coverage = client.healthcare_coverage
-            elif client.health_card_number:
-                healthcare_coverage = 'Yes (Has Health Card)'
-            
-            # Format ethnicity (it's a JSONField that can be a list)
-            ethnicity_str = ''
-            if client.ethnicity:
-                if isinstance(client.ethnicity, list):
-                    ethnicity_str = ', '.join(str(e) for e in client.ethnicity if e)
-                else:
-                    ethnicity_str = str(client.ethnicity)
-            
-            writer.writerow([
-                client.client_id or '',
-                client.first_name or '',
-                client.last_name or '',
-                client.preferred_name or '',
-                client.dob.strftime('%Y-%m-%d') if client.dob else '',
-                age,
-                client.gender or 'Unknown',
-                healthcare_coverage,
-                client.citizenship_status or '',
-                client.country_of_birth or '',
-                client.sexual_orientation or '',
-                client.indigenous_status or '',
-                ethnicity_str,
-                programs_str
-            ])
-        
-        return response
+                # Get programs for this client
+                client_programs = [enrollment.program.name for enrollment in client.clientprogramenrollment_set.all()]
+                programs_str = ', '.join(client_programs) if client_programs else 'None'
+                
+                # Get healthcare coverage - check if field exists, otherwise derive from health_card_number
+                healthcare_coverage = ''
+                if hasattr(client, 'healthcare_coverage') and client.healthcare_coverage:
+                    healthcare_coverage = client.healthcare_coverage
+                elif client.health_card_number:
+                    healthcare_coverage = 'Yes (Has Health Card)'
+                
+                # Format ethnicity (it's a JSONField that can be a list)
+                ethnicity_str = ''
+                if client.ethnicity:
+                    if isinstance(client.ethnicity, list):
+                        ethnicity_str = ', '.join(str(e) for e in client.ethnicity if e)
+                    else:
+                        ethnicity_str = str(client.ethnicity)
+                
+                yield [
+                    client.client_id or '',
+                    client.first_name or '',
+                    client.last_name or '',
+                    client.preferred_name or '',
+                    client.dob.strftime('%Y-%m-%d') if client.dob else '',
+                    age,
+                    client.gender or 'Unknown',
+                    healthcare_coverage,
+                    client.citizenship_status or '',
+                    client.country_of_birth or '',
+                    client.sexual_orientation or '',
+                    client.indigenous_status or '',
+                    ethnicity_str,
+                    programs_str
+                ]
+        
+        return CSVExport('client_demographics_report.csv', rows(), header=['Client Demographics Report'])
 
 
 class ClientOutcomesExportView(ReportsExportAccessMixin, TemplateView):
@@ -1990,11 +1678,11 @@ class ClientOutcomesExportView(ReportsExportAccessMixin, TemplateView):
         completed_count = 0
         pending_count = 0
         
-        for enrollment in enrollments:
-            if today < enrollment.start_date:
+        for start_date, end_date in iter_queryset(enrollments.values_list('start_date', 'end_date')):
+            if today < start_date:
                 pending_count += 1
-            elif enrollment.end_date:
-                if today > enrollment.end_date:
+            elif end_date:
+                if today > end_date:
                     completed_count += 1
                 else:
                     active_count += 1
@@ -2003,79 +1691,80 @@ class ClientOutcomesExportView(ReportsExportAccessMixin, TemplateView):
         
         success_rate = (completed_count / total * 100) if total > 0 else 0
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="client_outcomes_report.csv"'
-        
-        writer = csv.writer(response)
-        
-        # Write header
-        writer.writerow(['Client Outcomes Report'])
-        writer.writerow(['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow([])
-        
-        # Summary Statistics
-        writer.writerow(['SUMMARY STATISTICS'])
-        writer.writerow(['Metric', 'Value'])
-        writer.writerow(['Total Enrollments', total])
-        writer.writerow(['Completed Enrollments', completed_count])
-        writer.writerow(['Active Enrollments', active_count])
-        writer.writerow(['Pending Enrollments', pending_count])
-        writer.writerow(['Success Rate', f"{success_rate:.1f}%"])
-        
-        writer.writerow([])
-        
-        # Performance Insights
-        writer.writerow(['PERFORMANCE INSIGHTS'])
-        if success_rate >= 80:
-            insight = f"Excellent completion rate! Your programs are highly effective with {success_rate:.1f}% success rate."
-        elif success_rate >= 60:
-            insight = f"Good completion rate of {success_rate:.1f}%. Consider reviewing program structure for improvement opportunities."
-        else:
-            insight = f"Completion rate of {success_rate:.1f}% indicates room for improvement. Consider program evaluation and client feedback."
-        
-        writer.writerow(['Completion Analysis', insight])
-        writer.writerow(['Active Engagement', f"Currently {active_count} clients are actively engaged in programs, representing {(active_count/total*100):.1f}% of total enrollments."])
-        
-        writer.writerow([])
-        
-        # Detailed Enrollment Information
-        writer.writerow(['DETAILED ENROLLMENT INFORMATION'])
-        writer.writerow(['Client Name', 'Program Name', 'Department', 'Start Date', 'End Date', 'Status', 'Duration (Days)', 'Created By'])
-        
-        for enrollment in enrollments:
-            # Calculate duration and status
-            if today < enrollment.start_date:
-                duration = 0
-                status = "Pending"
-            elif enrollment.end_date:
-                duration = (enrollment.end_date - enrollment.start_date).days
-                if today > enrollment.end_date:
-                    status = "Completed"
+        enrollments = enrollments.select_related('client', 'program__department')
+        
+        def rows():
+            yield ['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')]
+            yield []
+            
+            # Summary Statistics
+            yield ['SUMMARY STATISTICS']
+            yield ['Metric', 'Value']
+            yield ['Total Enrollments', total]
+            yield ['Completed Enrollments', completed_count]
+            yield ['Active Enrollments', active_count]
+            yield ['Pending Enrollments', pending_count]
+            yield ['Success Rate', f"{success_rate:.1f}%"]
+            
+            yield []
+            
+            # Performance Insights
+            yield ['PERFORMANCE INSIGHTS']
+            if success_rate >= 80:
+                insight = f"Excellent completion rate! Your programs are highly effective with {success_rate:.1f}% success rate."
+            elif success_rate >= 60:
+                insight = f"Good completion rate of {success_rate:.1f}%. Consider reviewing program structure for improvement opportunities."
+            else:
+                insight = f"Completion rate of {success_rate:.1f}% indicates room for improvement. Consider program evaluation and client feedback."
+            
+            yield ['Completion Analysis', insight]
+            yield ['Active Engagement', f"Currently {active_count} clients are actively engaged in programs, representing {(active_count/total*100):.1f}% of total enrollments."]
+            
+            yield []
+            
+            # Detailed Enrollment Information
+            yield ['DETAILED ENROLLMENT INFORMATION']
+            yield ['Client Name', 'Program Name', 'Department', 'Start Date', 'End Date', 'Status', 'Duration (Days)', 'Created By']
+            
+            for enrollment in iter_queryset(enrollments):
+                # Calculate duration and status
+                if today < enrollment.start_date:
+                    duration = 0
+                    status = "Pending"
+                elif enrollment.end_date:
+                    duration = (enrollment.end_date - enrollment.start_date).days
+                    if today > enrollment.end_date:
+                        status = "Completed"
+                    else:
+                        status = "Active"
                 else:
+                    duration = (today - enrollment.start_date).days
                     status = "Active"
-            else:
-                duration = (today - enrollment.start_date).days
-                status = "Active"
-            
-            writer.writerow([
-                f"{enrollment.client.first_name} {enrollment.client.last_name}",
-                enrollment.program.name,
-                enrollment.program.department.name if enrollment.program.department else '',
-                enrollment.start_date.strftime('%Y-%m-%d'),
-                enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else 'Ongoing',
-                status,
-                duration,
-                enrollment.created_by or ''
-            ])
-        
-        return response
+                
+                yield [
+                    f"{enrollment.client.first_name} {enrollment.client.last_name}",
+                    enrollment.program.name,
+                    enrollment.program.department.name if enrollment.program.department else '',
+                    enrollment.start_date.strftime('%Y-%m-%d'),
+                    enrollment.end_date.strftime('%Y-%m-%d') if enrollment.end_date else 'Ongoing',
+                    status,
+                    duration,
+                    enrollment.created_by or ''
+                ]
+        
+        return stream_csv(request, 'client_outcomes_report.csv', rows(), header=['Client Outcomes Report'])
 
 
 class OrganizationalSummaryExportView(ReportsExportAccessMixin, TemplateView):
     """Export organizational summary report to CSV"""
     
     def get(self, request, *args, **kwargs):
+        if wants_background_export(request):
+            return export_job_response(request, 'organizational_summary')
+        return self.get_export().as_response(request)
+    
+    def get_export(self):
+        request = self.request
         # Get the same data as the main view
         is_program_manager, is_leader, is_analyst, is_staff_only, assigned_programs, assigned_clients = get_program_manager_filtering(request)
         
@@ -2110,42 +1799,15 @@ class OrganizationalSummaryExportView(ReportsExportAccessMixin, TemplateView):
         
         # Calculate active enrollments using date-based logic
         today = timezone.now().date()
-        active_count = 0
-        for enrollment in enrollments:
-            if today < enrollment.start_date:
-                continue
-            elif enrollment.end_date:
-                if today > enrollment.end_date:
-                    continue
-                else:
-                    active_count += 1
-            else:
-                active_count += 1
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="organizational_summary_report.csv"'
-        
-        writer = csv.writer(response)
         
-        # Write header
-        writer.writerow(['Organizational Summary Report'])
-        writer.writerow(['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow([])
+        def is_active(start_date, end_date):
+            return start_date <= today and (not end_date or end_date >= today)
         
-        # Summary Statistics
-        writer.writerow(['ORGANIZATIONAL OVERVIEW'])
-        writer.writerow(['Metric', 'Value'])
-        writer.writerow(['Total Clients', total_clients])
-        writer.writerow(['Total Programs', total_programs])
-        writer.writerow(['Active Enrollments', active_count])
-        writer.writerow(['Enrollment Rate', f"{(active_count/total_clients*100):.1f}%" if total_clients > 0 else "0%"])
-        writer.writerow(['Average per Program', f"{(active_count/total_programs):.1f}" if total_programs > 0 else "0"])
-        
-        writer.writerow([])
+        active_count = sum(
+            1 for start_date, end_date in iter_queryset(enrollments.values_list('start_date', 'end_date'))
+            if is_active(start_date, end_date)
+        )
         
-        # Client Demographics
-        writer.writerow(['CLIENT DEMOGRAPHICS'])
         if (is_program_manager or is_leader) and assigned_programs:
             clients = Client.objects.filter(
                 clientprogramenrollment__program__in=assigned_programs
@@ -2156,7 +1818,7 @@ class OrganizationalSummaryExportView(ReportsExportAccessMixin, TemplateView):
         # Apply client status filter
         clients = apply_client_status_filter(clients, client_status)
         
-        # Age distribution
+        # Age and gender distribution
         age_groups = {
             '0-17': 0,
             '18-25': 0,
@@ -2166,12 +1828,10 @@ class OrganizationalSummaryExportView(ReportsExportAccessMixin, TemplateView):
             '56-65': 0,
             '65+': 0
         }
+        gender_counts = {}
         
-        for client in clients:
-            age = client.dob
+        for client_pk, age, gender in iter_queryset(clients.values_list('pk', 'dob', 'gender')):
             if age:
-                from datetime import date
-                today = date.today()
                 age_years = today.year - age.year - ((today.month, today.day) < (age.month, age.day))
                 
                 if age_years <= 17:
@@ -2188,64 +1848,69 @@ class OrganizationalSummaryExportView(ReportsExportAccessMixin, TemplateView):
                     age_groups['56-65'] += 1
                 else:
                     age_groups['65+'] += 1
-        
-        writer.writerow(['Age Group', 'Count', 'Percentage'])
-        for age_group, count in age_groups.items():
-            percentage = (count / total_clients * 100) if total_clients > 0 else 0
-            writer.writerow([age_group, count, f"{percentage:.1f}%"])
-        
-        writer.writerow([])
-        
-        # Gender distribution
-        gender_counts = {}
-        for client in clients:
-            gender = client.gender or 'Unknown'
+            
+            gender = gender or 'Unknown'
             gender_counts[gender] = gender_counts.get(gender, 0) + 1
         
-        writer.writerow(['Gender', 'Count', 'Percentage'])
-        for gender, count in gender_counts.items():
-            percentage = (count / total_clients * 100) if total_clients > 0 else 0
-            writer.writerow([gender, count, f"{percentage:.1f}%"])
-        
-        writer.writerow([])
-        
-        # Program Statistics
-        writer.writerow(['PROGRAM STATISTICS'])
         if (is_program_manager or is_leader) and assigned_programs:
             programs = assigned_programs
         else:
             programs = Program.objects.all()
         
-        writer.writerow(['Program Name', 'Department', 'Location', 'Capacity', 'Active Enrollments', 'Utilization %'])
-        
-        for program in programs:
-            # Exclude archived enrollments from capacity calculations
-            program_enrollments = ClientProgramEnrollment.objects.filter(
-                program=program,
-                is_archived=False  # Exclude archived enrollments from capacity calculations
-            )
-            program_active = 0
+        def rows():
+            yield ['Generated on', timezone.now().strftime('%Y-%m-%d %H:%M:%S')]
+            yield []
             
-            for enrollment in program_enrollments:
-                if today < enrollment.start_date:
-                    continue
-                elif enrollment.end_date:
-                    if today > enrollment.end_date:
-                        continue
-                    else:
-                        program_active += 1
-                else:
-                    program_active += 1
+            # Summary Statistics
+            yield ['ORGANIZATIONAL OVERVIEW']
+            yield ['Metric', 'Value']
+            yield ['Total Clients', total_clients]
+            yield ['Total Programs', total_programs]
+            yield ['Active Enrollments', active_count]
+            yield ['Enrollment Rate', f"{(active_count/total_clients*100):.1f}%" if total_clients > 0 else "0%"]
+            yield ['Average per Program', f"{(active_count/total_programs):.1f}" if total_programs > 0 else "0"]
             
-            utilization = (program_active / program.capacity_current * 100) if program.capacity_current > 0 else 0
+            yield []
             
-            writer.writerow([
-                program.name,
-                program.department.name if program.department else '',
-                program.location or '',
-                program.capacity_current,
-                program_active,
-                f"{utilization:.1f}%"
-            ])
-        
-        return response
\ No newline at end of file
+            # Client Demographics
+            yield ['CLIENT DEMOGRAPHICS']
+            yield ['Age Group', 'Count', 'Percentage']
+            for age_group, count in age_groups.items():
+                percentage = (count / total_clients * 100) if total_clients > 0 else 0
+                yield [age_group, count, f"{percentage:.1f}%"]
+            
+            yield []
+            
+            yield ['Gender', 'Count', 'Percentage']
+            for gender, count in gender_counts.items():
+                percentage = (count / total_clients * 100) if total_clients > 0 else 0
+                yield [gender, count, f"{percentage:.1f}%"]
+            
+            yield []
+            
+            # Program Statistics
+            yield ['PROGRAM STATISTICS']
+            yield ['Program Name', 'Department', 'Location', 'Capacity', 'Active Enrollments', 'Utilization %']
+            
+            # Exclude archived enrollments from capacity calculations
+            program_enrollments = Prefetch(
+                'clientprogramenrollment_set',
+                queryset=ClientProgramEnrollment.objects.filter(is_archived=False).only('program_id', 'start_date', 'end_date'),
+            )
+            for program in iter_queryset(programs.select_related('department').prefetch_related(program_enrollments)):
+                program_active = sum(
+                    1 for enrollment in program.clientprogramenrollment_set.all()
+                    if is_active(enrollment.start_date, enrollment.end_date)
+                )
+                utilization = (program_active / program.capacity_current * 100) if program.capacity_current > 0 else 0
+                
+                yield [
+                    program.name,
+                    program.department.name if program.department else '',
+                    program.location or '',
+                    program.capacity_current,
+                    program_active,
+                    f"{utilization:.1f}%"
+                ]
+        
+        return CSVExport('organizational_summary_report.csv', rows(), header=['Organizational Summary Report'])
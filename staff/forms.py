@@ -2,6 +2,7 @@ from django import forms
 from core.models import Role, StaffRole, Client
 from programs.models import Program
 from .models import StaffProgramAssignment, StaffClientAssignment
+from core.principal import invalidate_principals_on_commit
 
 
 
@@ -68,6 +69,7 @@ class ProgramManagerAssignmentForm(forms.Form):
         
         # Deactivate all current assignments
         ProgramManagerAssignment.objects.filter(staff=staff, is_active=True).update(is_active=False)
+        invalidate_principals_on_commit()
         
         # Create new assignments or reactivate existing ones
         for program in selected_programs:
@@ -110,6 +112,7 @@ class StaffProgramAssignmentForm(forms.Form):
         
         # Deactivate all current program assignments
         StaffProgramAssignment.objects.filter(staff=staff, is_active=True).update(is_active=False)
+        invalidate_principals_on_commit()
         
         # Create new assignments or reactivate existing ones
         for program in selected_programs:
@@ -150,6 +153,7 @@ class StaffClientAssignmentForm(forms.Form):
         
         # Deactivate all current client assignments
         StaffClientAssignment.objects.filter(staff=staff, is_active=True).update(is_active=False)
+        invalidate_principals_on_commit()
         
         # Create new assignments or reactivate existing ones
         for client in selected_clients:
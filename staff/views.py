@@ -9,6 +9,7 @@ from functools import wraps
 from core.models import Staff, Role, StaffRole, User, ProgramManagerAssignment, Program, Department, DepartmentLeaderAssignment, Client
 from .forms import StaffRoleForm, ProgramManagerAssignmentForm, StaffProgramAssignmentForm, StaffClientAssignmentForm
 from .models import StaffClientAssignment, StaffProgramAssignment
+from core.principal import get_principal, invalidate_principals_on_commit
 
 
 def require_roles(*allowed_roles):
@@ -29,8 +30,7 @@ def require_roles(*allowed_roles):
             
             try:
                 staff = request.user.staff_profile
-                user_roles = staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(request.user).role_names
                 
                 # Check if user has any of the allowed roles
                 has_allowed_role = any(role in allowed_roles for role in role_names)
@@ -159,8 +159,7 @@ class StaffDetailView(DetailView):
         if self.request.user.is_authenticated:
             try:
                 viewing_staff = self.request.user.staff_profile
-                user_roles = viewing_staff.staffrole_set.select_related('role').all()
-                role_names = [staff_role.role.name for staff_role in user_roles]
+                role_names = get_principal(self.request.user).role_names
                 
                 viewing_user_is_admin = 'Admin' in role_names
                 viewing_user_is_superadmin = 'SuperAdmin' in role_names
@@ -676,6 +675,7 @@ def manage_department_assignments(request, external_id):
         
         # Remove existing assignments
         DepartmentLeaderAssignment.objects.filter(staff=staff).update(is_active=False)
+        invalidate_principals_on_commit()
         
         # Add new assignments
         for department_id in department_ids:
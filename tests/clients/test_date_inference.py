@@ -0,0 +1,73 @@
+import csv
+import io
+import os
+from datetime import date
+
+import django
+import pandas as pd
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from clients.date_inference import DateColumn, parse_date_text
+from core.models import Client, ClientUploadLog
+
+
+def date_column(values, field_name="dob"):
+    raw = pd.Series(values, dtype=object)
+    return DateColumn(field_name, raw, raw.fillna("").astype(str).str.strip())
+
+
+def test_ambiguous_dates_follow_the_column_ordering():
+    european = date_column(["05/12/2024", "25/12/2024", "01/02/2023", "not a date", ""])
+    assert european.report["format"] == "%d/%m/%Y" and european.report["ordering"] == "day_first"
+    assert european.get("05/12/2024") == (True, date(2024, 12, 5))
+    assert european.get(" 01/02/2023 ") == (True, date(2023, 2, 1))
+    assert european.get("not a date") == (True, None)
+    assert european.get("2024-01-01") == (False, None)
+
+    # Columns without a day above 12 keep the US ordering of the per-cell parser
+    us = date_column(["05/12/2024", "01/02/2023"])
+    assert us.report["ordering"] == "month_first"
+    assert us.get("05/12/2024") == (True, date(2024, 5, 12))
+
+
+def test_serials_lines_and_outliers():
+    column = date_column(["45000", "2024-01-05\n2024-02-10", "2023-03-04", "March 5, 2024", "1/2/2020 10:00"], "intake_date")
+    assert column.report == {
+        "format": "%Y-%m-%d", "ordering": None, "values": 6, "excel_serials": 1,
+        "vectorized": 3, "fallback": 2, "unparsed": 0,
+    }
+    assert column.get("45000") == (True, date(2023, 3, 15))
+    assert column.get("2024-02-10") == (True, date(2024, 2, 10))
+    assert column.get("March 5, 2024") == (True, date(2024, 3, 5))
+    # Whole multi-line cells are not single dates
+    assert column.get("2024-01-05\n2024-02-10") == (False, None)
+    assert list(column.cell_dates(pd.Series(["2023-03-04", "2024-01-05\n2024-02-10", ""]))) == [date(2023, 3, 4), None, None]
+
+    assert parse_date_text("03/04/2020", day_first=True) == date(2020, 4, 3)
+    assert parse_date_text("20241205") == date(2024, 12, 5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_parses_dates_with_the_inferred_format_and_logs_it(client):
+    csv_io = io.StringIO()
+    writer = csv.writer(csv_io)
+    writer.writerow(["client_id", "first_name", "last_name", "dob"])
+    writer.writerows([
+        ["3001", "Alex", "Morgan", "04/03/1990"],
+        ["3002", "Blair", "Chen", "28/02/1985"],
+    ])
+    upload = SimpleUploadedFile("clients.csv", csv_io.getvalue().encode("utf-8"), content_type="text/csv")
+
+    response = client.post(reverse("clients:upload_process"), {"file": upload, "source": "SMIS"})
+
+    assert response.status_code == 200
+    assert dict(Client.objects.values_list("client_id", "dob")) == {"3001": date(1990, 3, 4), "3002": date(1985, 2, 28)}
+    date_formats = ClientUploadLog.objects.get().upload_details["date_formats"]
+    assert date_formats["dob"]["format"] == "%d/%m/%Y" and date_formats["dob"]["vectorized"] == 2
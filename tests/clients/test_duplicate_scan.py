@@ -0,0 +1,150 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+import django
+from django.db import IntegrityError
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.utils import timezone
+
+from core.models import Client, ClientDuplicate, DuplicateScanRun
+
+
+NAMES = [
+    ("Alexander", "Morgan"),
+    ("Blair", "Chen"),
+    ("Alexandr", "Morgan"),
+    ("Casey", "Diaz"),
+    ("Blaire", "Chen"),
+    ("Dana", "Okafor"),
+]
+
+
+def create_clients():
+    return [
+        Client.objects.create(first_name=first, last_name=last, client_id=str(3000 + i), source="SMIS")
+        for i, (first, last) in enumerate(NAMES)
+    ]
+
+
+def flagged_pairs():
+    return {
+        frozenset((first, second))
+        for first, second in ClientDuplicate.objects.values_list("primary_client__first_name", "duplicate_client__first_name")
+    }
+
+
+def fail_on_call(monkeypatch, call_number):
+    import clients.duplicate_scan as duplicate_scan
+    original_bulk_create = duplicate_scan.ClientDuplicate.objects.bulk_create
+    calls = {"count": 0}
+
+    def bulk_create(objs, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == call_number:
+            raise IntegrityError("Forced failure for resume test")
+        return original_bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(duplicate_scan.ClientDuplicate.objects, "bulk_create", bulk_create)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_scan_flags_pairs_across_the_whole_population():
+    from clients.duplicate_scan import run_duplicate_scan_job
+
+    create_clients()
+    scan_run = DuplicateScanRun.objects.create(options={"batch_size": 2})
+    payload = run_duplicate_scan_job(scan_run.pk)
+
+    assert payload["status"] == "success"
+    assert payload["clients_scanned"] == payload["clients_total"] == len(NAMES)
+    assert payload["pairs_per_second"] is not None
+    assert flagged_pairs() == {frozenset(("Alexander", "Alexandr")), frozenset(("Blair", "Blaire"))}
+    assert set(ClientDuplicate.objects.values_list("detection_source", flat=True)) == {"scan"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_same_dob_pairs_are_flagged_without_a_shared_blocking_key():
+    from clients.duplicate_scan import run_duplicate_scan_job
+
+    dob = date(1984, 5, 17)
+    Client.objects.create(first_name="Quentin", last_name="Mills", dob=dob, client_id="4001", source="SMIS")
+    Client.objects.create(first_name="Zelda", last_name="Marsh", dob=dob, client_id="4002", source="SMIS")
+    Client.objects.create(first_name="Harriet", last_name="Vance", dob=dob, client_id="4003", source="SMIS")
+
+    run_duplicate_scan_job(DuplicateScanRun.objects.create().pk)
+
+    assert flagged_pairs() == {frozenset(("Quentin", "Zelda"))}
+    assert ClientDuplicate.objects.get().match_type == "name_dob_similarity"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stale_scan_stops_blocking_and_can_be_resumed(client, admin_user, settings):
+    from clients.duplicate_scan import build_scan_payload, get_active_scan, STALE_SCAN_SECONDS
+
+    scan_run = DuplicateScanRun.objects.create(status="processing")
+    assert get_active_scan() == scan_run
+    settings.DUPLICATE_SCAN_RUNNER = "command"
+    client.force_login(admin_user)
+
+    # Queued or running scans already have a runner: a second one would scan the same clients
+    for status in ("queued", "processing"):
+        DuplicateScanRun.objects.filter(pk=scan_run.pk).update(status=status)
+        response = client.post(f"/clients/dedupe/scans/{scan_run.external_id}/resume/")
+        assert response.status_code == 409
+
+    # Its runner died: no checkpoint since
+    DuplicateScanRun.objects.filter(pk=scan_run.pk).update(
+        updated_at=timezone.now() - timedelta(seconds=STALE_SCAN_SECONDS + 60)
+    )
+    scan_run.refresh_from_db()
+    assert get_active_scan() is None
+    payload = build_scan_payload(scan_run)
+    assert payload["stale"] and payload["can_resume"]
+
+    response = client.post(f"/clients/dedupe/scans/{scan_run.external_id}/resume/")
+    assert response.status_code == 202
+    scan_run.refresh_from_db()
+    assert scan_run.status == "queued"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_finished_scan_records_its_duration():
+    from clients.duplicate_scan import run_duplicate_scan_job
+
+    create_clients()
+    scan_run = DuplicateScanRun.objects.create(options={"batch_size": 2})
+    payload = run_duplicate_scan_job(scan_run.pk)
+
+    scan_run.refresh_from_db()
+    assert scan_run.duration_seconds is not None
+    assert scan_run.duration_seconds >= 0
+    assert payload["duration_seconds"] == scan_run.duration_seconds
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_scan_resumes_after_last_committed_batch(monkeypatch):
+    from clients.duplicate_scan import run_duplicate_scan_job
+
+    clients = create_clients()
+    scan_run = DuplicateScanRun.objects.create(options={"batch_size": 1})
+
+    # Batch 1 (Alexander) commits its pair, batch 2 (Blair) fails
+    fail_on_call(monkeypatch, 2)
+    run_duplicate_scan_job(scan_run.pk)
+    scan_run.refresh_from_db()
+    assert scan_run.status == "failed"
+    assert scan_run.last_client_id == clients[0].id
+    assert flagged_pairs() == {frozenset(("Alexander", "Alexandr"))}
+
+    monkeypatch.undo()
+    run_duplicate_scan_job(scan_run.pk, resume=True)
+    scan_run.refresh_from_db()
+    assert scan_run.status == "success"
+    assert scan_run.clients_scanned == len(NAMES)
+    assert scan_run.duplicates_flagged == 2
+    assert ClientDuplicate.objects.count() == 2
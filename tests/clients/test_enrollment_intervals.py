@@ -0,0 +1,109 @@
+import csv
+import io
+import os
+import random
+from datetime import date, timedelta
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from clients.enrollment_intervals import EnrollmentIntervals, overlaps_or_adjacent
+from core.models import Client, ClientProgramEnrollment, ClientUploadLog, Department, Program
+
+
+def scan_candidates(enrollments, start_date, end_date):
+    """The upload's previous merge candidates: a scan of every enrollment, latest start first."""
+    enrollments = sorted(enrollments, key=lambda e: -e.start_date.toordinal())
+    groups = [
+        [e for e in enrollments if end_date is None and e.end_date is None],
+        [e for e in enrollments if e.start_date == start_date],
+        [e for e in enrollments if abs((e.start_date - start_date).days) <= 7],
+        [e for e in enrollments if overlaps_or_adjacent(e.start_date, e.end_date, start_date, end_date)],
+    ]
+    matches = []
+    for group in groups:
+        matches += [e for e in group if not any(e is match for match in matches)]
+    return matches
+
+
+def test_candidates_match_the_full_scan():
+    rng = random.Random(7)
+    intervals = EnrollmentIntervals()
+    intervals.add_new_clients([1])
+    base = date(2024, 1, 1)
+    enrollments = []
+    for _ in range(60):
+        start = base + timedelta(days=rng.randrange(400))
+        end = None if rng.random() < 0.2 else start + timedelta(days=rng.randrange(60))
+        enrollments.append(intervals.create(client_id=1, program_id=1, start_date=start, end_date=end))
+    intervals.create(client_id=1, program_id=2, start_date=base, end_date=None)
+
+    for _ in range(200):
+        start = base + timedelta(days=rng.randrange(-30, 430))
+        end = None if rng.random() < 0.3 else start + timedelta(days=rng.randrange(30))
+        assert intervals.candidates(1, 1, start, end) == scan_candidates(enrollments, start, end)
+
+    # Archived enrollments stop being candidates but still own their start date
+    archived = enrollments[0]
+    intervals.archive(archived)
+    assert archived not in intervals.candidates(1, 1, archived.start_date, archived.end_date)
+    assert intervals.get(1, 1, archived.start_date) is not None
+    assert intervals.open_ended(1, 2) is not None and intervals.open_ended(1, 2, exclude_start=base) is None
+
+
+def upload_csv(client, rows):
+    csv_io = io.StringIO()
+    writer = csv.writer(csv_io)
+    writer.writerow(["client_id", "first_name", "last_name", "program_name", "intake_date", "discharge_date"])
+    writer.writerows(rows)
+    upload = SimpleUploadedFile("clients.csv", csv_io.getvalue().encode("utf-8"), content_type="text/csv")
+    return client.post(reverse("clients:upload_process"), {"file": upload, "source": "SMIS"})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_merges_into_preloaded_enrollments_and_writes_in_bulk(client):
+    department = Department.objects.create(name="Housing")
+    # Rows without a department column use the "NA" department
+    Department.objects.create(name="NA")
+    shelter = Program.objects.create(name="Shelter", department=department)
+    meals = Program.objects.create(name="Meals", department=department)
+    existing = Client.objects.create(first_name="Alex", last_name="Morgan", client_id="5001", source="SMIS")
+    ClientProgramEnrollment.objects.create(client=existing, program=shelter, start_date=date(2024, 1, 1))
+    ClientProgramEnrollment.objects.create(
+        client=existing, program=meals, start_date=date(2024, 3, 11), end_date=date(2024, 4, 1),
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        response = upload_csv(client, [
+            # Open-ended like the existing Shelter enrollment: merged into it
+            ["5001", "Alex", "Morgan", "Shelter", "2024-01-05", ""],
+            # Ends the day before the existing Meals enrollment starts: merged into it
+            ["5001", "Alex", "Morgan", "Meals", "2024-03-01", "2024-03-10"],
+            ["5002", "Blair", "Chen", "Shelter", "2024-02-01", ""],
+        ])
+    assert response.status_code == 200
+
+    enrollments = ClientProgramEnrollment.objects.filter(is_archived=False)
+    assert sorted(enrollments.values_list("client__client_id", "program__name", "start_date", "end_date")) == [
+        ("5001", "Meals", date(2024, 3, 1), date(2024, 4, 1)),
+        ("5001", "Shelter", date(2024, 1, 1), None),
+        ("5002", "Shelter", date(2024, 2, 1), None),
+    ]
+    enrollment_selects = [
+        query["sql"] for query in queries.captured_queries
+        if query["sql"].startswith("SELECT") and 'FROM "client_program_enrollments"' in query["sql"]
+    ]
+    # No per-row lookups by client and program: one load for the chunk's existing clients
+    assert not [sql for sql in enrollment_selects if '"client_program_enrollments"."program_id" = ' in sql.split("WHERE")[-1]]
+    assert len([sql for sql in enrollment_selects if f'"client_id" IN ({existing.pk})' in sql]) == 1
+    details = ClientUploadLog.objects.get().upload_details["enrollments"]
+    assert details == {"loaded": 2, "load_queries": 1, "created": 1, "updated": 2}
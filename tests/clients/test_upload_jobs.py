@@ -0,0 +1,126 @@
+import io
+import os
+import csv
+import pytest
+import django
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from core.models import Client, ClientUploadLog
+
+
+def build_upload(rows):
+    csv_io = io.StringIO()
+    writer = csv.writer(csv_io)
+    writer.writerow(["client_id", "first_name", "last_name", "phone"])
+    for row in rows:
+        writer.writerow(row)
+    return SimpleUploadedFile("clients.csv", csv_io.getvalue().encode("utf-8"), content_type="text/csv")
+
+
+ROWS = [
+    ["2001", "Alex", "Morgan", "5550000001"],
+    ["2002", "Blair", "Chen", "5550000002"],
+    ["2003", "Casey", "Diaz", "5550000003"],
+]
+
+
+def fail_on_call(monkeypatch, call_number):
+    import clients.views as views
+    original_bulk_create = views.Client.objects.bulk_create
+    calls = {"count": 0}
+
+    def bulk_create(objs, batch_size=None, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == call_number:
+            raise IntegrityError("Forced failure for checkpoint test")
+        return original_bulk_create(objs, batch_size=batch_size, **kwargs)
+
+    monkeypatch.setattr(views.Client.objects, "bulk_create", bulk_create)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_chunk_keeps_committed_chunks_and_checkpoint(client, settings, monkeypatch):
+    settings.CLIENT_UPLOAD_CHUNK_SIZE = 1
+    fail_on_call(monkeypatch, 2)
+
+    response = client.post(reverse("clients:upload_process"), {"file": build_upload(ROWS), "source": "SMIS"})
+
+    assert response.status_code == 500
+    # Chunk 1 committed, chunk 2 rolled back, chunk 3 never ran
+    assert list(Client.objects.values_list("client_id", flat=True)) == ["2001"]
+    upload_log = ClientUploadLog.objects.get()
+    assert upload_log.status == "failed"
+    assert upload_log.upload_details["checkpoint"]["next_row"] == 1
+    assert [chunk["chunk"] for chunk in upload_log.upload_details["chunks"]] == [1]
+    assert response.json()["checkpoint"]["records_created"] == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_job_resumes_from_last_checkpoint(settings, monkeypatch, tmp_path):
+    from clients.upload_jobs import build_progress_payload, enqueue_client_upload, run_client_upload_job
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.CLIENT_UPLOAD_CHUNK_SIZE = 1
+    settings.CLIENT_UPLOAD_RUNNER = "command"
+
+    upload_log = enqueue_client_upload(build_upload(ROWS), "SMIS", None)
+    assert upload_log.status == "queued"
+
+    fail_on_call(monkeypatch, 3)
+    run_client_upload_job(upload_log.pk)
+    upload_log.refresh_from_db()
+    assert upload_log.status == "failed"
+    assert build_progress_payload(upload_log)["can_resume"]
+    assert Client.objects.count() == 2
+
+    monkeypatch.undo()
+    result = run_client_upload_job(upload_log.pk, resume=True)
+    upload_log.refresh_from_db()
+
+    assert result["success"]
+    assert upload_log.status == "success"
+    assert upload_log.records_created == 3
+    assert upload_log.upload_details["resumed_from_row"] == 2
+    assert sorted(Client.objects.values_list("client_id", flat=True)) == ["2001", "2002", "2003"]
+
+    progress = build_progress_payload(upload_log)
+    assert progress["finished"] and progress["percentage"] == 100
+    assert [chunk["chunk"] for chunk in progress["chunks"]] == [1, 2, 3]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stale_processing_upload_can_be_resumed(client, admin_user, settings, tmp_path):
+    from datetime import timedelta
+    from django.utils import timezone
+    from clients.upload_jobs import STALE_UPLOAD_SECONDS, build_progress_payload, enqueue_client_upload
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.CLIENT_UPLOAD_RUNNER = "command"
+    upload_log = enqueue_client_upload(build_upload(ROWS), "SMIS", None)
+    client.force_login(admin_user)
+
+    # Queued or processing uploads already have a runner: a second one would import the rows twice
+    assert not build_progress_payload(upload_log)["can_resume"]
+    for status in ("queued", "processing"):
+        ClientUploadLog.objects.filter(pk=upload_log.pk).update(status=status)
+        response = client.post(reverse("clients:resume_upload", args=[upload_log.external_id]))
+        assert response.status_code == 409
+
+    # The worker running it was killed mid-chunk: no checkpoint since
+    ClientUploadLog.objects.filter(pk=upload_log.pk).update(
+        status="processing", updated_at=timezone.now() - timedelta(seconds=STALE_UPLOAD_SECONDS + 60)
+    )
+    upload_log.refresh_from_db()
+    progress = build_progress_payload(upload_log)
+    assert progress["stale"] and progress["can_resume"] and progress["error_message"]
+
+    response = client.post(reverse("clients:resume_upload", args=[upload_log.external_id]))
+    assert response.status_code == 202
+    upload_log.refresh_from_db()
+    assert upload_log.status == "queued"
@@ -0,0 +1,68 @@
+import io
+import os
+from datetime import date
+
+import django
+import pandas as pd
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from clients.upload_normalization import UploadFrame, resolve_field_columns
+
+
+CSV = (
+    "Client ID,First Name,Last Name,DOB,Phone,Email,Program\n"
+    "2765.0, Ann ,Lee,1990-02-03,+1 (555) 123-4567,Ann@Example.com,\"Shelter\nOutreach\"\n"
+    ",Bob,,03/04/1985,,,\n"
+    "A.B,,,not a date,,,\n"
+    "12.5,Cy,Ng,1900-01-01,,,\n"
+)
+
+MAPPING = {
+    "Client ID": "client_id",
+    "First Name": "first_name",
+    "Last Name": "last_name",
+    "DOB": "dob",
+    "Phone": "phone",
+    "Email": "email",
+    "Program": "program_name",
+}
+
+
+def build_frame():
+    return UploadFrame(pd.read_csv(io.StringIO(CSV)), MAPPING)
+
+
+def test_resolve_field_columns_keeps_first_mapped_column():
+    mapping = {"Phone": "phone", "Mobile": "phone", "Email": "email"}
+    assert resolve_field_columns(mapping, ["Mobile", "Phone", "Email"]) == {"phone": "Mobile", "email": "Email"}
+
+
+def test_derived_columns_match_row_wise_cleaning():
+    frame = build_frame()
+    assert frame.unique_values("client_id_clean") == ["2765", "12.5"]
+    assert frame.unique_values("email_key") == ["ann@example.com"]
+    assert frame.derived["phone_key"][0] == "15551234567"
+    assert frame.derived["program_name_list"][0] == ["Shelter", "Outreach"]
+    assert frame.dobs() == {date(1990, 2, 3), date(1985, 3, 4)}
+    assert frame.name_dob_keys() == {("ann", "lee", date(1990, 2, 3))}
+
+
+def test_get_field_contract():
+    frame = build_frame()
+    row_fields = frame.row_fields(1)
+    assert frame.get_field(row_fields, "first_name") == "Bob"
+    # Mapped but empty -> default, unmapped -> None
+    assert frame.get_field(row_fields, "last_name", "N/A") == "N/A"
+    assert frame.get_field(row_fields, "uid_external") is None
+
+
+def test_iter_rows_yields_raw_and_normalized_rows():
+    frame = build_frame()
+    rows = list(frame.iter_rows(0, 2))
+    assert [index for index, _, _ in rows] == [0, 1]
+    index, raw_row, row_fields = rows[0]
+    assert raw_row["First Name"] == " Ann "
+    assert row_fields["first_name"] == "Ann"
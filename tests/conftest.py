@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture
+def create_staff_user():
+    """Factory for a user with a staff profile and the given roles: ``create_staff_user(username, *role_names)``."""
+    from core.models import Role, Staff, StaffRole, User
+
+    def create(username, *role_names, first_name="", last_name=""):
+        user = User.objects.create_user(
+            username=username, email=f"{username}@example.com", password="x", first_name=first_name, last_name=last_name
+        )
+        staff = Staff.objects.create(user=user, first_name=username, email=user.email)
+        for role_name in role_names:
+            StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name=role_name)[0])
+        return user, staff
+
+    return create
@@ -0,0 +1,99 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from core.admissions import admit_clients
+from core.models import (
+    AuditLog, Client, ClientProgramEnrollment, Department, Program, Role, ServiceRestriction, Staff, StaffRole, User,
+)
+from core.principal import get_principal
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create_user(
+        username="admin", email="admin@example.com", password="x", first_name="Ada", last_name="Admin"
+    )
+    staff = Staff.objects.create(user=user, first_name="Ada", email="admin@example.com")
+    StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name="SuperAdmin")[0])
+    return user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_admissions_follow_can_enroll_client_in_order(user, django_assert_max_num_queries):
+    cache.clear()
+    start = date(2025, 3, 1)
+    department = Department.objects.create(name="Housing")
+    program = Program.objects.create(name="Shelter", department=department, capacity_current=3)
+    other = Program.objects.create(name="Meals", department=department)
+    barred, restricted, enrolled, first, second, late = (
+        Client.objects.create(first_name=name, last_name="Test", client_id=str(i))
+        for i, name in enumerate(["Barred", "Restricted", "Enrolled", "First", "Second", "Late"])
+    )
+    ServiceRestriction.objects.create(client=barred, scope="program", program=program, restriction_type=["bar"], start_date=date(2025, 1, 1))
+    ServiceRestriction.objects.create(client=barred, scope="org", restriction_type=["bar"], start_date=date(2025, 1, 1))
+    ServiceRestriction.objects.create(client=restricted, scope="program", program=program, restriction_type=["bar"], start_date=date(2025, 1, 1))
+    # Restrictions for another program or that ended do not block
+    ServiceRestriction.objects.create(client=first, scope="program", program=other, restriction_type=["bar"], start_date=date(2025, 1, 1))
+    ServiceRestriction.objects.create(
+        client=second, scope="org", restriction_type=["bar"], start_date=date(2025, 1, 1), end_date=date(2025, 2, 1),
+    )
+    ClientProgramEnrollment.objects.create(client=enrolled, program=program, start_date=date(2025, 1, 1))
+
+    # The checks can_enroll_client runs, one client at a time
+    expected_barred = program.check_client_restrictions(barred, start)[1]
+    expected_restricted = program.check_client_restrictions(restricted, start)[1]
+    get_principal(user)
+
+    requested = [barred.id, restricted.id, enrolled.id, first.id, "999999", second.id, late.id, str(first.id)]
+    # Lock, clients, restrictions, enrollments, capacity, one insert, the audit insert and counter upsert
+    # (plus transaction statements), whatever the selection size
+    with django_assert_max_num_queries(15):
+        decisions = admit_clients(program, requested, start, user)
+
+    assert [decision.accepted for decision in decisions] == [False, False, False, True, False, True, False, False]
+    reasons = [decision.reason for decision in decisions]
+    assert reasons[0] == expected_barred and "GLOBAL" in reasons[0]
+    assert reasons[1] == expected_restricted
+    assert reasons[2] == "Client is already enrolled in 'Shelter' program on March 01, 2025."
+    assert decisions[4].client is None
+    # One existing and two admitted enrollments fill the three spots
+    assert reasons[6] == reasons[7] == "Program 'Shelter' is at full capacity on March 01, 2025 (3/3 clients)."
+    assert program.can_enroll_client(late, start) == (False, reasons[6])
+
+    created = ClientProgramEnrollment.objects.filter(program=program, start_date=start)
+    assert sorted(created.values_list("client_id", "status", "created_by")) == [
+        (first.id, "active", "Ada Admin"), (second.id, "active", "Ada Admin"),
+    ]
+    assert AuditLog.objects.filter(entity="Enrollment", action="create").count() == 2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_enroll_view_admits_a_cohort_in_one_batch(client, user, django_assert_max_num_queries):
+    cache.clear()
+    department = Department.objects.create(name="Housing")
+    program = Program.objects.create(name="Shelter", department=department, capacity_current=150)
+    cohort = Client.objects.bulk_create([
+        Client(first_name=f"C{i}", last_name="Test", client_id=str(i)) for i in range(200)
+    ])
+    client.force_login(user)
+
+    # Request overhead plus a fixed number of admission queries, whatever the cohort size
+    with django_assert_max_num_queries(40):
+        response = client.post(
+            reverse("programs:bulk_enroll", args=[program.external_id]),
+            {"client_ids": [c.id for c in cohort], "start_date": "2025-03-01"},
+        )
+    assert response.status_code == 302
+    enrolled_ids = set(ClientProgramEnrollment.objects.filter(program=program).values_list("client_id", flat=True))
+    assert enrolled_ids == {c.id for c in cohort[:150]}
+    assert AuditLog.objects.filter(entity="Enrollment", action="create").count() == 150
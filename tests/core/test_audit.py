@@ -0,0 +1,65 @@
+import os
+import uuid
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.audit import audit_buffer, get_audit_writer_stats, stats, wait_for_audit_queue
+from core.models import AuditLog, Staff, User, create_audit_log
+from core.principal import get_principal
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create_user(username="auditor", email="auditor@example.com", password="x")
+    Staff.objects.create(user=user, first_name="Audi", email="auditor@example.com")
+    return user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_buffered_create_audit_log_writes_once_on_commit(user, django_assert_max_num_queries):
+    cache.clear()
+    stats.reset()
+    get_principal(user)
+    entity_ids = [uuid.uuid4() for _ in range(5)]
+
+    # One bulk insert for the whole loop and one counter upsert, nothing per call
+    with django_assert_max_num_queries(10):
+        with transaction.atomic(), audit_buffer(user):
+            for entity_id in entity_ids:
+                audit_log = create_audit_log("Client", entity_id, "update", changed_by=user, diff_data={"x": 1})
+                assert audit_log.pk is None
+            assert AuditLog.objects.count() == 0
+
+    logs = AuditLog.objects.filter(entity="Client")
+    assert {log.entity_id for log in logs} == set(entity_ids)
+    assert all(log.changed_by == user.staff_profile for log in logs)
+    assert get_audit_writer_stats()["entries_written"] == 5
+    assert get_audit_writer_stats()["flushes"] == 1
+
+    # Without a buffer each call still writes its own row and returns it
+    audit_log = create_audit_log("Client", uuid.uuid4(), "create", changed_by=user.staff_profile)
+    assert audit_log.pk is not None and audit_log.changed_by_id == user.staff_profile.pk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_rolled_back_entries_are_dropped_and_queue_mode_writes(user, settings):
+    cache.clear()
+    with pytest.raises(RuntimeError):
+        with transaction.atomic(), audit_buffer(user):
+            create_audit_log("Client", uuid.uuid4(), "update", changed_by=user)
+            raise RuntimeError("rollback")
+    assert AuditLog.objects.count() == 0
+
+    settings.AUDIT_LOG_WRITER = "queue"
+    with audit_buffer(user) as audit:
+        audit.add("Program", uuid.uuid4(), "delete", {"name": "P"})
+    wait_for_audit_queue()
+    assert AuditLog.objects.filter(entity="Program").count() == 1
@@ -0,0 +1,58 @@
+import os
+import uuid
+from datetime import timedelta
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.utils import timezone
+
+from core.audit import audit_buffer, rebuild_audit_log_counts
+from core.audit_browser import get_audit_entities, get_audit_log_stats, keyset_page
+from core.models import AuditLog, AuditLogDailyCount, create_audit_log
+
+
+@pytest.mark.django_db(transaction=True)
+def test_keyset_pages_walk_the_log_both_ways():
+    now = timezone.now()
+    for i in range(7):
+        log = create_audit_log("Client", uuid.uuid4(), "update", diff_data={"i": i})
+        # Two entries share a timestamp so the id breaks the tie
+        AuditLog.objects.filter(pk=log.pk).update(changed_at=now - timedelta(minutes=min(i, 5)))
+    expected = list(AuditLog.objects.order_by("-changed_at", "-id"))
+
+    pages = [keyset_page(AuditLog.objects.all(), 3)]
+    while pages[-1].has_next:
+        pages.append(keyset_page(AuditLog.objects.all(), 3, after=pages[-1].next_cursor))
+    assert [log for page in pages for log in page] == expected
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert not pages[0].has_previous and pages[2].has_previous
+
+    back = keyset_page(AuditLog.objects.all(), 3, before=pages[2].previous_cursor)
+    assert list(back) == list(pages[1]) and back.has_previous and back.has_next
+
+    assert list(keyset_page(AuditLog.objects.all(), 3, after="not-a-cursor")) == expected[:3]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_counters_follow_writes_and_rebuilds():
+    with audit_buffer():
+        for action in ("create", "create", "update", "delete"):
+            create_audit_log("Program", uuid.uuid4(), action)
+    create_audit_log("Client", uuid.uuid4(), "login")
+
+    today = timezone.localdate()
+    assert get_audit_log_stats(today, today) == {
+        "total_events": 5, "create_events": 2, "update_events": 1, "delete_events": 1,
+    }
+    assert get_audit_log_stats(entity="Program")["total_events"] == 4
+    assert get_audit_entities() == ["Client", "Program"]
+
+    AuditLog.objects.filter(entity="Program", action="create").delete()
+    rebuild_audit_log_counts(end_day=today)
+    assert get_audit_log_stats()["create_events"] == 0
+    assert AuditLogDailyCount.objects.get(day=today, entity="Client").count == 1
@@ -0,0 +1,84 @@
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from core.audit_partitions import (
+    AuditLogPartition, _overlaps, _parse_bound, create_partition, drop_expired_partitions, list_partitions,
+    next_partition_start, partition_name, partition_start,
+)
+from core.models import AuditLog
+
+
+@pytest.mark.parametrize("interval, day, start, end", [
+    ("day", date(2026, 2, 28), date(2026, 2, 28), date(2026, 3, 1)),
+    ("week", date(2026, 10, 16), date(2026, 10, 12), date(2026, 10, 19)),
+    ("month", date(2026, 12, 31), date(2026, 12, 1), date(2027, 1, 1)),
+])
+def test_partition_ranges(interval, day, start, end):
+    assert partition_start(day, interval) == start
+    assert next_partition_start(start, interval) == end
+    assert partition_name(start) == f"audit_logs_p{start:%Y%m%d}"
+
+
+def test_bounds_and_overlaps():
+    assert _parse_bound("MINVALUE") is None
+    upper = _parse_bound("'2026-10-16 00:00:00+00'")
+    assert upper == datetime(2026, 10, 16, tzinfo=dt_timezone.utc)
+
+    existing = [
+        AuditLogPartition("audit_logs_p20261016_before", None, upper),
+        AuditLogPartition("audit_logs_default", None, None, is_default=True),
+    ]
+    assert _overlaps(existing, upper - timedelta(days=1), upper)
+    assert not _overlaps(existing, upper, upper + timedelta(days=1))
+
+
+def create_audit_log(days_ago=0):
+    log = AuditLog.objects.create(entity="Client", entity_id=uuid.uuid4(), action="update", diff_json={})
+    if days_ago:
+        AuditLog.objects.filter(pk=log.pk).update(changed_at=timezone.now() - timedelta(days=days_ago))
+    return log
+
+
+# Not transaction=True: the partition DDL below is rolled back with the test's transaction
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "postgresql", reason="audit_logs is only partitioned on PostgreSQL")
+def test_retention_drops_expired_partitions():
+    # Detach the migration's catch-all partition so the old row lands in one this test owns
+    before = next(partition for partition in list_partitions() if partition.lower is None and not partition.is_default)
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE audit_logs DETACH PARTITION {connection.ops.quote_name(before.name)}")
+    old_day = timezone.now().astimezone(dt_timezone.utc).date() - timedelta(days=45)
+    name = create_partition(old_day, old_day + timedelta(days=1))
+
+    create_audit_log(days_ago=45)
+    create_audit_log()
+
+    assert drop_expired_partitions(timezone.now() - timedelta(days=15), dry_run=True) == [(name, 1)]
+    call_command("cleanup_old_audit_logs", "--days", "15", stdout=open(os.devnull, "w"))
+    assert AuditLog.objects.count() == 1
+    assert name not in [partition.name for partition in list_partitions()]
+
+
+@pytest.mark.django_db
+def test_retention_falls_back_to_row_deletes_without_partitions(monkeypatch):
+    monkeypatch.setattr("core.audit_partitions.is_partitioned", lambda connection=None: False)
+    monkeypatch.setattr("core.management.commands.cleanup_old_audit_logs.is_partitioned", lambda connection=None: False)
+    create_audit_log(days_ago=20)
+    create_audit_log()
+
+    assert drop_expired_partitions(timezone.now()) == []
+    call_command("cleanup_old_audit_logs", "--days", "15", stdout=open(os.devnull, "w"))
+    assert AuditLog.objects.count() == 1
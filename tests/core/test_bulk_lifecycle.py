@@ -0,0 +1,83 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+
+from core.bulk_lifecycle import archive_clients, archive_programs, restore_clients, restore_enrollments
+from core.models import (
+    AuditLog, Client, ClientProgramEnrollment, Department, Program, ServiceRestriction, Staff, User,
+)
+from core.principal import get_principal
+
+
+@pytest.fixture
+def user():
+    user = User.objects.create_user(
+        username="admin", email="admin@example.com", password="x", first_name="Ada", last_name="Admin"
+    )
+    Staff.objects.create(user=user, first_name="Ada", email="admin@example.com")
+    return user
+
+
+@pytest.fixture
+def enrolled_clients():
+    department = Department.objects.create(name="Housing")
+    programs = [Program.objects.create(name=f"P{i}", department=department, location="Main") for i in range(2)]
+    clients = [Client.objects.create(first_name=f"C{i}", last_name="Test", client_id=str(i)) for i in range(4)]
+    for client in clients:
+        for program in programs:
+            ClientProgramEnrollment.objects.create(client=client, program=program, start_date=date(2024, 1, 1))
+        ServiceRestriction.objects.create(client=client, scope="org", restriction_type=["bar"], start_date=date(2024, 1, 1))
+    return programs, clients
+
+
+@pytest.mark.django_db(transaction=True)
+def test_archive_clients_is_set_based_and_audited(user, enrolled_clients, django_assert_max_num_queries):
+    cache.clear()
+    programs, clients = enrolled_clients
+    selection = Client.objects.filter(id__in=[clients[0].id, clients[1].id])
+
+    get_principal(user)  # resolved once per request by the middleware
+
+    # Selection, audit insert, counter upsert and three updates (plus transaction statements), whatever the selection size
+    with django_assert_max_num_queries(13):
+        counts = archive_clients(selection, user)
+
+    assert counts == {"clients": 2, "enrollments": 4, "restrictions": 2}
+    assert set(Client.objects.filter(is_archived=True).values_list("id", flat=True)) == {clients[0].id, clients[1].id}
+    assert not ClientProgramEnrollment.objects.filter(client=clients[2], is_archived=True).exists()
+    archived_enrollment = ClientProgramEnrollment.objects.filter(client=clients[0]).first()
+    assert archived_enrollment.archived_at is not None
+    assert archived_enrollment.updated_by == "Ada Admin"
+
+    logs = AuditLog.objects.filter(entity="Client", action="archive")
+    assert {log.entity_id for log in logs} == {clients[0].external_id, clients[1].external_id}
+    assert all(log.changed_by == user.staff_profile and log.diff_json["archived_by"] == "Ada Admin" for log in logs)
+
+    assert restore_clients(Client.objects.filter(is_archived=True), user) == 2
+    assert not Client.objects.filter(is_archived=True).exists()
+    # Restoring a client leaves its enrollments archived, as before
+    assert ClientProgramEnrollment.objects.filter(is_archived=True).count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_archive_programs_cascades_to_enrollments(user, enrolled_clients):
+    cache.clear()
+    programs, clients = enrolled_clients
+
+    assert archive_programs(Program.objects.filter(pk=programs[0].pk), user) == 1
+    assert ClientProgramEnrollment.objects.filter(program=programs[0], is_archived=False).count() == 0
+    assert ClientProgramEnrollment.objects.filter(program=programs[1], is_archived=False).count() == 4
+    log = AuditLog.objects.get(entity="Program")
+    assert log.action == "delete" and log.diff_json["source"] == "bulk_delete"
+
+    restored = restore_enrollments(ClientProgramEnrollment.objects.filter(client=clients[0], is_archived=True), user)
+    assert restored == ["C0 Test - P0"]
+    assert ClientProgramEnrollment.objects.filter(program=programs[0], is_archived=False).count() == 1
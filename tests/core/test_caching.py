@@ -0,0 +1,89 @@
+import os
+import threading
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.test import override_settings
+
+from core.caching import (
+    CacheNamespace, get_cache_stats, invalidate_group, local_cache, reset_cache_stats, shared_cache,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    shared_cache().clear()
+    local_cache().clear()
+    reset_cache_stats()
+
+
+def test_values_are_served_from_the_local_tier_then_the_shared_tier():
+    reports = CacheNamespace("reports-test", groups=("reports-test",))
+    assert reports.get("a") is None
+    reports.set("a", 1)
+    assert reports.get("a") == 1
+
+    # Another worker has an empty local tier: it hits the shared tier and keeps a local copy
+    local_cache().clear()
+    assert reports.get_many(["a", "b"]) == {"a": 1}
+    assert reports.get("a") == 1
+
+    stats = get_cache_stats()["reports-test"]
+    assert (stats["local_hits"], stats["shared_hits"], stats["misses"]) == (2, 1, 2)
+    assert stats["hit_rate"] == 0.6
+
+
+def test_invalidating_a_group_moves_every_namespace_in_it():
+    reports = CacheNamespace("reports-test", groups=("reports-test", "shared-test"))
+    lists = CacheNamespace("lists-test", groups=("shared-test",), use_local=False)
+    reports.set("a", 1)
+    lists.set("a", 2)
+
+    invalidate_group("reports-test")
+    assert reports.get("a") is None and lists.get("a") == 2
+
+    invalidate_group("shared-test")
+    assert lists.get("a") is None
+
+    # Values computed before an invalidation are stored under the versions they were computed from
+    pinned = reports.current()
+    invalidate_group("reports-test")
+    pinned.set("a", "stale")
+    assert reports.get("a") is None
+
+
+def test_get_or_set_computes_once():
+    reports = CacheNamespace("reports-test")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"total": 3}
+
+    assert reports.get_or_set("totals", compute) == {"total": 3}
+    assert reports.get_or_set("totals", compute) == {"total": 3}
+    assert len(calls) == 1
+    assert get_cache_stats()["reports-test"]["avg_compute_ms"] is not None
+
+
+def test_get_or_set_waits_for_the_worker_holding_the_lock():
+    reports = CacheNamespace("reports-test", use_local=False)
+    pinned = reports.current()
+    shared_cache().add(f"lock:{pinned.make_key('totals')}", 1, 10)
+
+    # Another worker stores the value while we wait: it is used instead of computing it again
+    other_worker = threading.Timer(0.1, pinned.set, args=("totals", "from another worker"))
+    other_worker.start()
+    assert reports.get_or_set("totals", lambda: "computed here") == "from another worker"
+    other_worker.join()
+    assert get_cache_stats()["reports-test"]["lock_waits"] == 1
+
+    # A lock that is never released only delays the computation
+    shared_cache().add(f"lock:{pinned.make_key('other')}", 1, 10)
+    with override_settings(CACHE_LOCK_TIMEOUT=0.1):
+        assert reports.get_or_set("other", lambda: "computed here") == "computed here"
@@ -0,0 +1,66 @@
+import os
+from datetime import date
+from types import SimpleNamespace
+
+import django
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from core.candidate_index import ClientCandidateIndex, soundex
+from core.fuzzy_matching import FuzzyMatcher
+
+
+def make_client(pk, first_name, last_name, dob=None):
+    return SimpleNamespace(pk=pk, first_name=first_name, last_name=last_name, dob=dob)
+
+
+CLIENTS = [
+    make_client(1, "John", "Smith", date(1980, 5, 1)),
+    make_client(2, "Jon", "Smyth", date(1980, 5, 1)),
+    make_client(3, "Smith", "John", date(1995, 1, 1)),
+    make_client(4, "Johnny", "", None),
+    make_client(5, "Maria", "Garcia", date(1970, 2, 2)),
+    make_client(6, "Xavier", "Okafor", date(1980, 5, 1)),
+]
+
+
+def build_index():
+    return ClientCandidateIndex(FuzzyMatcher()).add_many(CLIENTS)
+
+
+def test_soundex_codes():
+    assert soundex("Robert") == soundex("Rupert") == "R163"
+    assert soundex("Ashcraft") == "A261"
+    assert soundex("123") == ""
+
+
+def test_candidates_cover_phonetic_token_and_nickname_keys():
+    index = build_index()
+    assert index.candidate_ids("John", "Smith") == {1, 2, 3, 4}
+    assert index.candidate_ids("Maria", "Garcia") == {5}
+
+
+def test_dob_year_window_keeps_clients_without_dob():
+    index = build_index()
+    assert index.candidate_ids("John", "Smith", dob=date(1981, 1, 1), dob_year_window=1) == {1, 2, 4}
+
+
+def test_incremental_add_update_remove():
+    index = build_index()
+    index.remove(1)
+    assert 1 not in index.candidate_ids("John", "Smith")
+    index.update(make_client(5, "Jon", "Smith"))
+    assert 5 in index.candidate_ids("John", "Smith")
+    assert index.candidate_ids("Maria", "Garcia") == set()
+    assert len(index) == 5
+
+
+def test_find_potential_duplicates_with_index_matches_full_scan():
+    matcher = FuzzyMatcher()
+    index = ClientCandidateIndex(matcher).add_many(CLIENTS)
+    client_data = {"first_name": "Jon", "last_name": "Smith"}
+    assert matcher.find_potential_duplicates(
+        client_data, CLIENTS, similarity_threshold=0.7, candidate_index=index
+    ) == matcher.find_potential_duplicates(client_data, CLIENTS, similarity_threshold=0.7)
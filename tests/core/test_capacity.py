@@ -0,0 +1,64 @@
+import os
+from datetime import date, timedelta
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.utils import timezone
+
+from core.capacity import filter_programs_by_capacity, get_program_capacities
+from core.models import Client, ClientProgramEnrollment, Department, Program
+
+
+@pytest.fixture
+def programs():
+    department = Department.objects.create(name="Housing")
+    today = timezone.now().date()
+    full = Program.objects.create(name="Full", department=department, location="A", capacity_current=2)
+    spare = Program.objects.create(name="Spare", department=department, location="B", capacity_current=5)
+    unlimited = Program.objects.create(name="Unlimited", department=department, location="C", no_capacity_limit=True)
+    clients = [Client.objects.create(first_name=f"C{i}", last_name="Test", client_id=str(i)) for i in range(6)]
+
+    enrollments = [
+        (clients[0], full, today - timedelta(days=30), None, False),
+        (clients[1], full, today - timedelta(days=10), today + timedelta(days=10), False),
+        (clients[2], full, today - timedelta(days=90), today - timedelta(days=60), False),  # ended
+        (clients[3], spare, today - timedelta(days=5), None, True),  # archived
+        (clients[4], spare, today + timedelta(days=5), None, False),  # future
+        (clients[5], unlimited, today - timedelta(days=1), None, False),
+    ]
+    for client, program, start_date, end_date, is_archived in enrollments:
+        ClientProgramEnrollment.objects.create(
+            client=client, program=program, start_date=start_date, end_date=end_date, is_archived=is_archived
+        )
+    return full, spare, unlimited
+
+
+@pytest.mark.django_db(transaction=True)
+def test_capacities_match_program_methods_in_one_query(programs, django_assert_num_queries):
+    today = timezone.now().date()
+    for as_of_date in (None, today + timedelta(days=7), today + timedelta(days=20), date(2000, 1, 1)):
+        with django_assert_num_queries(1):
+            capacities = get_program_capacities(programs, as_of_date)
+        for program in programs:
+            capacity = capacities[program.pk]
+            assert capacity.current_enrollments == program.get_current_enrollments_count(as_of_date)
+            assert capacity.total_enrollments == program.get_total_enrollments_count()
+            assert capacity.available_capacity == program.get_available_capacity(as_of_date)
+            assert capacity.is_at_capacity == program.is_at_capacity(as_of_date)
+            assert capacity.capacity_percentage == program.get_capacity_percentage(as_of_date)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_capacity_filter_keeps_a_queryset(programs):
+    full, spare, unlimited = programs
+    queryset = Program.objects.all()
+
+    assert list(filter_programs_by_capacity(queryset, "at_capacity")) == [full]
+    available = filter_programs_by_capacity(queryset, "available")
+    assert set(available.order_by("name").filter(name__icontains="a")) == {spare}
+    assert set(filter_programs_by_capacity(queryset, "no_limit")) == {unlimited}
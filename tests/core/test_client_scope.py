@@ -0,0 +1,89 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from core.client_scope import get_program_manager_client_ids, get_staff_client_ids
+from core.models import (
+    Client, ClientProgramEnrollment, Department, Program, ProgramManagerAssignment, User,
+)
+from staff.models import StaffClientAssignment, StaffProgramAssignment
+
+
+def enroll(client, program, created_by=None):
+    return ClientProgramEnrollment.objects.create(
+        client=client, program=program, start_date=date(2024, 1, 1), created_by=created_by
+    )
+
+
+def join_scoped_ids(staff):
+    """The OR-of-joins filter the views used before the sets were materialized."""
+    staff_name = f"{staff.user.first_name} {staff.user.last_name}".strip() or staff.user.username
+    relationship_filters = (
+        Q(clientprogramenrollment__program__in=staff.get_assigned_programs())
+        | Q(clientprogramenrollment__created_by=staff_name)
+        | Q(servicerestriction__created_by=staff_name)
+        | Q(updated_by=staff_name)
+    )
+    return set(Client.objects.filter(relationship_filters).distinct().values_list("id", flat=True))
+
+
+@pytest.fixture
+def programs():
+    department = Department.objects.create(name="Housing")
+    return [Program.objects.create(name=f"Program {i}", department=department, location="Main") for i in range(3)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_program_manager_scope_matches_join_filter_and_follows_writes(programs, create_staff_user):
+    cache.clear()
+    user, staff = create_staff_user("manager", "Manager", first_name="Manager", last_name="Lee")
+    ProgramManagerAssignment.objects.create(staff=staff, program=programs[0])
+    clients = [Client.objects.create(first_name=f"C{i}", last_name="Test", client_id=str(i)) for i in range(5)]
+    enroll(clients[0], programs[0])
+    enroll(clients[1], programs[1], created_by="Manager Lee")
+    enroll(clients[2], programs[2])
+
+    assert get_program_manager_client_ids(user) == join_scoped_ids(staff) == {clients[0].id, clients[1].id}
+
+    # New enrollment in a managed program and a client edited by the manager
+    enroll(clients[3], programs[0])
+    clients[4].updated_by = "Manager Lee"
+    clients[4].save()
+    assert get_program_manager_client_ids(user) == join_scoped_ids(staff)
+    assert {clients[3].id, clients[4].id} <= get_program_manager_client_ids(user)
+
+    # Moving the enrollment out of the managed program drops the client, without re-reading the row
+    enrollment = ClientProgramEnrollment.objects.get(client=clients[3])
+    enrollment.program = programs[2]
+    with CaptureQueriesContext(connection) as queries:
+        enrollment.save()
+    assert not [
+        query["sql"] for query in queries.captured_queries
+        if query["sql"].startswith("SELECT") and "client_program_enrollments" in query["sql"]
+    ]
+    assert clients[3].id not in get_program_manager_client_ids(user)
+    assert get_program_manager_client_ids(user) == join_scoped_ids(staff)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_staff_scope_covers_program_and_client_assignments(programs, create_staff_user):
+    cache.clear()
+    user, staff = create_staff_user("worker", "Staff", first_name="Worker", last_name="Lee")
+    clients = [Client.objects.create(first_name=f"S{i}", last_name="Test", client_id=str(10 + i)) for i in range(3)]
+    enroll(clients[0], programs[0])
+    assert get_staff_client_ids(user) == set()
+
+    StaffProgramAssignment.objects.create(staff=staff, program=programs[0])
+    StaffClientAssignment.objects.create(staff=staff, client=clients[2])
+    assert get_staff_client_ids(User.objects.get(pk=user.pk)) == {clients[0].id, clients[2].id}
@@ -0,0 +1,48 @@
+import os
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.test import Client as HttpClient
+from django.urls import reverse
+
+from core.client_scope import get_visible_clients
+from core.client_search import rank_client_matches
+from core.models import Client
+from staff.models import StaffClientAssignment
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_ranks_name_prefixes_first_within_scope(create_staff_user, django_assert_num_queries):
+    cache.clear()
+    admin, _ = create_staff_user("admin", "SuperAdmin")
+    worker, worker_staff = create_staff_user("worker", "Staff")
+    Client.objects.create(first_name="Annie", last_name="Zed", client_id="1")
+    joanna = Client.objects.create(first_name="Joanna", last_name="Ann", client_id="2")
+    hannah = Client.objects.create(first_name="Hannah", last_name="Smith", client_id="3")
+    Client.objects.create(first_name="Bob", last_name="Jones", client_id="4", email="bob.ann@example.com")
+    Client.objects.create(first_name="Anna", last_name="Archived", client_id="5", is_archived=True)
+    Client.objects.create(first_name="Carl", last_name="Other", client_id="6")
+    StaffClientAssignment.objects.create(staff=worker_staff, client=hannah)
+
+    visible = get_visible_clients(admin)
+    with django_assert_num_queries(1):
+        matches = list(rank_client_matches(visible, "  ANN ", limit=4))
+    # Name prefixes (by last name) before other matches; admins also see archived clients
+    assert [client.first_name for client in matches] == ["Joanna", "Anna", "Annie", "Bob"]
+
+    # Staff-only users search their own clients only
+    http = HttpClient()
+    http.force_login(worker)
+    data = http.get(reverse("core:search_clients"), {"q": "ann"}).json()
+    assert [client["id"] for client in data["clients"]] == [hannah.id]
+    assert http.get(reverse("core:search_clients")).json()["count"] == 1
+
+    http.force_login(admin)
+    data = http.get(reverse("core:search_clients"), {"q": "ann"}).json()
+    assert data["count"] == 5 and data["clients"][0]["id"] == joanna.id
@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.db.models import Prefetch
+from django.test import RequestFactory
+
+from core.csv_export import iter_queryset, stream_csv
+from core.models import Client, ClientProgramEnrollment, Department, Program
+
+
+def test_stream_csv_sends_gzip_chunks_when_accepted():
+    rows = [[i, f"name {i}", "a,b"] for i in range(5000)]
+    expected = io.StringIO()
+    writer = csv.writer(expected)
+    writer.writerow(["ID", "Name", "Tags"])
+    writer.writerows(rows)
+
+    plain = stream_csv(RequestFactory().get("/"), "plain.csv", iter(rows), header=["ID", "Name", "Tags"])
+    assert plain.streaming and not plain.has_header("Content-Encoding")
+    assert plain["Content-Disposition"] == 'attachment; filename="plain.csv"'
+    chunks = list(plain.streaming_content)
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode("utf-8") == expected.getvalue()
+
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+    compressed = stream_csv(request, "gzip.csv", iter(rows), header=["ID", "Name", "Tags"])
+    assert compressed["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed["Vary"]
+    assert gzip.decompress(b"".join(compressed.streaming_content)).decode("utf-8") == expected.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_iter_queryset_prefetches_per_chunk(django_assert_num_queries):
+    department = Department.objects.create(name="Housing")
+    program = Program.objects.create(name="Shelter", department=department, location="A")
+    for i in range(5):
+        client = Client.objects.create(first_name=f"C{i}", last_name="Test", client_id=str(i))
+        ClientProgramEnrollment.objects.create(client=client, program=program, start_date=date(2024, 1, 1))
+
+    clients = Client.objects.order_by("client_id").prefetch_related(
+        Prefetch("clientprogramenrollment_set", queryset=ClientProgramEnrollment.objects.select_related("program"))
+    )
+    # One client query, then one enrollment query per chunk of two clients
+    with django_assert_num_queries(4):
+        rows = [
+            [client.client_id, [enrollment.program.name for enrollment in client.clientprogramenrollment_set.all()]]
+            for client in iter_queryset(clients, chunk_size=2)
+        ]
+    assert rows == [[str(i), ["Shelter"]] for i in range(5)]
@@ -0,0 +1,73 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from core.dashboard_stats import get_dashboard_scope, get_dashboard_stats
+from core.models import Client, ClientProgramEnrollment, Department, Program, Role, Staff, StaffRole, User
+
+
+def analyst_request():
+    user = User.objects.create_user(username="analyst", email="analyst@example.com", password="x")
+    staff = Staff.objects.create(user=user, first_name="analyst", email="analyst@example.com")
+    StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name="Analyst")[0])
+    request = RequestFactory().get("/dashboard/")
+    request.user = user
+    return request
+
+
+def stats_for(request):
+    return get_dashboard_stats(
+        request,
+        get_dashboard_scope(request.user, is_analyst=True),
+        Program.objects.all(),
+        is_analyst=True,
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stats_match_program_methods_and_are_cached(django_assert_num_queries):
+    cache.clear()
+    request = analyst_request()
+    department = Department.objects.create(name="Shelter")
+    full = Program.objects.create(name="Full", department=department, location="A", capacity_current=1)
+    open_ended = Program.objects.create(name="Open", department=department, location="B", no_capacity_limit=True)
+    client = Client.objects.create(first_name="Ann", last_name="Lee", client_id="1")
+    ClientProgramEnrollment.objects.create(client=client, program=full, start_date=date(2024, 1, 1), status="active")
+
+    stats = stats_for(request)
+
+    assert stats["total_clients"] == 1
+    assert stats["active_programs"] == 2
+    rows = {row["name"]: row for row in stats["program_status"]}
+    for program in (full, open_ended):
+        assert rows[program.name]["current_enrollments"] == program.get_current_enrollments_count()
+        assert rows[program.name]["available_capacity"] == program.get_available_capacity()
+        assert rows[program.name]["is_at_capacity"] == program.is_at_capacity()
+        assert rows[program.name]["department"]["name"] == "Shelter"
+
+    with django_assert_num_queries(0):
+        assert stats_for(request) == stats
+
+
+@pytest.mark.django_db(transaction=True)
+def test_client_and_enrollment_writes_invalidate_stats():
+    cache.clear()
+    request = analyst_request()
+    department = Department.objects.create(name="Outreach")
+    program = Program.objects.create(name="Drop-in", department=department, location="C", capacity_current=10)
+    assert stats_for(request)["total_clients"] == 0
+
+    client = Client.objects.create(first_name="Bo", last_name="Park", client_id="2")
+    assert stats_for(request)["total_clients"] == 1
+
+    ClientProgramEnrollment.objects.create(client=client, program=program, start_date=date(2024, 1, 1))
+    assert stats_for(request)["program_status"][0]["current_enrollments"] == 1
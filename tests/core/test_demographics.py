@@ -0,0 +1,82 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from core.demographics import AGE_BANDS, get_client_demographics
+from core.models import Client, ClientProgramEnrollment, Department, Program
+
+
+def python_demographics(clients, today):
+    """The per-client counting the demographics report used before it moved to grouped queries."""
+    age_groups = {label: 0 for label, _ in AGE_BANDS}
+    counts = {key: {} for key in ("gender_counts", "language_counts", "city_counts", "ethnicity_counts", "healthcare_coverage_counts")}
+
+    def add(key, value):
+        counts[key][value] = counts[key].get(value, 0) + 1
+
+    for client in clients:
+        if client.dob:
+            age = today.year - client.dob.year - ((today.month, today.day) < (client.dob.month, client.dob.day))
+            label = next((label for label, oldest in AGE_BANDS if oldest is None or age <= oldest))
+            age_groups[label] += 1
+        add("gender_counts", client.gender or "Unknown")
+        add("language_counts", client.language or "Unknown")
+        add("city_counts", client.city or "Unknown")
+        add("healthcare_coverage_counts", "Yes (Has Health Card)" if client.health_card_number else "No/Unknown")
+        if client.ethnicity:
+            for value in client.ethnicity if isinstance(client.ethnicity, list) else [str(client.ethnicity)]:
+                if value:
+                    add("ethnicity_counts", value)
+        else:
+            add("ethnicity_counts", "Unknown")
+    return age_groups, counts
+
+
+@pytest.mark.django_db(transaction=True)
+def test_grouped_demographics_match_per_client_counts(django_assert_num_queries):
+    today = date(2028, 2, 29)
+    rows = [
+        # dob, gender, language, city, ethnicity, health card
+        (date(2010, 2, 28), "Female", "English", "Toronto", ["Black", "Asian"], "123"),
+        (date(2010, 3, 1), "Male", "French", "Ottawa", ["Black"], ""),
+        (date(2002, 2, 28), "", None, "Toronto", [], None),
+        (date(1990, 6, 15), "Female", "English", "", "Latin American", "456"),
+        (date(1962, 2, 28), None, "English", None, ["", "White"], None),
+        (date(1950, 1, 1), "Male", "Spanish", "Toronto", [], "789"),
+        (None, "Female", "", "Ottawa", ["Asian"], None),
+    ]
+    clients = []
+    for i, (dob, gender, language, city, ethnicity, health_card) in enumerate(rows):
+        clients.append(Client.objects.create(
+            first_name=f"Client{i}", last_name="Test", client_id=str(i), dob=dob, gender=gender,
+            language=language, city=city, ethnicity=ethnicity, health_card_number=health_card,
+        ))
+
+    # Two enrollments for the first client: the scoped queryset joins and uses distinct()
+    department = Department.objects.create(name="Housing")
+    programs = [Program.objects.create(name=f"Program {i}", department=department) for i in range(2)]
+    for program in programs:
+        ClientProgramEnrollment.objects.create(client=clients[0], program=program, start_date=date(2024, 1, 1))
+    ClientProgramEnrollment.objects.create(client=clients[1], program=programs[0], start_date=date(2024, 1, 1))
+    scoped = Client.objects.filter(clientprogramenrollment__program__in=programs).distinct()
+
+    with django_assert_num_queries(2):
+        demographics = get_client_demographics(Client.objects.all(), today=today)
+    age_groups, counts = python_demographics(Client.objects.all(), today)
+    assert demographics["total_clients"] == len(rows)
+    assert demographics["age_groups"] == age_groups
+    for key, expected in counts.items():
+        assert demographics[key] == expected, key
+    assert [demographics["age_groups"][band] for band in ("0-17", "18-25", "26-35")] == [1, 1, 1]
+    assert list(demographics["gender_counts"]) == ["Female", "Male", "Unknown"]
+
+    scoped_demographics = get_client_demographics(scoped, today=today)
+    assert scoped_demographics["total_clients"] == 2
+    assert scoped_demographics["ethnicity_counts"] == {"Black": 2, "Asian": 1}
+    assert scoped_demographics["city_counts"] == {"Ottawa": 1, "Toronto": 1}
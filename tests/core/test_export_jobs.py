@@ -0,0 +1,94 @@
+import csv
+import io
+import os
+from datetime import date, timedelta
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.export_jobs import enqueue_export_job, evict_export_artifacts, run_export_job
+from core.models import Client, ExportJob
+
+
+@pytest.fixture
+def export_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.EXPORT_JOB_RUNNER = "command"
+    cache.clear()
+    return settings
+
+
+def export_request(user, **params):
+    request = RequestFactory().get("/clients/export/", params)
+    request.user = user
+    return request
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identical_requests_share_one_artifact(export_settings, create_staff_user):
+    for i in range(3):
+        Client.objects.create(first_name=f"Ada{i}", last_name="Lovelace", client_id=str(i), dob=date(1990, 1, 1))
+    first_user, _ = create_staff_user("first", "SuperAdmin")
+    second_user, _ = create_staff_user("second", "SuperAdmin")
+
+    job, reused = enqueue_export_job("clients", export_request(first_user, search="Ada", background="true"))
+    assert not reused and job.status == "queued"
+    # Same filters and scope from another user while the job is still queued
+    same_job, reused = enqueue_export_job("clients", export_request(second_user, search="Ada", program=""))
+    assert reused and same_job.pk == job.pk
+
+    run_export_job(job.pk)
+    job.refresh_from_db()
+    assert job.status == "success" and job.row_count == 3
+    with default_storage.open(job.file_path, "rb") as file:
+        rows = list(csv.reader(io.StringIO(file.read().decode("utf-8"))))
+    assert rows[0][:2] == ["First Name", "Last Name"]
+    assert sorted(row[0] for row in rows[1:]) == ["Ada0", "Ada1", "Ada2"]
+
+    assert enqueue_export_job("clients", export_request(second_user, search="Ada"))[0].pk == job.pk
+    assert enqueue_export_job("clients", export_request(second_user, search="Bob"))[0].pk != job.pk
+    assert enqueue_export_job("clients", export_request(create_staff_user("staff", "Staff")[0], search="Ada"))[0].pk != job.pk
+
+    xlsx_job, _ = enqueue_export_job("clients", export_request(first_user, search="Ada"), file_format="xlsx")
+    run_export_job(xlsx_job.pk)
+    xlsx_job.refresh_from_db()
+    assert xlsx_job.status == "success" and xlsx_job.file_name == "clients_export.xlsx"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_artifacts_are_evicted_by_age_then_size(export_settings):
+    export_settings.EXPORT_JOB_MAX_AGE_HOURS = 24
+    export_settings.EXPORT_JOB_MAX_TOTAL_MB = 1
+    now = timezone.now()
+
+    def finished_job(name, size, completed_hours_ago, accessed_hours_ago=None):
+        path = default_storage.save(f"exports/{name}.csv", ContentFile(b"x" * size))
+        return ExportJob.objects.create(
+            export_type="clients", cache_key=name, status="success", file_path=path, file_size=size,
+            completed_at=now - timedelta(hours=completed_hours_ago),
+            last_accessed_at=now - timedelta(hours=accessed_hours_ago) if accessed_hours_ago is not None else None,
+        )
+
+    old = finished_job("old", 10, completed_hours_ago=30)
+    recently_used = finished_job("recently_used", 600 * 1024, completed_hours_ago=5, accessed_hours_ago=0)
+    newest = finished_job("newest", 300 * 1024, completed_hours_ago=1)
+    least_recently_used = finished_job("least_recently_used", 300 * 1024, completed_hours_ago=3)
+
+    assert evict_export_artifacts(now) == 2
+    statuses = dict(ExportJob.objects.values_list("cache_key", "status"))
+    assert statuses == {
+        "old": "expired", "recently_used": "success", "newest": "success", "least_recently_used": "expired",
+    }
+    assert not default_storage.exists(old.file_path)
+    assert not default_storage.exists(least_recently_used.file_path)
+    assert default_storage.exists(recently_used.file_path) and default_storage.exists(newest.file_path)
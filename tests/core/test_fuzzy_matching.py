@@ -0,0 +1,55 @@
+import json
+import os
+
+import django
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from core.fuzzy_matching import DEFAULT_NICKNAME_MAPPINGS, FuzzyMatcher, normalize_name
+
+
+def reference_nickname_match(mappings, name1, name2):
+    """The original linear walk over the mappings."""
+    name1_norm, name2_norm = normalize_name(name1), normalize_name(name2)
+    for full_name, nicknames in mappings.items():
+        full_name_norm = normalize_name(full_name)
+        nicknames_norm = [normalize_name(nickname) for nickname in nicknames]
+        if name1_norm == full_name_norm and name2_norm in nicknames_norm:
+            return True, 0.9
+        if name2_norm == full_name_norm and name1_norm in nicknames_norm:
+            return True, 0.9
+        if name1_norm in nicknames_norm and name2_norm in nicknames_norm:
+            return True, 0.85
+    return False, 0.0
+
+
+def test_compiled_index_matches_linear_walk(settings):
+    settings.NICKNAME_MAPPINGS_FILE = None
+    matcher = FuzzyMatcher()
+    names = ["John Smith", " johnny ", "Jon", "Smith", "Mike", "Michael Brown", "Brown", "R. Singh", "Rohit", "Nobody", ""]
+    for name1 in names:
+        for name2 in names:
+            assert matcher.check_nickname_match(name1, name2) == reference_nickname_match(
+                DEFAULT_NICKNAME_MAPPINGS, name1, name2
+            ), (name1, name2)
+
+
+def test_counters_and_hot_reload(settings, tmp_path):
+    nickname_file = tmp_path / "nicknames.json"
+    nickname_file.write_text(json.dumps({"Katherine Lee": ["Kate", "Kathy"]}))
+    settings.NICKNAME_MAPPINGS_FILE = str(nickname_file)
+    settings.NICKNAME_RELOAD_INTERVAL = 0
+    matcher = FuzzyMatcher()
+
+    assert matcher.check_nickname_match("Kate", "Kathy") == (True, 0.85)
+    assert matcher.check_nickname_match("Bill", "William Ng") == (False, 0.0)
+    assert matcher.get_nickname_stats() == {"hits": 1, "misses": 1, "reloads": 0, "groups": 1}
+
+    nickname_file.write_text(json.dumps({"William Ng": ["Bill"]}))
+    os.utime(nickname_file, (os.path.getmtime(nickname_file) + 10,) * 2)
+
+    assert matcher.check_nickname_match("Bill", "William Ng") == (True, 0.9)
+    assert matcher.check_nickname_match("Kate", "Kathy") == (False, 0.0)
+    assert matcher.nickname_stats["reloads"] == 1
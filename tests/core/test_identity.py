@@ -0,0 +1,85 @@
+import os
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.identity import get_identity_cache_stats, reset_identity_cache_stats, resolve_token_user, revoke_token
+from core.models import Role, Staff, StaffRole, User
+from core.principal import get_principal
+
+
+@pytest.fixture
+def shared_identity_cache(monkeypatch):
+    # The test cache is one process's memory; behave as if it were Redis shared by every worker
+    monkeypatch.setattr("core.identity.identity_cache_enabled", lambda: True)
+
+
+@pytest.fixture
+def staff_user(shared_identity_cache):
+    cache.clear()
+    reset_identity_cache_stats()
+    user = User.objects.create_user(username="worker", email="worker@example.com", password="x")
+    staff = Staff.objects.create(user=user, first_name="Worker", email=user.email)
+    StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name="Staff")[0])
+    return user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cached_identity_is_reused_until_roles_or_user_change(staff_user, django_assert_num_queries):
+    token = str(AccessToken.for_user(staff_user))
+    assert resolve_token_user(token) == staff_user
+
+    with django_assert_num_queries(0):
+        user = resolve_token_user(token)
+        assert user.staff_profile.first_name == "Worker"
+        assert get_principal(user).role_names == ["Staff"]
+    assert get_identity_cache_stats() == {"hits": 1, "misses": 1, "revoked": 0, "hit_rate": 0.5}
+
+    # A role change moves the principal version: the next lookup reloads the roles
+    StaffRole.objects.create(staff=staff_user.staff_profile, role=Role.objects.create(name="Manager"))
+    assert sorted(get_principal(resolve_token_user(token)).role_names) == ["Manager", "Staff"]
+    assert get_identity_cache_stats()["misses"] == 2
+
+    # Deactivated users no longer authenticate
+    staff_user.is_active = False
+    staff_user.save()
+    assert resolve_token_user(token) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_logout_revokes_the_cookie_token(staff_user, client):
+    token = str(AccessToken.for_user(staff_user))
+    client.cookies["access_token"] = token
+    assert resolve_token_user(token) == staff_user
+
+    response = client.post("/core/api/auth/logout/", content_type="application/json", data={})
+    assert response.status_code == 200
+    assert resolve_token_user(token) is None
+    assert get_identity_cache_stats()["revoked"] == 1
+
+    # Other tokens of the same user are unaffected
+    assert resolve_token_user(str(AccessToken.for_user(staff_user))) == staff_user
+    revoke_token("not-a-token")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identities_are_not_cached_without_a_shared_cache(staff_user, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr("core.identity.identity_cache_enabled", lambda: False)
+    token = str(AccessToken.for_user(staff_user))
+    assert resolve_token_user(token) == staff_user
+
+    # Every request loads the user again, so a deactivation is seen by every worker
+    with django_assert_num_queries(1):
+        assert resolve_token_user(token) == staff_user
+    assert get_identity_cache_stats()["hits"] == 0
+
+    staff_user.is_active = False
+    staff_user.save()
+    assert resolve_token_user(token) is None
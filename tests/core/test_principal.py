@@ -0,0 +1,61 @@
+import os
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from core.context_processors import user_permissions
+from core.models import Role, StaffRole, User
+from core.principal import get_principal, get_principal_version
+
+
+@pytest.mark.django_db(transaction=True)
+def test_principal_is_resolved_once_and_cached(create_staff_user, django_assert_num_queries):
+    cache.clear()
+    user, _ = create_staff_user("manager", "Manager")
+
+    principal = get_principal(user)
+    assert principal.role_names == ["Manager"]
+    assert principal.is_program_manager and not principal.is_admin
+
+    # Memoized on the user for the rest of the request
+    with django_assert_num_queries(0):
+        assert get_principal(user) is principal
+
+    # A fresh user object (next request) is served from the cache
+    fresh_user = User.objects.get(pk=user.pk)
+    with django_assert_num_queries(0):
+        assert get_principal(fresh_user).role_names == ["Manager"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_role_change_invalidates_cached_principals(create_staff_user):
+    cache.clear()
+    user, staff = create_staff_user("analyst", "Analyst")
+    assert get_principal(User.objects.get(pk=user.pk)).role_names == ["Analyst"]
+
+    version = get_principal_version()
+    admin_role = Role.objects.get_or_create(name="Admin")[0]
+    StaffRole.objects.create(staff=staff, role=admin_role)
+    assert get_principal_version() > version
+    assert get_principal(User.objects.get(pk=user.pk)).is_admin
+
+
+@pytest.mark.django_db(transaction=True)
+def test_context_processor_uses_principal(create_staff_user):
+    cache.clear()
+    user, _ = create_staff_user("leader", "Leader")
+    request = RequestFactory().get("/")
+    request.user = user
+
+    context = user_permissions(request)
+
+    assert context["user_roles"] == ["Leader"]
+    assert context["user_permissions"]["can_view_programs"] is True
+    assert context["user_permissions"]["can_manage_clients"] is False
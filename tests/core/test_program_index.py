@@ -0,0 +1,123 @@
+import os
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client as HttpClient
+from django.urls import reverse
+
+from core.models import Department, Program, ProgramAlias, Role, Staff, StaffRole, User
+from core.program_index import ProgramNameIndex, get_program_index, load_program_index
+from core.similarity import normalize_name, token_similarity
+
+
+class FakeProgram:
+    def __init__(self, pk, name, department_id=1):
+        self.pk = self.id = pk
+        self.name = name
+        self.department_id = department_id
+
+
+def full_scan(programs, name):
+    """The upload's previous fuzzy match: the best token similarity over every program."""
+    text = normalize_name(name)
+    best_program, best_score = None, 0
+    for program in programs:
+        score = token_similarity.similarity(text, program.name or "")
+        if score > best_score:
+            best_program, best_score = program, score
+    return best_program, best_score
+
+
+def test_resolution_matches_the_full_scan_with_fewer_candidates():
+    names = [
+        "Emergency Shelter", "Youth Shelter", "Housing First", "Rapid Rehousing", "Meals",
+        "Mental Health Outreach", "Addiction Services", "Family Support", "Employment", "ER",
+    ] + [f"Program {chr(65 + i)}{chr(65 + j)}" for i in range(10) for j in range(10)]
+    programs = [FakeProgram(pk, name) for pk, name in enumerate(names, start=1)]
+    index = ProgramNameIndex(programs, {"shelter youth": 2})
+
+    assert index.resolve("  EMERGENCY   shelter ").match_type == "exact"
+    assert index.resolve("Shelter Youth") == (programs[1], "alias", 1.0)
+    for name in ("Emergency Shelters", "Shelter", "Rehousing", "Mental Health", "Outreach Team",
+                 "housing", "Employment Services", "Program", "ER Visits", "Unknown Thing", "E"):
+        resolution = index.resolve(name)
+        assert (resolution.program, resolution.score) == full_scan(programs, name), name
+        assert resolution.match_type == ("fuzzy" if resolution.program else None)
+    # Token and trigram candidates only, except the one too short to index
+    assert index.stats["candidates_scored"] < 5 * len(programs)
+
+    assert [program.name for program, _ in index.search("Emergncy Shelter")] == ["Emergency Shelter"]
+    assert index.search("shelter youth")[0] == (programs[1], 1.0)
+    assert index.get_exact("youth shelter", department_id=2) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_confirmed_fuzzy_names_become_aliases_and_the_shared_index_follows_changes():
+    cache.clear()
+    department = Department.objects.create(name="Housing")
+    shelter = Program.objects.create(name="Emergency Shelter", department=department)
+
+    index = load_program_index()
+    resolution = index.resolve("Emergency Shelters")
+    assert resolution.program == shelter and resolution.match_type == "fuzzy"
+    index.confirm("Emergency Shelters", resolution)
+    index.confirm("Emergency Shelters", resolution)
+    alias = ProgramAlias.objects.get()
+    assert (alias.alias, alias.program, alias.source, alias.use_count) == ("emergency shelters", shelter, "upload", 1)
+    assert index.learned_aliases == [{
+        "alias": "emergency shelters", "program_id": shelter.id, "program_name": "Emergency Shelter", "score": 0.8,
+    }]
+
+    # One shared word resolves this upload's name but is too weak to lock in as an alias
+    weak = index.resolve("Shelter Intake Program")
+    assert weak.program == shelter and weak.score < 0.8
+    index.confirm("Shelter Intake Program", weak)
+    assert ProgramAlias.objects.count() == 1
+    assert index.stats["fuzzy_not_learned"] == 1
+
+    assert load_program_index().resolve("EMERGENCY SHELTERS").match_type == "alias"
+
+    shared = get_program_index()
+    assert get_program_index() is shared
+    youth = Program.objects.create(name="Youth Shelter", department=department)
+    rebuilt = get_program_index()
+    assert rebuilt is not shared and rebuilt.get_exact("youth shelter") == youth
+
+
+@pytest.mark.django_db(transaction=True)
+def test_program_search_and_upload_use_the_index():
+    cache.clear()
+    user = User.objects.create_user(username="admin", email="admin@example.com", password="x")
+    staff = Staff.objects.create(user=user, first_name="Admin", email=user.email)
+    StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name="SuperAdmin")[0])
+    housing = Department.objects.create(name="Housing")
+    shelter = Program.objects.create(name="Emergency Shelter", department=housing, status="active")
+    http = HttpClient()
+    http.force_login(user)
+
+    # A misspelled search still finds the program
+    data = http.get(reverse("core:search_programs"), {"q": "emergncy sheltr"}).json()
+    assert [program["id"] for program in data["programs"]] == [shelter.id]
+
+    rows = ["Program Name,Department,Capacity"] + [
+        "emergency  shelter,Housing,40",
+        "Emergency Shelter,Health,10",
+        "Emergency Sheltre,Housing,5",
+    ] + [f"Program {i},Housing,1" for i in range(20)]
+    upload = SimpleUploadedFile("programs.csv", "\n".join(rows).encode("utf-8"), content_type="text/csv")
+    response = http.post(reverse("programs:upload"), {"file": upload}, follow=True)
+    assert response.status_code == 200
+
+    shelter.refresh_from_db()
+    assert shelter.capacity_current == 40
+    assert Program.objects.filter(name__iexact="emergency shelter").count() == 2
+    assert Program.objects.count() == 23
+    warnings = [str(message) for message in response.context["messages"]]
+    assert any("'Emergency Sheltre' (similar to 'Emergency Shelter')" in message for message in warnings)
@@ -0,0 +1,108 @@
+import os
+from datetime import date
+
+import django
+import pytest
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from django.urls import reverse
+
+from core.models import Client, ClientProgramEnrollment, Department, Program, Role, Staff, StaffRole, User
+from core.program_metrics import get_program_metrics, get_trend_months
+
+
+def python_metrics(program, today, include_archived=False):
+    """The per-program counting the performance report used before it moved to one grouped query."""
+    enrollments = ClientProgramEnrollment.objects.filter(program=program)
+    if not include_archived:
+        enrollments = enrollments.filter(is_archived=False)
+    active = [e for e in enrollments if e.start_date <= today and (e.end_date is None or e.end_date > today)]
+    completed = [e for e in enrollments if e.end_date is not None and e.end_date < today]
+    return len(enrollments), len(active), len(completed)
+
+
+def test_trend_months_cover_the_range_up_to_today():
+    today = date(2025, 3, 10)
+    assert get_trend_months(today=today, months=3) == [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+    assert get_trend_months(date(2024, 11, 15), date(2025, 6, 1), today=today) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1),
+    ]
+    assert len(get_trend_months(date(2010, 1, 1), today=today)) == 36
+    assert get_trend_months(date(2026, 1, 1), today=today) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_metrics_and_trends_come_from_one_grouped_query(django_assert_num_queries):
+    today = date(2025, 3, 10)
+    department = Department.objects.create(name="Housing")
+    shelter, meals, empty = (Program.objects.create(name=name, department=department) for name in ("Shelter", "Meals", "Empty"))
+    client = Client.objects.create(first_name="Test", last_name="Client", client_id="1")
+    rows = [
+        # program, start, end, archived
+        (shelter, date(2025, 1, 5), date(2025, 1, 15), False),
+        (shelter, date(2025, 1, 20), date(2025, 2, 9), False),
+        (shelter, date(2025, 2, 1), None, False),
+        (shelter, date(2025, 3, 1), date(2025, 6, 1), False),
+        (shelter, date(2024, 6, 1), date(2024, 7, 1), True),
+        (meals, date(2025, 2, 10), date(2025, 3, 10), False),
+        (meals, date(2025, 4, 1), None, False),
+    ]
+    for program, start, end, archived in rows:
+        ClientProgramEnrollment.objects.create(
+            client=client, program=program, start_date=start, end_date=end, is_archived=archived,
+        )
+
+    programs = Program.objects.order_by("name")
+    with django_assert_num_queries(2):
+        metrics = get_program_metrics(programs, today=today, trends=True, trend_start=date(2025, 1, 10))
+    assert [metric.program for metric in metrics] == list(programs)
+    for metric in metrics:
+        expected = python_metrics(metric.program, today)
+        assert (metric.total_enrollments, metric.active_enrollments, metric.completed_enrollments) == expected
+
+    empty_metrics, meals_metrics, shelter_metrics = metrics
+    assert shelter_metrics.completion_rate == 50.0 and shelter_metrics.performance_status == "Fair"
+    assert empty_metrics.completion_rate == 0 and empty_metrics.trend_admissions == 0
+
+    # The window starts on Jan 10: the Jan 5 admission is before it, the Jan 15 discharge in it
+    assert [point["month"] for point in shelter_metrics.trend] == [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+    assert [point["admissions"] for point in shelter_metrics.trend] == [1, 1, 1]
+    assert [point["discharges"] for point in shelter_metrics.trend] == [1, 1, 0]
+    assert [point["average_length_of_stay"] for point in shelter_metrics.trend] == [10.0, 20.0, None]
+    assert shelter_metrics.trend_average_length_of_stay == 15.0
+    # Discharges are counted up to today, future admissions are outside the window
+    assert [point["discharges"] for point in meals_metrics.trend] == [0, 0, 1]
+    assert meals_metrics.trend_admissions == 1
+
+    # Archived enrollments count for users who can see them
+    shelter_archived = get_program_metrics([shelter], include_archived=True, today=today)[0]
+    assert shelter_archived.total_enrollments == 5 and shelter_archived.trend == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_report_and_export_use_the_grouped_metrics(client):
+    user = User.objects.create_user(username="admin", email="admin@example.com", password="x")
+    staff = Staff.objects.create(user=user, first_name="Admin", email=user.email)
+    StaffRole.objects.create(staff=staff, role=Role.objects.get_or_create(name="SuperAdmin")[0])
+    department = Department.objects.create(name="Housing")
+    program = Program.objects.create(name="Shelter", department=department)
+    enrolled = Client.objects.create(first_name="Test", last_name="Client", client_id="1")
+    ClientProgramEnrollment.objects.create(
+        client=enrolled, program=program, start_date=date(2025, 1, 5), end_date=date(2025, 1, 15),
+    )
+    client.force_login(user)
+
+    query = {"start_date": "2025-01-01", "end_date": "2025-02-28"}
+    response = client.get(reverse("reports:program_performance"), query)
+    assert response.status_code == 200
+    assert [metric.program for metric in response.context["program_metrics"]] == [program]
+    assert response.context["trend_months"] == [date(2025, 1, 1), date(2025, 2, 1)]
+
+    response = client.get(reverse("reports:program_performance_export"), query)
+    lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+    assert lines[0].endswith("Admissions 2025-02,Discharges 2025-02,Avg Length of Stay 2025-02 (days)")
+    assert lines[1].startswith("Shelter,Housing,")
+    assert lines[1].endswith("1,1,10.0,1,1,10.0,0,0,")
@@ -0,0 +1,58 @@
+import os
+from difflib import SequenceMatcher
+
+import django
+
+# Ensure Django is configured when running under plain pytest
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ccd.settings")
+django.setup()
+
+from core.similarity import SimilarityKernel
+
+
+NAMES = ["John Smith", "Jon Smith", "john  smith", "Smith", "Smith John", "Maria Garcia", "Mario Garcia", "", " ", "J"]
+
+
+def reference_similarity(name1, name2):
+    """FuzzyMatcher.calculate_similarity before the kernel."""
+    if not name1 or not name2:
+        return 0.0
+    name1_norm = " ".join(name1.lower().strip().split())
+    name2_norm = " ".join(name2.lower().strip().split())
+    if name1_norm == name2_norm:
+        return 1.0
+    if name1_norm in name2_norm or name2_norm in name1_norm:
+        return 0.8
+    similarity = SequenceMatcher(None, name1_norm, name2_norm).ratio()
+    words1, words2 = set(name1_norm.split()), set(name2_norm.split())
+    if words1 and words2:
+        similarity = max(similarity, len(words1 & words2) / len(words1 | words2))
+    return similarity
+
+
+def test_scores_match_reference_at_every_threshold():
+    kernel = SimilarityKernel("sequence")
+    for threshold in (0.9, 0.7, 0.0):
+        for name1 in NAMES:
+            for name2 in NAMES:
+                expected = reference_similarity(name1, name2)
+                score = kernel.similarity_at_least(name1, name2, threshold)
+                assert score == (expected if expected >= threshold else None), (name1, name2, threshold)
+    assert kernel.stats["skipped"] > 0
+
+
+def test_score_many_uses_bounded_pair_cache():
+    kernel = SimilarityKernel("sequence", cache_size=2)
+    candidates = ["Jon Smith", "Maria Garcia", "Smith John"]
+    matches = kernel.score_many("John Smith", candidates, threshold=0.5)
+    assert [position for position, _ in matches] == [0, 2]
+    assert len(kernel._pair_cache) == 2
+
+    kernel.score_many("John Smith", candidates[1:], threshold=0.5)
+    assert kernel.stats["hits"] == 2
+
+
+def test_token_method_ignores_character_overlap():
+    kernel = SimilarityKernel("token")
+    assert kernel.similarity("Jon Smith", "John Smith") == 1 / 3
+    assert kernel.similarity("Jon", "John") == 0